@@ -0,0 +1,38 @@
+"""create_guild_turn_leases_table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('guild_turn_leases',
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.Column('owner_id', sa.Text(), nullable=False, comment='Unique token of the lease holder (process id + random suffix)'),
+    sa.Column('acquired_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('guild_id')
+    )
+    op.create_index(op.f('ix_guild_turn_leases_expires_at'), 'guild_turn_leases', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_guild_turn_leases_expires_at'), table_name='guild_turn_leases')
+    op.drop_table('guild_turn_leases')
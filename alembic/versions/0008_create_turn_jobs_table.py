@@ -0,0 +1,56 @@
+"""create_turn_jobs_table
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Labels are the TurnJobStatus member names, which is what SQLAlchemyEnum stores (as in event_type_enum).
+turn_job_status_enum = postgresql.ENUM('QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED', name='turn_job_status_enum', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    turn_job_status_enum.create(op.get_bind(), checkfirst=True)
+    op.create_table('turn_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.Column('status', turn_job_status_enum, nullable=False, server_default='QUEUED'),
+    sa.Column('entities_json', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment="Entity descriptors for process_actions_for_guild, e.g. [{'id': 1, 'type': 'player'}]"),
+    sa.Column('lease_owner', sa.Text(), nullable=True, comment='Guild turn lease token taken when the turn was claimed'),
+    sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('locked_by', sa.Text(), nullable=True, comment='Worker that claimed the job'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), nullable=False, comment='Not picked up before this time (retry backoff)'),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_turn_jobs_id'), 'turn_jobs', ['id'], unique=False)
+    op.create_index('ix_turn_jobs_status_available_at', 'turn_jobs', ['status', 'available_at'], unique=False)
+    op.create_index('ix_turn_jobs_guild_id_status', 'turn_jobs', ['guild_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_turn_jobs_guild_id_status', table_name='turn_jobs')
+    op.drop_index('ix_turn_jobs_status_available_at', table_name='turn_jobs')
+    op.drop_index(op.f('ix_turn_jobs_id'), table_name='turn_jobs')
+    op.drop_table('turn_jobs')
+    turn_job_status_enum.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,64 @@
+"""create_queued_actions_table
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('queued_actions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False, comment="Submission order within the player's queue"),
+    sa.Column('action_json', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment="ParsedAction.model_dump(mode='json')"),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_queued_actions_guild_player_seq', 'queued_actions', ['guild_id', 'player_id', 'seq'], unique=False)
+
+    # Move actions still waiting in players.collected_actions_json into the new table.
+    bind = op.get_bind()
+    players = sa.table('players', sa.column('id', sa.Integer), sa.column('guild_id', sa.BigInteger), sa.column('collected_actions_json', sa.JSON))
+    queued_actions = sa.table('queued_actions', sa.column('guild_id', sa.BigInteger), sa.column('player_id', sa.Integer),
+                              sa.column('seq', sa.Integer), sa.column('action_json', postgresql.JSONB))
+    rows = []
+    pending = bind.execute(sa.select(players.c.id, players.c.guild_id, players.c.collected_actions_json)
+                           .where(players.c.collected_actions_json.isnot(None))).all()
+    for player_id, guild_id, actions in pending:
+        if isinstance(actions, str):
+            try:
+                actions = json.loads(actions)
+            except ValueError:
+                continue
+        for seq, action in enumerate(actions or [], start=1):
+            if isinstance(action, dict):
+                rows.append({"guild_id": guild_id, "player_id": player_id, "seq": seq, "action_json": action})
+    if rows:
+        op.bulk_insert(queued_actions, rows)
+    op.execute(players.update().values(collected_actions_json=None))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Queued actions are not copied back into players.collected_actions_json.
+    op.drop_index('ix_queued_actions_guild_player_seq', table_name='queued_actions')
+    op.drop_table('queued_actions')
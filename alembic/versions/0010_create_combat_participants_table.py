@@ -0,0 +1,57 @@
+"""create_combat_participants_table
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('combat_participants',
+    sa.Column('combat_encounter_id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.Text(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['combat_encounter_id'], ['combat_encounters.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('combat_encounter_id', 'entity_type', 'entity_id')
+    )
+    op.create_index('ix_combat_participants_guild_entity', 'combat_participants', ['guild_id', 'entity_type', 'entity_id'], unique=False)
+
+    # Index the participants of combats that are already running.
+    bind = op.get_bind()
+    combat_encounters = sa.table('combat_encounters', sa.column('id', sa.Integer), sa.column('guild_id', sa.BigInteger),
+                                 sa.column('status', sa.Text), sa.column('participants_json', postgresql.JSONB))
+    combat_participants = sa.table('combat_participants', sa.column('combat_encounter_id', sa.Integer), sa.column('entity_type', sa.Text),
+                                   sa.column('entity_id', sa.Integer), sa.column('guild_id', sa.BigInteger))
+    rows = {}
+    active = bind.execute(sa.select(combat_encounters.c.id, combat_encounters.c.guild_id, combat_encounters.c.participants_json)
+                          .where(sa.cast(combat_encounters.c.status, sa.Text) == 'active')).all()
+    for combat_id, guild_id, participants in active:
+        for entity in (participants or {}).get("entities", []):
+            if isinstance(entity, dict) and entity.get("id") is not None and entity.get("type"):
+                rows[(combat_id, entity["type"], entity["id"])] = {
+                    "combat_encounter_id": combat_id, "entity_type": entity["type"], "entity_id": entity["id"], "guild_id": guild_id
+                }
+    if rows:
+        op.bulk_insert(combat_participants, list(rows.values()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_combat_participants_guild_entity', table_name='combat_participants')
+    op.drop_table('combat_participants')
@@ -0,0 +1,64 @@
+"""create_combat_log_entries_table
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('combat_log_entries',
+    sa.Column('combat_encounter_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.Column('turn_number', sa.Integer(), nullable=True),
+    sa.Column('entry_json', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['combat_encounter_id'], ['combat_encounters.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('combat_encounter_id', 'seq')
+    )
+    op.add_column('combat_encounters', sa.Column('combat_log_archive', sa.LargeBinary(), nullable=True))
+    op.add_column('combat_encounters', sa.Column('combat_log_archived_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Move existing logs out of combat_encounters.combat_log_json.
+    bind = op.get_bind()
+    combat_encounters = sa.table('combat_encounters', sa.column('id', sa.Integer), sa.column('guild_id', sa.BigInteger),
+                                 sa.column('combat_log_json', postgresql.JSONB))
+    combat_log_entries = sa.table('combat_log_entries', sa.column('combat_encounter_id', sa.Integer), sa.column('seq', sa.Integer),
+                                  sa.column('guild_id', sa.BigInteger), sa.column('turn_number', sa.Integer),
+                                  sa.column('entry_json', postgresql.JSONB))
+    rows = []
+    logs = bind.execute(sa.select(combat_encounters.c.id, combat_encounters.c.guild_id, combat_encounters.c.combat_log_json)
+                        .where(combat_encounters.c.combat_log_json.isnot(None))).all()
+    for combat_id, guild_id, log in logs:
+        entries = log.get("entries", []) if isinstance(log, dict) else []
+        for seq, entry in enumerate((e for e in entries if isinstance(e, dict)), start=1):
+            turn = entry.get("turn")
+            rows.append({"combat_encounter_id": combat_id, "seq": seq, "guild_id": guild_id,
+                         "turn_number": turn if isinstance(turn, int) else None, "entry_json": entry})
+    if rows:
+        op.bulk_insert(combat_log_entries, rows)
+    op.execute(combat_encounters.update().where(combat_encounters.c.combat_log_json.isnot(None)).values(combat_log_json=sa.null()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Log entries are not copied back into combat_encounters.combat_log_json.
+    op.drop_column('combat_encounters', 'combat_log_archived_count')
+    op.drop_column('combat_encounters', 'combat_log_archive')
+    op.drop_table('combat_log_entries')
@@ -0,0 +1,140 @@
+"""partition_story_logs_by_month
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-16 23:30:00.000000
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created up front: every month that has events, up to this many months after the current one.
+PARTITIONS_AHEAD = 2
+
+STORY_LOG_INDEXES = (
+    ('ix_story_logs_event_type', ['event_type']),
+    ('ix_story_logs_guild_id', ['guild_id']),
+    ('ix_story_logs_id', ['id']),
+    ('ix_story_logs_location_id', ['location_id']),
+    ('ix_story_logs_timestamp', ['timestamp']),
+)
+
+
+def _month_start(value: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def _next_month(start: datetime.datetime) -> datetime.datetime:
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def _bound(value: datetime.datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S+00")
+
+
+def _create_story_logs_table(partitioned: bool) -> None:
+    # Same columns as in the initial schema; a partitioned table needs the partition key in its primary key.
+    event_type_enum = postgresql.ENUM(name='event_type_enum', create_type=False)
+    op.create_table('story_logs',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('story_logs_id_seq')"), nullable=False),
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('event_type', event_type_enum, nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=True),
+    sa.Column('entity_ids_json', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('details_json', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('narrative_i18n', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id', 'timestamp') if partitioned else sa.PrimaryKeyConstraint('id'),
+    postgresql_partition_by='RANGE ("timestamp")' if partitioned else None,
+    )
+    for name, columns in STORY_LOG_INDEXES:
+        op.create_index(name, 'story_logs', columns, unique=False)
+    op.create_index('ix_story_logs_guild_id_timestamp', 'story_logs', ['guild_id', 'timestamp'], unique=False)
+    op.execute("ALTER SEQUENCE story_logs_id_seq OWNED BY story_logs.id")
+
+
+def _move_story_logs(source: str) -> None:
+    op.execute(f"INSERT INTO story_logs SELECT id, guild_id, \"timestamp\", event_type, location_id, entity_ids_json, details_json, narrative_i18n FROM {source}")
+    op.execute(f"DROP TABLE {source}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('story_log_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('guild_id', sa.BigInteger(), nullable=False),
+    sa.Column('month', sa.Text(), nullable=False, comment="Month of the archived events, 'YYYY-MM' (UTC)"),
+    sa.Column('path', sa.Text(), nullable=False, comment='Archive file, relative to STORY_LOG_ARCHIVE_DIR'),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('first_event_id', sa.Integer(), nullable=True),
+    sa.Column('last_event_id', sa.Integer(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('restored_at', sa.DateTime(timezone=True), nullable=True, comment='Set while the events are back in story_logs'),
+    sa.ForeignKeyConstraint(['guild_id'], ['guild_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_story_log_archives_id'), 'story_log_archives', ['id'], unique=False)
+    op.create_index('ix_story_log_archives_guild_id_month', 'story_log_archives', ['guild_id', 'month'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # No declarative partitioning: a guild's month is a range of this index (see core.story_log_storage).
+        op.create_index('ix_story_logs_guild_id_timestamp', 'story_logs', ['guild_id', 'timestamp'], unique=False)
+        return
+
+    # Rebuild story_logs as a table partitioned by month of timestamp and copy the events into it.
+    op.execute("ALTER SEQUENCE story_logs_id_seq OWNED BY NONE")
+    for name, _ in STORY_LOG_INDEXES:
+        op.drop_index(name, table_name='story_logs')
+    op.execute("ALTER TABLE story_logs DROP CONSTRAINT story_logs_pkey")
+    op.rename_table('story_logs', 'story_logs_unpartitioned')
+    _create_story_logs_table(partitioned=True)
+
+    oldest = bind.execute(sa.text("SELECT min(\"timestamp\") FROM story_logs_unpartitioned")).scalar()
+    current = _month_start(datetime.datetime.now(datetime.timezone.utc))
+    start = _month_start(oldest.astimezone(datetime.timezone.utc)) if oldest is not None else current
+    last = current
+    for _ in range(PARTITIONS_AHEAD):
+        last = _next_month(last)
+    while start <= last:
+        end = _next_month(start)
+        op.execute(f"CREATE TABLE story_logs_y{start.year:04d}m{start.month:02d} PARTITION OF story_logs "
+                   f"FOR VALUES FROM ('{_bound(start)}') TO ('{_bound(end)}')")
+        start = end
+    op.execute("CREATE TABLE story_logs_default PARTITION OF story_logs DEFAULT")
+    _move_story_logs('story_logs_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived events stay in their files; restore them before downgrading if they are needed.
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("ALTER SEQUENCE story_logs_id_seq OWNED BY NONE")
+        op.rename_table('story_logs', 'story_logs_partitioned')
+        # Index names are per schema: drop the partitioned table's indexes before recreating them.
+        for name, _ in STORY_LOG_INDEXES:
+            op.drop_index(name, table_name='story_logs_partitioned')
+        op.drop_index('ix_story_logs_guild_id_timestamp', table_name='story_logs_partitioned')
+        op.execute("ALTER TABLE story_logs_partitioned DROP CONSTRAINT story_logs_pkey")
+        _create_story_logs_table(partitioned=False)
+        op.drop_index('ix_story_logs_guild_id_timestamp', table_name='story_logs')
+        _move_story_logs('story_logs_partitioned') # Drops the partitions with their parent
+    else:
+        op.drop_index('ix_story_logs_guild_id_timestamp', table_name='story_logs')
+    op.drop_index('ix_story_log_archives_guild_id_month', table_name='story_log_archives')
+    op.drop_index(op.f('ix_story_log_archives_id'), table_name='story_log_archives')
+    op.drop_table('story_log_archives')
@@ -0,0 +1,35 @@
+"""add_guild_turn_processed_event_type
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# GUILD_TURN_PROCESSED marks the end of each guild turn in story_logs and records the turn's rng_seed,
+# so a turn can be replayed with the same rolls (see action_processor._finalize_turn_processing).
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return # Enums are plain strings there
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE event_type_enum ADD VALUE IF NOT EXISTS 'GUILD_TURN_PROCESSED'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # PostgreSQL cannot drop a value from an enum type; the unused value is left in place.
+    pass
@@ -0,0 +1,76 @@
+import logging
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+from sqlalchemy import select
+
+from src.bot.commands.master_ai_commands import is_administrator
+from src.core.database import get_db_session
+from src.core.story_log_storage import month_key, month_start, restore_story_log_month
+from src.models import StoryLogArchive
+
+logger = logging.getLogger(__name__)
+
+ARCHIVES_LISTED = 25
+
+
+class MasterStoryLogCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    master_story_log_group = app_commands.Group(
+        name="master_story_log",
+        description="Master commands for archived event log months.",
+        guild_only=True
+    )
+
+    @master_story_log_group.command(name="archives", description="List the archived months of the event log.")
+    @is_administrator()
+    async def list_archives(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        if interaction.guild_id is None:
+            await interaction.followup.send("Command must be used in a guild.", ephemeral=True)
+            return
+
+        async with get_db_session() as session:
+            archives = (await session.execute(
+                select(StoryLogArchive).where(StoryLogArchive.guild_id == interaction.guild_id)
+                .order_by(StoryLogArchive.month.desc(), StoryLogArchive.id.desc()).limit(ARCHIVES_LISTED)
+            )).scalars().all()
+
+        if not archives:
+            await interaction.followup.send("No archived event log months.", ephemeral=True)
+            return
+        lines = [
+            f"`{archive.month}`: {archive.row_count} events" + (" (restored)" if archive.restored_at else "")
+            for archive in archives
+        ]
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+    @master_story_log_group.command(name="restore", description="Restore an archived month of the event log.")
+    @app_commands.describe(month="Month to restore, as YYYY-MM.")
+    @is_administrator()
+    async def restore_month(self, interaction: discord.Interaction, month: str):
+        await interaction.response.defer(ephemeral=True)
+        if interaction.guild_id is None:
+            await interaction.followup.send("Command must be used in a guild.", ephemeral=True)
+            return
+        try:
+            start = month_start(month)
+        except ValueError:
+            await interaction.followup.send(f"Invalid month '{month}', expected YYYY-MM.", ephemeral=True)
+            return
+
+        async with get_db_session() as session:
+            restored = await restore_story_log_month(session, interaction.guild_id, start)
+        if not restored:
+            await interaction.followup.send(f"No archived events for {month_key(start)}.", ephemeral=True)
+            return
+        logger.info(f"Guild {interaction.guild_id}: {interaction.user} restored {restored} StoryLog events of {month_key(start)}.")
+        await interaction.followup.send(f"Restored {restored} events of {month_key(start)}.", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(MasterStoryLogCog(bot))
+    logger.info("MasterStoryLogCog loaded.")
@@ -5,9 +5,12 @@ import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.database import get_db_session, transactional
+from src.core.game_events import get_last_turn_log_entries
 from src.core.player_utils import get_player_by_discord_id
+from src.core.report_formatter import stream_turn_report
 from src.core.party_utils import get_party # Renamed from get_party_by_id as it doesn't exist
-from src.models import Player, Party
+from src.bot.utils import send_chunked
+from src.models import GuildConfig, Player, Party
 from src.models.enums import PlayerStatus, PartyTurnStatus
 # Import for turn_controller placeholder - will be created in next step
 # from src.core.turn_controller import process_guild_turn_if_ready (or similar name)
@@ -130,6 +133,32 @@ class TurnManagementCog(commands.Cog):
         await interaction.response.send_message(f"Your party '{party.name}' has ended its turn. Waiting for other actions to resolve.", ephemeral=True)
         logger.info(f"Player {interaction.user.name} (Discord ID: {player_discord_id}) ended the turn for party {party.name} (ID: {party.id}) in guild {guild_id}.")
 
+    @app_commands.command(name="turn_report", description="Show what happened to you in the last processed turn.")
+    @app_commands.guild_only()
+    async def turn_report_command(self, interaction: discord.Interaction):
+        """
+        Sends the player's report of the guild's last processed turn, in as many messages as it needs.
+        """
+        assert interaction.guild_id is not None, "guild_id should not be None in a guild_only command"
+        guild_id: int = interaction.guild_id
+        await interaction.response.defer(ephemeral=True)
+
+        async with get_db_session() as session:
+            player = await get_player_by_discord_id(session, guild_id=guild_id, discord_id=interaction.user.id)
+            if not player:
+                await interaction.followup.send("You are not currently registered as a player in this game. Use `/start`.", ephemeral=True)
+                return
+            guild_config = await session.get(GuildConfig, guild_id)
+            fallback_language = guild_config.main_language if guild_config else "en"
+            log_entries = await get_last_turn_log_entries(session, guild_id, player.id)
+            # Each chunk is sent as soon as it is rendered
+            sent = await send_chunked(
+                interaction.followup,
+                stream_turn_report(session, guild_id, log_entries, player.id, player.selected_language or fallback_language, fallback_language),
+                ephemeral=True
+            )
+        logger.info(f"Sent turn report of {len(log_entries)} events in {sent} messages to player {player.id} in guild {guild_id}.")
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(TurnManagementCog(bot))
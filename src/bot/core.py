@@ -22,6 +22,28 @@ class BotCore(commands.Bot):
         """
         logger.info("Выполняется setup_hook...")
 
+        # Подписка на инвалидацию кэша правил от других процессов бота (только PostgreSQL)
+        try:
+            from src.core.database import engine
+            from src.core.rules import start_rules_invalidation_listener
+            await start_rules_invalidation_listener(engine)
+        except Exception as e:
+            logger.error(f"Не удалось запустить слушатель инвалидации правил: {e}", exc_info=True)
+
+        # Пул воркеров очереди ходов (turn_jobs); при старте восстанавливает прерванные ходы
+        try:
+            from src.core.turn_queue import start_turn_job_workers
+            await start_turn_job_workers()
+        except Exception as e:
+            logger.error(f"Не удалось запустить пул воркеров очереди ходов: {e}", exc_info=True)
+
+        # Обслуживание журнала событий: помесячные секции, архивация по сроку хранения гильдий
+        try:
+            from src.core.story_log_storage import start_story_log_maintenance
+            await start_story_log_maintenance()
+        except Exception as e:
+            logger.error(f"Не удалось запустить обслуживание журнала событий: {e}", exc_info=True)
+
         # Загрузка когов
         # Пути к когам указываются относительно корневой директории проекта, если PYTHONPATH настроен,
         # или относительно директории, откуда запускается main.py, используя точки как разделители пакетов.
@@ -62,6 +84,25 @@ class BotCore(commands.Bot):
 
         logger.info("setup_hook завершен.")
 
+    async def close(self):
+        """Останавливает фоновые воркеры перед закрытием соединения бота."""
+        try:
+            from src.core.turn_queue import stop_turn_job_workers
+            await stop_turn_job_workers()
+        except Exception as e:
+            logger.error(f"Ошибка при остановке пула воркеров очереди ходов: {e}", exc_info=True)
+        try:
+            from src.core.story_log_storage import stop_story_log_maintenance
+            await stop_story_log_maintenance()
+        except Exception as e:
+            logger.error(f"Ошибка при остановке обслуживания журнала событий: {e}", exc_info=True)
+        try:
+            from src.core.rules import stop_rules_invalidation_listener
+            await stop_rules_invalidation_listener()
+        except Exception as e:
+            logger.error(f"Ошибка при остановке слушателя инвалидации правил: {e}", exc_info=True)
+        await super().close()
+
     async def on_ready(self):
         """
         Событие, вызываемое при полной готовности бота.
@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import Any, AsyncIterable, Optional
 import discord
 from discord.ext import commands
 
@@ -54,6 +54,21 @@ async def notify_master(
     except Exception as e:
         logger.error(f"An unexpected error occurred while sending master notification to guild {guild_id}: {e}", exc_info=True)
 
+async def send_chunked(destination: Any, chunks: AsyncIterable[str], **send_kwargs: Any) -> int:
+    """
+    Sends each chunk (e.g. from report_formatter.stream_turn_report) as its own message as soon as it is
+    yielded, so the first message goes out while the rest is still being rendered. `destination` is anything
+    with an async send(), e.g. a channel or interaction.followup; `send_kwargs` (e.g. ephemeral=True) are
+    passed to every send. Returns the number sent.
+    """
+    sent = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        await destination.send(chunk, **send_kwargs)
+        sent += 1
+    return sent
+
 # Example of how it might be called (from ai_orchestrator.py, after creating PendingGeneration):
 # from src.bot.utils import notify_master
 # from src.core.database import get_db_session # Assuming orchestrator has access to session factory
@@ -101,6 +101,57 @@ BOT_LANGUAGE = os.getenv("BOT_LANGUAGE", "en")
 # Secret Key
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+# Кэш правил (RuleConfig)
+# Максимальное число гильдий, правила которых держатся в памяти процесса (LRU).
+RULES_CACHE_MAX_GUILDS = int(os.getenv("RULES_CACHE_MAX_GUILDS", "256"))
+# Как часто (в секундах) проверять версию правил гильдии в БД, если нет LISTEN/NOTIFY (например, SQLite).
+# 0 - проверять при каждом обращении.
+RULES_CACHE_POLL_INTERVAL_SECONDS = float(os.getenv("RULES_CACHE_POLL_INTERVAL_SECONDS", "2.0"))
+# Страховочная проверка версии при активном LISTEN/NOTIFY на PostgreSQL.
+RULES_CACHE_LISTEN_PROBE_INTERVAL_SECONDS = float(os.getenv("RULES_CACHE_LISTEN_PROBE_INTERVAL_SECONDS", "60.0"))
+
+# Обработка ходов гильдии
+# Сколько независимых групп действий (разные локации/цели) выполнять параллельно. 1 - строго последовательно.
+# Не должно превышать размер пула соединений БД.
+ACTION_EXECUTION_MAX_CONCURRENCY = int(os.getenv("ACTION_EXECUTION_MAX_CONCURRENCY", "4"))
+# Аренда (lease) обработки хода гильдии в БД: срок жизни без продления и интервал heartbeat.
+# Если процесс-обработчик упал, другой процесс сможет забрать ход после истечения срока.
+GUILD_TURN_LEASE_TTL_SECONDS = float(os.getenv("GUILD_TURN_LEASE_TTL_SECONDS", "120"))
+GUILD_TURN_LEASE_HEARTBEAT_SECONDS = float(os.getenv("GUILD_TURN_LEASE_HEARTBEAT_SECONDS", "30"))
+# Очередь заданий обработки ходов (turn_jobs): число воркеров в процессе, повторы и интервал опроса БД.
+TURN_JOB_WORKERS = int(os.getenv("TURN_JOB_WORKERS", "4"))
+TURN_JOB_MAX_ATTEMPTS = int(os.getenv("TURN_JOB_MAX_ATTEMPTS", "3"))
+TURN_JOB_RETRY_BASE_SECONDS = float(os.getenv("TURN_JOB_RETRY_BASE_SECONDS", "5"))
+TURN_JOB_RETRY_MAX_SECONDS = float(os.getenv("TURN_JOB_RETRY_MAX_SECONDS", "300"))
+TURN_JOB_POLL_INTERVAL_SECONDS = float(os.getenv("TURN_JOB_POLL_INTERVAL_SECONDS", "1.0"))
+# Как часто пул воркеров ищет зависшие RUNNING-задания (аренда гильдии истекла, воркер упал)
+# и ставит в очередь ходы гильдий, ожидающие обработки без задания.
+TURN_JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("TURN_JOB_SWEEP_INTERVAL_SECONDS", "60"))
+
+# Журнал боя (таблица combat_log_entries)
+# Размер страницы при чтении журнала (воспроизведение боя, core.combat_replay).
+COMBAT_LOG_PAGE_SIZE = int(os.getenv("COMBAT_LOG_PAGE_SIZE", "50"))
+# Сжимать записи журнала в архив (combat_encounters.combat_log_archive) после окончания боя.
+COMBAT_LOG_COMPACT_ON_END = os.getenv("COMBAT_LOG_COMPACT_ON_END", "true").lower() in ("1", "true", "yes")
+# Бой: сколько ходов подряд (NPC до хода игрока) разрешать за один вызов process_combat_turn.
+COMBAT_MAX_TURNS_PER_PASS = int(os.getenv("COMBAT_MAX_TURNS_PER_PASS", "200"))
+
+# Журнал событий (story_logs): помесячные секции, хранение и холодный архив
+# Каталог архивов (gzip NDJSON, по файлу на гильдию и месяц).
+STORY_LOG_ARCHIVE_DIR = os.getenv("STORY_LOG_ARCHIVE_DIR", os.path.join("data", "story_log_archive"))
+# Срок хранения событий в днях, если у гильдии нет правила story_log:retention_days. 0 - хранить бессрочно.
+STORY_LOG_DEFAULT_RETENTION_DAYS = int(os.getenv("STORY_LOG_DEFAULT_RETENTION_DAYS", "0"))
+# Сколько месяцев вперёд заранее создавать секции (только PostgreSQL).
+STORY_LOG_PARTITIONS_AHEAD = int(os.getenv("STORY_LOG_PARTITIONS_AHEAD", "2"))
+# Размер пачки строк при архивации и восстановлении.
+STORY_LOG_ARCHIVE_BATCH_SIZE = int(os.getenv("STORY_LOG_ARCHIVE_BATCH_SIZE", "5000"))
+# Сколько дней восстановленные из архива события не архивируются повторно.
+STORY_LOG_RESTORE_HOLD_DAYS = int(os.getenv("STORY_LOG_RESTORE_HOLD_DAYS", "7"))
+# Интервал фонового обслуживания журнала (создание секций, архивация).
+STORY_LOG_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("STORY_LOG_MAINTENANCE_INTERVAL_SECONDS", "21600"))
+# Сколько последних событий игрока за ход читать для /turn_report (ограничивает выборку, если предыдущего хода в журнале нет).
+TURN_REPORT_MAX_LOG_ENTRIES = int(os.getenv("TURN_REPORT_MAX_LOG_ENTRIES", "500"))
+
 
 # Проверка наличия токена и URL базы данных при импорте модуля
 if not DISCORD_BOT_TOKEN:
@@ -172,10 +223,11 @@ BOT_COGS = [
     "src.bot.commands.party_commands",
     "src.bot.commands.movement_commands",
     "src.bot.commands.master_ai_commands", # New cog for AI moderation
-    "src.bot.commands.turn_commands", # Cog for /end_turn and /end_party_turn
+    "src.bot.commands.turn_commands", # Cog for /end_turn, /end_party_turn and /turn_report
     # "src.bot.commands.map_commands", # Added Map Master commands - Disabled to prevent conflict with master_map_commands
     "src.bot.commands.master_map_commands", # Cog for Master Map Management
     "src.bot.commands.character_commands", # Cog for character-related commands like /levelup
+    "src.bot.commands.master_story_log_commands", # Cog for StoryLog archives (/master_story_log)
 ]
 
 # Master User IDs - comma-separated string in .env, parsed into a list here
@@ -20,10 +20,17 @@ import logging
 from . import crud_base_definitions
 from . import database
 from . import rules
+from . import formula_engine # Compiled, sandboxed RuleConfig formulas
+from . import rule_snapshot # Typed per-turn/per-combat rule snapshots
+from .rule_snapshot import GuildRuleSnapshot, build_guild_rule_snapshot
 from . import locations_utils
 from . import player_utils
 from . import party_utils
 from . import movement_logic
+from . import story_log_writer # Buffered StoryLog rows written with one multi-row INSERT per flush
+from .story_log_writer import flush_story_log
+from . import story_log_storage # Month partitions, per-guild retention and the cold archive of story_logs
+from .story_log_storage import archive_expired_story_logs, restore_story_log_month
 from . import game_events
 from . import ai_prompt_builder
 from . import ai_response_parser
@@ -33,8 +40,13 @@ from . import ai_orchestrator
 from .ai_orchestrator import trigger_ai_generation_flow, save_approved_generation, generate_narrative
 from . import nlu_service # Import the new NLU service module
 from .nlu_service import parse_player_input # Import the main function
+from . import action_queue # Per-action queue table (queued_actions)
+from .action_queue import queue_player_action, queue_player_actions
+from . import turn_lease # DB-backed guild turn lease (cross-process turn lock)
+from . import turn_queue # Durable turn job queue and worker pool
 from . import turn_controller # Import the new turn_controller module
 from .turn_controller import trigger_guild_turn_processing, process_guild_turn_if_ready
+from . import action_scheduler # Conflict-aware parallel scheduling of a turn's actions
 from . import action_processor # Import the new action_processor module
 from .action_processor import process_actions_for_guild
 from . import interaction_handlers # Import the new interaction_handlers module
@@ -44,15 +56,30 @@ from . import localization_utils # Import new localization utils
 from .localization_utils import get_localized_entity_name, get_localized_text, get_batch_localized_entity_names # Make specific functions available
 from . import report_formatter # Import new report formatter
 # format_log_entry is now internal, only format_turn_report is public
-from .report_formatter import format_turn_report
+from .report_formatter import format_turn_report, format_turn_reports, stream_turn_report
 from . import ability_system # Import the new ability_system module
 from .ability_system import activate_ability, apply_status, remove_status # Import public functions
 from . import world_generation # Added new module
 from .world_generation import generate_location # Updated function name
 from . import map_management # Import the map_management module
 from .map_management import add_location_master, remove_location_master, connect_locations_master, disconnect_locations_master # Import specific functions
+from . import combat_log # Append-only combat log (combat_log_entries) with paginated reads and compaction
+from .combat_log import get_combat_log_page, compact_combat_log
+from . import combat_state # Indexed participant state with diff writes for combat encounters
+from .combat_state import CombatState, get_combat_state
+from . import rng_service # Seeded, replayable dice streams per combat and guild turn
+from . import stat_sheet # Per-participant stats computed once per combat, invalidated on stat changes
+from .stat_sheet import StatSheet, invalidate_stat_sheet
+from . import combat_context # Participant entities and rules shared by the turns of one combat pass
+from .combat_context import CombatContext, load_combat_context
 from . import combat_engine # Import the new combat_engine module
 from .combat_engine import process_combat_action # Import the main function
+from . import combat_replay # Re-executes a logged combat from its recorded seeds
+from .combat_replay import replay_combat
+from . import outcome_estimator # Exact hit chances and expected damage for NPC action selection
+from .outcome_estimator import ActionOutcome, estimate_action_outcomes
+from . import npc_ai_strategy # Compiled, cached NPC AI strategies (per guild rules version and personality)
+from .npc_ai_strategy import CompiledNpcStrategy, get_compiled_npc_strategy, get_npc_strategy_cache_stats
 from . import npc_combat_strategy # Import the new npc_combat_strategy module
 from .npc_combat_strategy import get_npc_combat_action # Import the main function
 from . import combat_cycle_manager # Import the new combat_cycle_manager module
@@ -63,7 +90,7 @@ from ..models.combat_outcomes import CombatActionResult # Import the Pydantic mo
 
 
 logger = logging.getLogger(__name__)
-logger.info("Core package initialized. Loaded: crud_base_definitions, database, rules, locations_utils, player_utils, party_utils, movement_logic, game_events, ai_prompt_builder, ai_response_parser, ai_orchestrator, nlu_service, turn_controller, action_processor, interaction_handlers, localization_utils, report_formatter, ability_system, world_generation, map_management, combat_engine, npc_combat_strategy, combat_cycle_manager, experience_system.")
+logger.info("Core package initialized. Loaded: crud_base_definitions, database, rules, formula_engine, rule_snapshot, locations_utils, player_utils, party_utils, movement_logic, story_log_writer, story_log_storage, game_events, ai_prompt_builder, ai_response_parser, ai_orchestrator, nlu_service, action_queue, turn_lease, turn_queue, turn_controller, action_scheduler, action_processor, interaction_handlers, localization_utils, report_formatter, ability_system, world_generation, map_management, combat_log, combat_state, rng_service, stat_sheet, combat_context, combat_engine, combat_replay, outcome_estimator, npc_ai_strategy, npc_combat_strategy, combat_cycle_manager, experience_system.")
 
 # Define __all__ for explicit public API of the 'core' package, if desired.
 # This controls what 'from core import *' imports.
@@ -72,10 +99,19 @@ __all__ = [
     # Note: The sub-package src.core.crud is still available as src.core.crud
     "database",
     "rules",
+    "formula_engine",
+    "rule_snapshot",
+    "GuildRuleSnapshot",
+    "build_guild_rule_snapshot",
     "locations_utils",
     "player_utils",
     "party_utils",
     "movement_logic",
+    "story_log_writer",
+    "flush_story_log",
+    "story_log_storage",
+    "archive_expired_story_logs",
+    "restore_story_log_month",
     "game_events",
     "ai_prompt_builder",
     "ai_response_parser",
@@ -89,9 +125,15 @@ __all__ = [
     "generate_narrative", # Added new function
     "nlu_service",
     "parse_player_input",
+    "action_queue",
+    "queue_player_action",
+    "queue_player_actions",
+    "turn_lease",
+    "turn_queue",
     "turn_controller",
     "trigger_guild_turn_processing",
     "process_guild_turn_if_ready", # Though this might be more internal to turn_controller logic
+    "action_scheduler",
     "action_processor",
     "process_actions_for_guild",
     # "ACTION_DISPATCHER", # Should be internal to action_processor
@@ -106,6 +148,8 @@ __all__ = [
     "report_formatter",
     # "format_log_entry", # This is now an internal helper _format_log_entry_with_names_cache
     "format_turn_report",
+    "format_turn_reports",
+    "stream_turn_report",
     "ability_system",
     "activate_ability",
     "apply_status",
@@ -117,8 +161,30 @@ __all__ = [
     "remove_location_master", # Added
     "connect_locations_master", # Added
     "disconnect_locations_master", # Added
+    "combat_log",
+    "get_combat_log_page",
+    "compact_combat_log",
+    "combat_state",
+    "CombatState",
+    "get_combat_state",
+    "rng_service",
+    "stat_sheet",
+    "StatSheet",
+    "invalidate_stat_sheet",
+    "combat_context",
+    "CombatContext",
+    "load_combat_context",
     "combat_engine",
     "process_combat_action",
+    "combat_replay",
+    "replay_combat",
+    "outcome_estimator",
+    "ActionOutcome",
+    "estimate_action_outcomes",
+    "npc_ai_strategy",
+    "CompiledNpcStrategy",
+    "get_compiled_npc_strategy",
+    "get_npc_strategy_cache_stats",
     "npc_combat_strategy", # Added
     "get_npc_combat_action", # Added
     "combat_cycle_manager", # Added
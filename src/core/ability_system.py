@@ -23,6 +23,7 @@ from src.core.crud.crud_player import player_crud
 from src.core.crud.crud_npc import npc_crud
 from src.core.game_events import log_event
 from src.core.rules import get_rule
+from src.core.stat_sheet import invalidate_stat_sheet
 from src.core.entity_stats_utils import get_entity_hp, set_entity_hp, change_entity_hp, get_entity_stat, set_entity_stat, change_entity_stat # Added
 from sqlalchemy.sql import func # Added
 
@@ -63,6 +64,7 @@ async def remove_status(
 
     await session.delete(active_status_effect)
     await session.flush() # Ensure delete is processed before trying to log based on it.
+    invalidate_stat_sheet(guild_id, removed_entity_type_str, removed_entity_id)
 
     logger.info(f"ActiveStatusEffect ID {active_status_id} (owner: {removed_entity_type_str} {removed_entity_id}) removed.")
 
@@ -458,6 +460,7 @@ async def apply_status(
         await session.flush() # To get active_status.id for logging if needed immediately
 
     logger.info(f"Status '{db_status_effect.static_id}' (ID: {db_status_effect.id}, ActiveID: {active_status.id}) applied/refreshed on {entity_type} ID {entity_id}.")
+    invalidate_stat_sheet(guild_id, entity_type, target_entity.id)
 
     event_player_id = target_entity.id if isinstance(target_entity, Player) else None
     if not event_player_id and source_entity_id and source_entity_type and source_entity_type.lower() == "player":
@@ -1,12 +1,13 @@
 import asyncio
-import json
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
 from sqlalchemy.future import select
-from typing import Any, Coroutine, Callable, Dict, List, Tuple, AsyncContextManager
+from typing import Any, Coroutine, Callable, Dict, List, Optional, Tuple, AsyncContextManager
 
+from ..config.settings import ACTION_EXECUTION_MAX_CONCURRENCY
 from .database import get_db_session, transactional
-from ..models import Player, Party, PendingConflict
+from ..models import Player, Party, PendingConflict, Location
 from ..models.enums import PlayerStatus, PartyTurnStatus, ConflictStatus
 from ..models.actions import ParsedAction
 from .rules import get_rule # For conflict_resolution_rules
@@ -28,6 +29,11 @@ from ..models import GeneratedNpc # For fetching target NPC
 from .crud.crud_player import player_crud # Changed import
 from .crud.crud_npc import npc_crud # Changed import
 from .crud.crud_combat_encounter import combat_encounter_crud # Changed: Removed get_active_combat_for_entity
+from .action_scheduler import ScheduledAction, PhaseTimer, get_move_destination, partition_actions, run_action_groups
+from .action_queue import take_queued_actions
+from .dice_roller import use_dice_roller
+from .rng_service import guild_turn_action_roller, new_seed
+from .turn_lease import GuildTurnLeaseLost, HeldLease, renew_guild_turn_lease
 
 logger = logging.getLogger(__name__)
 
@@ -55,39 +61,8 @@ async def _handle_move_action_wrapper(
     try:
         from src.core.movement_logic import execute_move_for_player_action # Import here to avoid circular deps at module level if any
 
-        target_location_identifier = None
-        # Try to get identifier from entities. NLU might provide it under various keys.
-        # Common ones could be 'name', 'destination', 'target_location', 'location_static_id'.
-        if action.entities:
-            for entity in action.entities:
-                # Corrected: use entity.type instead of entity.entity_type
-                if entity.type == "location_name" or entity.type == "location_static_id":
-                    target_location_identifier = entity.value
-                    break
-            # Fallback or alternative common keys if not found by specific entity_type
-            if not target_location_identifier:
-                if len(action.entities) == 1: # If only one entity, assume it's the target
-                     target_location_identifier = action.entities[0].value
-                else: # Heuristic: look for common keys
-                    for entity in action.entities:
-                        # Corrected: use entity.type instead of entity.entity_type
-                        if entity.type.lower() in ["destination", "target", "location"]:
-                             target_location_identifier = entity.value
-                             break
-
-
-        if not target_location_identifier:
-            # Fallback: if intent is 'move' and there's a single entity value, use it.
-            # This might be fragile and depends on NLU output structure.
-            # A more robust NLU would clearly label the target location entity.
-            # For now, let's assume NLU provides at least one entity that is the target.
-            # If action.entities is a list of {'entity_type': 'some_type', 'value': 'some_value'}
-            if action.entities and isinstance(action.entities, list) and len(action.entities) > 0:
-                 # Let's assume the NLU is simple and the first entity value is the target if not specifically typed.
-                 # This part needs to be robust based on actual NLU output.
-                 # For this implementation, we'll be strict: NLU must provide an entity we can identify as the target.
-                 # The logic above tries to find a suitable entity. If none, then it's an error.
-                 pass # Identifier already sought above
+        # Same lookup as the action scheduler uses for the destination's conflict key.
+        target_location_identifier = get_move_destination(action)
 
         if not target_location_identifier:
             logger.warning(f"Player {player_id} MOVE action: Target location identifier not found in entities: {action.entities}")
@@ -231,15 +206,14 @@ async def _handle_attack_action_wrapper(
     if target_entity_data["id"] == actor_player.id and target_entity_data["type"] == "player":
         return {"status": "error", "message": "You cannot attack yourself."}
 
-    # 2. Check Existing Combat
-    # Check for actor
-    actor_combat = await combat_encounter_crud.get_active_combat_for_entity( # Changed call
-        db=session, guild_id=guild_id, entity_id=actor_player.id, entity_type="player"
-    )
-    # Check for target
-    target_combat = await combat_encounter_crud.get_active_combat_for_entity( # Changed call
-        db=session, guild_id=guild_id, entity_id=target_entity_data["id"], entity_type=target_entity_data["type"]
+    # 2. Check Existing Combat (actor and target resolved in one query)
+    actor_key = ("player", actor_player.id)
+    target_key = (target_entity_data["type"], target_entity_data["id"])
+    active_combats = await combat_encounter_crud.get_active_combats_for_entities(
+        db=session, guild_id=guild_id, entities=[actor_key, target_key]
     )
+    actor_combat = active_combats.get(actor_key)
+    target_combat = active_combats.get(target_key)
 
     if actor_combat and target_combat and actor_combat.id != target_combat.id:
         return {"status": "error", "message": "You and your target are in different active combat encounters."}
@@ -381,33 +355,9 @@ async def _load_and_clear_actions_for_entity(session: AsyncSession, guild_id: in
     """Loads actions for a single entity and clears them from the DB."""
     actions_to_process = []
     if entity_type == "player":
-        player = await get_player(session, guild_id, entity_id) # Corrected
-        if player and player.collected_actions_json:
-            logger.debug(f"Player {entity_id} raw collected_actions_json: {player.collected_actions_json}")
-            try:
-                actions_data = json.loads(player.collected_actions_json) if isinstance(player.collected_actions_json, str) else player.collected_actions_json
-                logger.debug(f"Player {entity_id} actions_data after potential json.loads: {actions_data}")
-                for i, action_data_item in enumerate(actions_data):
-                    try:
-                        actions_to_process.append(ParsedAction(**action_data_item))
-                    except Exception as e_parse:
-                        logger.error(f"Player {entity_id}, action item {i} failed Pydantic parsing: {action_data_item}", exc_info=True)
-                player.collected_actions_json = [] # Clear actions
-                session.add(player)
-                logger.info(f"[ACTION_PROCESSOR] Loaded {len(actions_to_process)} actions for player {player.id} and cleared from DB.")
-            except json.JSONDecodeError:
-                logger.error(f"[ACTION_PROCESSOR] Failed to decode actions for player {player.id}", exc_info=True)
-                player.collected_actions_json = [] # Clear invalid actions on JSONDecodeError too
-                session.add(player)
-            except Exception as e: # Other errors
-                logger.error(f"[ACTION_PROCESSOR] Error processing actions_data for player {player.id}: {e}", exc_info=True)
-                player.collected_actions_json = [] # Clear invalid actions
-                session.add(player)
-        elif player:
-            logger.debug(f"Player {entity_id} found, but collected_actions_json is empty or None: {player.collected_actions_json}")
-        else:
-            logger.debug(f"Player {entity_id} not found by get_player.")
-
+        player_actions = await take_queued_actions(session, guild_id, [entity_id])
+        actions_to_process = [action for _, action in player_actions]
+        logger.info(f"[ACTION_PROCESSOR] Loaded {len(actions_to_process)} actions for player {entity_id} and cleared from DB.")
 
     elif entity_type == "party":
         party = await get_party(session, guild_id, entity_id) # Corrected
@@ -415,180 +365,232 @@ async def _load_and_clear_actions_for_entity(session: AsyncSession, guild_id: in
             # Party actions might be stored differently, e.g., on a party model or aggregated from members.
             # For now, assume party actions are collected similarly or this part needs specific logic.
             # MVP: Assume party actions are implicitly handled via player actions within the party.
-            # Or, a party might have its own `collected_actions_json` if a party leader submits them.
             # This part is conceptual for now for party-specific actions.
             logger.info(f"[ACTION_PROCESSOR] Party {party.id}: Party-level action collection not yet implemented. Processing member actions.")
-            # If parties had their own action queue:
-            # if party.collected_actions_json:
-            #     actions_data = json.loads(party.collected_actions_json)
-            #     for action_data in actions_data: actions_to_process.append(ParsedAction(**action_data))
-            #     party.collected_actions_json = []
-            #     session.add(party)
     return actions_to_process
 
 
 async def _load_and_clear_all_actions(
-    session: AsyncSession, guild_id: int, entities_and_types_to_process: list[dict]
+    session: AsyncSession, guild_id: int, entities_and_types_to_process: list[dict],
+    player_locations: Optional[Dict[int, Optional[int]]] = None,
+    location_ids: Optional[Dict[str, int]] = None
 ) -> list[tuple[int, ParsedAction]]:
     """
-    Loads actions for all relevant players and clears them from the DB in a single transaction.
-    Optimized to load players and parties in batches.
-    Returns a list of (player_id, action) tuples.
+    Takes the queued actions of all relevant players off the queue in a single transaction
+    (one DELETE ... RETURNING over queued_actions, validated as one batch).
+    Returns a list of (player_id, action) tuples in submission order.
+    If `player_locations` is given, it is filled with {player_id: current_location_id} for the players
+    (used by the action scheduler to find independent actions). If `location_ids` is given and the turn has
+    move actions, it is filled with {static_id or lowercased name: location_id} for the guild's locations,
+    so the scheduler can key move destinations by location id.
     """
-    all_player_actions_for_turn: list[tuple[int, ParsedAction]] = []
-
     player_entity_ids_direct = {info["id"] for info in entities_and_types_to_process if info["type"] == "player"}
     party_entity_ids = {info["id"] for info in entities_and_types_to_process if info["type"] == "party"}
 
     all_player_ids_to_process_actions_for = set(player_entity_ids_direct)
-    parties_map: Dict[int, Party] = {}
 
     if party_entity_ids:
-        # Dynamically import party_crud here if not already available at module level
-        # For now, assume party_crud is available similar to how player_crud would be.
-        # from .crud.crud_party import party_crud # This might cause circular if party_crud needs this module
-        # A better approach would be to pass crud instances or use a registry.
-        # For this refactor, let's assume party_crud is accessible.
-        # This import might need adjustment based on actual project structure and dependencies.
-        from .crud.crud_party import party_crud # Assuming this is safe
+        # Imported here to avoid a circular import at module level.
+        from .crud.crud_party import party_crud
 
         loaded_parties = await party_crud.get_many_by_ids(db=session, ids=list(party_entity_ids), guild_id=guild_id)
         for party in loaded_parties:
-            parties_map[party.id] = party
             if party.player_ids_json:
-                for p_id in party.player_ids_json:
-                    all_player_ids_to_process_actions_for.add(p_id)
+                all_player_ids_to_process_actions_for.update(party.player_ids_json)
 
     if not all_player_ids_to_process_actions_for:
         logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: No players found to process actions for.")
         return []
 
-    # Dynamically import player_crud
-    from .crud.crud_player import player_crud
+    player_ids = sorted(all_player_ids_to_process_actions_for)
+    if player_locations is not None:
+        location_stmt = select(Player.id, Player.current_location_id).where(
+            Player.guild_id == guild_id, Player.id.in_(player_ids)
+        )
+        player_locations.update({p_id: loc_id for p_id, loc_id in (await session.execute(location_stmt)).all()})
 
-    loaded_players_list = await player_crud.get_many_by_ids(db=session, ids=list(all_player_ids_to_process_actions_for), guild_id=guild_id)
-    players_map: Dict[int, Player] = {p.id: p for p in loaded_players_list}
+    all_player_actions_for_turn = await take_queued_actions(session, guild_id, player_ids)
 
-    for player_id, player_obj in players_map.items():
-        if player_obj.collected_actions_json:
-            logger.debug(f"Player {player_id} raw collected_actions_json: {player_obj.collected_actions_json}")
-            try:
-                actions_data = json.loads(player_obj.collected_actions_json) if isinstance(player_obj.collected_actions_json, str) else player_obj.collected_actions_json
-                logger.debug(f"Player {player_id} actions_data after potential json.loads: {actions_data}")
-                for i, action_data_item in enumerate(actions_data):
-                    try:
-                        parsed_action = ParsedAction(**action_data_item)
-                        all_player_actions_for_turn.append((player_id, parsed_action))
-                    except Exception as e_parse:
-                        logger.error(f"Player {player_id}, action item {i} failed Pydantic parsing: {action_data_item}", exc_info=True)
-                player_obj.collected_actions_json = [] # Clear actions
-                session.add(player_obj) # Add to session to mark for update
-            except json.JSONDecodeError:
-                logger.error(f"[ACTION_PROCESSOR] Failed to decode actions for player {player_id}", exc_info=True)
-                player_obj.collected_actions_json = []
-                session.add(player_obj)
-            except Exception as e:
-                logger.error(f"[ACTION_PROCESSOR] Error processing actions_data for player {player_id}: {e}", exc_info=True)
-                player_obj.collected_actions_json = []
-                session.add(player_obj)
-        elif player_obj:
-            logger.debug(f"Player {player_id} found, but collected_actions_json is empty or None: {player_obj.collected_actions_json}")
+    if location_ids is not None and any(action.intent == "move" for _, action in all_player_actions_for_turn):
+        location_rows = (await session.execute(
+            select(Location.id, Location.static_id, Location.name_i18n).where(Location.guild_id == guild_id)
+        )).all()
+        for loc_id, _, name_i18n in location_rows:
+            for name in (name_i18n or {}).values():
+                if isinstance(name, str):
+                    location_ids.setdefault(name.strip().lower(), loc_id)
+        # static_id wins over a name, as in movement_logic._find_location_by_identifier
+        location_ids.update({static_id: loc_id for loc_id, static_id, _ in location_rows if static_id})
 
     if all_player_actions_for_turn:
-        logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Prepared {len(all_player_actions_for_turn)} actions from {len(players_map)} players for processing.")
+        logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Prepared {len(all_player_actions_for_turn)} actions from {len(player_ids)} players for processing.")
 
     return all_player_actions_for_turn
 
 
+async def _execute_single_action(
+    session_maker: Callable[[], AsyncContextManager[AsyncSession]],
+    guild_id: int,
+    player_id: int,
+    action: ParsedAction
+) -> dict:
+    """Executes one player action in its own session and transaction. Errors are logged and returned as a result."""
+    async with session_maker() as action_session:  # New session for each action's transaction
+        try:
+            async with action_session.begin():  # Start transaction for this action
+                handler = ACTION_DISPATCHER.get(action.intent, _handle_placeholder_action)
+                logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Dispatching action '{action.intent}' to {handler.__name__}")
+                action_result = await handler(action_session, guild_id, player_id, action)
+            logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Action '{action.intent}' committed successfully.")
+            return {"player_id": player_id, "action": action.model_dump(mode='json'), "result": action_result}
+        except Exception as e:
+            logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Error processing action '{action.intent}': {e}", exc_info=True)
+            # Log event within the same session if possible, but outside the failed transaction
+            try:
+                async with action_session.begin(): # Attempt a new transaction for logging
+                    await log_event(action_session, guild_id=guild_id, event_type="ACTION_PROCESSING_ERROR",
+                                    details_json={"player_id": player_id, "action": action.model_dump(mode='json'), "error": str(e)}, player_id=player_id)
+                logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: ACTION_PROCESSING_ERROR event logged.")
+            except Exception as log_e:
+                logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Failed to log ACTION_PROCESSING_ERROR: {log_e}", exc_info=True)
+            return {
+                "player_id": player_id,
+                "action": action.model_dump(mode='json'),
+                "result": {"status": "error", "message": str(e)}
+            }
+
+
 async def _execute_player_actions(
     session_maker: Callable[[], AsyncContextManager[AsyncSession]],
     guild_id: int,
-    all_player_actions_for_turn: list[tuple[int, ParsedAction]]
+    all_player_actions_for_turn: list[tuple[int, ParsedAction]],
+    player_locations: Optional[Dict[int, Optional[int]]] = None,
+    max_concurrency: Optional[int] = None,
+    rng_seed: Optional[int] = None,
+    location_ids: Optional[Dict[str, int]] = None
 ) -> list[dict]:
     """
     Executes all player actions, each in its own transaction.
-    Returns a list of action results.
+    Actions are partitioned into independent groups (see action_scheduler.partition_actions): groups that touch
+    different locations/targets run concurrently (bounded by max_concurrency), actions within a group run in order.
+    Without player_locations all actions form one group and run sequentially. `location_ids` resolves
+    move destinations to location ids (see _load_and_clear_all_actions).
+    Each action rolls from its own stream derived from the turn's `rng_seed` and its submission index, so the
+    rolls do not depend on how concurrent groups interleave (see rng_service).
+    Returns a list of action results in the order the actions were given.
     """
-    processed_actions_results = []
-    for player_id, action in all_player_actions_for_turn:
-        async with session_maker() as action_session:  # New session for each action's transaction
-            try:
-                async with action_session.begin():  # Start transaction for this action
-                    handler = ACTION_DISPATCHER.get(action.intent, _handle_placeholder_action)
-                    logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Dispatching action '{action.intent}' to {handler.__name__}")
-                    action_result = await handler(action_session, guild_id, player_id, action)
-                    processed_actions_results.append({"player_id": player_id, "action": action.model_dump(mode='json'), "result": action_result})
-                logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Action '{action.intent}' committed successfully.")
-            except Exception as e:
-                logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Error processing action '{action.intent}': {e}", exc_info=True)
-                processed_actions_results.append({
-                    "player_id": player_id,
-                    "action": action.model_dump(mode='json'),
-                    "result": {"status": "error", "message": str(e)}
-                })
-                # Log event within the same session if possible, but outside the failed transaction
-                try:
-                    async with action_session.begin(): # Attempt a new transaction for logging
-                        await log_event(action_session, guild_id=guild_id, event_type="ACTION_PROCESSING_ERROR",
-                                        details_json={"player_id": player_id, "action": action.model_dump(mode='json'), "error": str(e)}, player_id=player_id)
-                    logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: ACTION_PROCESSING_ERROR event logged.")
-                except Exception as log_e:
-                    logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}, Player {player_id}: Failed to log ACTION_PROCESSING_ERROR: {log_e}", exc_info=True)
-    return processed_actions_results
+    if not all_player_actions_for_turn:
+        return []
+
+    groups = partition_actions(all_player_actions_for_turn, player_locations, location_ids)
+    concurrency = max_concurrency if max_concurrency is not None else ACTION_EXECUTION_MAX_CONCURRENCY
+    logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Scheduling {len(all_player_actions_for_turn)} actions in {len(groups)} independent groups (max concurrency {concurrency}).")
+
+    turn_seed = rng_seed if rng_seed is not None else new_seed()
+
+    async def _run(scheduled: ScheduledAction) -> dict:
+        with use_dice_roller(guild_turn_action_roller(turn_seed, scheduled.index)):
+            return await _execute_single_action(session_maker, guild_id, scheduled.player_id, scheduled.action)
+
+    return await run_action_groups(groups, _run, concurrency)
 
 
 async def _finalize_turn_processing(
     session_maker: Callable[[], AsyncContextManager[AsyncSession]],
     guild_id: int,
     entities_and_types_to_process: list[dict],
-    processed_actions_results_count: int
-) -> None:
+    processed_actions_results_count: int,
+    rng_seed: Optional[int] = None,
+    lease: Optional[HeldLease] = None
+) -> Dict[str, List[int]]:
     """
     Updates entity statuses and logs the completion of the guild turn.
+    Statuses are reset with set-based UPDATE ... RETURNING statements (one for parties, one for players),
+    so the number of statements does not depend on the number of entities. Members of a party are reset
+    together with the party. The GUILD_TURN_PROCESSED event, which records the turn's `rng_seed`, is written
+    in the same transaction.
+    With a `lease`, the guild turn lease is renewed first in that transaction; if it was lost, nothing is
+    committed and GuildTurnLeaseLost is raised, since another worker may already be running this turn.
+    Returns {"players": [...], "parties": [...]} with the ids whose status was actually reset.
     """
+    player_ids = {info["id"] for info in entities_and_types_to_process if info["type"] == "player"}
+    party_ids = {info["id"] for info in entities_and_types_to_process if info["type"] == "party"}
+    reset_party_ids: List[int] = []
+    reset_player_ids: List[int] = []
+
+    if lease is not None and lease.lost:
+        raise GuildTurnLeaseLost(guild_id, lease.owner_id)
+
     async with session_maker() as final_session:
         async with final_session.begin():
-            for entity_info in entities_and_types_to_process:
-                entity_id = entity_info["id"]
-                entity_type = entity_info["type"]
-                if entity_type == "player":
-                    player = await get_player(final_session, guild_id, entity_id)
-                    if player and player.current_status == PlayerStatus.PROCESSING_GUILD_TURN:
-                        player.current_status = PlayerStatus.EXPLORING
-                        final_session.add(player)
-                        logger.info(f"[ACTION_PROCESSOR] Player {player.id} status reset to EXPLORING.")
-                elif entity_type == "party":
-                    party = await get_party(final_session, guild_id, entity_id)
-                    if party and party.turn_status == PartyTurnStatus.PROCESSING_GUILD_TURN:
-                        party.turn_status = PartyTurnStatus.IDLE
-                        final_session.add(party)
-                        logger.info(f"[ACTION_PROCESSOR] Party {party.id} status reset to IDLE.")
-                        for p_id in (party.player_ids_json or []):
-                            member = await get_player(final_session, guild_id, p_id)
-                            if member and member.current_status == PlayerStatus.PROCESSING_GUILD_TURN:
-                                member.current_status = PlayerStatus.EXPLORING
-                                final_session.add(member)
-                                logger.info(f"[ACTION_PROCESSOR] Party Member {member.id} status reset to EXPLORING.")
+            if lease is not None and not await renew_guild_turn_lease(final_session, guild_id, lease.owner_id):
+                lease.lost = True
+                raise GuildTurnLeaseLost(guild_id, lease.owner_id)
+            if party_ids:
+                party_stmt = (
+                    update(Party)
+                    .where(
+                        Party.guild_id == guild_id,
+                        Party.id.in_(party_ids),
+                        Party.turn_status == PartyTurnStatus.PROCESSING_GUILD_TURN,
+                    )
+                    .values(turn_status=PartyTurnStatus.IDLE)
+                    .returning(Party.id, Party.player_ids_json)
+                    .execution_options(synchronize_session=False)
+                )
+                for party_id, member_ids in (await final_session.execute(party_stmt)).all():
+                    reset_party_ids.append(party_id)
+                    player_ids.update(member_ids or [])
+
+            if player_ids:
+                player_stmt = (
+                    update(Player)
+                    .where(
+                        Player.guild_id == guild_id,
+                        Player.id.in_(player_ids),
+                        Player.current_status == PlayerStatus.PROCESSING_GUILD_TURN,
+                    )
+                    .values(current_status=PlayerStatus.EXPLORING)
+                    .returning(Player.id)
+                    .execution_options(synchronize_session=False)
+                )
+                reset_player_ids = list((await final_session.execute(player_stmt)).scalars().all())
+
+            reset_party_ids.sort()
+            reset_player_ids.sort()
             await log_event(final_session, guild_id=guild_id, event_type="GUILD_TURN_PROCESSED",
-                            details_json={"processed_entities": entities_and_types_to_process, "results_summary_count": processed_actions_results_count})
-    logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Entity statuses updated and GUILD_TURN_PROCESSED event logged.")
-
-
-async def process_actions_for_guild(guild_id: int, entities_and_types_to_process: list[dict]):
+                            details_json={
+                                "processed_entities": entities_and_types_to_process,
+                                "results_summary_count": processed_actions_results_count,
+                                "reset_player_ids": reset_player_ids,
+                                "reset_party_ids": reset_party_ids,
+                                "rng_seed": rng_seed,
+                            })
+    logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Reset parties {reset_party_ids} to IDLE and players {reset_player_ids} to EXPLORING; GUILD_TURN_PROCESSED event logged.")
+    return {"players": reset_player_ids, "parties": reset_party_ids}
+
+
+async def process_actions_for_guild(guild_id: int, entities_and_types_to_process: list[dict], lease: Optional[HeldLease] = None):
     """
     Main asynchronous worker for processing a guild's turn.
     Orchestrates loading, execution, and finalization of player actions.
     entities_and_types_to_process: list of dicts, e.g. [{'id': 1, 'type': 'player', 'discord_id': 123}, {'id': 2, 'type': 'party', 'name': 'The Group'}]
+    lease: the guild turn lease held for this turn (see turn_queue); finalization aborts with GuildTurnLeaseLost if it was lost.
     """
     session_maker = get_db_session
     all_player_actions_for_turn: list[tuple[int, ParsedAction]] = []
     processed_actions_results: list[dict] = []
+    player_locations: Dict[int, Optional[int]] = {}
+    location_ids: Dict[str, int] = {}
+    timer = PhaseTimer()
+    turn_seed = new_seed() # Root seed of this turn's rolls, recorded in GUILD_TURN_PROCESSED
 
     # 1. Load and clear all player actions for the turn in a single transaction
     try:
-        async with session_maker() as session:
-            all_player_actions_for_turn = await _load_and_clear_all_actions(session, guild_id, entities_and_types_to_process)
-            await session.commit() # Commit the clearing of collected_actions_json
+        with timer.phase("load"):
+            async with session_maker() as session:
+                all_player_actions_for_turn = await _load_and_clear_all_actions(session, guild_id, entities_and_types_to_process, player_locations, location_ids)
+                await session.commit() # Commit the removal of the taken actions from queued_actions
         logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Loaded and cleared {len(all_player_actions_for_turn)} player actions.")
     except Exception as e:
         logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}: Critical error during action loading/clearing phase: {e}", exc_info=True)
@@ -608,16 +610,21 @@ async def process_actions_for_guild(guild_id: int, entities_and_types_to_process
     # if conflict_rule == "manual_moderation_required_for_movement": ...
     # For now, all loaded actions are assumed to be executable.
 
-    # 3. Execute player actions, each in its own transaction
+    # 3. Execute player actions, each in its own transaction; independent groups run concurrently
     if all_player_actions_for_turn:
-        processed_actions_results = await _execute_player_actions(session_maker, guild_id, all_player_actions_for_turn)
+        with timer.phase("execute"):
+            processed_actions_results = await _execute_player_actions(session_maker, guild_id, all_player_actions_for_turn, player_locations, rng_seed=turn_seed, location_ids=location_ids)
         logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Execution phase completed for {len(all_player_actions_for_turn)} actions. Results count: {len(processed_actions_results)}.")
     else:
         logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: No player actions to execute for this turn.")
 
     # 4. Finalize turn processing (update statuses, log turn completion)
     try:
-        await _finalize_turn_processing(session_maker, guild_id, entities_and_types_to_process, len(processed_actions_results))
+        with timer.phase("finalize"):
+            await _finalize_turn_processing(session_maker, guild_id, entities_and_types_to_process, len(processed_actions_results), rng_seed=turn_seed, lease=lease)
+    except GuildTurnLeaseLost:
+        logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}: Turn lease lost before finalization; turn not finalized.")
+        raise
     except Exception as e:
         logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}: Error during turn finalization phase: {e}", exc_info=True)
         # Optionally, log this error to the database
@@ -630,6 +637,7 @@ async def process_actions_for_guild(guild_id: int, entities_and_types_to_process
             logger.error(f"[ACTION_PROCESSOR] Guild {guild_id}: Failed to log TURN_FINALIZE_ERROR: {log_e_final}", exc_info=True)
 
 
+    logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Turn phase timings: {timer.summary()}")
     logger.info(f"[ACTION_PROCESSOR] Guild {guild_id}: Turn processing complete. Processed {len(processed_actions_results)} individual action results.")
     # TODO: Send feedback reports to players/master based on processed_actions_results
 
@@ -0,0 +1,94 @@
+import logging
+from typing import Iterable, Optional, Sequence
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.actions import ParsedAction
+from ..models.queued_action import QueuedAction
+
+logger = logging.getLogger(__name__)
+
+# Validating the whole batch through one adapter avoids a model construction round trip per action.
+_PARSED_ACTIONS_ADAPTER = TypeAdapter(list[ParsedAction])
+_PARSED_ACTION_ADAPTER = TypeAdapter(ParsedAction)
+
+
+async def queue_player_actions(
+    session: AsyncSession, guild_id: int, player_id: int, actions: Sequence[ParsedAction]
+) -> int:
+    """
+    Appends actions to a player's queue for the next guild turn (a single multi-row INSERT).
+    Returns the number of queued actions. Does not commit.
+    """
+    if not actions:
+        return 0
+    # seq only orders a player's own queue; the (guild_id, player_id, seq) index answers this lookup.
+    last_seq_stmt = select(func.max(QueuedAction.seq)).where(
+        QueuedAction.guild_id == guild_id, QueuedAction.player_id == player_id
+    )
+    last_seq = (await session.execute(last_seq_stmt)).scalar() or 0
+    rows = [
+        {"guild_id": guild_id, "player_id": player_id, "seq": last_seq + offset, "action_json": action.model_dump(mode="json")}
+        for offset, action in enumerate(actions, start=1)
+    ]
+    await session.execute(insert(QueuedAction), rows)
+    logger.debug(f"Guild {guild_id}: queued {len(rows)} actions for player {player_id} (seq {last_seq + 1}..{last_seq + len(rows)}).")
+    return len(rows)
+
+
+async def queue_player_action(session: AsyncSession, guild_id: int, player_id: int, action: ParsedAction) -> int:
+    return await queue_player_actions(session, guild_id, player_id, [action])
+
+
+def _validate_action_batch(rows: list) -> list[tuple[int, ParsedAction]]:
+    """Validates (player_id, action_json) rows in one pass; falls back to per-item validation to skip bad rows."""
+    try:
+        actions = _PARSED_ACTIONS_ADAPTER.validate_python([action_json for _, action_json in rows])
+        return [(player_id, action) for (player_id, _), action in zip(rows, actions)]
+    except ValidationError:
+        pass
+
+    valid: list[tuple[int, ParsedAction]] = []
+    for player_id, action_json in rows:
+        try:
+            valid.append((player_id, _PARSED_ACTION_ADAPTER.validate_python(action_json)))
+        except ValidationError:
+            logger.error(f"Player {player_id}: queued action failed Pydantic parsing and was dropped: {action_json}", exc_info=True)
+    return valid
+
+
+async def take_queued_actions(
+    session: AsyncSession, guild_id: int, player_ids: Optional[Iterable[int]] = None
+) -> list[tuple[int, ParsedAction]]:
+    """
+    Removes and returns the queued actions of the given players (all players of the guild if None)
+    with one DELETE ... RETURNING. Actions come back in submission order as (player_id, action) tuples;
+    rows that do not validate as ParsedAction are logged and dropped. Does not commit.
+    """
+    stmt = delete(QueuedAction).where(QueuedAction.guild_id == guild_id)
+    if player_ids is not None:
+        player_ids = list(player_ids)
+        if not player_ids:
+            return []
+        stmt = stmt.where(QueuedAction.player_id.in_(player_ids))
+    stmt = stmt.returning(
+        QueuedAction.id, QueuedAction.player_id, QueuedAction.action_json
+    ).execution_options(synchronize_session=False)
+
+    # RETURNING row order is not guaranteed; ids increase with submission order.
+    deleted = sorted((await session.execute(stmt)).all(), key=lambda row: row.id)
+    if not deleted:
+        return []
+    return _validate_action_batch([(row.player_id, row.action_json) for row in deleted])
+
+
+async def count_queued_actions(session: AsyncSession, guild_id: int, player_id: Optional[int] = None) -> int:
+    stmt = select(func.count(QueuedAction.id)).where(QueuedAction.guild_id == guild_id)
+    if player_id is not None:
+        stmt = stmt.where(QueuedAction.player_id == player_id)
+    return (await session.execute(stmt)).scalar_one()
+
+
+logger.info("Action queue module loaded.")
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
+from ..models.actions import ParsedAction
+
+logger = logging.getLogger(__name__)
+
+# A conflict key names a piece of game state an action may read or write, e.g. ("player", 5) or ("location", 12).
+# Two actions that share a key are never run concurrently; actions with disjoint keys are.
+ConflictKey = Tuple[str, Hashable]
+
+# Entity types (ActionEntity.type, lowercased) that point at another actor. Numeric values are treated as
+# DB ids, anything else as a name that is only unique within a location.
+_NPC_TARGET_TYPES = {"npc", "target_npc", "enemy_npc"}
+_PLAYER_TARGET_TYPES = {"player", "target_player"}
+_NAMED_TARGET_TYPES = {"target", "target_name", "npc_name", "player_name", "item_name", "object_name"}
+# Entity types naming the destination of a "move" action, in the order the move handler looks for them.
+_MOVE_DESTINATION_TYPES = {"location_name", "location_static_id"}
+_MOVE_FALLBACK_TYPES = {"destination", "target", "location"}
+
+
+class ScheduledAction(NamedTuple):
+    """A queued action plus its position in the turn, so results can be returned in submission order."""
+    index: int
+    player_id: int
+    action: ParsedAction
+
+
+def get_move_destination(action: ParsedAction) -> Optional[str]:
+    """
+    The location identifier (static_id or name) a "move" action goes to: a location_name/location_static_id
+    entity, else the only entity, else a destination/target/location entity. None if there is none.
+    """
+    if not action.entities:
+        return None
+    for entity in action.entities:
+        if entity.type in _MOVE_DESTINATION_TYPES:
+            return entity.value
+    if len(action.entities) == 1:
+        return action.entities[0].value
+    for entity in action.entities:
+        if entity.type.lower() in _MOVE_FALLBACK_TYPES:
+            return entity.value
+    return None
+
+
+def get_action_conflict_keys(
+    player_id: int,
+    action: ParsedAction,
+    location_id: Optional[int],
+    location_ids: Optional[Mapping[str, int]] = None
+) -> Set[ConflictKey]:
+    """
+    Returns the set of entities an action may touch:
+    - the acting player (keeps one player's actions in order);
+    - the player's current location. Combat encounters are bound to a location (CombatEncounter.location_id),
+      so this also serializes actions that feed the same combat. Players with an unknown location share one key;
+    - the destination of a move, resolved to a location id through `location_ids` (static_id or lowercased
+      name -> id), or keyed by its lowercased identifier if it does not resolve;
+    - explicit targets from the NLU entities (NPC/player ids, or target names).
+    """
+    keys: Set[ConflictKey] = {("player", player_id), ("location", location_id)}
+    if action.intent == "move":
+        destination = get_move_destination(action)
+        if destination:
+            destination = str(destination).strip()
+            resolved = None
+            if location_ids is not None:
+                resolved = location_ids.get(destination, location_ids.get(destination.lower()))
+            keys.add(("location", resolved if resolved is not None else destination.lower()))
+    for entity in action.entities:
+        entity_type = entity.type.lower()
+        value = str(entity.value).strip()
+        if entity_type in _NPC_TARGET_TYPES or entity_type in _PLAYER_TARGET_TYPES:
+            kind = "npc" if entity_type in _NPC_TARGET_TYPES else "player"
+            if value.isdigit():
+                keys.add((kind, int(value)))
+            else:
+                keys.add(("target", value.lower()))
+        elif entity_type in _NAMED_TARGET_TYPES:
+            keys.add(("target", value.lower()))
+    return keys
+
+
+def partition_actions(
+    actions: Sequence[Tuple[int, ParsedAction]],
+    player_locations: Optional[Mapping[int, Optional[int]]] = None,
+    location_ids: Optional[Mapping[str, int]] = None
+) -> List[List[ScheduledAction]]:
+    """
+    Splits a turn's (player_id, action) list into independent groups: actions that transitively share a conflict
+    key end up in the same group. Within a group actions keep their submission order; groups are ordered by
+    their first action, so the result is deterministic for a given input.
+    If player_locations is not given, every action is assumed to be in the same (unknown) location
+    and the whole turn forms a single group. `location_ids` resolves move destinations
+    (see get_action_conflict_keys).
+    """
+    parent: List[int] = list(range(len(actions)))
+
+    def _find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    key_owner: Dict[ConflictKey, int] = {}
+    for index, (player_id, action) in enumerate(actions):
+        location_id = player_locations.get(player_id) if player_locations is not None else None
+        for key in get_action_conflict_keys(player_id, action, location_id, location_ids):
+            owner = key_owner.setdefault(key, index)
+            if owner != index:
+                root_a, root_b = _find(owner), _find(index)
+                if root_a != root_b:
+                    # Keep the smaller index as root so group order follows submission order
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[int, List[ScheduledAction]] = {}
+    for index, (player_id, action) in enumerate(actions):
+        groups.setdefault(_find(index), []).append(ScheduledAction(index, player_id, action))
+    return [groups[root] for root in sorted(groups)]
+
+
+async def run_action_groups(
+    groups: Sequence[Sequence[ScheduledAction]],
+    run_action: Callable[[ScheduledAction], Awaitable[Any]],
+    max_concurrency: int
+) -> List[Any]:
+    """
+    Runs the groups concurrently, at most `max_concurrency` at a time; actions inside a group run one after another.
+    `run_action` is expected to handle its own errors (an exception aborts the remaining actions of that group
+    and is re-raised after all groups finish). Results are returned in submission order (ScheduledAction.index).
+    """
+    total = sum(len(group) for group in groups)
+    results: List[Any] = [None] * total
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run_group(group: Sequence[ScheduledAction]) -> None:
+        async with semaphore:
+            for scheduled in group:
+                results[scheduled.index] = await run_action(scheduled)
+
+    outcomes = await asyncio.gather(*(_run_group(group) for group in groups), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return results
+
+
+class PhaseTimer:
+    """Collects wall-clock durations of named phases (milliseconds) for a single guild turn."""
+
+    def __init__(self) -> None:
+        self.timings_ms: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(self.timings_ms.values()), 2)
+
+    def summary(self) -> str:
+        parts = ", ".join(f"{name}={ms}ms" for name, ms in self.timings_ms.items())
+        return f"{parts} (total={self.total_ms}ms)"
+
+
+logger.info("Action scheduler module loaded.")
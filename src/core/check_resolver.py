@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any, Union
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
 import logging
 
 # Import the Pydantic models from their new location
@@ -16,12 +16,14 @@ logger = logging.getLogger(__name__)
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .rules import get_rule, get_all_rules_for_guild
 from .dice_roller import roll_dice
 from ..models.player import Player
 from ..models.generated_npc import GeneratedNpc
 # Add other entity models as needed, e.g., from ..models.object import ObjectModel
 from .crud_base_definitions import get_entity_by_id # Using the generic get_entity_by_id
+from .crud.crud_player import player_crud
+from .crud.crud_npc import npc_crud
+from .rule_snapshot import CheckRules, GuildRuleSnapshot, build_guild_rule_snapshot
 
 # Entity types mapping (can be expanded or made more dynamic)
 # For now, a simple string mapping. Could use an Enum later.
@@ -34,6 +36,36 @@ class CheckError(Exception):
     pass
 
 
+def _model_for_entity_type(entity_type: str) -> Optional[type]:
+    if entity_type.upper() == ENTITY_TYPE_PLAYER:
+        return Player
+    if entity_type.upper() == ENTITY_TYPE_NPC:
+        return GeneratedNpc
+    # Add more entity types here
+    # elif entity_type.upper() == ENTITY_TYPE_OBJECT:
+    # return ObjectModel # Assuming an ObjectModel exists
+    return None
+
+
+def _crud_for_entity_type(entity_type: str) -> Optional[Any]:
+    """CRUD used to load many entities of a type at once (see _get_entity_attributes)."""
+    if entity_type.upper() == ENTITY_TYPE_PLAYER:
+        return player_crud
+    if entity_type.upper() == ENTITY_TYPE_NPC:
+        return npc_crud
+    return None
+
+
+def _read_entity_attribute(entity: Any, entity_type: str, attribute_name: str) -> Optional[Any]:
+    if hasattr(entity, attribute_name):
+        return getattr(entity, attribute_name)
+    # Fallback: Check common stat structures if models have e.g. a 'stats_json' field
+    if hasattr(entity, "stats_json") and isinstance(entity.stats_json, dict) and attribute_name in entity.stats_json:
+        return entity.stats_json[attribute_name]
+    logger.warning(f"Attribute '{attribute_name}' not found on entity {entity_type}:{getattr(entity, 'id', None)}.")
+    return None
+
+
 async def _get_entity_attribute(
     db: AsyncSession,
     entity_id: int,
@@ -47,15 +79,7 @@ async def _get_entity_attribute(
     - Standardized way to access stats/attributes across different models.
     - Calculation of 'effective stats' considering skills, items, statuses.
     """
-    model_class: Optional[type] = None
-    if entity_type.upper() == ENTITY_TYPE_PLAYER:
-        model_class = Player
-    elif entity_type.upper() == ENTITY_TYPE_NPC:
-        model_class = GeneratedNpc
-    # Add more entity types here
-    # elif entity_type.upper() == ENTITY_TYPE_OBJECT:
-    # model_class = ObjectModel # Assuming an ObjectModel exists
-
+    model_class = _model_for_entity_type(entity_type)
     if not model_class:
         logger.warning(f"Unsupported entity type '{entity_type}' for attribute fetch.")
         return None
@@ -65,87 +89,133 @@ async def _get_entity_attribute(
         logger.warning(f"Entity {entity_type}:{entity_id} not found in guild {guild_id}.")
         return None
 
-    if hasattr(entity, attribute_name):
-        return getattr(entity, attribute_name)
+    return _read_entity_attribute(entity, entity_type, attribute_name)
+
+
+async def _get_entity_attributes(
+    db: AsyncSession,
+    guild_id: int,
+    entities: Iterable[Tuple[str, int]],
+    attribute_name: str
+) -> Dict[Tuple[str, int], Optional[Any]]:
+    """
+    Batch form of _get_entity_attribute: one query per entity type instead of one per entity.
+    Returns {(ENTITY_TYPE, id): value}; entities that were not found or have no such attribute map to None.
+    """
+    ids_by_type: Dict[str, Set[int]] = {}
+    for entity_type, entity_id in entities:
+        ids_by_type.setdefault(entity_type.upper(), set()).add(entity_id)
+
+    values: Dict[Tuple[str, int], Optional[Any]] = {}
+    for entity_type, ids in ids_by_type.items():
+        crud = _crud_for_entity_type(entity_type)
+        if crud is None:
+            logger.warning(f"Unsupported entity type '{entity_type}' for attribute fetch.")
+            values.update({(entity_type, entity_id): None for entity_id in ids})
+            continue
+        found = {entity.id: entity for entity in await crud.get_many_by_ids(db, ids=list(ids), guild_id=guild_id)}
+        for entity_id in ids:
+            entity = found.get(entity_id)
+            if entity is None:
+                logger.warning(f"Entity {entity_type}:{entity_id} not found in guild {guild_id}.")
+                values[(entity_type, entity_id)] = None
+            else:
+                values[(entity_type, entity_id)] = _read_entity_attribute(entity, entity_type, attribute_name)
+    return values
+
+
+class CheckContext:
+    """
+    Everything resolve_check reads for one check_type, gathered up front (see build_check_context): the check's
+    rules and the base attribute value of every entity that may roll it. Resolving a check against it awaits nothing.
+    """
+
+    def __init__(
+        self,
+        guild_id: int,
+        check_type: str,
+        rules: CheckRules,
+        attribute_values: Dict[Tuple[str, int], Optional[Any]]
+    ):
+        self.guild_id = guild_id
+        self.check_type = check_type
+        self.rules = rules
+        self.attribute_values = attribute_values # {(ENTITY_TYPE, id): base attribute value}
+
+    def has_entity(self, entity_type: str, entity_id: int) -> bool:
+        return (entity_type.upper(), entity_id) in self.attribute_values
+
+    def attribute_value(self, entity_type: str, entity_id: int) -> Optional[Any]:
+        return self.attribute_values.get((entity_type.upper(), entity_id))
+
+
+async def build_check_context(
+    db: AsyncSession,
+    guild_id: int,
+    check_type: str,
+    entities: Iterable[Tuple[str, int]],
+    rule_snapshot: Optional[GuildRuleSnapshot] = None
+) -> CheckContext:
+    """
+    Gathers the rules of `check_type` and the base attribute of every (entity_type, entity_id) in one step:
+    the guild rules come from `rule_snapshot` (or one rules-cache lookup) and the entities are loaded with one
+    query per entity type.
+    """
+    if rule_snapshot is None:
+        rule_snapshot = await build_guild_rule_snapshot(db, guild_id)
+    check_rules = rule_snapshot.check_rules(check_type)
+    entity_keys = [(entity_type.upper(), entity_id) for entity_type, entity_id in entities]
+    if check_rules.base_attribute:
+        attribute_values = await _get_entity_attributes(db, guild_id, entity_keys, check_rules.base_attribute)
     else:
-        # Fallback: Check common stat structures if models have e.g. a 'stats_json' field
-        if hasattr(entity, "stats_json") and isinstance(entity.stats_json, dict) and attribute_name in entity.stats_json:
-            return entity.stats_json[attribute_name]
-        logger.warning(f"Attribute '{attribute_name}' not found on entity {entity_type}:{entity_id}.")
-        return None
+        attribute_values = {key: None for key in entity_keys}
+    return CheckContext(guild_id, check_type, check_rules, attribute_values)
 
 
-async def resolve_check(
-    db: AsyncSession, # Added db session
+class CheckRequest(NamedTuple):
+    """One check of a resolve_checks_batch call."""
+    entity_id: int
+    entity_type: str
+    target_entity_id: Optional[int] = None
+    target_entity_type: Optional[str] = None
+    difficulty_dc: Optional[int] = None
+    check_context: Optional[Dict[str, Any]] = None
+
+
+def _resolve_prepared_check(
     guild_id: int,
     check_type: str,
+    check_rules: CheckRules,
+    attribute_value: Optional[Any],
     entity_doing_check_id: int,
     entity_doing_check_type: str,
-    target_entity_id: Optional[int] = None,
-    target_entity_type: Optional[str] = None,
-    difficulty_dc: Optional[int] = None,
-    check_context: Optional[Dict[str, Any]] = None
+    target_entity_id: Optional[int],
+    target_entity_type: Optional[str],
+    difficulty_dc: Optional[int],
+    check_context: Optional[Dict[str, Any]]
 ) -> CheckResult:
-    """
-    Resolves a game check (e.g., skill check, attack roll) based on RuleConfig rules for a guild.
-    """
-    logger.info(
-        f"Resolving check for guild {guild_id}, type '{check_type}', "
-        f"entity {entity_doing_check_type}:{entity_doing_check_id}, DC: {difficulty_dc}"
-    )
+    """Rolls and evaluates a check whose rules and base attribute value are already known. Awaits nothing."""
     check_context = check_context or {}
     modifier_details: List[ModifierDetail] = []
     total_modifier: int = 0
-
-    # 1. Fetch relevant rules from RuleConfig
-    # Example rule keys we might expect for a check_type:
-    # - f"checks:{check_type}:dice_notation" (e.g., "1d20")
-    # - f"checks:{check_type}:base_attribute" (e.g., "strength", "dexterity")
-    # - f"checks:{check_type}:critical_success_threshold" (e.g., 20)
-    # - f"checks:{check_type}:critical_failure_threshold" (e.g., 1)
-    # - f"checks:{check_type}:dc_formula" (if DC is dynamic, not used if difficulty_dc is passed)
-    # - f"checks:{check_type}:adv_disadv_sources" (list of context keys that grant adv/disadv)
-
-    # For simplicity, we'll fetch individual rules. Caching all rules might be better for performance.
-    dice_notation_rule_key = f"checks:{check_type}:dice_notation"
-    base_attribute_rule_key = f"checks:{check_type}:base_attribute"
-    crit_success_rule_key = f"checks:{check_type}:critical_success_threshold"
-    crit_failure_rule_key = f"checks:{check_type}:critical_failure_threshold"
-
-    dice_notation = await get_rule(db, guild_id=guild_id, key=dice_notation_rule_key) or "1d20" # Default to 1d20
-    base_attribute_name = await get_rule(db, guild_id=guild_id, key=base_attribute_rule_key) # e.g., "strength"
+    dice_notation = check_rules.dice_notation
+    base_attribute_name = check_rules.base_attribute
 
     # Store rules used for logging/transparency
     rules_snapshot = {
-        dice_notation_rule_key: dice_notation,
-        base_attribute_rule_key: base_attribute_name,
+        f"checks:{check_type}:dice_notation": dice_notation,
+        f"checks:{check_type}:base_attribute": base_attribute_name,
     }
 
     # 2. Calculate Modifiers
     # 2.a. Base attribute modifier
     if base_attribute_name:
-        attribute_value = await _get_entity_attribute(
-            db, entity_doing_check_id, entity_doing_check_type, base_attribute_name, guild_id
-        )
         if isinstance(attribute_value, int):
             # Assuming attributes are direct modifiers for now.
             # A common TTRPG conversion is (Stat - 10) // 2. This needs to be rule-defined.
-            # For now, let's assume 'attribute_value' *is* the modifier if it's from a field like 'strength_modifier'.
-            # If it's a raw stat like 'strength:14', it needs conversion rule.
-            # Simplified: if attribute_name is 'strength', assume it's the raw stat.
-            # This part NEEDS to be defined by RuleConfig: how to derive modifier from attribute.
-            # Placeholder: if attribute is e.g. 14, modifier is +2. If it's 8, modifier is -1.
-            # For now, if attribute_value is int, we assume it's already a modifier for simplicity in this phase.
+            # For now, if attribute_value is an int, we assume it's already a modifier for simplicity in this phase.
             # If not, we need a rule: f"attributes:{base_attribute_name}:modifier_formula" -> "(value - 10) // 2"
-
-            # Simple placeholder: Assume the fetched value is the modifier itself.
-            # This needs refinement based on how stats are stored (raw vs. modifier)
-            # and how RuleConfig defines conversion.
             stat_modifier = attribute_value
-
-            # Example: If 'strength' is 14, and rule is (val-10)/2, then mod is 2.
-            # Let's assume for now RuleConfig gives `base_attribute_modifier_value` directly or we fetch pre-calculated mod.
-            # For this phase, if attribute_value is an int, we use it.
             modifier_details.append(
                 ModifierDetail(source=f"base_stat:{base_attribute_name}", value=stat_modifier, description=f"{base_attribute_name} base stat contribution")
             )
@@ -154,8 +224,6 @@ async def resolve_check(
         else:
             logger.warning(f"Could not determine modifier for base attribute '{base_attribute_name}' for entity {entity_doing_check_type}:{entity_doing_check_id}.")
             # We might add a default 0 modifier or raise an error depending on game rules.
-            # modifier_details.append(ModifierDetail(source=f"base_stat:{base_attribute_name}", value=0, description="Attribute not found or not integer"))
-
 
     # 2.b. Contextual modifiers (from check_context)
     # RuleConfig should define which keys in check_context provide modifiers.
@@ -176,14 +244,6 @@ async def resolve_check(
             modifier_details.append(ModifierDetail(source="context:situational_penalty", value=-abs(penalty), description="Situational penalty from context")) # Ensure penalty is negative
             total_modifier -= abs(penalty)
 
-    # TODO: Add placeholders for other modifier sources (skills, items, statuses, relationships)
-    # These would also fetch rules from RuleConfig on how they apply to 'check_type'
-    # Example: actor_attributes from context could be parsed here based on rules for the check_type
-    # if "actor_attributes" in check_context and isinstance(check_context["actor_attributes"], dict):
-    #     # Logic to parse actor_attributes based on rules for this check_type
-    #     pass
-
-
     # TODO: Add placeholders for other modifier sources (skills, items, statuses, relationships)
     # These would also fetch rules from RuleConfig on how they apply to 'check_type'
     # E.g., modifier_details.append(ModifierDetail(source="skill:perception", value=skill_mod))
@@ -195,12 +255,8 @@ async def resolve_check(
         logger.error(f"Invalid dice notation '{dice_notation}' from rules for check '{check_type}': {e}")
         raise CheckError(f"Configuration error for check '{check_type}': Invalid dice notation '{dice_notation}'.") from e
 
-    # For now, assume no advantage/disadvantage. The first roll or sum is used.
-    # If dice_notation is like "1d20", individual_rolls[0] is the key.
-    # If "2d6", dice_roll_total is the sum.
-    # The definition of "roll_used" needs to be clear. For a single die like 1d20, it's the result of that die.
-    # For multiple dice summed (like 2d6 for damage), "roll_used" could be the sum *before* flat modifiers.
-    # Let's assume for typical d20 checks, roll_used is the single die face.
+    # For a single die like 1d20 (or d20adv, which keeps one die) "roll_used" is the die face;
+    # for multiple dice summed (like 2d6) it is the total.
     roll_used = individual_rolls[0] if len(individual_rolls) == 1 and "d" in dice_notation else dice_roll_total
     # This ^ is a simplification. RuleConfig should specify how to interpret raw_rolls (e.g., for adv/disadv)
 
@@ -212,10 +268,10 @@ async def resolve_check(
     outcome_status = "failure"
     outcome_description = f"Check ({check_type}) failed with {final_value}."
 
-    crit_success_threshold = await get_rule(db, guild_id=guild_id, key=crit_success_rule_key) or 20
-    crit_failure_threshold = await get_rule(db, guild_id=guild_id, key=crit_failure_rule_key) or 1
-    rules_snapshot[crit_success_rule_key] = crit_success_threshold
-    rules_snapshot[crit_failure_rule_key] = crit_failure_threshold
+    crit_success_threshold = check_rules.critical_success_threshold
+    crit_failure_threshold = check_rules.critical_failure_threshold
+    rules_snapshot[f"checks:{check_type}:critical_success_threshold"] = crit_success_threshold
+    rules_snapshot[f"checks:{check_type}:critical_failure_threshold"] = crit_failure_threshold
 
     is_d20_roll = "d20" in dice_notation.lower() # Approximation
 
@@ -235,7 +291,6 @@ async def resolve_check(
     else:
         # This is a contested check or a check without a fixed DC.
         # The outcome might be determined by comparing to another entity's roll, or just the value itself.
-        # Placeholder: if no DC, we can't determine success/failure easily without more rules.
         # For now, let's just record the value.
         outcome_status = "value_determined" # Or some other status
         outcome_description = f"Check ({check_type}) resulted in {final_value} (no DC provided for comparison)."
@@ -268,6 +323,89 @@ async def resolve_check(
     )
 
 
+async def resolve_check(
+    db: AsyncSession, # Added db session
+    guild_id: int,
+    check_type: str,
+    entity_doing_check_id: int,
+    entity_doing_check_type: str,
+    target_entity_id: Optional[int] = None,
+    target_entity_type: Optional[str] = None,
+    difficulty_dc: Optional[int] = None,
+    check_context: Optional[Dict[str, Any]] = None,
+    rule_snapshot: Optional[GuildRuleSnapshot] = None,
+    prepared: Optional[CheckContext] = None
+) -> CheckResult:
+    """
+    Resolves a game check (e.g., skill check, attack roll) based on RuleConfig rules for a guild.
+    If `prepared` (see build_check_context) covers this check_type and entity, nothing is awaited.
+    Otherwise rules are read from `rule_snapshot`, or from a snapshot built from the rules cache, and the
+    entity's base attribute is fetched on its own.
+    """
+    logger.info(
+        f"Resolving check for guild {guild_id}, type '{check_type}', "
+        f"entity {entity_doing_check_type}:{entity_doing_check_id}, DC: {difficulty_dc}"
+    )
+
+    # 1. Fetch relevant rules from RuleConfig
+    # Rule keys for a check_type (see GuildRuleSnapshot.check_rules):
+    # - f"checks:{check_type}:dice_notation" (e.g., "1d20")
+    # - f"checks:{check_type}:base_attribute" (e.g., "strength", "dexterity")
+    # - f"checks:{check_type}:critical_success_threshold" (e.g., 20)
+    # - f"checks:{check_type}:critical_failure_threshold" (e.g., 1)
+    # All of them come from one rules-cache lookup instead of one get_rule per key.
+    if prepared is not None and prepared.check_type == check_type:
+        check_rules = prepared.rules
+    else:
+        prepared = None
+        if rule_snapshot is None:
+            rule_snapshot = await build_guild_rule_snapshot(db, guild_id)
+        check_rules = rule_snapshot.check_rules(check_type)
+
+    attribute_value: Optional[Any] = None
+    if check_rules.base_attribute:
+        if prepared is not None and prepared.has_entity(entity_doing_check_type, entity_doing_check_id):
+            attribute_value = prepared.attribute_value(entity_doing_check_type, entity_doing_check_id)
+        else:
+            attribute_value = await _get_entity_attribute(
+                db, entity_doing_check_id, entity_doing_check_type, check_rules.base_attribute, guild_id
+            )
+
+    return _resolve_prepared_check(
+        guild_id, check_type, check_rules, attribute_value,
+        entity_doing_check_id, entity_doing_check_type, target_entity_id, target_entity_type,
+        difficulty_dc, check_context
+    )
+
+
+async def resolve_checks_batch(
+    db: AsyncSession,
+    guild_id: int,
+    check_type: str,
+    requests: Sequence[CheckRequest],
+    rule_snapshot: Optional[GuildRuleSnapshot] = None
+) -> List[CheckResult]:
+    """
+    Resolves the same check_type for many entities at once (e.g. a perception check for every player in a
+    location). Rules and attributes are gathered by one build_check_context call, so the number of awaited
+    round trips does not grow with the number of checks. Results are returned in request order.
+    """
+    if not requests:
+        return []
+    prepared = await build_check_context(
+        db, guild_id, check_type, [(request.entity_type, request.entity_id) for request in requests], rule_snapshot
+    )
+    logger.info(f"Resolving {len(requests)} '{check_type}' checks for guild {guild_id} in one batch.")
+    return [
+        _resolve_prepared_check(
+            guild_id, check_type, prepared.rules, prepared.attribute_value(request.entity_type, request.entity_id),
+            request.entity_id, request.entity_type, request.target_entity_id, request.target_entity_type,
+            request.difficulty_dc, request.check_context
+        )
+        for request in requests
+    ]
+
+
 if __name__ == '__main__':
     # Example usage (will be more useful once integrated)
     import asyncio
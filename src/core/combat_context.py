@@ -0,0 +1,106 @@
+import logging
+from typing import Dict, Optional, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Player, GeneratedNpc, CombatEncounter
+from ..models.enums import RelationshipEntityType
+from .crud import crud_npc, crud_player
+from .crud.crud_relationship import crud_relationship
+from .combat_state import CombatState, get_combat_state
+from .rule_snapshot import GuildRuleSnapshot, build_guild_rule_snapshot
+
+logger = logging.getLogger(__name__)
+
+ParticipantEntity = Union[Player, GeneratedNpc]
+ParticipantKey = Tuple[str, int] # (participant type, id) as in participants_json: ("player", 1), ("npc", 5)
+
+# Participant types of participants_json and the entity types relationships are stored under.
+_RELATIONSHIP_TYPE_BY_PARTICIPANT_TYPE = {
+    "player": RelationshipEntityType.PLAYER,
+    "npc": RelationshipEntityType.GENERATED_NPC,
+}
+_PARTICIPANT_TYPE_BY_RELATIONSHIP_TYPE = {v: k for k, v in _RELATIONSHIP_TYPE_BY_PARTICIPANT_TYPE.items()}
+
+
+class CombatContext:
+    """
+    Everything the turns of one combat pass read, loaded once: the encounter with its CombatState, the
+    participants' Player / GeneratedNpc rows, the relationships between participants and the guild's rules.
+    process_combat_turn resolves a run of NPC turns over one context; combat_engine and npc_combat_strategy
+    take it instead of reloading per turn, and target selection reads it without awaiting anything.
+    Changes made through the context stay in the CombatState until its owner flushes it.
+    """
+
+    def __init__(
+        self,
+        guild_id: int,
+        encounter: CombatEncounter,
+        entities: Dict[ParticipantKey, ParticipantEntity],
+        guild_rules: Optional[GuildRuleSnapshot] = None,
+        relationships: Optional[Dict[Tuple[ParticipantKey, ParticipantKey], int]] = None,
+    ):
+        self.guild_id = guild_id
+        self.encounter = encounter
+        self.entities = entities
+        self.guild_rules = guild_rules
+        # Both orders of every pair are present, so a lookup never has to care which side was stored first.
+        self.relationships: Dict[Tuple[ParticipantKey, ParticipantKey], int] = relationships or {}
+
+    @property
+    def state(self) -> CombatState:
+        # Resolved on access so a reloaded encounter is never paired with a stale state.
+        return get_combat_state(self.encounter)
+
+    def entity(self, entity_type: str, entity_id: int) -> Optional[ParticipantEntity]:
+        return self.entities.get((entity_type, entity_id))
+
+    def relationship_value(self, entity1_type: str, entity1_id: int, entity2_type: str, entity2_id: int) -> Optional[int]:
+        """Relationship value between two participants, or None if they have no relationship."""
+        return self.relationships.get(((entity1_type, entity1_id), (entity2_type, entity2_id)))
+
+
+async def load_combat_context(
+    session: AsyncSession,
+    guild_id: int,
+    combat_encounter: CombatEncounter,
+    guild_rules: Optional[GuildRuleSnapshot] = None,
+) -> CombatContext:
+    """
+    Builds a CombatContext for the encounter in three queries: players, NPCs and the relationships among
+    all participants (plus the guild rule snapshot, from the rules cache, unless one is passed in).
+    """
+    ids_by_type: Dict[str, list] = {"player": [], "npc": []}
+    for participant in get_combat_state(combat_encounter).participants:
+        ids = ids_by_type.get(participant.get("type"))
+        if ids is not None and participant.get("id") is not None:
+            ids.append(participant["id"])
+
+    entities: Dict[Tuple[str, int], ParticipantEntity] = {}
+    for player in await crud_player.player_crud.get_many_by_ids(session, ids=ids_by_type["player"], guild_id=guild_id):
+        entities[("player", player.id)] = player
+    for npc in await crud_npc.npc_crud.get_many_by_ids(session, ids=ids_by_type["npc"], guild_id=guild_id):
+        entities[("npc", npc.id)] = npc
+
+    relationships: Dict[Tuple[ParticipantKey, ParticipantKey], int] = {}
+    relationship_entities = [
+        (_RELATIONSHIP_TYPE_BY_PARTICIPANT_TYPE[participant_type], entity_id)
+        for participant_type, entity_id in entities
+    ]
+    if len(relationship_entities) > 1:
+        rows = await crud_relationship.get_relationships_among_entities(session, guild_id=guild_id, entities=relationship_entities)
+        for rel in rows:
+            first = (_PARTICIPANT_TYPE_BY_RELATIONSHIP_TYPE[rel.entity1_type], rel.entity1_id)
+            second = (_PARTICIPANT_TYPE_BY_RELATIONSHIP_TYPE[rel.entity2_type], rel.entity2_id)
+            relationships[(first, second)] = rel.value
+            relationships[(second, first)] = rel.value
+
+    if guild_rules is None:
+        guild_rules = await build_guild_rule_snapshot(session, guild_id)
+
+    logger.debug(f"Guild {guild_id}: loaded combat context for combat {combat_encounter.id} with {len(entities)} participant entities "
+                 f"and {len(relationships) // 2} relationships.")
+    return CombatContext(guild_id, combat_encounter, entities, guild_rules, relationships)
+
+
+logger.info("Combat context module loaded.")
@@ -8,9 +8,14 @@ from src.models import Player, GeneratedNpc, CombatEncounter, Party # Added Part
 from src.models.enums import CombatStatus, PlayerStatus, PartyTurnStatus, EventType
 
 # Core module imports
-from src.core import game_events, dice_roller, rules, check_resolver, npc_combat_strategy, combat_engine
+from src.core import game_events, dice_roller, check_resolver, npc_combat_strategy, combat_engine, rng_service
 from src.core.crud import crud_player, crud_party, crud_npc, crud_combat_encounter # May need specific cruds
 from src.core.database import transactional # For atomic operations
+from src.core.combat_state import get_combat_state
+from src.core import combat_log
+from src.core.combat_context import CombatContext, load_combat_context
+from src.core.rule_snapshot import build_guild_rule_snapshot
+from src.config.settings import COMBAT_LOG_COMPACT_ON_END, COMBAT_MAX_TURNS_PER_PASS
 
 logger = logging.getLogger(__name__)
 
@@ -72,15 +77,21 @@ async def start_combat(
         status=CombatStatus.PENDING_START, # Changed from STARTING
         participants_json={"entities": []}, # Initialize participants list
         turn_order_json={"order": [], "current_index": 0, "current_turn_number": 1},
-        rules_config_snapshot_json={},
-        combat_log_json={"entries": []}
+        rules_config_snapshot_json={}
+        # The combat log is written to combat_log_entries (see core.combat_log)
     )
     session.add(combat_encounter)
     await session.flush() # To get combat_encounter.id for logging if needed early
 
+    # Root seed of every roll in this combat (see rng_service); recorded in the rules snapshot below
+    combat_seed = rng_service.new_seed()
+    # The guild's rules, read once for the whole setup (participant defaults, initiative, rules snapshot)
+    guild_rules = await build_guild_rule_snapshot(session, guild_id)
+
     # 2. Determine participants and their initial data
     participants_for_json = []
-    initiative_rolls = [] # List of tuples: (roll_result, participant_index_in_entities_list)
+    initiative_rolls = [] # List of {"score", "participant_ref"} dicts
+    dexterity_scores: List[int] = [] # Per participant, turned into initiative modifiers in one batch below
 
     for i, entity in enumerate(participant_entities):
         entity_type_str = "player" if isinstance(entity, Player) else "npc"
@@ -94,11 +105,11 @@ async def start_combat(
         if isinstance(entity, Player):
             # In a real scenario, fetch from player.stats, player.equipment etc.
             # For now, using placeholder values or direct model fields if available
-            player_default_max_hp = await rules.get_rule(db=session, guild_id=guild_id, key="player:stats:default_max_hp", default=100)
+            player_default_max_hp = guild_rules.get("player:stats:default_max_hp", 100)
             max_hp = getattr(entity, 'max_hp', player_default_max_hp) # Assuming Player model might have max_hp
             current_hp = getattr(entity, 'current_hp', max_hp) # And current_hp
             armor_class = getattr(entity, 'armor_class', 10) # And armor_class
-            dex_modifier = (getattr(entity, 'dexterity', 10) - 10) // 2 # Example dexterity modifier for initiative
+            dexterity = getattr(entity, 'dexterity', 10) # Initiative modifier is derived from dexterity
 
         elif isinstance(entity, GeneratedNpc):
             entity_props = entity.properties_json or {}
@@ -106,7 +117,7 @@ async def start_combat(
             max_hp = npc_stats_block.get("hp", 50)
             current_hp = npc_stats_block.get("current_hp", max_hp) # NPCs might have current_hp if pre-damaged
             armor_class = npc_stats_block.get("armor_class", 10)
-            dex_modifier = (npc_stats_block.get("dexterity", 10) - 10) // 2
+            dexterity = npc_stats_block.get("dexterity", 10)
             # Example of using get_rule within start_combat if needed for an NPC default
             # max_hp = npc_stats_block.get("hp", await rules.get_rule(session, guild_id, "npc:default_max_hp", default=50))
 
@@ -120,24 +131,34 @@ async def start_combat(
             "current_hp": current_hp,
             "armor_class": armor_class,
             "status_effects": [], # Placeholder for active status effects
-            "initiative_modifier": dex_modifier # Store for reference, used below
+            "initiative_modifier": 0 # Set below from dexterity; stored for reference
         }
         participants_for_json.append(participant_data)
-
-        # Roll initiative
-        initiative_dice_rule = await rules.get_rule(db=session, guild_id=guild_id, key="combat:initiative:dice", default="1d20")
-        initiative_roll, _ = dice_roller.roll_dice(initiative_dice_rule)
-        total_initiative = initiative_roll + dex_modifier
-        initiative_rolls.append({"score": total_initiative, "participant_ref": participant_data}) # Link to the data
+        dexterity_scores.append(dexterity)
+
+    # Roll initiative for every participant in one batch
+    if participants_for_json:
+        # The guild's modifier formula (same rule as attack modifiers) is compiled once for all participants
+        dex_modifiers = await combat_engine._calculate_attribute_modifiers_many(dexterity_scores, session, guild_id, guild_rules)
+        for participant_data, dex_modifier in zip(participants_for_json, dex_modifiers):
+            participant_data["initiative_modifier"] = dex_modifier
+        initiative_dice_rule = guild_rules.get("combat:initiative:dice", "1d20")
+        with dice_roller.use_dice_roller(rng_service.combat_initiative_roller(combat_seed)):
+            initiative_roll_totals = dice_roller.roll_many(initiative_dice_rule, len(participants_for_json))
+        for participant_data, initiative_roll in zip(participants_for_json, initiative_roll_totals):
+            total_initiative = initiative_roll + participant_data["initiative_modifier"]
+            initiative_rolls.append({"score": total_initiative, "participant_ref": participant_data}) # Link to the data
 
     # Sort by initiative (descending), then by original index as tie-breaker (implicit if stable sort not used)
     # A better tie-breaker might be dexterity score itself or random. For now, just score.
     initiative_rolls.sort(key=lambda x: x["score"], reverse=True)
 
-    combat_encounter.participants_json["entities"] = participants_for_json # Store all participants' data
-    combat_encounter.turn_order_json["order"] = [
+    # The encounter row was already flushed: the JSON documents are reassigned, not mutated in place,
+    # so the change is detected and written.
+    combat_encounter.participants_json = {**combat_encounter.participants_json, "entities": participants_for_json} # Store all participants' data
+    combat_encounter.turn_order_json = {**combat_encounter.turn_order_json, "order": [
         {"id": item["participant_ref"]["id"], "type": item["participant_ref"]["type"]} for item in initiative_rolls
-    ]
+    ]}
 
     if combat_encounter.turn_order_json["order"]:
         first_in_turn = combat_encounter.turn_order_json["order"][0]
@@ -159,15 +180,17 @@ async def start_combat(
         "combat:attack:crit_effect", "combat:initiative:dice", "combat:attributes:modifier_formula",
         # Add other relevant rule keys here
     ]
-    rules_snapshot = {}
-    for key_to_snap in combat_rules_keys: # Renamed 'key' to avoid conflict with 'key' parameter of get_rule
-        rule_value = await rules.get_rule(db=session, guild_id=guild_id, key=key_to_snap, default=None)
-        if rule_value is not None:
-            rules_snapshot[key_to_snap] = rule_value
+    rules_snapshot = {key: guild_rules.get(key) for key in combat_rules_keys if guild_rules.get(key) is not None}
+    rules_snapshot[rng_service.RNG_SEED_RULE_KEY] = combat_seed
     combat_encounter.rules_config_snapshot_json = rules_snapshot
 
     # 4. Update CombatEncounter status and entity statuses
     combat_encounter.status = CombatStatus.ACTIVE
+    await crud_combat_encounter.combat_encounter_crud.add_participants(
+        session,
+        combat_encounter=combat_encounter,
+        entities=[(p_data["type"], p_data["id"]) for p_data in combat_encounter.participants_json["entities"]]
+    )
 
     for p_data in combat_encounter.participants_json["entities"]:
         if p_data["type"] == "player":
@@ -218,7 +241,8 @@ async def start_combat(
             "combat_id": combat_encounter.id,
             "location_id": location_id,
             "participants": combat_encounter.participants_json["entities"],
-            "turn_order": combat_encounter.turn_order_json["order"]
+            "turn_order": combat_encounter.turn_order_json["order"],
+            "rng_seed": combat_seed
         },
         entity_ids_json=log_entity_ids,
         location_id=location_id # Redundant with details_json but often a direct param for log_event
@@ -229,6 +253,13 @@ async def start_combat(
     return combat_encounter
 
 
+# Final status of an encounter by the winning team reported by _check_combat_end (None is a draw).
+_COMBAT_END_STATUS_BY_WINNER: Dict[Optional[str], CombatStatus] = {
+    "players": CombatStatus.ENDED_VICTORY_PLAYERS,
+    "npcs": CombatStatus.ENDED_VICTORY_NPCS,
+}
+
+
 @transactional
 async def process_combat_turn(
     session: AsyncSession,
@@ -244,6 +275,10 @@ async def process_combat_turn(
     Processes the current turn in a combat encounter.
     If it's an NPC's turn, gets their action and processes it.
     Advances the turn order. Checks for combat end.
+
+    Runs until a player's turn: consecutive NPC turns are resolved in the same pass over one
+    CombatContext (participant entities and guild rules loaded once), and the changes of all
+    of them are written with a single flush at the end.
     """
     combat_encounter = await session.get(CombatEncounter, combat_id)
     if not combat_encounter or combat_encounter.guild_id != guild_id:
@@ -255,6 +290,62 @@ async def process_combat_turn(
         logger.warning(f"Guild {guild_id}: process_combat_turn called for non-active combat {combat_id} (status: {combat_encounter.status}).")
         return combat_encounter # No action if combat is not active
 
+    # The encounter object is shared with combat_engine within this session, so its documents
+    # already reflect the player's action; no refresh is needed before reading them.
+    combat_context = await load_combat_context(session, guild_id, combat_encounter)
+
+    turns_resolved = 0
+    while True:
+        turns_resolved += 1
+        if not await _resolve_current_turn(session, guild_id, combat_context):
+            break
+
+        # Check for combat end after any action (player or NPC)
+        combat_ended, winning_team = await _check_combat_end(session, guild_id, combat_encounter)
+        if combat_ended:
+            logger.info(f"Guild {guild_id}: Combat {combat_id} has ended. Winning team: {winning_team if winning_team else 'Draw/Error'}.")
+            combat_encounter.status = _COMBAT_END_STATUS_BY_WINNER.get(winning_team, CombatStatus.ENDED_STALEMATE)
+            await _handle_combat_end_consequences(session, guild_id, combat_encounter, winning_team)
+            await crud_combat_encounter.combat_encounter_crud.remove_participants(session, combat_encounter_id=combat_encounter.id)
+            if COMBAT_LOG_COMPACT_ON_END:
+                await combat_context.state.flush(session) # The last log entries have to be in the table before compaction
+                await combat_log.compact_combat_log(session, combat_encounter)
+            # Log COMBAT_END (moved to _handle_combat_end_consequences)
+            break
+
+        # If combat not ended, advance turn
+        await _advance_turn(session, combat_encounter)
+        logger.info(f"Guild {guild_id}: Advanced turn for combat {combat_id}. New entity: {combat_encounter.current_turn_entity_type}:{combat_encounter.current_turn_entity_id}. Turn #: {combat_encounter.turn_order_json.get('current_turn_number')}")
+
+        # If the new current turn is an NPC and they are not defeated, process their turn in this pass too.
+        # This makes NPC turns flow automatically until a player's turn or combat ends.
+        new_active_id = combat_encounter.current_turn_entity_id
+        new_active_type = combat_encounter.current_turn_entity_type
+        if new_active_type != "npc" or combat_encounter.status != CombatStatus.ACTIVE:
+            break
+        if not combat_context.state.is_alive(new_active_type, new_active_id):
+            break
+        if turns_resolved >= COMBAT_MAX_TURNS_PER_PASS:
+            logger.warning(f"Guild {guild_id}: Combat {combat_id} resolved {turns_resolved} turns without reaching a player's turn; stopping this pass.")
+            break
+        logger.info(f"Guild {guild_id}: Combat {combat_id} - new turn is NPC {new_active_id}, processing their turn.")
+
+    # One write for every turn of the pass: participant fields, turn pointer and log entries.
+    await combat_context.state.flush(session)
+    session.add(combat_encounter)
+    await session.flush()
+    logger.debug(f"Guild {guild_id}: Combat {combat_id} pass finished after {turns_resolved} turn(s).")
+    return combat_encounter
+
+
+async def _resolve_current_turn(session: AsyncSession, guild_id: int, combat_context: CombatContext) -> bool:
+    """
+    Resolves the turn of the encounter's current entity: an NPC acts, a defeated entity is skipped and a
+    player's action has already been processed by combat_engine. Returns False if the encounter was put
+    into the ERROR status.
+    """
+    combat_encounter = combat_context.encounter
+    combat_id = combat_encounter.id
     logger.info(f"Guild {guild_id}: Processing turn {combat_encounter.turn_order_json.get('current_turn_number', 0)} for combat {combat_id}. Current entity: {combat_encounter.current_turn_entity_type}:{combat_encounter.current_turn_entity_id}")
 
     active_entity_id_optional = combat_encounter.current_turn_entity_id
@@ -263,25 +354,19 @@ async def process_combat_turn(
     if active_entity_id_optional is None or active_entity_type_optional is None:
         logger.error(f"Guild {guild_id}: Combat {combat_id} has no current active entity (ID or Type is None). Status: {combat_encounter.status}")
         combat_encounter.status = CombatStatus.ERROR
-        session.add(combat_encounter)
-        return combat_encounter
+        return False
 
     # Now we know they are not None
     active_entity_id: int = active_entity_id_optional
     active_entity_type: str = active_entity_type_optional
 
-    # Ensure participants_json and its 'entities' list exist
-    if combat_encounter.participants_json is None: combat_encounter.participants_json = {"entities": []}
-    if "entities" not in combat_encounter.participants_json: combat_encounter.participants_json["entities"] = []
-
-    actor_participant_data = next((p for p in combat_encounter.participants_json["entities"] if p["id"] == active_entity_id and p["type"] == active_entity_type), None)
+    actor_participant_data = combat_context.state.get(active_entity_type, active_entity_id)
 
     if not actor_participant_data:
         logger.error(f"Guild {guild_id}: Active entity {active_entity_type}:{active_entity_id} not found in participants_json for combat {combat_id}.")
         # This is a critical error, potentially advance turn or mark combat as error
         combat_encounter.status = CombatStatus.ERROR # Mark combat as errored
-        session.add(combat_encounter)
-        return combat_encounter
+        return False
 
     # Check if current actor is defeated (e.g. due to damage over time effects before their turn)
     if actor_participant_data.get("current_hp", 0) <= 0:
@@ -293,7 +378,8 @@ async def process_combat_turn(
             session=session,
             guild_id=guild_id,
             npc_id=active_entity_id,
-            combat_instance_id=combat_id
+            combat_instance_id=combat_id,
+            combat_context=combat_context
         )
         if npc_action_data and npc_action_data.get("action_type") != "idle" and npc_action_data.get("action_type") != "error":
             logger.info(f"Guild {guild_id}: NPC {active_entity_id} in combat {combat_id} performing action: {npc_action_data}")
@@ -303,9 +389,10 @@ async def process_combat_turn(
                 combat_instance_id=combat_id,
                 actor_id=active_entity_id, # type: int
                 actor_type=active_entity_type, # type: str
-                action_data=npc_action_data
+                action_data=npc_action_data,
+                combat_context=combat_context
             )
-            # combat_engine already logs COMBAT_ACTION and updates participants_json
+            # combat_engine already logs COMBAT_ACTION and updates participants_json (in the context's CombatState)
             logger.debug(f"Guild {guild_id}: NPC action result for combat {combat_id}: {action_result.model_dump_json()}")
             # Trigger quest system hook for NPC actions too
             await quest_system.handle_combat_event_for_quests(session, guild_id, combat_encounter, {"type": "npc_action", "result": action_result.model_dump()})
@@ -321,51 +408,8 @@ async def process_combat_turn(
             )
 
     # If it was a player's turn, their action would have been processed by combat_engine
-    # directly from action_processor calling it. This function, process_combat_turn,
-    # would then be called to advance the state.
-
-    # Check for combat end after any action (player or NPC)
-    # The combat_engine updates HPs in participants_json
-    # We need to re-fetch combat_encounter to get the latest participants_json if combat_engine committed separately.
-    # However, if all are within the same @transactional scope, session.refresh(combat_encounter) might be enough.
-    # For simplicity, assume combat_engine modified the session's combat_encounter object.
-
-    await session.refresh(combat_encounter) # Ensure we have the latest state after combat_engine might have changed it.
-
-    combat_ended, winning_team = await _check_combat_end(session, guild_id, combat_encounter)
-
-    if combat_ended:
-        logger.info(f"Guild {guild_id}: Combat {combat_id} has ended. Winning team: {winning_team if winning_team else 'Draw/Error'}.")
-        combat_encounter.status = CombatStatus.FINISHED
-        await _handle_combat_end_consequences(session, guild_id, combat_encounter, winning_team)
-        # Log COMBAT_END (moved to _handle_combat_end_consequences)
-        session.add(combat_encounter)
-        await session.flush()
-        return combat_encounter
-
-    # If combat not ended, advance turn
-    await _advance_turn(session, combat_encounter) # Pass session here if _advance_turn needs it for rule lookups etc.
-
-    logger.info(f"Guild {guild_id}: Advanced turn for combat {combat_id}. New entity: {combat_encounter.current_turn_entity_type}:{combat_encounter.current_turn_entity_id}. Turn #: {combat_encounter.turn_order_json.get('current_turn_number')}")
-
-    session.add(combat_encounter)
-    await session.flush() # Ensure updates to turn order are saved before returning
-
-    # If the new current turn is an NPC and they are not defeated, process their turn immediately.
-    # This makes NPC turns flow automatically until a player's turn or combat ends.
-    new_active_id = combat_encounter.current_turn_entity_id
-    new_active_type = combat_encounter.current_turn_entity_type
-    if new_active_type == "npc" and combat_encounter.status == CombatStatus.ACTIVE:
-        new_actor_participant_data = next((p for p in combat_encounter.participants_json["entities"] if p["id"] == new_active_id and p["type"] == new_active_type), None)
-        if new_actor_participant_data and new_actor_participant_data.get("current_hp", 0) > 0:
-            logger.info(f"Guild {guild_id}: Combat {combat_id} - new turn is NPC {new_active_id}, processing their turn.")
-            # RECURSIVE CALL - be careful with depth if many NPCs and no players
-            # This will continue until a player's turn or combat ends.
-            return await process_combat_turn(session, guild_id, combat_id)
-            # Non-recursive alternative: return and let an external loop call process_combat_turn again.
-            # For now, recursive seems to match the "NPCs act until player turn" idea.
-
-    return combat_encounter
+    # directly from action_processor calling it. process_combat_turn then advances the state.
+    return True
 
 async def _check_combat_end(session: AsyncSession, guild_id: int, combat_encounter: CombatEncounter) -> Tuple[bool, Optional[str]]:
     """
@@ -379,14 +423,12 @@ async def _check_combat_end(session: AsyncSession, guild_id: int, combat_encount
 
     teams = {"players": {"alive_count": 0, "present": False}, "npcs": {"alive_count": 0, "present": False}}
 
-    for p_data in combat_encounter.participants_json["entities"]:
-        team_name = p_data.get("team")
+    for team_name, alive_count in get_combat_state(combat_encounter).alive_counts_by_team().items():
         if team_name in teams:
             teams[team_name]["present"] = True
-            if p_data.get("current_hp", 0) > 0:
-                teams[team_name]["alive_count"] += 1
+            teams[team_name]["alive_count"] = alive_count
         else:
-            logger.warning(f"Guild {guild_id}: Unknown team '{team_name}' in combat {combat_encounter.id} for participant {p_data.get('id')}")
+            logger.warning(f"Guild {guild_id}: Unknown team '{team_name}' in combat {combat_encounter.id}")
 
     # If only one team ever became present (e.g. combat started with only one team type somehow)
     if teams["players"]["present"] and not teams["npcs"]["present"]:
@@ -417,33 +459,11 @@ async def _advance_turn(session: AsyncSession, combat_encounter: CombatEncounter
         combat_encounter.status = CombatStatus.ERROR # Mark as error
         return
 
-    order_list = turn_order_data["order"]
-    current_idx = turn_order_data.get("current_index", 0)
-
-    # Loop to find the next non-defeated participant
-    for i in range(len(order_list)): # Max iterations = length of order list
-        current_idx = (current_idx + 1) % len(order_list)
-        if current_idx == 0: # Completed a full round
-            turn_order_data["current_turn_number"] = turn_order_data.get("current_turn_number", 0) + 1
-            logger.info(f"Combat {combat_encounter.id}: Starting new round, turn number {turn_order_data['current_turn_number']}.")
-            # TODO: Here, process round-based effects (e.g., status effect durations, cooldowns decrement)
-            # This would involve iterating through participants_json and updating their status_effects, cooldowns.
-
-        next_entity_ref = order_list[current_idx]
-        next_entity_id = next_entity_ref["id"]
-        next_entity_type = next_entity_ref["type"]
-
-        # Check if this next entity is still alive
-        participant_data = next(
-            (p for p in combat_encounter.participants_json["entities"] if p["id"] == next_entity_id and p["type"] == next_entity_type),
-            None
-        )
-        if participant_data and participant_data.get("current_hp", 0) > 0:
-            turn_order_data["current_index"] = current_idx
-            combat_encounter.current_turn_entity_id = next_entity_id
-            combat_encounter.current_turn_entity_type = next_entity_type
-            combat_encounter.turn_order_json = turn_order_data # Ensure the dict is marked as changed for SQLAlchemy
-            return
+    # TODO: On a new round, process round-based effects (e.g., status effect durations, cooldowns decrement)
+    # Only the in-memory state moves here; process_combat_turn flushes once for the whole pass.
+    advanced_to = get_combat_state(combat_encounter).advance_turn()
+    if advanced_to is not None:
+        return
 
     # If loop completes, it means no one is left alive (should have been caught by _check_combat_end)
     # Or all remaining are defeated. This state implies combat should have ended.
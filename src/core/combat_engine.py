@@ -10,20 +10,28 @@ from ..models.enums import EventType, CombatStatus # Added CombatStatus
 from .rules import get_rule as core_get_rule
 from . import check_resolver as core_check_resolver
 from . import dice_roller as core_dice_roller
+from . import formula_engine as core_formula_engine
 from . import game_events as core_game_events
+from . import rng_service as core_rng_service
+from . import stat_sheet as core_stat_sheet
 from .crud_base_definitions import get_entity_by_id
+from .rule_snapshot import GuildRuleSnapshot
+from .combat_state import get_combat_state
+from .combat_context import CombatContext
 
 logger = logging.getLogger(__name__)
 
 # --- Вспомогательные функции (уже реализованы на предыдущем шаге) ---
 
 async def _get_combat_rule(
-    combat_rules_snapshot: Optional[Dict[str, Any]],
+    combat_rules_snapshot: Optional[Union[Dict[str, Any], GuildRuleSnapshot]],
     session: AsyncSession,
     guild_id: int,
     rule_key: str,
     default: Optional[Any] = None
 ) -> Any:
+    if isinstance(combat_rules_snapshot, GuildRuleSnapshot):
+        return combat_rules_snapshot.get(rule_key, default)
     if combat_rules_snapshot and rule_key in combat_rules_snapshot:
         val = combat_rules_snapshot[rule_key]
         logger.debug(f"Rule '{rule_key}' found in snapshot: {val}")
@@ -34,7 +42,7 @@ async def _calculate_attribute_modifier(
     base_value: int,
     session: AsyncSession,
     guild_id: int,
-    combat_rules_snapshot: Optional[Dict[str, Any]],
+    combat_rules_snapshot: Optional[Union[Dict[str, Any], GuildRuleSnapshot]],
     default_formula: str = "(value - 10) // 2"
 ) -> int:
     formula_key = "combat:attributes:modifier_formula"
@@ -44,8 +52,8 @@ async def _calculate_attribute_modifier(
         default=default_formula
     )
     try:
-        scope = {"value": base_value}
-        modifier = eval(formula, {"__builtins__": {}}, scope)
+        compiled_formula = core_formula_engine.get_compiled_formula(guild_id, formula_key, formula)
+        modifier = compiled_formula.evaluate(value=base_value)
         if not isinstance(modifier, int):
             logger.warning(f"Attribute modifier formula '{formula}' (from key '{formula_key}') for value {base_value} did not return an int. Got: {modifier}. Attempting conversion.")
             try:
@@ -58,13 +66,38 @@ async def _calculate_attribute_modifier(
         logger.error(f"Error evaluating attribute modifier formula '{formula}' (from key '{formula_key}') with value {base_value}: {e}. Using default calculation.")
         return (base_value - 10) // 2
 
+async def _calculate_attribute_modifiers_many(
+    base_values: List[int],
+    session: AsyncSession,
+    guild_id: int,
+    combat_rules_snapshot: Optional[Union[Dict[str, Any], GuildRuleSnapshot]],
+    default_formula: str = "(value - 10) // 2"
+) -> List[int]:
+    """
+    Batch variant of _calculate_attribute_modifier: fetches and compiles the formula once
+    and scores every value in one pass (e.g. dexterity of all participants for initiative).
+    """
+    formula_key = "combat:attributes:modifier_formula"
+    formula = await _get_combat_rule(
+        combat_rules_snapshot, session, guild_id,
+        formula_key,
+        default=default_formula
+    )
+    try:
+        compiled_formula = core_formula_engine.get_compiled_formula(guild_id, formula_key, formula)
+        modifiers = compiled_formula.evaluate_many(base_values)
+        return [int(m) for m in modifiers]
+    except Exception as e:
+        logger.error(f"Error evaluating attribute modifier formula '{formula}' (from key '{formula_key}') for {len(base_values)} values: {e}. Using default calculation.")
+        return [(v - 10) // 2 for v in base_values]
+
 async def _get_participant_stat(
     participant_data_from_encounter: Optional[Dict[str, Any]],
     base_entity_model: Union[Player, GeneratedNpc],
     stat_path: str,
     session: AsyncSession,
     guild_id: int,
-    combat_rules_snapshot: Optional[Dict[str, Any]],
+    combat_rules_snapshot: Optional[Union[Dict[str, Any], GuildRuleSnapshot]],
     default: Optional[Any] = None
 ) -> Any:
     if participant_data_from_encounter:
@@ -157,6 +190,45 @@ async def _get_participant_stat(
     logger.warning(f"Stat '{stat_path}' not found for entity {base_entity_model.id} ({type(base_entity_model).__name__}). Returning default value: {default}")
     return default
 
+async def _get_stat_sheet(
+    combat_encounter: CombatEncounter,
+    entity_type: str,
+    entity_id: int,
+    participant_data: Optional[Dict[str, Any]],
+    entity: Union[Player, GeneratedNpc],
+    session: AsyncSession,
+    guild_id: int,
+    combat_rules_snapshot: Optional[Union[Dict[str, Any], GuildRuleSnapshot]],
+) -> core_stat_sheet.StatSheet:
+    """
+    The participant's StatSheet, built on first use in the encounter and reused until the rules version changes
+    or the entity's stats are invalidated (see stat_sheet). Replaces per-lookup _get_participant_stat calls.
+    """
+    rules_version = combat_rules_snapshot.version if isinstance(combat_rules_snapshot, GuildRuleSnapshot) else None
+    sheet = core_stat_sheet.get_cached_stat_sheet(combat_encounter, entity_type, entity_id, participant_data, rules_version)
+    if sheet is not None:
+        return sheet
+
+    formula_key = "combat:attributes:modifier_formula"
+    formula = await _get_combat_rule(combat_rules_snapshot, session, guild_id, formula_key, default=core_stat_sheet.DEFAULT_MODIFIER_FORMULA)
+    try:
+        compiled_formula = core_formula_engine.get_compiled_formula(guild_id, formula_key, formula)
+    except Exception as e:
+        logger.error(f"Error compiling attribute modifier formula '{formula}' (from key '{formula_key}'): {e}. Using default calculation.")
+        compiled_formula = None
+    default_modifier = await _get_combat_rule(combat_rules_snapshot, session, guild_id, "combat:attributes:default_modifier_if_stat_missing", default=0)
+    default_max_hp = None
+    if isinstance(entity, Player):
+        default_max_hp = await _get_combat_rule(combat_rules_snapshot, session, guild_id, "player:stats:default_max_hp", default=50)
+
+    sheet = core_stat_sheet.build_stat_sheet(
+        guild_id, entity_type, entity_id, participant_data, entity,
+        compiled_formula, default_modifier, default_max_hp, rules_version,
+    )
+    core_stat_sheet.store_stat_sheet(combat_encounter, sheet)
+    logger.debug(f"Guild {guild_id}: built {sheet!r} for combat {combat_encounter.id}.")
+    return sheet
+
 # --- Основная функция ---
 
 async def process_combat_action(
@@ -165,10 +237,19 @@ async def process_combat_action(
     combat_instance_id: int,
     actor_id: int,
     actor_type: str,
-    action_data: dict
+    action_data: dict,
+    guild_rules: Optional[GuildRuleSnapshot] = None,
+    combat_context: Optional[CombatContext] = None,
+    rng_seed: Optional[int] = None
 ) -> CombatActionResult:
     """
     Processes a combat action for a given actor within a combat encounter.
+    If `guild_rules` is given (built once per turn/combat), rules are read from it, with the
+    encounter's rules_config_snapshot_json taking precedence, instead of awaiting get_rule.
+    If `combat_context` is given, the encounter, participant entities and rules come from it and the
+    changes are left in its CombatState: the caller flushes once after resolving several actions.
+    Rolls come from a DiceRoller seeded with `rng_seed`, by default derived from the combat's seed and the
+    actor's turn slot (see rng_service); the seed is written to the combat log entry for replays.
     """
     logger.info(f"Processing combat action for guild {guild_id}, combat {combat_instance_id}, actor {actor_type}:{actor_id}")
     logger.debug(f"Action data: {action_data}")
@@ -179,7 +260,13 @@ async def process_combat_action(
         description_i18n={"en": "Action processing started."} # Default message
     )
 
-    combat_encounter = await session.get(CombatEncounter, combat_instance_id)
+    if combat_context is not None and combat_context.encounter.id == combat_instance_id:
+        combat_encounter = combat_context.encounter
+        if guild_rules is None:
+            guild_rules = combat_context.guild_rules
+    else:
+        combat_context = None
+        combat_encounter = await session.get(CombatEncounter, combat_instance_id)
     if not combat_encounter or combat_encounter.guild_id != guild_id:
         msg = f"Combat encounter {combat_instance_id} not found or does not belong to guild {guild_id}."
         logger.error(msg)
@@ -199,18 +286,19 @@ async def process_combat_action(
         combat_action_result.description_i18n = {"en": msg}
         return combat_action_result
 
-    actor_entity = await get_entity_by_id(session, actor_model_class, actor_id, guild_id=guild_id)
+    actor_entity = combat_context.entity(actor_type.lower(), actor_id) if combat_context else None
+    if actor_entity is None:
+        actor_entity = await get_entity_by_id(session, actor_model_class, actor_id, guild_id=guild_id)
     if not actor_entity:
         msg = f"Actor {actor_id} ({actor_type}) not found in guild {guild_id}."
         logger.error(msg)
         combat_action_result.description_i18n = {"en": f"Actor {actor_type} not found."} # Generic
         return combat_action_result
 
-    # Ensure participants_json and its 'entities' list exist
-    if combat_encounter.participants_json is None: combat_encounter.participants_json = {}
-    if "entities" not in combat_encounter.participants_json: combat_encounter.participants_json["entities"] = []
+    # Indexed view of participants_json / turn_order_json; records what this action changes and its log entry
+    combat_state = get_combat_state(combat_encounter)
 
-    actor_participant_data = next((p for p in combat_encounter.participants_json["entities"] if p["id"] == actor_id and p["type"] == actor_type), None)
+    actor_participant_data = combat_state.get(actor_type, actor_id)
     if not actor_participant_data:
         # This might happen if an entity joins combat mid-way and isn't in participants_json yet
         # Or if actor_id/type from input doesn't match anyone in the current encounter's list
@@ -220,172 +308,181 @@ async def process_combat_action(
         return combat_action_result
 
     # --- Action-specific logic ---
-    if action_type_str == "attack":
-        target_id = action_data.get("target_id")
-        target_type = action_data.get("target_type")
-
-        if target_id is None or target_type is None:
-            combat_action_result.description_i18n = {"en": "Attack action requires target_id and target_type."}
-            return combat_action_result
-
-        combat_action_result.target_id = target_id
-        combat_action_result.target_type = target_type
-
-        target_model_class = Player if target_type.lower() == "player" else GeneratedNpc if target_type.lower() == "npc" else None
-        if not target_model_class:
-            msg = f"Invalid target_type: {target_type}."
-            logger.error(msg)
-            combat_action_result.description_i18n = {"en": msg}
-            return combat_action_result
-
-        target_entity = await get_entity_by_id(session, target_model_class, target_id, guild_id=guild_id)
-        if not target_entity:
-            combat_action_result.description_i18n = {"en": f"Target {target_type} not found."}
-            return combat_action_result
-
-        target_participant_data = next((p for p in combat_encounter.participants_json["entities"] if p["id"] == target_id and p["type"] == target_type), None)
-        if not target_participant_data:
-            combat_action_result.description_i18n = {"en": "Target not found in this combat."}
-            return combat_action_result
-
-        if target_participant_data.get("current_hp", 0) <= 0:
-            combat_action_result.description_i18n = {"en": "Target is already defeated."}
-            combat_action_result.success = True # Action taken, but no effect
-            return combat_action_result
-
-        # Get rules for attack
-        rules_snapshot = combat_encounter.rules_config_snapshot_json
-        check_type = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:check_type", "attack_roll")
-
-        # Attacker's attribute for the check (e.g., "strength" or "dexterity" to get modifier from)
-        attacker_base_attribute_name = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:attacker_main_attribute", "strength")
-        attacker_check_modifier_val = await _get_participant_stat(actor_participant_data, actor_entity, f"{attacker_base_attribute_name}_modifier", session, guild_id, rules_snapshot, 0)
-
-        # Target's defense attribute for DC (e.g., "armor_class")
-        target_defense_attribute_name = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:target_defense_attribute", "armor_class")
-        dc_value = await _get_participant_stat(target_participant_data, target_entity, target_defense_attribute_name, session, guild_id, rules_snapshot, 10)
-
-        # Resolve the attack check
-        # Note: resolve_check itself uses _get_participant_stat for its base_attribute.
-        # We pass the specific attribute name to be used for the check via context or ensure rules are set up.
-        # For now, resolve_check might need adjustment or we rely on its internal rule fetching for "base_attribute".
-        # Let's assume resolve_check is configured to use the correct attacker attribute for the given check_type.
-        # The `attacker_check_modifier_val` calculated above is one way to get the modifier,
-        # but resolve_check will calculate it internally based on `base_attribute` rule for the check_type.
-        # We should ensure `checks:{check_type}:base_attribute` is set to `attacker_base_attribute_name`.
-
-        # To be extremely explicit, we can pass the modifier directly if resolve_check supports it,
-        # or ensure rules are configured. For now, rely on resolve_check's rule-based modifier calculation.
-        # A potential modification to resolve_check would be to accept an optional `base_modifier_override`.
-
-        attack_roll_result = await core_check_resolver.resolve_check(
-            db=session, guild_id=guild_id, check_type=check_type,
-            entity_doing_check_id=actor_id, entity_doing_check_type=actor_type,
-            target_entity_id=target_id, target_entity_type=target_type,
-            difficulty_dc=dc_value,
-            check_context={"actor_participant_data": actor_participant_data, "target_participant_data": target_participant_data}
-        )
-        combat_action_result.check_result = attack_roll_result
-
-        actor_name_i18n = actor_entity.name_i18n if isinstance(actor_entity, GeneratedNpc) else {"en": actor_entity.name, "ru": actor_entity.name}
-        target_name_i18n = target_entity.name_i18n if isinstance(target_entity, GeneratedNpc) else {"en": target_entity.name, "ru": target_entity.name}
-        actor_loc_name = actor_name_i18n.get("en", actor_type) # Default to type if name not found
-        target_loc_name = target_name_i18n.get("en", target_type)
-
-
-        if attack_roll_result.outcome.status in ["success", "critical_success"]:
-            combat_action_result.success = True
-            damage_formula = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:damage_formula", "1d4")
-            damage_base_attribute_name = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:damage_attribute", "strength") # e.g. strength
-            damage_modifier_val = await _get_participant_stat(actor_participant_data, actor_entity, f"{damage_base_attribute_name}_modifier", session, guild_id, rules_snapshot, 0)
-
-            base_damage_roll, _ = core_dice_roller.roll_dice(damage_formula)
-            total_damage = base_damage_roll + damage_modifier_val
-
-            if attack_roll_result.outcome.status == "critical_success":
-                crit_multiplier = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:crit_damage_multiplier", 2.0)
-                # Option 1: Multiply total damage
-                # total_damage = int(total_damage * crit_multiplier)
-                # Option 2: Maximize base dice then add another roll + modifier (common D&D rule)
-                # For simplicity now, let's use multiplier on calculated damage (base_roll + mod)
-                # A more robust crit system would be defined by rules (e.g. "max_dice", "add_dice")
-                # max_base_damage_roll = sum(core_dice_roller.roll_dice(damage_formula.split('+')[0])[1]) # Maximize dice part
-                # if '+' in damage_formula: # If formula is like "1d6+2", only maximize "1d6"
-                #     max_base_damage_roll = sum(core_dice_roller.roll_dice(re.sub(r'\d*d\d+', lambda m: str(int(m.group(0).split('d')[0]) * int(m.group(0).split('d')[1])), damage_formula.split('+')[0]))[1])
-                # ^^^ Эта логика перенесена внутрь "maximize_and_add_dice"
-
-
-                # Simplified crit: double dice or double total. Rule: "crit_type": "double_dice" or "double_total"
-                # Let's assume rule "combat:attack:crit_effect" -> "double_damage_dice" or "multiply_total_damage"
-                crit_effect_rule = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:crit_effect", "multiply_total_damage")
-                logger.debug(f"DEBUG: crit_effect_rule is: {crit_effect_rule}")
-
-
-                if crit_effect_rule == "double_damage_dice":
-                    damage_formula_dice_part = damage_formula
-                    if '+' in damage_formula_dice_part:
-                        damage_formula_dice_part = damage_formula.split('+')[0]
-
-                    extra_crit_damage_roll, _ = core_dice_roller.roll_dice(damage_formula_dice_part)
-                    total_damage = base_damage_roll + extra_crit_damage_roll + damage_modifier_val
-                    combat_action_result.additional_details = {"crit_effect": "double_damage_dice"}
-
-                elif crit_effect_rule == "maximize_and_add_dice": # D&D 5e common house rule
-                    dice_part = damage_formula.split('+')[0] # e.g., "2d6" from "2d6+3"
-
-                    # Calculate maximized base dice value
-                    # Assuming simple NdX format for dice_part for maximization
-                    num_dice_str, sides_str = dice_part.split('d')
-                    num_dice_val = int(num_dice_str) if num_dice_str else 1
-                    sides_val = int(sides_str)
-                    maximized_dice_value = num_dice_val * sides_val
-
-                    additional_roll_crit, _ = core_dice_roller.roll_dice(dice_part) # Roll dice again
-                    total_damage = maximized_dice_value + additional_roll_crit + damage_modifier_val
-                    combat_action_result.additional_details = {"crit_effect": "maximize_and_add_dice"}
-
-                else: # Default: multiply_total_damage
-                    total_damage = int(total_damage * crit_multiplier)
-                    combat_action_result.additional_details = {"crit_effect": "multiply_total_damage", "multiplier": crit_multiplier}
-
-                desc_en = f"{actor_loc_name} critically strikes {target_loc_name} for {total_damage} damage!"
-            else:
-                desc_en = f"{actor_loc_name} hits {target_loc_name} for {total_damage} damage."
+    if rng_seed is None:
+        rng_seed = core_rng_service.combat_action_seed(combat_encounter, actor_type, actor_id)
+    with core_dice_roller.use_dice_roller(core_dice_roller.DiceRoller(rng_seed)):
+        if action_type_str == "attack":
+            target_id = action_data.get("target_id")
+            target_type = action_data.get("target_type")
+
+            if target_id is None or target_type is None:
+                combat_action_result.description_i18n = {"en": "Attack action requires target_id and target_type."}
+                return combat_action_result
+
+            combat_action_result.target_id = target_id
+            combat_action_result.target_type = target_type
+
+            target_model_class = Player if target_type.lower() == "player" else GeneratedNpc if target_type.lower() == "npc" else None
+            if not target_model_class:
+                msg = f"Invalid target_type: {target_type}."
+                logger.error(msg)
+                combat_action_result.description_i18n = {"en": msg}
+                return combat_action_result
+
+            target_entity = combat_context.entity(target_type.lower(), target_id) if combat_context else None
+            if target_entity is None:
+                target_entity = await get_entity_by_id(session, target_model_class, target_id, guild_id=guild_id)
+            if not target_entity:
+                combat_action_result.description_i18n = {"en": f"Target {target_type} not found."}
+                return combat_action_result
+
+            target_participant_data = combat_state.get(target_type, target_id)
+            if not target_participant_data:
+                combat_action_result.description_i18n = {"en": "Target not found in this combat."}
+                return combat_action_result
+
+            if target_participant_data.get("current_hp", 0) <= 0:
+                combat_action_result.description_i18n = {"en": "Target is already defeated."}
+                combat_action_result.success = True # Action taken, but no effect
+                return combat_action_result
+
+            # Get rules for attack
+            rules_snapshot: Optional[Union[Dict[str, Any], GuildRuleSnapshot]] = combat_encounter.rules_config_snapshot_json
+            if guild_rules is not None:
+                rules_snapshot = guild_rules.with_overrides(combat_encounter.rules_config_snapshot_json)
+            check_type = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:check_type", "attack_roll")
+
+            # Attacker's attribute for the check (e.g., "strength" or "dexterity" to get modifier from)
+            attacker_base_attribute_name = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:attacker_main_attribute", "strength")
+            actor_stats = await _get_stat_sheet(combat_encounter, actor_type, actor_id, actor_participant_data, actor_entity, session, guild_id, rules_snapshot)
+            attacker_check_modifier_val = actor_stats.get(f"{attacker_base_attribute_name}_modifier")
+
+            # Target's defense attribute for DC (e.g., "armor_class")
+            target_defense_attribute_name = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:target_defense_attribute", "armor_class")
+            target_stats = await _get_stat_sheet(combat_encounter, target_type, target_id, target_participant_data, target_entity, session, guild_id, rules_snapshot)
+            dc_value = target_stats.get(target_defense_attribute_name, 10)
+
+            # Resolve the attack check
+            # Note: resolve_check computes the modifier of its own base_attribute rule.
+            # We pass the specific attribute name to be used for the check via context or ensure rules are set up.
+            # For now, resolve_check might need adjustment or we rely on its internal rule fetching for "base_attribute".
+            # Let's assume resolve_check is configured to use the correct attacker attribute for the given check_type.
+            # The `attacker_check_modifier_val` calculated above is one way to get the modifier,
+            # but resolve_check will calculate it internally based on `base_attribute` rule for the check_type.
+            # We should ensure `checks:{check_type}:base_attribute` is set to `attacker_base_attribute_name`.
+
+            # To be extremely explicit, we can pass the modifier directly if resolve_check supports it,
+            # or ensure rules are configured. For now, rely on resolve_check's rule-based modifier calculation.
+            # A potential modification to resolve_check would be to accept an optional `base_modifier_override`.
+
+            attack_roll_result = await core_check_resolver.resolve_check(
+                db=session, guild_id=guild_id, check_type=check_type,
+                entity_doing_check_id=actor_id, entity_doing_check_type=actor_type,
+                target_entity_id=target_id, target_entity_type=target_type,
+                difficulty_dc=dc_value,
+                check_context={"actor_participant_data": actor_participant_data, "target_participant_data": target_participant_data},
+                rule_snapshot=rules_snapshot if isinstance(rules_snapshot, GuildRuleSnapshot) else None
+            )
+            combat_action_result.check_result = attack_roll_result
+
+            actor_name_i18n = actor_entity.name_i18n if isinstance(actor_entity, GeneratedNpc) else {"en": actor_entity.name, "ru": actor_entity.name}
+            target_name_i18n = target_entity.name_i18n if isinstance(target_entity, GeneratedNpc) else {"en": target_entity.name, "ru": target_entity.name}
+            actor_loc_name = actor_name_i18n.get("en", actor_type) # Default to type if name not found
+            target_loc_name = target_name_i18n.get("en", target_type)
+
+
+            if attack_roll_result.outcome.status in ["success", "critical_success"]:
+                combat_action_result.success = True
+                damage_formula = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:damage_formula", "1d4")
+                damage_base_attribute_name = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:damage_attribute", "strength") # e.g. strength
+                damage_modifier_val = actor_stats.get(f"{damage_base_attribute_name}_modifier")
+
+                base_damage_roll, _ = core_dice_roller.roll_dice(damage_formula)
+                total_damage = base_damage_roll + damage_modifier_val
+
+                if attack_roll_result.outcome.status == "critical_success":
+                    crit_multiplier = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:crit_damage_multiplier", 2.0)
+                    # Option 1: Multiply total damage
+                    # total_damage = int(total_damage * crit_multiplier)
+                    # Option 2: Maximize base dice then add another roll + modifier (common D&D rule)
+                    # For simplicity now, let's use multiplier on calculated damage (base_roll + mod)
+                    # A more robust crit system would be defined by rules (e.g. "max_dice", "add_dice")
+                    # max_base_damage_roll = sum(core_dice_roller.roll_dice(damage_formula.split('+')[0])[1]) # Maximize dice part
+                    # if '+' in damage_formula: # If formula is like "1d6+2", only maximize "1d6"
+                    #     max_base_damage_roll = sum(core_dice_roller.roll_dice(re.sub(r'\d*d\d+', lambda m: str(int(m.group(0).split('d')[0]) * int(m.group(0).split('d')[1])), damage_formula.split('+')[0]))[1])
+                    # ^^^ Эта логика перенесена внутрь "maximize_and_add_dice"
+
+
+                    # Simplified crit: double dice or double total. Rule: "crit_type": "double_dice" or "double_total"
+                    # Let's assume rule "combat:attack:crit_effect" -> "double_damage_dice" or "multiply_total_damage"
+                    crit_effect_rule = await _get_combat_rule(rules_snapshot, session, guild_id, "combat:attack:crit_effect", "multiply_total_damage")
+                    logger.debug(f"DEBUG: crit_effect_rule is: {crit_effect_rule}")
+
+
+                    if crit_effect_rule == "double_damage_dice":
+                        damage_formula_dice_part = damage_formula
+                        if '+' in damage_formula_dice_part:
+                            damage_formula_dice_part = damage_formula.split('+')[0]
+
+                        extra_crit_damage_roll, _ = core_dice_roller.roll_dice(damage_formula_dice_part)
+                        total_damage = base_damage_roll + extra_crit_damage_roll + damage_modifier_val
+                        combat_action_result.additional_details = {"crit_effect": "double_damage_dice"}
+
+                    elif crit_effect_rule == "maximize_and_add_dice": # D&D 5e common house rule
+                        dice_part = damage_formula.split('+')[0] # e.g., "2d6" from "2d6+3"
+
+                        # Calculate maximized base dice value
+                        # Assuming simple NdX format for dice_part for maximization
+                        num_dice_str, sides_str = dice_part.split('d')
+                        num_dice_val = int(num_dice_str) if num_dice_str else 1
+                        sides_val = int(sides_str)
+                        maximized_dice_value = num_dice_val * sides_val
+
+                        additional_roll_crit, _ = core_dice_roller.roll_dice(dice_part) # Roll dice again
+                        total_damage = maximized_dice_value + additional_roll_crit + damage_modifier_val
+                        combat_action_result.additional_details = {"crit_effect": "maximize_and_add_dice"}
+
+                    else: # Default: multiply_total_damage
+                        total_damage = int(total_damage * crit_multiplier)
+                        combat_action_result.additional_details = {"crit_effect": "multiply_total_damage", "multiplier": crit_multiplier}
+
+                    desc_en = f"{actor_loc_name} critically strikes {target_loc_name} for {total_damage} damage!"
+                else:
+                    desc_en = f"{actor_loc_name} hits {target_loc_name} for {total_damage} damage."
 
-            total_damage = max(0, total_damage) # Damage cannot be negative
-            combat_action_result.damage_dealt = total_damage
+                total_damage = max(0, total_damage) # Damage cannot be negative
+                combat_action_result.damage_dealt = total_damage
 
-            target_participant_data["current_hp"] = max(0, target_participant_data.get("current_hp", 0) - total_damage)
-            combat_action_result.description_i18n = {"en": desc_en}
+                combat_state.apply_damage(target_type, target_id, total_damage)
+                combat_action_result.description_i18n = {"en": desc_en}
 
-        elif attack_roll_result.outcome.status == "critical_failure":
-            combat_action_result.success = False # Usually means miss, but could have other effects
-            combat_action_result.description_i18n = {"en": f"{actor_loc_name}'s attack against {target_loc_name} critically fails!"}
-        else: # Failure
-            combat_action_result.success = False
-            combat_action_result.description_i18n = {"en": f"{actor_loc_name} misses {target_loc_name}."}
+            elif attack_roll_result.outcome.status == "critical_failure":
+                combat_action_result.success = False # Usually means miss, but could have other effects
+                combat_action_result.description_i18n = {"en": f"{actor_loc_name}'s attack against {target_loc_name} critically fails!"}
+            else: # Failure
+                combat_action_result.success = False
+                combat_action_result.description_i18n = {"en": f"{actor_loc_name} misses {target_loc_name}."}
 
-    else: # Unknown action type
-        combat_action_result.description_i18n = {"en": f"Action type '{action_type_str}' is not recognized."}
-        return combat_action_result # Early exit for unknown action
+        else: # Unknown action type
+            combat_action_result.description_i18n = {"en": f"Action type '{action_type_str}' is not recognized."}
+            return combat_action_result # Early exit for unknown action
 
     # Update combat encounter log (simple log for now)
-    if combat_encounter.combat_log_json is None: combat_encounter.combat_log_json = {"entries": []}
-    if "entries" not in combat_encounter.combat_log_json: combat_encounter.combat_log_json["entries"] = []
-
     # Use a Pydantic model for log entries if structure becomes complex
     log_entry_details = combat_action_result.model_dump(exclude_none=True)
     # Remove redundant info if it's already in the higher-level story log
     log_entry_details.pop("actor_id", None)
     log_entry_details.pop("actor_type", None)
 
-    combat_encounter.combat_log_json["entries"].append({
-        "turn": combat_encounter.turn_order_json.get("current_turn_number", 0) if combat_encounter.turn_order_json else 0, # Assuming turn number is tracked
+    combat_state.append_log({
+        "turn": combat_state.turn_number,
         "actor": f"{actor_type}:{actor_id}",
-        "action_details": log_entry_details
+        "action_details": log_entry_details,
+        "rng_seed": rng_seed
     })
 
-    session.add(combat_encounter) # Mark for saving
+    if combat_context is None:
+        await combat_state.flush(session) # Writes only the changed HP fields; the log entry is one INSERT into combat_log_entries
 
     # Log to global StoryLog
     # Prepare entity_ids for StoryLog
@@ -0,0 +1,149 @@
+import json
+import logging
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..config.settings import COMBAT_LOG_PAGE_SIZE
+from ..models.combat_encounter import CombatEncounter
+from ..models.combat_log_entry import CombatLogEntry
+
+logger = logging.getLogger(__name__)
+
+# The combat log is an append-only table keyed by (combat_encounter_id, seq):
+# - writing: one multi-row INSERT per flush, the cost does not depend on how long the log already is;
+# - reading: keyset pages (seq > after_seq ORDER BY seq LIMIT n) over the primary key, used by combat replay;
+# - compaction: when a combat ends, its rows can be folded into a zlib-compressed blob on the encounter
+#   (combat_log_archive); readers see archived and live entries as one sequence.
+
+
+async def append_combat_log_entries(
+    session: AsyncSession, combat_encounter: CombatEncounter, entries: Sequence[Dict[str, Any]]
+) -> int:
+    """
+    Appends entries to the encounter's log with a single multi-row INSERT and returns the seq of the last one
+    (0 if nothing was written). Does not commit.
+    """
+    if not entries:
+        return 0
+    # The latest seq is a backward step on the primary key, not a scan of the log; after a compaction
+    # numbering continues from the archive.
+    last_seq_stmt = select(func.coalesce(
+        select(func.max(CombatLogEntry.seq)).where(CombatLogEntry.combat_encounter_id == combat_encounter.id).scalar_subquery(),
+        select(CombatEncounter.combat_log_archived_count).where(CombatEncounter.id == combat_encounter.id).scalar_subquery(),
+        0,
+    ))
+    last_seq = (await session.execute(last_seq_stmt)).scalar() or 0
+    rows = [
+        {
+            "combat_encounter_id": combat_encounter.id,
+            "seq": last_seq + offset,
+            "guild_id": combat_encounter.guild_id,
+            "turn_number": entry.get("turn") if isinstance(entry.get("turn"), int) else None,
+            "entry_json": entry,
+        }
+        for offset, entry in enumerate(entries, start=1)
+    ]
+    await session.execute(insert(CombatLogEntry), rows)
+    logger.debug(f"Combat {combat_encounter.id}: appended {len(rows)} log entries (seq {last_seq + 1}..{last_seq + len(rows)}).")
+    return last_seq + len(rows)
+
+
+async def append_combat_log_entry(session: AsyncSession, combat_encounter: CombatEncounter, entry: Dict[str, Any]) -> int:
+    return await append_combat_log_entries(session, combat_encounter, [entry])
+
+
+def _pack_archive(entries: List[List[Any]]) -> bytes:
+    return zlib.compress(json.dumps(entries, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack_archive(blob: Optional[bytes]) -> List[List[Any]]:
+    if not blob:
+        return []
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+async def get_combat_log_page(
+    session: AsyncSession, combat_encounter_id: int, *, after_seq: int = 0, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns up to `limit` log entries with seq > after_seq, oldest first. Each entry is the logged dict with its
+    "seq" added; pass the last "seq" of a page as `after_seq` to read the next one. Archived entries of a
+    compacted combat are returned the same way.
+    """
+    limit = COMBAT_LOG_PAGE_SIZE if limit is None else limit
+    if limit <= 0:
+        return []
+
+    page: List[Dict[str, Any]] = []
+    archived_count = (await session.execute(
+        select(CombatEncounter.combat_log_archived_count).where(CombatEncounter.id == combat_encounter_id)
+    )).scalar() or 0
+    if after_seq < archived_count:
+        archive = (await session.execute(
+            select(CombatEncounter.combat_log_archive).where(CombatEncounter.id == combat_encounter_id)
+        )).scalar()
+        for seq, entry in _unpack_archive(archive)[after_seq:after_seq + limit]:
+            page.append({**entry, "seq": seq})
+        if len(page) == limit:
+            return page
+        after_seq = archived_count
+
+    stmt = (
+        select(CombatLogEntry.seq, CombatLogEntry.entry_json)
+        .where(CombatLogEntry.combat_encounter_id == combat_encounter_id, CombatLogEntry.seq > after_seq)
+        .order_by(CombatLogEntry.seq)
+        .limit(limit - len(page))
+    )
+    for seq, entry in (await session.execute(stmt)).all():
+        page.append({**entry, "seq": seq})
+    return page
+
+
+async def count_combat_log_entries(session: AsyncSession, combat_encounter_id: int) -> int:
+    archived_count = (await session.execute(
+        select(CombatEncounter.combat_log_archived_count).where(CombatEncounter.id == combat_encounter_id)
+    )).scalar() or 0
+    live_count = (await session.execute(
+        select(func.count()).select_from(CombatLogEntry).where(CombatLogEntry.combat_encounter_id == combat_encounter_id)
+    )).scalar_one()
+    return archived_count + live_count
+
+
+async def compact_combat_log(session: AsyncSession, combat_encounter: CombatEncounter) -> int:
+    """
+    Moves the encounter's log rows into the compressed combat_log_archive (one DELETE ... RETURNING and one UPDATE)
+    and returns the number of entries archived. Meant for finished combats; later appends continue the seq
+    numbering after the archive. Does not commit.
+    """
+    stmt = (
+        delete(CombatLogEntry)
+        .where(CombatLogEntry.combat_encounter_id == combat_encounter.id)
+        .returning(CombatLogEntry.seq, CombatLogEntry.entry_json)
+        .execution_options(synchronize_session=False)
+    )
+    # RETURNING row order is not guaranteed.
+    moved = sorted((await session.execute(stmt)).all(), key=lambda row: row.seq)
+    if not moved:
+        return 0
+
+    archived = _unpack_archive(combat_encounter.combat_log_archive)
+    archived.extend([row.seq, row.entry_json] for row in moved)
+    blob = _pack_archive(archived)
+    await session.execute(
+        update(CombatEncounter)
+        .where(CombatEncounter.id == combat_encounter.id)
+        .values(combat_log_archive=blob, combat_log_archived_count=archived[-1][0])
+        .execution_options(synchronize_session=False)
+    )
+    # Keep the loaded object in line with the row without marking it dirty.
+    set_committed_value(combat_encounter, "combat_log_archive", blob)
+    set_committed_value(combat_encounter, "combat_log_archived_count", archived[-1][0])
+    logger.info(f"Combat {combat_encounter.id}: compacted {len(moved)} log entries into the archive ({len(blob)} bytes).")
+    return len(moved)
+
+
+logger.info("Combat log module loaded.")
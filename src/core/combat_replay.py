@@ -0,0 +1,157 @@
+import copy
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import CombatEncounter, StoryLog
+from ..models.enums import CombatStatus, EventType
+from . import combat_engine, rng_service
+from .combat_context import load_combat_context
+from .combat_log import get_combat_log_page
+
+logger = logging.getLogger(__name__)
+
+# Replay harness for seeded combats.
+# A combat is re-executed from what was recorded: the root seed in rules_config_snapshot_json, the starting
+# participants and turn order in the COMBAT_START event, and every action with its seed in the combat log.
+# Initiative is re-rolled and each logged action is run again through combat_engine.process_combat_action
+# against an in-memory copy of the encounter, then the rolled values are compared with the logged ones.
+# Nothing is persisted: the actions run inside a savepoint that is rolled back. Results only reproduce if
+# the guild rules and the participants' stats are the ones the combat ran with.
+
+# Fields of a logged action that are fully determined by the rolls and the combat state.
+_REPLAYED_CHECK_FIELDS = ("dice_notation", "raw_rolls", "roll_used", "total_modifier", "final_value")
+_REPLAYED_ACTION_FIELDS = ("success", "damage_dealt", "healing_done", "additional_details")
+
+
+class ReplayedAction(NamedTuple):
+    seq: int
+    actor: str # "type:id", as in the combat log
+    logged: Dict[str, Any]
+    replayed: Optional[Dict[str, Any]] # None if the entry could not be replayed (e.g. no recorded seed)
+
+    @property
+    def matches(self) -> bool:
+        return self.replayed is not None and self.replayed == self.logged
+
+
+class CombatReplay(NamedTuple):
+    combat_id: int
+    seed: int
+    initiative_matches: bool
+    actions: List[ReplayedAction]
+
+    @property
+    def matches(self) -> bool:
+        return self.initiative_matches and all(action.matches for action in self.actions)
+
+    @property
+    def mismatches(self) -> List[ReplayedAction]:
+        return [action for action in self.actions if not action.matches]
+
+
+def _replayed_fields(action_details: Dict[str, Any]) -> Dict[str, Any]:
+    """The roll-dependent part of a logged (or replayed) CombatActionResult dump."""
+    fields = {key: action_details.get(key) for key in _REPLAYED_ACTION_FIELDS}
+    check_result = action_details.get("check_result") or {}
+    fields["check"] = {key: check_result.get(key) for key in _REPLAYED_CHECK_FIELDS}
+    fields["check"]["outcome"] = (check_result.get("outcome") or {}).get("status")
+    return fields
+
+
+async def _get_combat_start_details(session: AsyncSession, combat_encounter: CombatEncounter) -> Dict[str, Any]:
+    stmt = select(StoryLog.details_json).where(
+        StoryLog.guild_id == combat_encounter.guild_id,
+        StoryLog.event_type == EventType.COMBAT_START,
+        StoryLog.location_id == combat_encounter.location_id,
+    ).order_by(StoryLog.id)
+    for details in (await session.execute(stmt)).scalars():
+        if details and details.get("combat_id") == combat_encounter.id:
+            return details
+    raise ValueError(f"No COMBAT_START event recorded for combat {combat_encounter.id}.")
+
+
+def _replay_initiative(seed: int, participants: List[Dict[str, Any]], initiative_dice: str) -> List[Dict[str, Any]]:
+    """Turn order as start_combat rolls it for `seed`."""
+    rolls = rng_service.combat_initiative_roller(seed).roll_many(initiative_dice, len(participants))
+    scored = [(roll + participant.get("initiative_modifier", 0), participant) for roll, participant in zip(rolls, participants)]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [{"id": participant["id"], "type": participant["type"]} for _, participant in scored]
+
+
+async def replay_combat(session: AsyncSession, guild_id: int, combat_id: int) -> CombatReplay:
+    """
+    Re-executes a logged combat and compares every action's rolls and outcome with the log.
+
+    Raises:
+        ValueError: If the combat does not exist in the guild or was not recorded with a seed.
+    """
+    combat_encounter = await session.get(CombatEncounter, combat_id)
+    if not combat_encounter or combat_encounter.guild_id != guild_id:
+        raise ValueError(f"Combat encounter {combat_id} not found in guild {guild_id}.")
+    rules_snapshot = combat_encounter.rules_config_snapshot_json or {}
+    seed = rules_snapshot.get(rng_service.RNG_SEED_RULE_KEY)
+    if not isinstance(seed, int):
+        raise ValueError(f"Combat {combat_id} has no recorded RNG seed and cannot be replayed.")
+
+    start_details = await _get_combat_start_details(session, combat_encounter)
+    initial_participants = copy.deepcopy(start_details.get("participants") or [])
+    logged_turn_order = start_details.get("turn_order") or []
+    initiative_dice = rules_snapshot.get("combat:initiative:dice") or "1d20"
+    initiative_matches = _replay_initiative(seed, initial_participants, initiative_dice) == logged_turn_order
+
+    # Detached copy in its starting state; never added to the session.
+    replay_encounter = CombatEncounter(
+        id=combat_encounter.id,
+        guild_id=guild_id,
+        location_id=combat_encounter.location_id,
+        status=CombatStatus.ACTIVE,
+        participants_json={"entities": initial_participants},
+        turn_order_json={"order": copy.deepcopy(logged_turn_order), "current_index": 0, "current_turn_number": 1},
+        rules_config_snapshot_json=copy.deepcopy(rules_snapshot),
+    )
+    combat_context = await load_combat_context(session, guild_id, replay_encounter)
+
+    actions: List[ReplayedAction] = []
+    savepoint = await session.begin_nested()
+    try:
+        after_seq = 0
+        while True:
+            page = await get_combat_log_page(session, combat_id, after_seq=after_seq)
+            if not page:
+                break
+            after_seq = page[-1]["seq"]
+            for entry in page:
+                if "action_details" not in entry:
+                    continue
+                action_details = entry["action_details"] or {}
+                logged = _replayed_fields(action_details)
+                actor = entry.get("actor", "")
+                actor_type, _, actor_id = actor.partition(":")
+                action_seed = entry.get("rng_seed")
+                if not isinstance(action_seed, int) or not actor_id.isdigit():
+                    actions.append(ReplayedAction(entry["seq"], actor, logged, None))
+                    continue
+                action_data = {
+                    "action_type": action_details.get("action_type"),
+                    "target_id": action_details.get("target_id"),
+                    "target_type": action_details.get("target_type"),
+                }
+                result = await combat_engine.process_combat_action(
+                    guild_id=guild_id, session=session, combat_instance_id=combat_id,
+                    actor_id=int(actor_id), actor_type=actor_type, action_data=action_data,
+                    combat_context=combat_context, rng_seed=action_seed,
+                )
+                replayed = _replayed_fields(result.model_dump(mode="json", exclude_none=True))
+                actions.append(ReplayedAction(entry["seq"], actor, logged, replayed))
+    finally:
+        await savepoint.rollback()
+
+    replay = CombatReplay(combat_id, seed, initiative_matches, actions)
+    logger.info(
+        f"Guild {guild_id}: Replayed combat {combat_id} (seed {seed}): {len(actions)} actions, "
+        f"{len(replay.mismatches)} mismatches, initiative {'matches' if initiative_matches else 'differs'}."
+    )
+    return replay
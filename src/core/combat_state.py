@@ -0,0 +1,276 @@
+import json
+import logging
+import weakref
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, Text, cast, func, inspect, literal, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import flag_modified
+
+from ..models.combat_encounter import CombatEncounter
+from .combat_log import append_combat_log_entries
+
+logger = logging.getLogger(__name__)
+
+ParticipantKey = Tuple[str, int] # (entity_type, entity_id), as in participants_json entries
+_DOCUMENT_ATTRS = ("participants_json", "turn_order_json")
+
+
+class CombatState:
+    """
+    Indexed in-memory view of a CombatEncounter's JSON documents for one or more actions.
+
+    Participants are reached by (type, id) through a dict index, HP and the initiative order live in
+    arrays, and every change is recorded as dirty. flush() then writes only what changed: jsonb_set /
+    json_set on the touched participant fields and the turn pointer, instead of re-serializing
+    participants_json and turn_order_json as whole documents. Log entries go to combat_log_entries.
+
+    The participant dicts are the encounter's own, so mutations are visible on the ORM object at once.
+    The current_turn_entity_* columns are plain attributes and are written by the ORM as usual.
+    """
+
+    def __init__(self, encounter: CombatEncounter):
+        self.encounter = encounter
+        self._full_rewrite: Set[str] = set() # Documents that did not exist in the expected shape
+
+        if not isinstance(encounter.participants_json, dict) or not isinstance(encounter.participants_json.get("entities"), list):
+            legacy = encounter.participants_json
+            entities = legacy if isinstance(legacy, list) else (legacy or {}).get("entities") or [] # Bare lists are an older shape
+            encounter.participants_json = {"entities": list(entities)}
+            self._full_rewrite.add("participants_json")
+        if not isinstance(encounter.turn_order_json, dict) or not isinstance(encounter.turn_order_json.get("order"), list):
+            encounter.turn_order_json = {"order": [], "current_index": 0, "current_turn_number": 1, **(encounter.turn_order_json or {})}
+            encounter.turn_order_json.setdefault("order", [])
+            self._full_rewrite.add("turn_order_json")
+
+        self.participants: List[Dict[str, Any]] = encounter.participants_json["entities"]
+        self._documents = (encounter.participants_json, encounter.turn_order_json)
+        self._index: Dict[ParticipantKey, int] = {}
+        for i, p in enumerate(self.participants):
+            self._index.setdefault((p.get("type"), p.get("id")), i)
+        self.hp = array("l", (int(p.get("current_hp", 0) or 0) for p in self.participants))
+
+        order_entries = encounter.turn_order_json["order"]
+        # Initiative order as participant positions; -1 for order entries without a participant.
+        self.turn_order = array("l", (self._index.get((e.get("type"), e.get("id")), -1) for e in order_entries))
+
+        self._dirty_fields: Dict[int, Set[str]] = {}
+        self._new_log_entries: List[Dict[str, Any]] = []
+        self._turn_dirty = False
+
+    # --- Participants ---
+
+    def index_of(self, entity_type: str, entity_id: int) -> Optional[int]:
+        return self._index.get((entity_type, entity_id))
+
+    def get(self, entity_type: str, entity_id: int) -> Optional[Dict[str, Any]]:
+        idx = self._index.get((entity_type, entity_id))
+        return None if idx is None else self.participants[idx]
+
+    def __contains__(self, key: ParticipantKey) -> bool:
+        return key in self._index
+
+    def current_hp(self, entity_type: str, entity_id: int) -> int:
+        idx = self._index.get((entity_type, entity_id))
+        return 0 if idx is None else self.hp[idx]
+
+    def is_alive(self, entity_type: str, entity_id: int) -> bool:
+        return self.current_hp(entity_type, entity_id) > 0
+
+    def set_hp(self, entity_type: str, entity_id: int, value: int) -> int:
+        idx = self._index[(entity_type, entity_id)]
+        value = max(0, int(value))
+        self.hp[idx] = value
+        self.set_field(idx, "current_hp", value)
+        return value
+
+    def apply_damage(self, entity_type: str, entity_id: int, amount: int) -> int:
+        """Subtracts `amount` HP (never below 0) and returns the new HP."""
+        return self.set_hp(entity_type, entity_id, self.current_hp(entity_type, entity_id) - amount)
+
+    def set_field(self, idx: int, field: str, value: Any) -> None:
+        """Sets a top-level field of participant `idx` and marks it for the next flush."""
+        self.participants[idx][field] = value
+        if field == "current_hp":
+            self.hp[idx] = int(value or 0)
+        self._dirty_fields.setdefault(idx, set()).add(field)
+
+    def alive_counts_by_team(self) -> Dict[str, int]:
+        """{team: participants with HP > 0}; teams whose members are all down map to 0."""
+        counts: Dict[str, int] = {}
+        for p, hp in zip(self.participants, self.hp):
+            team = p.get("team")
+            counts[team] = counts.get(team, 0) + (1 if hp > 0 else 0)
+        return counts
+
+    # --- Turn order ---
+
+    @property
+    def current_index(self) -> int:
+        return self.encounter.turn_order_json.get("current_index", 0)
+
+    @property
+    def turn_number(self) -> int:
+        return self.encounter.turn_order_json.get("current_turn_number", 0)
+
+    def advance_turn(self) -> Optional[ParticipantKey]:
+        """
+        Moves the turn pointer to the next participant with HP > 0 in initiative order, bumping the
+        round number on every wrap. Returns the new (type, id), or None if nobody is left alive.
+        """
+        turn_order_data = self.encounter.turn_order_json
+        order_entries = turn_order_data["order"]
+        if not order_entries:
+            return None
+
+        current_idx = turn_order_data.get("current_index", 0)
+        for _ in range(len(order_entries)):
+            current_idx = (current_idx + 1) % len(order_entries)
+            if current_idx == 0: # Completed a full round
+                turn_order_data["current_turn_number"] = turn_order_data.get("current_turn_number", 0) + 1
+                self._turn_dirty = True
+                logger.info(f"Combat {self.encounter.id}: Starting new round, turn number {turn_order_data['current_turn_number']}.")
+
+            participant_idx = self.turn_order[current_idx]
+            if participant_idx >= 0 and self.hp[participant_idx] > 0:
+                entry = order_entries[current_idx]
+                turn_order_data["current_index"] = current_idx
+                self.encounter.current_turn_entity_id = entry["id"]
+                self.encounter.current_turn_entity_type = entry["type"]
+                self._turn_dirty = True
+                return entry["type"], entry["id"]
+        return None
+
+    # --- Combat log ---
+
+    def append_log(self, entry: Dict[str, Any]) -> None:
+        """Queues an entry for the combat log; flush() appends it to combat_log_entries."""
+        self._new_log_entries.append(entry)
+
+    # --- Persistence ---
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._dirty_fields or self._new_log_entries or self._turn_dirty or self._full_rewrite)
+
+    async def flush(self, session: AsyncSession) -> None:
+        """Writes the recorded changes with one UPDATE of the encounter row, then clears them."""
+        if not self.is_dirty:
+            return
+
+        # A document reassigned on the ORM object since the state was built is written whole, so the
+        # ORM's own flush and a JSON-path diff never apply the same change (e.g. a log append) twice.
+        encounter_state = inspect(self.encounter)
+        for attr in _DOCUMENT_ATTRS:
+            if encounter_state.attrs[attr].history.has_changes():
+                self._full_rewrite.add(attr)
+
+        dialect_name = session.get_bind().dialect.name if self.encounter.id is not None else None
+        if dialect_name == "postgresql":
+            values = self._postgresql_diff()
+        elif dialect_name == "sqlite":
+            values = self._sqlite_diff()
+        else:
+            values = None
+
+        if values is None:
+            # No JSON path functions available (or a transient encounter): let the ORM write the documents.
+            for attr in _DOCUMENT_ATTRS:
+                flag_modified(self.encounter, attr)
+            session.add(self.encounter)
+            if self._new_log_entries and self.encounter.id is None:
+                await session.flush() # The log rows need the encounter id
+        elif values:
+            stmt = (
+                update(CombatEncounter)
+                .where(CombatEncounter.id == self.encounter.id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(stmt)
+
+        if self._new_log_entries:
+            await append_combat_log_entries(session, self.encounter, self._new_log_entries)
+
+        logger.debug(f"Combat {self.encounter.id}: flushed {len(self._dirty_fields)} participants, "
+                     f"{len(self._new_log_entries)} log entries, turn changed: {self._turn_dirty}.")
+        self._dirty_fields.clear()
+        self._new_log_entries.clear()
+        self._turn_dirty = False
+        self._full_rewrite.clear()
+
+    def _postgresql_diff(self) -> Dict[str, Any]:
+        def path(*parts: Any):
+            return cast(literal([str(p) for p in parts], ARRAY(Text)), ARRAY(Text))
+
+        values: Dict[str, Any] = {}
+        col = CombatEncounter.__table__.c
+
+        if "participants_json" in self._full_rewrite:
+            values["participants_json"] = self.encounter.participants_json
+        elif self._dirty_fields:
+            expr = col.participants_json
+            for idx, fields in sorted(self._dirty_fields.items()):
+                for field in sorted(fields):
+                    expr = func.jsonb_set(expr, path("entities", idx, field), literal(self.participants[idx][field], JSONB))
+            values["participants_json"] = expr
+
+        if "turn_order_json" in self._full_rewrite:
+            values["turn_order_json"] = self.encounter.turn_order_json
+        elif self._turn_dirty:
+            expr = col.turn_order_json
+            for key in ("current_index", "current_turn_number"):
+                expr = func.jsonb_set(expr, path(key), literal(self.encounter.turn_order_json.get(key, 0), JSONB))
+            values["turn_order_json"] = expr
+        return values
+
+    def _sqlite_diff(self) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        col = CombatEncounter.__table__.c
+
+        if "participants_json" in self._full_rewrite:
+            values["participants_json"] = self.encounter.participants_json
+        elif self._dirty_fields:
+            args: List[Any] = []
+            for idx, fields in sorted(self._dirty_fields.items()):
+                for field in sorted(fields):
+                    args += [f"$.entities[{idx}].{field}", _sqlite_json_value(self.participants[idx][field])]
+            values["participants_json"] = func.json_set(col.participants_json, *args)
+
+        if "turn_order_json" in self._full_rewrite:
+            values["turn_order_json"] = self.encounter.turn_order_json
+        elif self._turn_dirty:
+            values["turn_order_json"] = func.json_set(
+                col.turn_order_json,
+                "$.current_index", literal(self.encounter.turn_order_json.get("current_index", 0), Integer),
+                "$.current_turn_number", literal(self.encounter.turn_order_json.get("current_turn_number", 0), Integer),
+            )
+        return values
+
+
+def _sqlite_json_value(value: Any) -> Any:
+    """Scalars bind as-is; dicts and lists go through json() so they are stored as JSON, not as a string."""
+    if isinstance(value, (dict, list)):
+        return func.json(json.dumps(value))
+    return value
+
+
+_states: "weakref.WeakKeyDictionary[CombatEncounter, CombatState]" = weakref.WeakKeyDictionary()
+
+
+def get_combat_state(encounter: CombatEncounter) -> CombatState:
+    """
+    Returns the CombatState of an encounter, reusing the one built for the same documents earlier in
+    the turn. A reload of the encounter (e.g. session.refresh) replaces the documents and yields a fresh state.
+    """
+    state = _states.get(encounter)
+    documents = (encounter.participants_json, encounter.turn_order_json)
+    if state is None or any(a is not b for a, b in zip(state._documents, documents)):
+        state = CombatState(encounter)
+        _states[encounter] = state
+    return state
+
+
+logger.info("Combat state module loaded.")
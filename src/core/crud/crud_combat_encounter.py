@@ -1,9 +1,11 @@
+from sqlalchemy import and_, delete, insert, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import Optional
+from typing import Dict, Iterable, Optional, Set, Tuple
 
 from src.core.crud_base_definitions import CRUDBase
 from src.models.combat_encounter import CombatEncounter
+from src.models.combat_participant import CombatParticipant
 from src.models.enums import CombatStatus # Added import for CombatStatus
 
 
@@ -30,47 +32,68 @@ class CRUDCombatEncounter(CRUDBase[CombatEncounter]):
         result = await db.execute(query)
         return result.scalars().first()
 
-    async def get_active_combat_for_entity(
-        self, db: AsyncSession, *, guild_id: int, entity_id: int, entity_type: str
-    ) -> Optional[CombatEncounter]:
+    async def add_participants(
+        self, db: AsyncSession, *, combat_encounter: CombatEncounter, entities: Iterable[Tuple[str, int]]
+    ) -> None:
+        """Registers (entity_type, entity_id) pairs as participants of the encounter in combat_participants."""
+        rows = {
+            (entity_type, entity_id): {"combat_encounter_id": combat_encounter.id, "guild_id": combat_encounter.guild_id,
+                                       "entity_type": entity_type, "entity_id": entity_id}
+            for entity_type, entity_id in entities
+        }
+        if rows:
+            await db.execute(insert(CombatParticipant), list(rows.values()))
+
+    async def remove_participants(self, db: AsyncSession, *, combat_encounter_id: int) -> None:
+        """Drops the participant index rows of an encounter (called when the combat ends)."""
+        await db.execute(
+            delete(CombatParticipant)
+            .where(CombatParticipant.combat_encounter_id == combat_encounter_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def get_active_combats_for_entities(
+        self, db: AsyncSession, *, guild_id: int, entities: Iterable[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], CombatEncounter]:
         """
-        Retrieves the active combat encounter for a specific entity in a guild.
-        An entity is considered in active combat if it's listed in participants_json
-        of a CombatEncounter with status ACTIVE.
+        Resolves many entities at once: returns {(entity_type, entity_id): active CombatEncounter}
+        for the given entities that take part in an ACTIVE combat. Entities not in combat are absent from the result.
+        One indexed query over combat_participants joined to the encounters.
         """
-        # This query is a bit complex due to JSONB operations.
-        # It checks if the participants_json array contains an object with the given id and type.
-        # Note: JSONB path operators like @> are specific to PostgreSQL.
-        # For broader compatibility or if not using PostgreSQL, this might need adjustment
-        # (e.g., fetching encounters and filtering in Python, which is less efficient).
+        ids_by_type: Dict[str, Set[int]] = {}
+        for entity_type, entity_id in entities:
+            ids_by_type.setdefault(entity_type, set()).add(entity_id)
+        if not ids_by_type:
+            return {}
 
-        # Constructing the JSON path element to search for
-        # Example: '[{"id": 123, "type": "player"}]' - checks if this entity is in the list
-        # A more precise check would be participants_json['entities'] @> jsonb_build_array(jsonb_build_object('id', entity_id, 'type', entity_type))
-        # However, SQLAlchemy's JSONB support might require specific syntax.
-        # Let's try a simpler contains approach first, assuming 'id' and 'type' are top-level in participant entries.
-
-        # This is a simplified approach for demonstration.
-        # A robust way needs to iterate through participants_json in Python or use more complex JSON queries.
-        # For now, we fetch all active combats for the guild and filter in Python.
-        # This is NOT efficient for many active combats.
-        stmt = select(self.model).where(
-            self.model.guild_id == guild_id,
-            self.model.status == CombatStatus.ACTIVE
+        stmt = (
+            select(CombatParticipant.entity_type, CombatParticipant.entity_id, self.model)
+            .join(self.model, self.model.id == CombatParticipant.combat_encounter_id)
+            .where(
+                CombatParticipant.guild_id == guild_id,
+                or_(*(
+                    and_(CombatParticipant.entity_type == entity_type, CombatParticipant.entity_id.in_(ids))
+                    for entity_type, ids in ids_by_type.items()
+                )),
+                self.model.status == CombatStatus.ACTIVE,
+            )
+            .order_by(self.model.id)
         )
         result = await db.execute(stmt)
-        active_combats = result.scalars().all()
+        combats: Dict[Tuple[str, int], CombatEncounter] = {}
+        for entity_type, entity_id, combat in result.all():
+            combats.setdefault((entity_type, entity_id), combat) # Oldest active combat wins if there are several
+        return combats
 
-        for combat in active_combats:
-            if combat.participants_json and "entities" in combat.participants_json:
-                for participant in combat.participants_json["entities"]:
-                    if isinstance(participant, dict) and \
-                       participant.get("id") == entity_id and \
-                       participant.get("type") == entity_type:
-                        # Check participant's current_hp > 0 as well? Or combat status is enough?
-                        # For now, if they are in an active combat, return it.
-                        # Defeated participants might still be in the list until combat ends.
-                        return combat
-        return None
+    async def get_active_combat_for_entity(
+        self, db: AsyncSession, *, guild_id: int, entity_id: int, entity_type: str
+    ) -> Optional[CombatEncounter]:
+        """
+        Retrieves the active combat encounter for a specific entity in a guild.
+        An entity is considered in active combat if it is registered in combat_participants
+        for a CombatEncounter with status ACTIVE.
+        """
+        combats = await self.get_active_combats_for_entities(db, guild_id=guild_id, entities=[(entity_type, entity_id)])
+        return combats.get((entity_type, entity_id))
 
 combat_encounter_crud = CRUDCombatEncounter(CombatEncounter)
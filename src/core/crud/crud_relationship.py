@@ -1,6 +1,6 @@
-from typing import Optional, Sequence
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
 
-from sqlalchemy import select, or_
+from sqlalchemy import and_, select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
@@ -85,4 +85,36 @@ class CRUDRelationship(CRUDBase[Relationship]):
         return result.scalars().all()
 
 
+    async def get_relationships_among_entities(
+        self,
+        db: AsyncSession,
+        *,
+        guild_id: int,
+        entities: Iterable[Tuple[RelationshipEntityType, int]],
+    ) -> Sequence[Relationship]:
+        """
+        Retrieves every relationship whose both sides are among the given (type, id) entities,
+        i.e. the pairwise relationship matrix of a group (such as the participants of a combat), in one query.
+        """
+        ids_by_type: Dict[RelationshipEntityType, Set[int]] = {}
+        for entity_type, entity_id in entities:
+            ids_by_type.setdefault(entity_type, set()).add(entity_id)
+        if not ids_by_type:
+            return []
+
+        def side(type_column, id_column):
+            return or_(*(
+                and_(type_column == entity_type, id_column.in_(ids))
+                for entity_type, ids in ids_by_type.items()
+            ))
+
+        stmt = select(self.model).where(
+            self.model.guild_id == guild_id,
+            side(self.model.entity1_type, self.model.entity1_id),
+            side(self.model.entity2_type, self.model.entity2_id),
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+
 crud_relationship = CRUDRelationship(Relationship)
@@ -7,6 +7,7 @@ from urllib.parse import urlparse # For logging connection details
 from ..config.settings import DATABASE_URL, DB_SSL_MODE, DB_SSL_CERT_PATH, DB_SSL_KEY_PATH, DB_SSL_ROOT_CERT_PATH
 # Импортируем Base из models, чтобы init_db мог создать таблицы
 from ..models.base import Base
+from .story_log_writer import StoryLogSession
 
 logger = logging.getLogger(__name__)
 
@@ -47,9 +48,11 @@ engine = create_async_engine(DATABASE_URL, echo=False, connect_args=connect_args
 
 # Создаем фабрику асинхронных сессий
 # expire_on_commit=False рекомендуется для асинхронных сессий, чтобы объекты были доступны после коммита.
+# StoryLogSession буферизует записи log_event и пишет их одним INSERT при flush/commit (см. story_log_writer).
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=StoryLogSession,
     expire_on_commit=False
 )
 
@@ -1,11 +1,161 @@
 import random
 import re
-from typing import List, Tuple
+import secrets
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple, cast
 
-def roll_dice(dice_string: str) -> Tuple[int, List[int]]:
+# Dice notation is parsed once per distinct string (LRU below) into a DiceExpression: a sum of signed
+# dice terms and a flat modifier. Supported per term: NdX, keep-highest / keep-lowest (4d6kh3, 2d20kl1),
+# advantage / disadvantage (d20adv == 2d20kh1, d20dis == 2d20kl1) and exploding dice (3d6!: every
+# maximum face adds another die). Terms combine with + and -, e.g. "1d8+2d6!-1".
+# Every roll function takes an optional `rng` (a random.Random). Without it rolls come from the DiceRoller
+# activated for the current task with use_dice_roller (see rng_service: every combat action and guild turn
+# action gets its own seeded roller), and only outside such a scope from the global `random` module.
+
+MAX_DICE = 1000 # Safety limit per notation (advantage counts both rolls)
+MAX_SIDES = 1000 # Safety limit per die
+MAX_EXPLOSIONS = 100 # Extra dice a single exploding term may add per roll
+MAX_BATCH_DICE = 1_000_000 # Safety limit for one roll_many call (dice per roll * n)
+
+_TERM_RE = re.compile(r"([+-]?)(?:(\d*)d(\d+)(!)?(?:(kh|kl)(\d+)|(adv|dis))?|(\d+))")
+
+
+class DiceTerm(NamedTuple):
+    """One NdX term of a dice expression."""
+    sign: int # 1 or -1
+    num_dice: int # Dice actually rolled (advantage already doubled)
+    num_sides: int
+    keep: Optional[int] = None # Number of dice kept, None keeps all
+    keep_highest: bool = True
+    explode: bool = False
+
+    @property
+    def is_simple(self) -> bool:
+        return self.keep is None and not self.explode
+
+
+class DiceExpression(NamedTuple):
+    """A parsed dice notation: the signed sum of `terms` plus `modifier`."""
+    notation: str # Normalized (lowercase, no whitespace)
+    terms: Tuple[DiceTerm, ...]
+    modifier: int
+
+    @property
+    def is_simple(self) -> bool:
+        """True for plain NdX[+/-M] notations (what parse_dice_string accepts)."""
+        return len(self.terms) == 1 and self.terms[0].sign == 1 and self.terms[0].is_simple
+
+
+@lru_cache(maxsize=1024)
+def parse_dice_expression(dice_string: str) -> DiceExpression:
+    """
+    Parses and validates a dice notation without rolling it. Results are cached per input string,
+    so hot paths that roll the same rule notation repeatedly only pay for the regex once.
+
+    Raises:
+        ValueError: If the notation is invalid or exceeds the safety limits.
+    """
+    notation = dice_string.lower().replace(" ", "")
+
+    terms: List[DiceTerm] = []
+    modifier = 0
+    position = 0
+    while position < len(notation):
+        match = _TERM_RE.match(notation, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Invalid dice string format: {dice_string}")
+        sign_str, num_dice_str, num_sides_str, explode, keep_kind, keep_str, advantage, constant_str = match.groups()
+        if bool(sign_str) == (position == 0): # First term is unsigned, every later term needs a sign
+            raise ValueError(f"Invalid dice string format: {dice_string}")
+        position = match.end()
+        sign = -1 if sign_str == "-" else 1
+
+        if constant_str is not None:
+            modifier += sign * int(constant_str)
+            continue
+
+        num_dice = int(num_dice_str) if num_dice_str else 1
+        num_sides = int(num_sides_str)
+        if num_dice <= 0 or num_sides <= 0:
+            raise ValueError("Number of dice and sides must be positive.")
+        if num_sides > MAX_SIDES:
+            raise ValueError(f"Too many sides on a die (max {MAX_SIDES}).")
+
+        keep: Optional[int] = None
+        keep_highest = True
+        if advantage:
+            keep, keep_highest = num_dice, advantage == "adv"
+            num_dice *= 2
+        elif keep_kind:
+            keep, keep_highest = int(keep_str), keep_kind == "kh"
+            if not 0 < keep <= num_dice:
+                raise ValueError(f"Cannot keep {keep} of {num_dice} dice: {dice_string}")
+        if explode and num_sides == 1:
+            raise ValueError(f"A one-sided die cannot explode: {dice_string}")
+        terms.append(DiceTerm(sign, num_dice, num_sides, keep, keep_highest, bool(explode)))
+
+    if not terms:
+        raise ValueError(f"Invalid dice string format: {dice_string}")
+    if sum(term.num_dice for term in terms) > MAX_DICE:
+        raise ValueError(f"Too many dice to roll (max {MAX_DICE}).")
+    return DiceExpression(notation, tuple(terms), modifier)
+
+
+def parse_dice_string(dice_string: str) -> Tuple[int, int, int]:
+    """
+    Parses and validates a dice string without rolling it.
+
+    Args:
+        dice_string: The string representing the dice roll, format NdX[+/-M].
+
+    Returns:
+        A tuple (num_dice, num_sides, modifier).
+
+    Raises:
+        ValueError: If the dice_string is invalid, or uses richer notation (several dice terms,
+                    keep-highest/lowest, advantage, exploding dice) that has no (N, X, M) form.
     """
-    Parses a dice string (e.g., "2d6", "1d20+5", "3d8-2") and returns the total sum
-    and a list of individual dice results.
+    expression = parse_dice_expression(dice_string)
+    if not expression.is_simple:
+        raise ValueError(f"Not a plain NdX[+/-M] dice string: {dice_string}")
+    term = expression.terms[0]
+    return term.num_dice, term.num_sides, expression.modifier
+
+
+def _source(rng: Optional[random.Random]) -> random.Random:
+    if rng is not None:
+        return rng
+    active_roller = _active_dice_roller.get()
+    return active_roller.rng if active_roller is not None else cast(random.Random, random)
+
+
+def _draw(rng: random.Random, num_sides: int, count: int) -> List[int]:
+    """`count` faces of a die with `num_sides` sides in one call (no per-die randint)."""
+    return rng.choices(range(1, num_sides + 1), k=count)
+
+
+def _roll_term(term: DiceTerm, rng: random.Random) -> List[int]:
+    """Rolls one term and returns the faces that count towards the total."""
+    rolls = _draw(rng, term.num_sides, term.num_dice)
+    if term.explode:
+        pending = rolls.count(term.num_sides)
+        added = 0
+        while pending and added < MAX_EXPLOSIONS:
+            extra = _draw(rng, term.num_sides, min(pending, MAX_EXPLOSIONS - added))
+            added += len(extra)
+            rolls.extend(extra)
+            pending = extra.count(term.num_sides)
+    if term.keep is not None:
+        rolls = sorted(rolls, reverse=term.keep_highest)[:term.keep]
+    return rolls
+
+
+def roll_dice(dice_string: str, rng: Optional[random.Random] = None) -> Tuple[int, List[int]]:
+    """
+    Parses a dice string (e.g., "2d6", "1d20+5", "3d8-2", "d20adv", "4d6kh3", "2d6!+1d4") and returns
+    the total sum and a list of individual dice results.
 
     Args:
         dice_string: The string representing the dice roll.
@@ -13,61 +163,102 @@ def roll_dice(dice_string: str) -> Tuple[int, List[int]]:
                      N = number of dice (optional, defaults to 1)
                      X = number of sides per die
                      M = modifier (optional, defaults to 0)
+                     See parse_dice_expression for keep/advantage/exploding and multiple terms.
+        rng: Random generator to draw from (e.g. DiceRoller.rng); defaults to the global `random`.
 
     Returns:
         A tuple containing:
             - The total sum of the roll (including modifiers).
-            - A list of individual dice results (before modifiers).
+            - A list of individual dice results (before modifiers). Only kept dice are listed.
 
     Raises:
         ValueError: If the dice_string is invalid.
     """
-    dice_string = dice_string.lower().replace(" ", "")
+    expression = parse_dice_expression(dice_string)
+    source = _source(rng)
 
-    # Regex to capture NdX+M or NdX-M or NdX
-    # It captures:
-    # 1. Number of dice (optional, defaults to 1 if not present before 'd')
-    # 2. Number of sides
-    # 3. Modifier sign (+ or -) (optional)
-    # 4. Modifier value (optional)
-    match = re.fullmatch(r"(\d*)d(\d+)([+-])?(\d*)?", dice_string)
+    rolls: List[int] = []
+    total_sum = expression.modifier
+    for term in expression.terms:
+        term_rolls = _roll_term(term, source)
+        rolls.extend(term_rolls)
+        total_sum += term.sign * sum(term_rolls)
 
-    if not match:
-        raise ValueError(f"Invalid dice string format: {dice_string}")
+    return total_sum, rolls
+
+
+def roll_many(dice_string: str, n: int, rng: Optional[random.Random] = None) -> List[int]:
+    """
+    Rolls `dice_string` `n` times and returns the `n` totals, e.g. initiative for every participant of
+    an encounter or area damage for every target. Plain terms are drawn for the whole batch at once.
 
-    num_dice_str, num_sides_str, mod_sign, mod_val_str = match.groups()
+    Raises:
+        ValueError: If the dice_string is invalid, `n` is negative or the batch is too large.
+    """
+    expression = parse_dice_expression(dice_string)
+    if n < 0:
+        raise ValueError(f"Cannot roll a negative number of times: {n}")
+    if sum(term.num_dice for term in expression.terms) * n > MAX_BATCH_DICE:
+        raise ValueError(f"Too many dice to roll in one batch (max {MAX_BATCH_DICE}).")
+    source = _source(rng)
 
-    num_dice = int(num_dice_str) if num_dice_str else 1
-    num_sides = int(num_sides_str)
+    totals = [expression.modifier] * n
+    for term in expression.terms:
+        term_sums: Sequence[int]
+        if not term.is_simple:
+            term_sums = [sum(_roll_term(term, source)) for _ in range(n)]
+        elif term.num_dice == 1:
+            term_sums = _draw(source, term.num_sides, n)
+        else:
+            draws = iter(_draw(source, term.num_sides, term.num_dice * n))
+            term_sums = list(map(sum, zip(*[draws] * term.num_dice)))
+        totals = [total + term.sign * term_sum for total, term_sum in zip(totals, term_sums)]
+    return totals
 
-    if num_dice <= 0 or num_sides <= 0:
-        raise ValueError("Number of dice and sides must be positive.")
-    if num_dice > 1000: # Safety limit
-        raise ValueError("Too many dice to roll (max 1000).")
-    if num_sides > 1000: # Safety limit
-        raise ValueError("Too many sides on a die (max 1000).")
 
+class DiceRoller:
+    """
+    A seedable dice stream. Two rollers created with the same seed produce the same sequence of rolls,
+    so a guild turn or combat that rolls through its own roller can be replayed exactly.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed if seed is not None else secrets.randbits(63)
+        self.rng = random.Random(self.seed)
 
-    modifier = 0
-    if mod_sign and mod_val_str:
-        modifier = int(mod_val_str)
-        if mod_sign == "-":
-            modifier = -modifier
-    elif mod_sign and not mod_val_str: # e.g. "1d6+"
-        raise ValueError(f"Invalid modifier format: {dice_string}")
+    def __repr__(self) -> str:
+        return f"<DiceRoller(seed={self.seed})>"
 
+    def roll(self, dice_string: str) -> Tuple[int, List[int]]:
+        return roll_dice(dice_string, rng=self.rng)
 
-    rolls: List[int] = []
-    current_sum = 0
+    def roll_many(self, dice_string: str, n: int) -> List[int]:
+        return roll_many(dice_string, n, rng=self.rng)
 
-    for _ in range(num_dice):
-        roll = random.randint(1, num_sides)
-        rolls.append(roll)
-        current_sum += roll
 
-    total_sum = current_sum + modifier
+_active_dice_roller: ContextVar[Optional[DiceRoller]] = ContextVar("active_dice_roller", default=None)
 
-    return total_sum, rolls
+
+def get_active_dice_roller() -> Optional[DiceRoller]:
+    return _active_dice_roller.get()
+
+
+@contextmanager
+def use_dice_roller(roller: Optional[DiceRoller]) -> Iterator[Optional[DiceRoller]]:
+    """
+    Makes `roller` the source of every roll without an explicit `rng` inside the block. The roller is
+    held in a ContextVar, so concurrently running asyncio tasks each keep their own.
+    """
+    token = _active_dice_roller.set(roller)
+    try:
+        yield roller
+    finally:
+        _active_dice_roller.reset(token)
+
+
+def dice_cache_info():
+    """Statistics of the parsed-notation cache (for benchmarks and diagnostics)."""
+    return parse_dice_expression.cache_info()
 
 if __name__ == '__main__':
     # Simple test cases
@@ -7,6 +7,7 @@ from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core import game_events, rules
+from src.core.stat_sheet import invalidate_stat_sheet
 from src.models import Player, GuildConfig
 from src.models.enums import RelationshipEntityType, EventType
 from src.core.crud.crud_player import player_crud
@@ -77,6 +78,7 @@ async def award_xp(
 
             level_up_achieved = await _check_for_level_up(session, guild_id, player_obj)
             if level_up_achieved:
+                invalidate_stat_sheet(guild_id, RelationshipEntityType.PLAYER.value, player_obj.id)
                 logger.info(f"Игрок {player_obj.name} (ID: {player_obj.id}) повысил уровень до {player_obj.level} в гильдии {guild_id}.")
 
             players_to_update.append(player_obj)
@@ -211,6 +213,7 @@ async def spend_attribute_points(
     new_attribute_value = current_attribute_value + points_to_spend
     player.attributes_json[attribute_name] = new_attribute_value
     player.unspent_xp -= total_cost
+    invalidate_stat_sheet(guild_id, RelationshipEntityType.PLAYER.value, player.id)
 
     await game_events.log_event(
         session=session,
@@ -0,0 +1,282 @@
+import ast
+import logging
+import math
+import operator
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Formulas come from RuleConfig (e.g. "combat:attributes:modifier_formula" -> "(value - 10) // 2").
+# They are parsed once into a tree of Python closures, so evaluation never goes through eval()
+# and only the operators/functions whitelisted below are reachable.
+
+_BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPERATORS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Not: operator.not_,
+}
+
+_COMPARE_OPERATORS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+ALLOWED_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "int": int,
+    "float": float,
+    "round": round,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "sqrt": math.sqrt,
+}
+
+# Safety limits for formulas coming from guild configuration
+MAX_FORMULA_LENGTH = 500
+MAX_POWER_EXPONENT = 100
+FORMULA_CACHE_MAX_SIZE = 1024
+
+Evaluator = Callable[[Mapping[str, Any]], Any]
+
+
+class FormulaError(ValueError):
+    """Raised when a formula cannot be compiled or evaluated."""
+    pass
+
+
+def _safe_pow(base: Any, exponent: Any) -> Any:
+    if isinstance(exponent, (int, float)) and abs(exponent) > MAX_POWER_EXPONENT:
+        raise FormulaError(f"Exponent {exponent} exceeds the allowed maximum of {MAX_POWER_EXPONENT}.")
+    return operator.pow(base, exponent)
+
+
+class _FormulaCompiler:
+    """Translates a whitelisted Python expression AST into nested closures."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.variables: set = set()
+
+    def compile(self, node: ast.AST) -> Evaluator:
+        method = getattr(self, f"_compile_{type(node).__name__}", None)
+        if method is None:
+            raise FormulaError(f"Unsupported syntax '{type(node).__name__}' in formula '{self.source}'.")
+        return method(node)
+
+    def _compile_Expression(self, node: ast.Expression) -> Evaluator:
+        return self.compile(node.body)
+
+    def _compile_Constant(self, node: ast.Constant) -> Evaluator:
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise FormulaError(f"Only numeric constants are allowed in formula '{self.source}', got {value!r}.")
+        return lambda scope: value
+
+    def _compile_Name(self, node: ast.Name) -> Evaluator:
+        name = node.id
+        if name in ALLOWED_FUNCTIONS:
+            raise FormulaError(f"Function '{name}' must be called in formula '{self.source}'.")
+        self.variables.add(name)
+
+        def _lookup(scope: Mapping[str, Any]) -> Any:
+            try:
+                return scope[name]
+            except KeyError:
+                raise FormulaError(f"Variable '{name}' is not defined for formula '{self.source}'.") from None
+        return _lookup
+
+    def _compile_BinOp(self, node: ast.BinOp) -> Evaluator:
+        op_type = type(node.op)
+        if op_type not in _BINARY_OPERATORS:
+            raise FormulaError(f"Operator '{op_type.__name__}' is not allowed in formula '{self.source}'.")
+        op = _safe_pow if op_type is ast.Pow else _BINARY_OPERATORS[op_type]
+        left, right = self.compile(node.left), self.compile(node.right)
+        return lambda scope: op(left(scope), right(scope))
+
+    def _compile_UnaryOp(self, node: ast.UnaryOp) -> Evaluator:
+        op_type = type(node.op)
+        if op_type not in _UNARY_OPERATORS:
+            raise FormulaError(f"Operator '{op_type.__name__}' is not allowed in formula '{self.source}'.")
+        op = _UNARY_OPERATORS[op_type]
+        operand = self.compile(node.operand)
+        return lambda scope: op(operand(scope))
+
+    def _compile_Compare(self, node: ast.Compare) -> Evaluator:
+        ops = []
+        for op_node in node.ops:
+            op_type = type(op_node)
+            if op_type not in _COMPARE_OPERATORS:
+                raise FormulaError(f"Comparison '{op_type.__name__}' is not allowed in formula '{self.source}'.")
+            ops.append(_COMPARE_OPERATORS[op_type])
+        left = self.compile(node.left)
+        comparators = [self.compile(c) for c in node.comparators]
+
+        def _compare(scope: Mapping[str, Any]) -> bool:
+            current = left(scope)
+            for op, comparator in zip(ops, comparators):
+                right_value = comparator(scope)
+                if not op(current, right_value):
+                    return False
+                current = right_value
+            return True
+        return _compare
+
+    def _compile_BoolOp(self, node: ast.BoolOp) -> Evaluator:
+        values = [self.compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def _and(scope: Mapping[str, Any]) -> Any:
+                result: Any = True
+                for value in values:
+                    result = value(scope)
+                    if not result:
+                        return result
+                return result
+            return _and
+
+        def _or(scope: Mapping[str, Any]) -> Any:
+            result: Any = False
+            for value in values:
+                result = value(scope)
+                if result:
+                    return result
+            return result
+        return _or
+
+    def _compile_IfExp(self, node: ast.IfExp) -> Evaluator:
+        test, body, orelse = self.compile(node.test), self.compile(node.body), self.compile(node.orelse)
+        return lambda scope: body(scope) if test(scope) else orelse(scope)
+
+    def _compile_Call(self, node: ast.Call) -> Evaluator:
+        if not isinstance(node.func, ast.Name) or node.func.id not in ALLOWED_FUNCTIONS:
+            func_repr = node.func.id if isinstance(node.func, ast.Name) else type(node.func).__name__
+            raise FormulaError(f"Function '{func_repr}' is not allowed in formula '{self.source}'.")
+        if node.keywords:
+            raise FormulaError(f"Keyword arguments are not allowed in formula '{self.source}'.")
+        func = ALLOWED_FUNCTIONS[node.func.id]
+        args = [self.compile(a) for a in node.args]
+        return lambda scope: func(*[arg(scope) for arg in args])
+
+
+class CompiledFormula:
+    """
+    A RuleConfig formula parsed once into a safe evaluator.
+    Use `evaluate(value=...)` for a single result or `evaluate_many(values)` to score a whole list.
+    """
+
+    __slots__ = ("source", "variables", "_evaluator")
+
+    def __init__(self, source: str, evaluator: Evaluator, variables: Iterable[str]):
+        self.source = source
+        self.variables = frozenset(variables)
+        self._evaluator = evaluator
+
+    def evaluate(self, scope: Optional[Mapping[str, Any]] = None, **variables: Any) -> Any:
+        if scope is None:
+            scope = variables
+        elif variables:
+            scope = {**scope, **variables}
+        try:
+            return self._evaluator(scope)
+        except FormulaError:
+            raise
+        except Exception as e:
+            raise FormulaError(f"Error evaluating formula '{self.source}': {e}") from e
+
+    def evaluate_many(
+        self,
+        values: Iterable[Any],
+        variable: str = "value",
+        extra_scope: Optional[Mapping[str, Any]] = None
+    ) -> List[Any]:
+        """
+        Evaluates the formula for every item of `values`, binding each item to `variable`.
+        The scope dict is reused between items, so scoring a whole participant list
+        costs one closure walk per value and nothing else.
+        """
+        scope: Dict[str, Any] = dict(extra_scope) if extra_scope else {}
+        evaluator = self._evaluator
+        results: List[Any] = []
+        try:
+            for value in values:
+                scope[variable] = value
+                results.append(evaluator(scope))
+        except FormulaError:
+            raise
+        except Exception as e:
+            raise FormulaError(f"Error evaluating formula '{self.source}': {e}") from e
+        return results
+
+    def __repr__(self) -> str:
+        return f"<CompiledFormula('{self.source}')>"
+
+
+def compile_formula(formula: str) -> CompiledFormula:
+    """
+    Parses `formula` and returns a CompiledFormula.
+    Raises FormulaError if the formula is not a string, is too long, has a syntax error
+    or uses anything outside the whitelisted operators and functions.
+    """
+    if not isinstance(formula, str):
+        raise FormulaError(f"Formula must be a string, got {type(formula).__name__}.")
+    if len(formula) > MAX_FORMULA_LENGTH:
+        raise FormulaError(f"Formula exceeds maximum length of {MAX_FORMULA_LENGTH} characters.")
+    try:
+        tree = ast.parse(formula.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula syntax '{formula}': {e.msg}") from e
+
+    compiler = _FormulaCompiler(formula)
+    evaluator = compiler.compile(tree)
+    return CompiledFormula(formula, evaluator, compiler.variables)
+
+
+# Cache of compiled formulas, structured as {(guild_id, rule_key, formula_text): CompiledFormula}
+_formula_cache: "OrderedDict[Tuple[int, str, str], CompiledFormula]" = OrderedDict()
+
+
+def get_compiled_formula(guild_id: int, rule_key: str, formula: str) -> CompiledFormula:
+    """
+    Returns the compiled form of `formula` for the given guild and rule key, compiling it on first use.
+    The formula text is part of the cache key, so an updated RuleConfig value is picked up automatically.
+    """
+    cache_key = (guild_id, rule_key, formula)
+    compiled = _formula_cache.get(cache_key)
+    if compiled is not None:
+        _formula_cache.move_to_end(cache_key)
+        return compiled
+
+    compiled = compile_formula(formula)
+    _formula_cache[cache_key] = compiled
+    if len(_formula_cache) > FORMULA_CACHE_MAX_SIZE:
+        _formula_cache.popitem(last=False)
+    logger.debug(f"Compiled formula '{formula}' for guild {guild_id}, rule '{rule_key}'.")
+    return compiled
+
+
+def clear_formula_cache(guild_id: Optional[int] = None) -> None:
+    """Drops cached formulas for one guild, or for all guilds if guild_id is None."""
+    if guild_id is None:
+        _formula_cache.clear()
+        return
+    for cache_key in [k for k in _formula_cache if k[0] == guild_id]:
+        del _formula_cache[cache_key]
+
+
+logger.info("Formula engine module initialized.")
@@ -1,5 +1,5 @@
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +18,25 @@ async def on_enter_location(
         f"entered location {location_id}."
     )
 
+from sqlalchemy import func, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..config.settings import TURN_REPORT_MAX_LOG_ENTRIES
+
+from ..models.enums import EventType
+from ..models.story_log import StoryLog
+from .story_log_writer import get_story_log_buffer, make_story_log_row, resolve_event_type
+
 # logger = logging.getLogger(__name__) # Logger already initialized at the top of the file
 
 # The second definition of on_enter_location was here and has been removed.
 
+def _with_entity_id(entity_ids: dict, key: str, entity_id: int) -> None:
+    # Unique ids in first-seen order; a new list, as the caller's dict is only shallow-copied.
+    entity_ids[key] = list(dict.fromkeys([*(entity_ids.get(key) or []), entity_id]))
+
+
 async def log_event(
     session: AsyncSession,
     guild_id: int,
@@ -37,46 +50,84 @@ async def log_event(
     """
     Logs a game event to the StoryLog.
     The event_type should match a key in the EventType enum.
+    In sessions of the app's sessionmaker the entry is buffered and written with the session's other events
+    in one multi-row INSERT at the next flush or commit (see story_log_writer); a rollback discards it.
     The caller is responsible for session management (commit/rollback).
     """
-    # Log basic info for now, even if it was a placeholder before.
-    # The detailed logging now happens via the StoryLog entry itself.
-    logger.info(
-        f"Attempting to log event. Guild: {guild_id}, EventType: {event_type}, Player: {player_id}, Party: {party_id}, Location: {location_id}"
+    logger.debug(
+        f"Logging event. Guild: {guild_id}, EventType: {event_type}, Player: {player_id}, Party: {party_id}, Location: {location_id}"
     )
 
-    from src.models.story_log import StoryLog
-    from src.models.enums import EventType
-
-    # Validate event_type against EventType enum
-    try:
-        # If event_type is string, try to convert to Enum member.
-        event_type_enum_member = EventType[event_type.upper()]
-    except KeyError:
+    event_type_enum_member = resolve_event_type(event_type)
+    if event_type_enum_member is None:
         logger.error(f"Invalid event_type string: {event_type}. Cannot log event for guild {guild_id}.")
         return
 
     # Prepare entity_ids_json
     final_entity_ids: dict = entity_ids_json.copy() if entity_ids_json is not None else {}
-
     if player_id is not None:
-        final_entity_ids.setdefault("players", []).append(player_id)
-        # Ensure uniqueness if player_id might be duplicated by caller
-        final_entity_ids["players"] = list(set(final_entity_ids["players"]))
-
+        _with_entity_id(final_entity_ids, "players", player_id)
     if party_id is not None:
-        final_entity_ids.setdefault("parties", []).append(party_id)
-        # Ensure uniqueness
-        final_entity_ids["parties"] = list(set(final_entity_ids["parties"]))
-
-    log_entry = StoryLog(
-        guild_id=guild_id,
-        event_type=event_type_enum_member,
-        details_json=details_json,
-        location_id=location_id,
-        entity_ids_json=final_entity_ids if final_entity_ids else None, # Store None if empty after processing
-        # timestamp is server_default
+        _with_entity_id(final_entity_ids, "parties", party_id)
+
+    row = make_story_log_row(
+        guild_id, event_type_enum_member, details_json, location_id,
+        final_entity_ids if final_entity_ids else None, # Store None if empty after processing
     )
-    session.add(log_entry)
-    logger.debug(f"StoryLog entry added to session for guild {guild_id}, event: {event_type}")
+    buffer = get_story_log_buffer(session)
+    if buffer is not None:
+        buffer.append(row)
+    else:
+        session.add(StoryLog(**row))
     # The caller is responsible for committing the session.
+
+
+def _involves_player(session: AsyncSession, player_id: int):
+    """SQL condition: the player is listed in entity_ids_json["players"]; None if the dialect has no JSON support here."""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        return type_coerce(StoryLog.entity_ids_json, JSONB)["players"].contains([player_id])
+    if dialect_name == "sqlite":
+        players = func.json_each(StoryLog.entity_ids_json, "$.players").table_valued("value")
+        return select(players.c.value).where(players.c.value == player_id).exists()
+    return None
+
+
+async def get_last_turn_log_entries(
+    session: AsyncSession, guild_id: int, player_id: int, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Events of the guild's last processed turn that involve the player (listed in entity_ids_json["players"]),
+    oldest first, as report_formatter log entries: details_json plus guild_id, event_type and location_id.
+    The turn spans the events after the previous GUILD_TURN_PROCESSED up to the last one. The player filter
+    runs in SQL, and only the last `limit` events (TURN_REPORT_MAX_LOG_ENTRIES by default) are read, which
+    also bounds the first turn of a guild, whose events reach back to the start of its log.
+    Returns an empty list if no turn was processed yet.
+    """
+    limit = TURN_REPORT_MAX_LOG_ENTRIES if limit is None else limit
+    turn_event_ids = (await session.execute(
+        select(StoryLog.id)
+        .where(StoryLog.guild_id == guild_id, StoryLog.event_type == EventType.GUILD_TURN_PROCESSED)
+        .order_by(StoryLog.id.desc())
+        .limit(2)
+    )).scalars().all()
+    if not turn_event_ids:
+        return []
+
+    stmt = select(StoryLog).where(StoryLog.guild_id == guild_id, StoryLog.id < turn_event_ids[0])
+    if len(turn_event_ids) > 1:
+        stmt = stmt.where(StoryLog.id > turn_event_ids[1])
+    involves_player = _involves_player(session, player_id)
+    if involves_player is not None:
+        stmt = stmt.where(involves_player)
+    story_logs = (await session.execute(stmt.order_by(StoryLog.id.desc()).limit(limit))).scalars().all()
+
+    log_entries: List[Dict[str, Any]] = []
+    for story_log in reversed(story_logs):
+        if involves_player is None and player_id not in ((story_log.entity_ids_json or {}).get("players") or []):
+            continue
+        entry = {**(story_log.details_json or {}), "guild_id": guild_id, "event_type": story_log.event_type.value}
+        entry.setdefault("location_id", story_log.location_id)
+        entry.setdefault("player_id", player_id)
+        log_entries.append(entry)
+    return log_entries
@@ -0,0 +1,300 @@
+import copy
+import json
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple, Union
+
+from ..models.generated_npc import GeneratedNpc
+from ..models.player import Player
+from ..models.enums import CombatParticipantType as EntityType
+from .combat_context import CombatContext
+from .rule_snapshot import GuildRuleSnapshot
+
+logger = logging.getLogger(__name__)
+
+NPC_STRATEGY_RULE_KEY = "ai_behavior:npc_default_strategy"
+NPC_STRATEGY_CACHE_MAX_SIZE = 1024
+
+DEFAULT_NPC_STRATEGY: Dict[str, Any] = {
+    "target_selection": {
+        "priority_order": ["lowest_hp_percentage", "highest_threat_score"],
+        "hostility_rules": {"default": "attack_players_and_hostile_npcs"},
+        "threat_factors": {"damage_dealt_to_self_factor": 1.5, "is_healer_factor": 1.2, "low_hp_target_bonus": 0.2}
+    },
+    "action_selection": {
+        "offensive_bias": 0.75,
+        "abilities_priority": [],
+        "resource_thresholds": {
+            "self_hp_below_for_heal_ability": 0.4,
+            "target_hp_above_for_execute_ability": 0.8
+        },
+        "prefer_effective_actions": True
+    },
+    "simulation": {
+        "enabled": False,
+        "required_hit_chance_threshold": 0.5,
+        "min_expected_damage_ratio_vs_target_hp": 0.05
+    },
+    "personality_modifiers": {
+        "aggressive": {"offensive_bias_add": 0.2, "threat_factors_multiplier": {"damage_dealt_to_self_factor": 1.2}},
+        "cautious": {"offensive_bias_subtract": 0.2, "resource_thresholds_modifier": {"self_hp_below_for_heal_ability": 0.1}}
+    }
+}
+
+
+# --- Target metrics ---
+# A metric scores one target; whether lower or higher wins is fixed per metric ("lowest_" prefix = lower is better).
+
+TargetScorer = Callable[[CombatContext, GeneratedNpc, Union[Player, GeneratedNpc], Dict[str, Any], Mapping], float]
+
+
+def _combat_hp(combat_data: Dict[str, Any], default: int = 0) -> int:
+    """
+    Current HP of a participants_json entry. Encounters store it as "current_hp"; "hp" is the older key.
+    Shared with npc_combat_strategy, which imports it from here.
+    """
+    return combat_data.get("current_hp", combat_data.get("hp", default))
+
+
+def _max_hp(target_entity: Union[Player, GeneratedNpc], target_combat_data: Dict[str, Any], current_hp: int) -> int:
+    if isinstance(target_entity, GeneratedNpc):
+        max_hp = (target_entity.properties_json or {}).get("stats", {}).get("hp", current_hp if current_hp > 0 else 1)
+    else:
+        max_hp = target_combat_data.get("max_hp", current_hp if current_hp > 0 else 1)
+    return max_hp if max_hp > 0 else 1
+
+
+def _hp_percentage(combat_context, actor_npc, target_entity, target_combat_data, strategy) -> float:
+    current_hp = _combat_hp(target_combat_data)
+    return (current_hp / _max_hp(target_entity, target_combat_data, current_hp)) * 100
+
+
+def _absolute_hp(combat_context, actor_npc, target_entity, target_combat_data, strategy) -> float:
+    return _combat_hp(target_combat_data)
+
+
+def _threat_score(combat_context, actor_npc, target_entity, target_combat_data, strategy) -> float:
+    threat = 0.0
+    threat_factors = strategy.get("target_selection", {}).get("threat_factors", {})
+    threat += target_combat_data.get("threat_generated_towards_actor", 0.0) * threat_factors.get("damage_dealt_to_self_factor", 1.0)
+
+    if isinstance(target_entity, GeneratedNpc):
+        target_roles = (target_entity.properties_json or {}).get("roles", [])
+        if "healer" in target_roles and threat_factors.get("is_healer_factor"):
+            threat += 100 * threat_factors.get("is_healer_factor")
+
+    if threat_factors.get("low_hp_target_bonus"):
+        current_hp = _combat_hp(target_combat_data)
+        if current_hp / _max_hp(target_entity, target_combat_data, current_hp) < 0.3:
+            threat += 50 * threat_factors.get("low_hp_target_bonus")
+
+    # Relationship influence on threat (negative relationship increases perceived threat)
+    relationship_val = combat_context.relationship_value(
+        EntityType.NPC.value, actor_npc.id, target_combat_data["type"], target_combat_data["id"]
+    )
+    if relationship_val is not None and threat_factors.get("relationship_threat_modifier"):
+        if relationship_val < -50: # Arbitrary threshold for "very hostile"
+            threat += 75 * threat_factors.get("relationship_threat_modifier", 0.1)
+    return threat
+
+
+def _neutral_score(combat_context, actor_npc, target_entity, target_combat_data, strategy) -> float:
+    return 0.0
+
+
+TARGET_METRIC_SCORERS: Dict[str, TargetScorer] = {
+    "lowest_hp_percentage": _hp_percentage,
+    "highest_hp_percentage": _hp_percentage,
+    "lowest_absolute_hp": _absolute_hp,
+    "highest_absolute_hp": _absolute_hp,
+    "highest_threat_score": _threat_score,
+}
+# TODO: Implement other metrics like "closest_target", "random", "specific_role_focus"
+
+
+class TargetMetric(NamedTuple):
+    """One priority_order entry resolved to its scorer and sort direction."""
+    name: str
+    scorer: TargetScorer
+    descending: bool # True if a higher score is better
+
+
+def compile_target_metrics(priority_order: Any) -> Tuple[TargetMetric, ...]:
+    """Resolves metric names to TargetMetric; unknown names score every target 0."""
+    if not isinstance(priority_order, (list, tuple)):
+        return ()
+    return tuple(
+        TargetMetric(name, TARGET_METRIC_SCORERS.get(name, _neutral_score), not name.startswith("lowest_"))
+        for name in priority_order if isinstance(name, str)
+    )
+
+
+# --- Compiled strategies ---
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class CompiledNpcStrategy(Mapping):
+    """
+    Read-only, fully merged AI strategy of one NPC archetype (guild rules + defaults + personality).
+    Reads like the rules dict it was built from; nested dicts are read-only mappings and lists are tuples.
+    priority_metrics holds target_selection.priority_order already resolved to scorers.
+    """
+    __slots__ = ("_rules", "personality", "priority_metrics")
+
+    def __init__(self, rules: Dict[str, Any], personality: Optional[str] = None):
+        self._rules = _freeze(rules)
+        self.personality = personality
+        self.priority_metrics = compile_target_metrics(
+            rules.get("target_selection", {}).get("priority_order", ["lowest_hp_percentage"])
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        return self._rules[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rules)
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __repr__(self) -> str:
+        return f"<CompiledNpcStrategy(personality={self.personality!r}, metrics={[m.name for m in self.priority_metrics]})>"
+
+
+def npc_personality(actor_npc: GeneratedNpc) -> Optional[str]:
+    actor_props = actor_npc.properties_json or {}
+    actor_ai_meta = actor_npc.ai_metadata_json or {}
+    personality = actor_props.get("personality", actor_ai_meta.get("personality"))
+    return personality if isinstance(personality, str) else None
+
+
+def compile_npc_strategy(guild_strategy: Optional[Dict[str, Any]], personality: Optional[str]) -> CompiledNpcStrategy:
+    """
+    Merges the guild's strategy rule over DEFAULT_NPC_STRATEGY (missing sections and keys are filled in)
+    and applies the personality modifiers. Neither input is modified.
+    """
+    if not guild_strategy:
+        npc_rules = copy.deepcopy(DEFAULT_NPC_STRATEGY)
+    else:
+        npc_rules = copy.deepcopy(guild_strategy)
+        for key, value in DEFAULT_NPC_STRATEGY.items():
+            if key not in npc_rules:
+                npc_rules[key] = copy.deepcopy(value)
+            elif isinstance(npc_rules[key], dict) and isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    if sub_key not in npc_rules[key]:
+                        npc_rules[key][sub_key] = copy.deepcopy(sub_value)
+            elif isinstance(npc_rules[key], list) and isinstance(value, list) and not npc_rules[key]: # only overwrite if current list is empty
+                npc_rules[key] = copy.deepcopy(value)
+
+    if personality and personality in npc_rules.get("personality_modifiers", {}):
+        mods = npc_rules["personality_modifiers"][personality]
+        current_bias = npc_rules.get("action_selection", {}).get("offensive_bias", DEFAULT_NPC_STRATEGY["action_selection"]["offensive_bias"])
+
+        if "offensive_bias_add" in mods:
+            current_bias = min(1.0, current_bias + mods["offensive_bias_add"])
+        if "offensive_bias_subtract" in mods:
+            current_bias = max(0.0, current_bias - mods["offensive_bias_subtract"])
+
+        if "action_selection" not in npc_rules: npc_rules["action_selection"] = {}
+        npc_rules["action_selection"]["offensive_bias"] = current_bias
+
+        if "resource_thresholds_modifier" in mods:
+            if "resource_thresholds" not in npc_rules["action_selection"]:
+                npc_rules["action_selection"]["resource_thresholds"] = {}
+            for item, val_mod in mods["resource_thresholds_modifier"].items():
+                base_val = DEFAULT_NPC_STRATEGY["action_selection"]["resource_thresholds"].get(item, 0)
+                npc_rules["action_selection"]["resource_thresholds"][item] = base_val + val_mod
+
+    return CompiledNpcStrategy(npc_rules, personality)
+
+
+StrategyCacheKey = Tuple[int, Optional[int], Optional[str], Optional[str]]
+
+
+class NpcStrategyCache:
+    """
+    Per-process LRU of CompiledNpcStrategy, structured as {(guild_id, rules_version, rules_fingerprint, personality): strategy}.
+    A rules update bumps the guild's rules version, so stale strategies are never hit and simply age out.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[StrategyCacheKey, CompiledNpcStrategy]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    def get_or_compile(self, key: StrategyCacheKey, compile_fn: Callable[[], CompiledNpcStrategy]) -> CompiledNpcStrategy:
+        strategy = self._entries.get(key)
+        if strategy is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return strategy
+
+        self.misses += 1
+        strategy = compile_fn()
+        self._entries[key] = strategy
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return strategy
+
+    def clear(self, guild_id: Optional[int] = None) -> None:
+        """Drops cached strategies for one guild, or everything (including the counters) if guild_id is None."""
+        if guild_id is None:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            return
+        for key in [k for k in self._entries if k[0] == guild_id]:
+            del self._entries[key]
+
+
+_strategy_cache = NpcStrategyCache(max_size=NPC_STRATEGY_CACHE_MAX_SIZE)
+
+
+def get_compiled_npc_strategy(guild_rules: GuildRuleSnapshot, actor_npc: GeneratedNpc) -> CompiledNpcStrategy:
+    """
+    Returns the compiled strategy for the NPC's personality under the guild's current rules, compiling it on
+    the first request for that (guild, rules version, personality).
+    """
+    guild_strategy = guild_rules.get(NPC_STRATEGY_RULE_KEY, {})
+    personality = npc_personality(actor_npc)
+    # Without a rules version (no GuildConfig row) the rule value itself has to identify the entry.
+    fingerprint = None if guild_rules.version is not None else json.dumps(guild_strategy, sort_keys=True, default=str)
+    key = (guild_rules.guild_id, guild_rules.version, fingerprint, personality)
+
+    def compile_fn() -> CompiledNpcStrategy:
+        logger.debug(f"Guild {guild_rules.guild_id}: compiling NPC strategy for personality {personality!r} (rules version {guild_rules.version}).")
+        return compile_npc_strategy(guild_strategy, personality)
+
+    return _strategy_cache.get_or_compile(key, compile_fn)
+
+
+def get_npc_strategy_cache_stats() -> Dict[str, Any]:
+    """Size, hits, misses and hit rate of the compiled strategy cache."""
+    return _strategy_cache.stats()
+
+
+def clear_npc_strategy_cache(guild_id: Optional[int] = None) -> None:
+    _strategy_cache.clear(guild_id)
+
+
+logger.info("NPC AI strategy module loaded.")
@@ -1,159 +1,48 @@
 # src/core/npc_combat_strategy.py
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 
 from src.models.generated_npc import GeneratedNpc
 from src.models.combat_encounter import CombatEncounter
 from src.models.player import Player
 from src.models.enums import CombatParticipantType as EntityType # Changed to CombatParticipantType
-from src.core.crud import crud_npc, crud_combat_encounter, crud_player, crud_relationship
-from src.core.rules import get_rule
+from src.core.crud import crud_combat_encounter
+from src.core.rule_snapshot import GuildRuleSnapshot, build_guild_rule_snapshot
+from src.core.outcome_estimator import estimate_action_outcome, estimate_action_outcomes, expected_dice_value
+from src.core.combat_context import CombatContext, load_combat_context
+from src.core.npc_ai_strategy import (
+    CompiledNpcStrategy, TargetMetric, TARGET_METRIC_SCORERS, _combat_hp, compile_target_metrics, get_compiled_npc_strategy
+)
 
 # Вспомогательные функции для загрузки данных
 
-async def _get_npc_data(session: AsyncSession, npc_id: int, guild_id: int) -> Optional[GeneratedNpc]:
-    """
-    Loads NPC data from the database.
-    """
-    return await crud_npc.npc_crud.get_by_id_and_guild(db=session, id=npc_id, guild_id=guild_id)
-
 async def _get_combat_encounter_data(session: AsyncSession, combat_instance_id: int, guild_id: int) -> Optional[CombatEncounter]:
     """
     Loads Combat Encounter data from the database.
     """
     return await crud_combat_encounter.combat_encounter_crud.get_by_id_and_guild(db=session, id=combat_instance_id, guild_id=guild_id)
 
-async def _get_participant_entity(session: AsyncSession, participant_info: Dict[str, Any], guild_id: int) -> Optional[Union[Player, GeneratedNpc]]:
-    """
-    Loads a specific combat participant entity (Player or GeneratedNpc) from the database.
-    participant_info is expected to be an entry from CombatEncounter.participants_json
-    e.g. {"id": 1, "type": "player", "hp": 100, ...}
-    """
-    entity_id = participant_info.get("id")
-    entity_type_str = participant_info.get("type")
-
-    if not entity_id or not entity_type_str:
-        return None
-
-    try:
-        entity_type = EntityType(entity_type_str)
-    except ValueError:
-        return None # Unknown entity type
-
-    if entity_type == EntityType.PLAYER:
-        return await crud_player.player_crud.get_by_id_and_guild(db=session, id=entity_id, guild_id=guild_id)
-    elif entity_type == EntityType.NPC:
-        return await crud_npc.npc_crud.get_by_id_and_guild(db=session, id=entity_id, guild_id=guild_id)
-
-    return None
-
-async def _get_relationship_value(
-    session: AsyncSession,
-    guild_id: int,
-    entity1_type: EntityType,
-    entity1_id: int,
-    entity2_type: EntityType,
-    entity2_id: int
-) -> Optional[int]:
-    """
-    Retrieves the relationship value between two entities.
-    Returns None if no relationship is found.
-    """
-    relationship = await crud_relationship.get_relationship_between_entities(
-        session=session,
-        guild_id=guild_id,
-        entity1_type=entity1_type,
-        entity1_id=entity1_id,
-        entity2_type=entity2_type,
-        entity2_id=entity2_id
-    )
-    return relationship.value if relationship else None
-
 async def _get_npc_ai_rules(
     session: AsyncSession,
     guild_id: int,
     actor_npc: GeneratedNpc,
-    combat_encounter: CombatEncounter
-) -> Dict[str, Any]:
+    combat_encounter: CombatEncounter,
+    guild_rules: Optional[GuildRuleSnapshot] = None
+) -> CompiledNpcStrategy:
     """
-    Loads and compiles AI behavior rules for the given NPC from RuleConfig.
-    This is a placeholder implementation. Detailed logic will depend on RuleConfig structure.
+    Returns the AI behavior rules for the given NPC: the guild's "ai_behavior:npc_default_strategy" merged
+    over the defaults with the NPC's personality applied. Compiled once per (guild, rules version,
+    personality) and shared read-only by every NPC of that kind (see npc_ai_strategy).
     """
-    base_rules_key = "ai_behavior:npc_default_strategy"
-    npc_rules = await get_rule(db=session, guild_id=guild_id, key=base_rules_key, default={})
-
-    default_strategy = {
-        "target_selection": {
-            "priority_order": ["lowest_hp_percentage", "highest_threat_score"],
-            "hostility_rules": {"default": "attack_players_and_hostile_npcs"},
-            "threat_factors": {"damage_dealt_to_self_factor": 1.5, "is_healer_factor": 1.2, "low_hp_target_bonus": 0.2}
-        },
-        "action_selection": {
-            "offensive_bias": 0.75,
-            "abilities_priority": [],
-            "resource_thresholds": {
-                "self_hp_below_for_heal_ability": 0.4,
-                "target_hp_above_for_execute_ability": 0.8
-            },
-            "prefer_effective_actions": True
-        },
-        "simulation": {
-            "enabled": False,
-            "required_hit_chance_threshold": 0.5,
-            "min_expected_damage_ratio_vs_target_hp": 0.05
-        },
-        "personality_modifiers": {
-            "aggressive": {"offensive_bias_add": 0.2, "threat_factors_multiplier": {"damage_dealt_to_self_factor": 1.2}},
-            "cautious": {"offensive_bias_subtract": 0.2, "resource_thresholds_modifier": {"self_hp_below_for_heal_ability": 0.1}}
-        }
-    }
-
-    if not npc_rules:
-        npc_rules = default_strategy
-    else:
-        for key, value in default_strategy.items():
-            if key not in npc_rules:
-                npc_rules[key] = value
-            elif isinstance(npc_rules[key], dict) and isinstance(value, dict):
-                for sub_key, sub_value in value.items():
-                    if sub_key not in npc_rules[key]:
-                        npc_rules[key][sub_key] = sub_value
-            elif isinstance(npc_rules[key], list) and isinstance(value, list) and not npc_rules[key]: # only overwrite if current list is empty
-                 npc_rules[key] = value
-
-    actor_props = actor_npc.properties_json or {}
-    actor_ai_meta = actor_npc.ai_metadata_json or {}
-
-    npc_personality = actor_props.get("personality", actor_ai_meta.get("personality"))
-    if npc_personality and npc_personality in npc_rules.get("personality_modifiers", {}):
-        mods = npc_rules["personality_modifiers"][npc_personality]
-        current_bias = npc_rules.get("action_selection", {}).get("offensive_bias", default_strategy["action_selection"]["offensive_bias"])
-
-        if "offensive_bias_add" in mods:
-            current_bias = min(1.0, current_bias + mods["offensive_bias_add"])
-        if "offensive_bias_subtract" in mods:
-            current_bias = max(0.0, current_bias - mods["offensive_bias_subtract"])
-
-        if "action_selection" not in npc_rules: npc_rules["action_selection"] = {}
-        npc_rules["action_selection"]["offensive_bias"] = current_bias
-
-        # Example for modifying nested structures like resource_thresholds
-        if "resource_thresholds_modifier" in mods:
-            if "resource_thresholds" not in npc_rules["action_selection"]:
-                npc_rules["action_selection"]["resource_thresholds"] = {}
-            for item, val_mod in mods["resource_thresholds_modifier"].items():
-                base_val = default_strategy["action_selection"]["resource_thresholds"].get(item,0)
-                npc_rules["action_selection"]["resource_thresholds"][item] = base_val + val_mod
-
-
-    return npc_rules
+    if guild_rules is None:
+        guild_rules = await build_guild_rule_snapshot(session, guild_id)
+    return get_compiled_npc_strategy(guild_rules, actor_npc)
 
 # --- Functions for Target Selection ---
 
-async def _is_hostile(
-    session: AsyncSession,
-    guild_id: int,
+def _is_hostile(
+    combat_context: CombatContext,
     actor_npc: GeneratedNpc,
     target_participant_info: Dict[str, Any], # A single participant entry from combat_encounter.participants_json
     target_entity: Union[Player, GeneratedNpc], # The actual Player or GeneratedNpc object for the target
@@ -177,10 +66,8 @@ async def _is_hostile(
         target_faction = target_props.get("faction_id")
 
     # 1. Check explicit relationship
-    relationship_val = await _get_relationship_value(
-        session, guild_id,
-        EntityType.NPC, actor_npc.id,
-        EntityType(target_participant_info["type"]), target_participant_info["id"]
+    relationship_val = combat_context.relationship_value(
+        EntityType.NPC.value, actor_npc.id, target_participant_info["type"], target_participant_info["id"]
     )
 
     if relationship_val is not None:
@@ -216,18 +103,17 @@ async def _is_hostile(
 
     return False # Default to non-hostile if no rule matches
 
-async def _get_potential_targets(
-    session: AsyncSession,
+def _get_potential_targets(
+    combat_context: CombatContext,
     actor_npc: GeneratedNpc,
-    combat_encounter: CombatEncounter, # Still needed for context, though participants_json not directly used
     ai_rules: Dict[str, Any],
-    guild_id: int,
     participants_list: List[Dict[str, Any]] # Added parameter
 ) -> List[Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]]]:
     """
     Identifies potential hostile targets for the actor_npc from the combat encounter.
     Returns a list of dictionaries, each containing the entity object and its combat_data.
-    Uses the provided participants_list instead of accessing combat_encounter.participants_json directly.
+    Uses the provided participants_list instead of accessing combat_encounter.participants_json directly;
+    target entities and relationships come from the preloaded combat_context.
     """
     potential_targets = []
     # participants_list is already checked to be a list in the caller
@@ -242,15 +128,15 @@ async def _get_potential_targets(
             continue
 
         # Skip defeated participants (current HP is in participant_info)
-        if participant_info.get("hp", 0) <= 0:
+        if _combat_hp(participant_info) <= 0:
             continue
 
-        target_entity = await _get_participant_entity(session, participant_info, guild_id)
+        target_entity = combat_context.entity(participant_info.get("type"), participant_info.get("id"))
         if not target_entity:
-            # Log error: could not load participant entity
+            # Log error: participant entity was not loaded (deleted or from another guild)
             continue
 
-        is_target_hostile = await _is_hostile(session, guild_id, actor_npc, participant_info, target_entity, ai_rules)
+        is_target_hostile = _is_hostile(combat_context, actor_npc, participant_info, target_entity, ai_rules)
         if is_target_hostile:
             potential_targets.append({
                 "entity": target_entity,
@@ -259,14 +145,12 @@ async def _get_potential_targets(
 
     return potential_targets
 
-async def _calculate_target_score(
-    session: AsyncSession,
-    guild_id: int,
+def _calculate_target_score(
+    combat_context: CombatContext, # Relationships; the encounter for things like combat log to calculate threat
     actor_npc: GeneratedNpc,
     target_info: Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]], # Contains 'entity' and 'combat_data'
     priority_metric: str,
-    ai_rules: Dict[str, Any],
-    combat_encounter: CombatEncounter # For things like combat log to calculate threat
+    ai_rules: Dict[str, Any]
 ) -> float:
     """
     Calculates a score for a target based on a given priority metric.
@@ -286,96 +170,23 @@ async def _calculate_target_score(
         return 0.0 # Return a neutral score or handle error
 
 
-    score = 0.0
-
-    if priority_metric == "lowest_hp_percentage":
-        current_hp = target_combat_data.get("hp", 0)
-        max_hp = 1 # Default to 1 to avoid division by zero if not found
-        if isinstance(target_entity_model, GeneratedNpc):
-            target_props = target_entity_model.properties_json or {}
-            base_stats = target_props.get("stats", {})
-            max_hp = base_stats.get("hp", current_hp if current_hp > 0 else 1)
-        elif isinstance(target_entity_model, Player):
-            max_hp = target_combat_data.get("max_hp", current_hp if current_hp > 0 else 1)
-
-        if max_hp <= 0: max_hp = 1
-        score = (current_hp / max_hp) * 100 if max_hp > 0 else 0
-        return score # Lower is better
-
-    elif priority_metric == "highest_hp_percentage":
-        current_hp = target_combat_data.get("hp", 0)
-        max_hp = 1
-        if isinstance(target_entity_model, GeneratedNpc):
-            target_props = target_entity_model.properties_json or {}
-            base_stats = target_props.get("stats", {})
-            max_hp = base_stats.get("hp", current_hp if current_hp > 0 else 1)
-        elif isinstance(target_entity_model, Player):
-            max_hp = target_combat_data.get("max_hp", current_hp if current_hp > 0 else 1)
-
-        if max_hp <= 0: max_hp = 1
-        score = (current_hp / max_hp) * 100 if max_hp > 0 else 0
-        return score # Higher is better
-
-    elif priority_metric == "lowest_absolute_hp":
-        score = target_combat_data.get("hp", 0)
-        return score # Lower is better
-
-    elif priority_metric == "highest_absolute_hp":
-        score = target_combat_data.get("hp", 0)
-        return score # Higher is better
-
-    elif priority_metric == "highest_threat_score":
-        threat = 0.0
-        threat_factors = ai_rules.get("target_selection", {}).get("threat_factors", {})
-        threat += target_combat_data.get("threat_generated_towards_actor", 0.0) * threat_factors.get("damage_dealt_to_self_factor", 1.0)
-
-        if isinstance(target_entity_model, GeneratedNpc):
-            target_props = target_entity_model.properties_json or {}
-            target_roles = target_props.get("roles", [])
-            if "healer" in target_roles and threat_factors.get("is_healer_factor"):
-                threat += 100 * threat_factors.get("is_healer_factor")
-
-        if threat_factors.get("low_hp_target_bonus"):
-            current_hp = target_combat_data.get("hp", 0)
-            max_hp = 1
-            if isinstance(target_entity_model, GeneratedNpc):
-                target_props = target_entity_model.properties_json or {}
-                target_stats = target_props.get("stats", {})
-                max_hp = target_stats.get("hp", current_hp if current_hp > 0 else 1)
-            elif isinstance(target_entity_model, Player):
-                max_hp = target_combat_data.get("max_hp", current_hp if current_hp > 0 else 1)
-
-            if max_hp <=0: max_hp = 1
-            hp_percent = (current_hp / max_hp) if max_hp > 0 else 0
-            if hp_percent < 0.3:
-                threat += 50 * threat_factors.get("low_hp_target_bonus")
-
-        # Relationship influence on threat (negative relationship increases perceived threat)
-        relationship_val = await _get_relationship_value(
-            session, guild_id,
-            EntityType.NPC, actor_npc.id,
-            EntityType(target_combat_data["type"]), target_combat_data["id"]
-        )
-        if relationship_val is not None and threat_factors.get("relationship_threat_modifier"):
-            # e.g. modifier = ( (max_relationship - relationship_val) / max_relationship_range ) * factor
-            # Simplified: if very hostile, add some threat
-            if relationship_val < -50 : # Arbitrary threshold for "very hostile"
-                 threat += 75 * threat_factors.get("relationship_threat_modifier", 0.1)
-
-        return threat # Higher is better
+    scorer = TARGET_METRIC_SCORERS.get(priority_metric)
+    if scorer is None:
+        return 0.0
+    return scorer(combat_context, actor_npc, target_entity_model, target_combat_data, ai_rules)
 
-    # TODO: Implement other metrics like "closest_target", "random", "specific_role_focus"
 
-    return score
+def _priority_metrics(ai_rules: Dict[str, Any]) -> Tuple[TargetMetric, ...]:
+    if isinstance(ai_rules, CompiledNpcStrategy):
+        return ai_rules.priority_metrics
+    return compile_target_metrics(ai_rules.get("target_selection", {}).get("priority_order", ["lowest_hp_percentage"]))
 
 
-async def _select_target(
-    session: AsyncSession,
-    guild_id: int,
+def _select_target(
+    combat_context: CombatContext,
     actor_npc: GeneratedNpc,
     potential_targets: List[Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]]],
-    ai_rules: Dict[str, Any],
-    combat_encounter: CombatEncounter
+    ai_rules: Dict[str, Any]
 ) -> Optional[Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]]]:
     """
     Selects a specific target from the list of potential_targets based on AI rules.
@@ -383,7 +194,7 @@ async def _select_target(
     if not potential_targets:
         return None
 
-    priority_order = ai_rules.get("target_selection", {}).get("priority_order", ["lowest_hp_percentage"])
+    priority_metrics = _priority_metrics(ai_rules)
 
     # Apply tie-breaking or filtering by relationship first if configured
     # relationship_filter_rules = ai_rules.get("target_selection", {}).get("relationship_filter", {})
@@ -392,7 +203,7 @@ async def _select_target(
     #     # Filter out targets actor_npc might not want to attack based on good relationship
     #     filtered_targets_by_rel = []
     #     for target_info in potential_targets:
-    #         rel_val = await _get_relationship_value(session, guild_id, EntityType.NPC, actor_npc.id, EntityType(target_info["combat_data"]["type"]), target_info["combat_data"]["id"])
+    #         rel_val = combat_context.relationship_value(EntityType.NPC.value, actor_npc.id, target_info["combat_data"]["type"], target_info["combat_data"]["id"])
     #         if rel_val is None or rel_val < min_val:
     #             filtered_targets_by_rel.append(target_info)
     #     if filtered_targets_by_rel: # Only use this filter if it doesn't remove all targets
@@ -402,23 +213,23 @@ async def _select_target(
 
     best_target = None
 
-    for metric in priority_order:
+    for metric in priority_metrics:
         if not potential_targets: break # Should not happen if initial list wasn't empty
 
         scored_targets = []
         for target_info in potential_targets:
-            score = await _calculate_target_score(session, guild_id, actor_npc, target_info, metric, ai_rules, combat_encounter)
+            target_entity, target_combat_data = target_info.get("entity"), target_info.get("combat_data")
+            if isinstance(target_entity, (Player, GeneratedNpc)) and isinstance(target_combat_data, dict):
+                score = metric.scorer(combat_context, actor_npc, target_entity, target_combat_data, ai_rules)
+            else:
+                score = 0.0
             scored_targets.append({"target_info": target_info, "score": score})
 
         if not scored_targets:
             continue # Should not happen if potential_targets had items
 
-        # Determine if lower score is better for this metric
-        # Convention: "lowest_" prefix means lower is better. Otherwise, higher is better.
-        if metric.startswith("lowest_"):
-            scored_targets.sort(key=lambda x: x["score"])
-        else: # "highest_" or other metrics
-            scored_targets.sort(key=lambda x: x["score"], reverse=True)
+        # Sort direction is resolved with the metric: "lowest_" metrics prefer lower scores, all others higher.
+        scored_targets.sort(key=lambda x: x["score"], reverse=metric.descending)
 
         # The best target according to this metric is the first one after sorting.
         # For now, we take the top one from the first metric that yields results.
@@ -498,78 +309,25 @@ async def _simulate_action_outcome(
     target_info: Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]],
     action_details: Dict[str, Any], # e.g. {"type": "attack" or "ability", "ability_props": {}}
     ai_rules: Dict[str, Any],
-    combat_engine_api: Any # Mock or actual CombatEngine process_combat_action or a dedicated simulation part
+    combat_engine_api: Any, # Unused; kept for callers that still pass it
+    guild_rules: Optional[GuildRuleSnapshot] = None
 ) -> Dict[str, Any]:
     """
-    Simulates the outcome of an action to estimate its effectiveness.
-    This is a complex function and might involve calling parts of the combat engine.
+    Estimates the outcome of an action to rate its effectiveness.
     Returns a dictionary with simulation results like { 'hit_chance': float, 'expected_damage': float, 'applied_statuses': [] }
 
-    For now, this will be a very simplified placeholder.
-    A real version would need to:
-    1. Determine check type, actor attribute, target attribute, DC based on action_details and rules.
-    2. Call resolve_check.
-    3. Estimate damage based on weapon/ability damage formula and resolve_check outcome.
-    4. Estimate status application probability.
+    Hit and critical chances and expected damage are exact values computed by outcome_estimator from the
+    guild's check and damage rules, the actor's stats and the target's defense; nothing is rolled.
     """
-    # This is a placeholder. A real implementation is significantly more complex.
-    # It might need access to a simplified version of `process_combat_action` or `resolve_check`.
-
     sim_config = ai_rules.get("simulation", {})
     if not sim_config.get("enabled", False):
         # If simulation is disabled in rules, return high confidence to not penalize actions.
         return {"hit_chance": 1.0, "expected_damage": 10.0, "critical_chance": 0.05, "applied_statuses": []}
 
-    # Extremely simplified simulation:
-    hit_chance = 0.7 # Base hit chance
-    expected_damage = 0
-    crit_chance = 0.05
-
-    actor_props = actor_npc.properties_json or {}
-    actor_stats = actor_props.get("stats", {})
-
-    if action_details["type"] == "attack":
-        # Simulate basic attack
-        # TODO: Get weapon damage from actor_props.get("equipment", {})
-        expected_damage = actor_stats.get("base_attack_damage", 5)
-    elif action_details["type"] == "ability":
-        ability_props = action_details.get("ability_props", {})
-        # TODO: Parse ability_props for effects (damage, healing, status)
-        # For a damage effect:
-        damage_effect = next((eff for eff in ability_props.get("effects", []) if eff.get("type") == "damage"), None)
-        if damage_effect:
-            # Simplified: "1d6+strength_modifier" -> extract base, ignore dice for now
-            dmg_formula = damage_effect.get("value", "5") # e.g. "1d6+5" or just "10"
-            if isinstance(dmg_formula, str) and 'd' in dmg_formula:
-                parts = dmg_formula.split('d') # "1d6" -> parts[1] = "6"
-                try:
-                    dice_face = int(parts[1].split('+')[0].split('-')[0])
-                    num_dice = int(parts[0])
-                    expected_damage = num_dice * (dice_face / 2 + 0.5) # Avg roll
-                    # Add modifiers if any
-                    if '+' in dmg_formula: expected_damage += int(dmg_formula.split('+')[-1])
-                    elif '-' in dmg_formula: expected_damage -= int(dmg_formula.split('-')[-1])
-                except:
-                    expected_damage = 5 # fallback
-            else:
-                try:
-                    expected_damage = int(dmg_formula)
-                except:
-                    expected_damage = 5 # fallback for non-parsable direct damage
-        else:
-            expected_damage = 2 # Default for non-damaging abilities or unparsed
-
-    # TODO: Consider target defenses (armor, resistances) from target_info["entity"].properties_json.stats
-    # target_defense = target_info["entity"].properties_json.get("stats", {}).get("defense", 0)
-    # expected_damage = max(1, expected_damage - target_defense)
-
-
-    return {
-        "hit_chance": hit_chance,
-        "expected_damage": expected_damage,
-        "critical_chance": crit_chance,
-        "applied_statuses": [] # TODO: Simulate status application
-    }
+    if guild_rules is None:
+        guild_rules = await build_guild_rule_snapshot(session, guild_id)
+    # TODO: Consider target resistances from target_info["entity"].properties_json.stats
+    return estimate_action_outcome(guild_rules, actor_npc, actor_combat_data, action_details, target_info).as_sim_results()
 
 
 async def _evaluate_action_effectiveness(
@@ -579,8 +337,8 @@ async def _evaluate_action_effectiveness(
     actor_combat_data: Dict[str, Any],
     target_info: Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]],
     action_details: Dict[str, Any], # e.g. {"type": "attack" or "ability", "ability_props": {}}
-    ai_rules: Dict[str, Any]
-    # combat_engine_api: Any # Potentially pass a combat engine simulation interface
+    ai_rules: Dict[str, Any],
+    sim_results: Optional[Dict[str, Any]] = None # Precomputed by _choose_action for all candidates at once
 ) -> float:
     """
     Evaluates the 'effectiveness' or 'attractiveness' of a given action against a target.
@@ -589,8 +347,8 @@ async def _evaluate_action_effectiveness(
     effectiveness_score = 0.0
 
     # 1. Simulate basic outcome (hit chance, damage)
-    # For a real system, combat_engine_api would be used here.
-    sim_results = await _simulate_action_outcome(session, guild_id, actor_npc, actor_combat_data, target_info, action_details, ai_rules, None)
+    if sim_results is None:
+        sim_results = await _simulate_action_outcome(session, guild_id, actor_npc, actor_combat_data, target_info, action_details, ai_rules, None)
 
     # 2. Basic damage contribution
     # Consider hit chance: effective_damage = expected_damage * hit_chance
@@ -613,6 +371,7 @@ async def _evaluate_action_effectiveness(
     # Example: if ability applies 'stun' and target is not immune, add significant value.
     if action_details["type"] == "ability":
         ability_props = action_details.get("ability_props", {})
+        heal_total, has_heal = 0.0, False
         for effect in ability_props.get("effects", []):
             if effect.get("type") == "apply_status":
                 status_static_id = effect.get("status_static_id")
@@ -622,23 +381,23 @@ async def _evaluate_action_effectiveness(
                 effectiveness_score += status_value
             elif effect.get("type") == "heal": # Self-heal or ally heal (if NPC can target allies)
                 # Healing value could be based on amount healed and current HP deficit
-                heal_amount = 0 # parse effect.value
                 try:
                     heal_formula = effect.get("value", "5")
-                    if isinstance(heal_formula, str) and 'd' in heal_formula: # Simplified dice parsing
-                         parts = heal_formula.split('d'); dice_face = int(parts[1].split('+')[0]); num_dice = int(parts[0])
-                         heal_amount = num_dice * (dice_face / 2 + 0.5)
-                         if '+' in heal_formula: heal_amount += int(heal_formula.split('+')[-1])
-                    else: heal_amount = int(heal_formula)
-                except: heal_amount = 5
-
-                # Value healing more if actor is low HP
-                actor_props = actor_npc.properties_json or {}
-                actor_stats = actor_props.get("stats", {})
-                actor_max_hp = actor_stats.get("hp",1)
-                actor_current_hp = actor_combat_data.get("hp", actor_max_hp)
-                hp_deficit_ratio = 1 - (actor_current_hp / actor_max_hp if actor_max_hp > 0 else 1)
-                effectiveness_score += heal_amount * (1 + hp_deficit_ratio * ai_rules.get("action_selection",{}).get("low_hp_heal_urgency_multiplier", 2.0))
+                    heal_total += expected_dice_value(heal_formula) if isinstance(heal_formula, str) and 'd' in heal_formula else int(heal_formula)
+                except (ValueError, TypeError):
+                    heal_total += 5
+                has_heal = True
+
+        if has_heal:
+            if "expected_heal" in sim_results: # Exact estimate covering all heal effects
+                heal_total = sim_results["expected_heal"]
+            # Value healing more if actor is low HP
+            actor_props = actor_npc.properties_json or {}
+            actor_stats = actor_props.get("stats", {})
+            actor_max_hp = actor_stats.get("hp",1)
+            actor_current_hp = _combat_hp(actor_combat_data, default=actor_max_hp)
+            hp_deficit_ratio = 1 - (actor_current_hp / actor_max_hp if actor_max_hp > 0 else 1)
+            effectiveness_score += heal_total * (1 + hp_deficit_ratio * ai_rules.get("action_selection",{}).get("low_hp_heal_urgency_multiplier", 2.0))
 
 
     # 5. Check against simulation thresholds from rules
@@ -647,7 +406,7 @@ async def _evaluate_action_effectiveness(
         if sim_results["hit_chance"] < sim_thresholds.get("required_hit_chance_threshold", 0.0):
             return -1.0 # Action is too unreliable
 
-        target_current_hp = target_info["combat_data"].get("hp", 1)
+        target_current_hp = _combat_hp(target_info["combat_data"], default=1)
         if target_current_hp <= 0: target_current_hp = 1
         damage_ratio_vs_target_hp = sim_results["expected_damage"] / target_current_hp
         if damage_ratio_vs_target_hp < sim_thresholds.get("min_expected_damage_ratio_vs_target_hp", 0.0):
@@ -665,7 +424,8 @@ async def _choose_action(
     actor_combat_data: Dict[str, Any], # Actor's current state in combat
     target_info: Dict[str, Union[Player, GeneratedNpc, Dict[str, Any]]], # Selected target's entity and combat_data
     ai_rules: Dict[str, Any],
-    combat_encounter: CombatEncounter # For context
+    combat_encounter: CombatEncounter, # For context
+    guild_rules: Optional[GuildRuleSnapshot] = None
 ) -> Dict[str, Any]: # Returns a dict describing the chosen action, e.g. {"type": "attack", "source_npc_id": ...}
     """
     Chooses the best action for the actor_npc to take against the target_info.
@@ -690,10 +450,19 @@ async def _choose_action(
         return {"type": "idle", "reason": "No actions available"} # Should at least have basic attack
 
     # 3. Evaluate effectiveness of each possible action
+    # With simulation on, all candidates are estimated in one pass (shared attacker and target lookups).
+    estimates: List[Optional[Dict[str, Any]]] = [None] * len(possible_actions)
+    if ai_rules.get("simulation", {}).get("enabled", False):
+        if guild_rules is None:
+            guild_rules = await build_guild_rule_snapshot(session, guild_id)
+        rules = guild_rules.with_overrides(combat_encounter.rules_config_snapshot_json if combat_encounter else None)
+        outcomes = estimate_action_outcomes(rules, actor_npc, actor_combat_data, possible_actions, [target_info])
+        estimates = [row[0].as_sim_results() for row in outcomes]
+
     action_evaluations = []
-    for action in possible_actions:
+    for action, estimate in zip(possible_actions, estimates):
         effectiveness = await _evaluate_action_effectiveness(
-            session, guild_id, actor_npc, actor_combat_data, target_info, action, ai_rules
+            session, guild_id, actor_npc, actor_combat_data, target_info, action, ai_rules, estimate
         )
         if effectiveness >= 0: # Only consider actions that pass basic simulation checks (not -1.0)
             action_evaluations.append({"action": action, "score": effectiveness})
@@ -726,7 +495,7 @@ async def _choose_action(
     actor_props = actor_npc.properties_json or {}
     actor_stats = actor_props.get("stats", {})
     actor_max_hp = actor_stats.get("hp",1)
-    actor_current_hp = actor_combat_data.get("hp", actor_max_hp)
+    actor_current_hp = _combat_hp(actor_combat_data, default=actor_max_hp)
     hp_percentage = (actor_current_hp / actor_max_hp) if actor_max_hp > 0 else 1.0
 
     heal_threshold = ai_rules.get("action_selection",{}).get("resource_thresholds",{}).get("self_hp_below_for_heal_ability")
@@ -801,58 +570,60 @@ async def get_npc_combat_action(
     session: AsyncSession,
     guild_id: int,
     npc_id: int,
-    combat_instance_id: int
+    combat_instance_id: int,
+    combat_context: Optional[CombatContext] = None
 ) -> Dict[str, Any]:
     """
     Determines the action an NPC will take in combat.
     Orchestrates loading data, selecting a target, choosing an action, and formatting the result.
+    Target selection works on a CombatContext (participant entities and their relationships preloaded);
+    pass the one of the current combat pass (see process_combat_turn), otherwise it is loaded here.
     """
-    # 1. Load core data
-    actor_npc = await _get_npc_data(session, npc_id, guild_id)
+    if combat_context is None or combat_context.encounter.id != combat_instance_id:
+        # 1. Load core data
+        combat_encounter = await _get_combat_encounter_data(session, combat_instance_id, guild_id)
+        if not combat_encounter:
+            # TODO: Log this error
+            return {"action_type": "error", "message": f"Combat encounter {combat_instance_id} not found for guild {guild_id}."}
+        combat_context = await load_combat_context(session, guild_id, combat_encounter)
+    combat_encounter = combat_context.encounter
+
+    actor_npc = combat_context.entity(EntityType.NPC.value, npc_id)
     if not actor_npc:
         # TODO: Log this error
         return {"action_type": "error", "message": f"NPC {npc_id} not found for guild {guild_id}."}
 
-    combat_encounter = await _get_combat_encounter_data(session, combat_instance_id, guild_id)
-    if not combat_encounter:
-        # TODO: Log this error
-        return {"action_type": "error", "message": f"Combat encounter {combat_instance_id} not found for guild {guild_id}."}
-
     # Find actor's current combat data (HP, resources, cooldowns, etc.)
-    participants_list = combat_encounter.participants_json
-    if not isinstance(participants_list, list):
-        # TODO: Log this error
-        return {"action_type": "error", "message": f"Combat encounter {combat_instance_id} has invalid participants_json format."}
-
-    actor_combat_data = next((p for p in participants_list if isinstance(p, dict) and p.get("id") == actor_npc.id and p.get("type") == EntityType.NPC.value), None)
+    participants_list = combat_context.state.participants
+    actor_combat_data = combat_context.state.get(EntityType.NPC.value, actor_npc.id)
     if not actor_combat_data:
         # TODO: Log this error - actor NPC not found in participant list of the combat encounter
         return {"action_type": "error", "message": f"Actor NPC {npc_id} not found in combat {combat_instance_id} participants."}
 
     # If actor is defeated
-    if actor_combat_data.get("hp", 0) <= 0:
+    if _combat_hp(actor_combat_data) <= 0:
         return {"action_type": "idle", "reason": "Actor is defeated."}
 
     # 2. Get AI rules
-    ai_rules = await _get_npc_ai_rules(session, guild_id, actor_npc, combat_encounter)
+    ai_rules = await _get_npc_ai_rules(session, guild_id, actor_npc, combat_encounter, guild_rules=combat_context.guild_rules)
 
     # 3. Get potential targets
     # Pass participants_list to _get_potential_targets to avoid re-accessing combat_encounter.participants_json
-    potential_targets = await _get_potential_targets(session, actor_npc, combat_encounter, ai_rules, guild_id, participants_list)
+    potential_targets = _get_potential_targets(combat_context, actor_npc, ai_rules, participants_list)
     if not potential_targets:
        return {"action_type": "idle", "reason": "No targets available."}
 
     # 4. Select a target
-    selected_target_info = await _select_target(session, guild_id, actor_npc, potential_targets, ai_rules, combat_encounter)
+    selected_target_info = _select_target(combat_context, actor_npc, potential_targets, ai_rules)
     if not selected_target_info:
        return {"action_type": "idle", "reason": "Could not select a target."}
 
     # If selected target is somehow defeated (should be filtered by _get_potential_targets, but as a safeguard)
-    if selected_target_info["combat_data"].get("hp", 0) <= 0:
+    if _combat_hp(selected_target_info["combat_data"]) <= 0:
         # Attempt to pick another target if any are left, or idle.
-        remaining_targets = [t for t in potential_targets if t["entity"].id != selected_target_info["entity"].id and t["combat_data"].get("hp",0)>0]
+        remaining_targets = [t for t in potential_targets if t["entity"].id != selected_target_info["entity"].id and _combat_hp(t["combat_data"]) > 0]
         if remaining_targets:
-            selected_target_info = await _select_target(session, guild_id, actor_npc, remaining_targets, ai_rules, combat_encounter)
+            selected_target_info = _select_target(combat_context, actor_npc, remaining_targets, ai_rules)
             if not selected_target_info: # Still no valid target
                  return {"action_type": "idle", "reason": "Selected target defeated, no other valid targets."}
         else: # No other targets left
@@ -861,7 +632,8 @@ async def get_npc_combat_action(
 
     # 5. Choose an action against the selected target
     chosen_action_details = await _choose_action(
-        session, guild_id, actor_npc, actor_combat_data, selected_target_info, ai_rules, combat_encounter
+        session, guild_id, actor_npc, actor_combat_data, selected_target_info, ai_rules, combat_encounter,
+        guild_rules=combat_context.guild_rules
     )
 
     if chosen_action_details.get("type") == "idle": # If _choose_action decided to be idle
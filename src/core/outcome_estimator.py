@@ -0,0 +1,334 @@
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from ..models.generated_npc import GeneratedNpc
+from ..models.player import Player
+from .dice_roller import parse_dice_string
+from .formula_engine import FormulaError
+from .rule_snapshot import GuildRuleSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Exact outcome estimates for NPC decision making.
+# Instead of rolling, every random quantity is handled as a discrete distribution: the sum of N dice is the
+# N-fold convolution of one die (memoized per (N, sides)), and hit / critical chances and expected damage
+# are read off those distributions with the same rules combat_engine and check_resolver apply when the
+# action is actually resolved. Everything here is synchronous and session-free, and every building block
+# is memoized on plain numbers, so the same ability against the same defense is computed once per process.
+
+Pmf = Tuple[int, Tuple[float, ...]] # (lowest value, probabilities of lowest, lowest + 1, ...)
+Participant = Union[Player, GeneratedNpc]
+
+
+class ActionOutcome(NamedTuple):
+    """Estimated outcome of one action against one target."""
+    hit_chance: float
+    critical_chance: float
+    expected_damage: float # Expected damage when the action lands (normal hits and crits weighted)
+    expected_heal: float = 0.0
+
+    def as_sim_results(self) -> Dict[str, Any]:
+        return {
+            "hit_chance": self.hit_chance,
+            "expected_damage": self.expected_damage,
+            "critical_chance": self.critical_chance,
+            "expected_heal": self.expected_heal,
+            "applied_statuses": [],
+        }
+
+
+# --- Distributions ---
+
+@lru_cache(maxsize=512)
+def dice_pmf(num_dice: int, num_sides: int) -> Pmf:
+    """Distribution of the sum of `num_dice` dice with `num_sides` sides (sliding-window convolution)."""
+    probs: List[float] = [1.0]
+    for _ in range(num_dice):
+        window = 0.0
+        rolled: List[float] = []
+        for k in range(len(probs) + num_sides - 1):
+            if k < len(probs):
+                window += probs[k]
+            if k >= num_sides:
+                window -= probs[k - num_sides]
+            rolled.append(window / num_sides)
+        probs = rolled
+    return num_dice, tuple(probs)
+
+
+def _shift(pmf: Pmf, offset: int) -> Pmf:
+    return pmf[0] + offset, pmf[1]
+
+
+def _convolve(a: Pmf, b: Pmf) -> Pmf:
+    probs = [0.0] * (len(a[1]) + len(b[1]) - 1)
+    for i, pa in enumerate(a[1]):
+        for j, pb in enumerate(b[1]):
+            probs[i + j] += pa * pb
+    return a[0] + b[0], tuple(probs)
+
+
+def _expected_clamped(pmf: Pmf, multiplier: float = 1.0) -> float:
+    """E[max(0, int(X * multiplier))], the way combat_engine turns a damage roll into dealt damage."""
+    low, probs = pmf
+    if multiplier == 1.0 and low >= 0:
+        return sum((low + i) * p for i, p in enumerate(probs)) # Nothing to clamp
+    return sum(max(0, int((low + i) * multiplier)) * p for i, p in enumerate(probs))
+
+
+def expected_dice_value(notation: str) -> float:
+    """Closed-form mean of an NdX[+/-M] notation: N * (X + 1) / 2 + M."""
+    num_dice, num_sides, modifier = parse_dice_string(notation)
+    return num_dice * (num_sides + 1) / 2 + modifier
+
+
+# --- Checks ---
+
+class CheckOdds(NamedTuple):
+    hit: float # success or critical_success
+    critical: float
+    critical_failure: float
+
+
+@lru_cache(maxsize=4096)
+def check_odds(
+    dice_notation: str, check_modifier: int, dc: int, critical_success_threshold: int, critical_failure_threshold: int
+) -> CheckOdds:
+    """
+    Probabilities of resolve_check outcomes against a fixed DC. Mirrors resolve_check: a single die is read
+    as its face (the notation's own modifier does not apply), several dice as their total; natural crit
+    thresholds only apply to d20 notations and override the DC comparison.
+    """
+    try:
+        num_dice, num_sides, notation_modifier = parse_dice_string(dice_notation)
+    except (ValueError, AttributeError):
+        return CheckOdds(0.0, 0.0, 0.0) # resolve_check raises CheckError: the action cannot land
+    low, probs = dice_pmf(num_dice, num_sides)
+    if num_dice > 1:
+        low += notation_modifier
+    is_d20_roll = "d20" in dice_notation.lower()
+
+    hit = critical = critical_failure = 0.0
+    for i, p in enumerate(probs):
+        roll_used = low + i
+        if is_d20_roll and roll_used >= critical_success_threshold:
+            hit += p
+            critical += p
+        elif is_d20_roll and roll_used <= critical_failure_threshold:
+            critical_failure += p
+        elif roll_used + check_modifier >= dc:
+            hit += p
+    return CheckOdds(hit, critical, critical_failure)
+
+
+# --- Damage ---
+
+def _dice_part(damage_formula: str) -> str:
+    # combat_engine takes the dice part of a crit formula as everything before the first '+'
+    return damage_formula.split('+')[0] if '+' in damage_formula else damage_formula
+
+
+@lru_cache(maxsize=4096)
+def attack_damage(damage_formula: str, damage_modifier: int, crit_effect: str, crit_multiplier: float) -> Tuple[float, float]:
+    """(expected damage of a normal hit, expected damage of a critical hit) for combat_engine's attack damage."""
+    try:
+        num_dice, num_sides, notation_modifier = parse_dice_string(damage_formula)
+    except (ValueError, AttributeError):
+        return 0.0, 0.0 # combat_engine fails the roll as well
+    base = _shift(dice_pmf(num_dice, num_sides), notation_modifier + damage_modifier)
+    normal = _expected_clamped(base)
+
+    try:
+        if crit_effect == "double_damage_dice":
+            extra = parse_dice_string(_dice_part(damage_formula))
+            crit = _expected_clamped(_convolve(base, _shift(dice_pmf(extra[0], extra[1]), extra[2])))
+        elif crit_effect == "maximize_and_add_dice":
+            extra = parse_dice_string(_dice_part(damage_formula))
+            maximized = extra[0] * extra[1]
+            crit = _expected_clamped(_shift(dice_pmf(extra[0], extra[1]), extra[2] + maximized + damage_modifier))
+        else: # multiply_total_damage
+            crit = _expected_clamped(base, float(crit_multiplier))
+    except (ValueError, AttributeError, TypeError):
+        crit = normal
+    return normal, crit
+
+
+_TERM_RE = re.compile(r"([+-])?\s*(\d*d\d+|\d+|[a-z_][a-z0-9_]*)")
+
+
+@lru_cache(maxsize=1024)
+def parse_effect_expression(expression: str) -> Optional[Tuple[Tuple[Tuple[int, int, int], ...], int, Tuple[Tuple[int, str], ...]]]:
+    """
+    Parses an ability effect value such as "10", "2d6+3" or "1d6+strength_modifier" into
+    (dice terms as (sign, num_dice, num_sides), flat total, stat terms as (sign, name)). None if it is not an expression.
+    """
+    text = expression.lower().replace(" ", "")
+    if not text:
+        return None
+    dice: List[Tuple[int, int, int]] = []
+    stats: List[Tuple[int, str]] = []
+    flat = 0
+    pos = 0
+    while pos < len(text):
+        match = _TERM_RE.match(text, pos)
+        if match is None or (pos > 0 and not match.group(1)):
+            return None
+        sign = -1 if match.group(1) == "-" else 1
+        term = match.group(2)
+        if term.isdigit():
+            flat += sign * int(term)
+        elif re.fullmatch(r"\d*d\d+", term):
+            try:
+                num_dice, num_sides, _ = parse_dice_string(term)
+            except ValueError:
+                return None
+            dice.append((sign, num_dice, num_sides))
+        else:
+            stats.append((sign, term))
+        pos = match.end()
+    return tuple(dice), flat, tuple(stats)
+
+
+@lru_cache(maxsize=4096)
+def expression_expectation(dice: Tuple[Tuple[int, int, int], ...], flat: int) -> float:
+    """E[max(0, sum of dice terms + flat)]."""
+    pmf: Pmf = (flat, (1.0,))
+    for sign, num_dice, num_sides in dice:
+        low, probs = dice_pmf(num_dice, num_sides)
+        term = (low, probs) if sign > 0 else (-(low + len(probs) - 1), tuple(reversed(probs)))
+        pmf = _convolve(pmf, term)
+    return _expected_clamped(pmf)
+
+
+# --- Participant stats ---
+
+def _raw_stat(participant_data: Optional[Dict[str, Any]], entity: Optional[Participant], name: str) -> Any:
+    """Same lookup order as combat_engine._get_participant_stat: encounter data, then the entity."""
+    if participant_data and isinstance(participant_data.get(name), int):
+        return participant_data[name]
+    if isinstance(entity, Player):
+        return getattr(entity, name, None)
+    if isinstance(entity, GeneratedNpc):
+        value: Any = (entity.properties_json or {}).get("stats", {})
+        for key in name.split('.'):
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        return value
+    return None
+
+
+def stat_modifier(rules: GuildRuleSnapshot, participant_data: Optional[Dict[str, Any]], entity: Optional[Participant], name: str) -> int:
+    """`<name>_modifier` as combat_engine derives it: a precomputed value, else the guild's modifier formula."""
+    precomputed = (participant_data or {}).get(f"{name}_modifier")
+    if isinstance(precomputed, int):
+        return precomputed
+    raw = _raw_stat(participant_data, entity, name)
+    if not isinstance(raw, int):
+        return rules.combat.default_modifier_if_stat_missing
+    try:
+        return int(rules.combat.modifier_formula.evaluate(value=raw))
+    except (FormulaError, TypeError, ValueError):
+        return (raw - 10) // 2
+
+
+def _expression_stat_value(rules: GuildRuleSnapshot, participant_data, entity, name: str) -> int:
+    if name.endswith("_modifier"):
+        return stat_modifier(rules, participant_data, entity, name[:-9])
+    raw = _raw_stat(participant_data, entity, name)
+    return raw if isinstance(raw, int) else 0
+
+
+def effect_expectation(
+    rules: GuildRuleSnapshot, value: Any, actor_data: Optional[Dict[str, Any]], actor_entity: Optional[Participant], default: float
+) -> float:
+    """Expected amount of an ability effect value ("10", "2d6+3", "1d6+strength_modifier"); `default` if unparsable."""
+    if isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float)):
+        return max(0.0, float(value))
+    if not isinstance(value, str):
+        return default
+    parsed = parse_effect_expression(value)
+    if parsed is None:
+        return default
+    dice, flat, stats = parsed
+    for sign, name in stats:
+        flat += sign * _expression_stat_value(rules, actor_data, actor_entity, name)
+    return expression_expectation(dice, flat)
+
+
+# --- Batch estimation ---
+
+def estimate_action_outcomes(
+    rules: GuildRuleSnapshot,
+    actor_entity: Participant,
+    actor_data: Optional[Dict[str, Any]],
+    actions: Sequence[Dict[str, Any]],
+    targets: Sequence[Dict[str, Any]],
+) -> List[List[ActionOutcome]]:
+    """
+    Estimates every (action, target) pair at once and returns outcomes[action_index][target_index].
+    `actions` are _choose_action candidates ({"type": "attack"} or {"type": "ability", "ability_props": {...}}),
+    `targets` are {"entity": ..., "combat_data": ...} entries. Attacker modifiers are resolved once, each
+    target's defense once and each action's damage profile once; pairs only combine those numbers.
+    """
+    combat = rules.combat
+    check = rules.check_rules(combat.attack_check_type)
+    # resolve_check reads its base attribute straight off the model, not through the modifier formula
+    check_attr = getattr(actor_entity, check.base_attribute, None) if check.base_attribute else None
+    check_modifier = check_attr if isinstance(check_attr, int) and not isinstance(check_attr, bool) else 0
+    damage_modifier = stat_modifier(rules, actor_data, actor_entity, combat.damage_attribute)
+    crit_multiplier = combat.crit_damage_multiplier if isinstance(combat.crit_damage_multiplier, (int, float)) else 2.0
+
+    target_dcs: List[int] = []
+    for target in targets:
+        dc = _raw_stat(target.get("combat_data"), target.get("entity"), combat.target_defense_attribute)
+        target_dcs.append(dc if isinstance(dc, int) else 10)
+
+    outcomes: List[List[ActionOutcome]] = []
+    for action in actions:
+        if action.get("type") == "attack":
+            normal, crit = attack_damage(combat.damage_formula, damage_modifier, combat.crit_effect, crit_multiplier)
+            row = []
+            for dc in target_dcs:
+                odds = check_odds(check.dice_notation, check_modifier, dc,
+                                  check.critical_success_threshold, check.critical_failure_threshold)
+                expected = ((odds.hit - odds.critical) * normal + odds.critical * crit) / odds.hit if odds.hit else normal
+                row.append(ActionOutcome(odds.hit, odds.critical, expected))
+            outcomes.append(row)
+        else:
+            # Abilities do not roll to hit; their effects apply as written.
+            damage = heal = 0.0
+            for effect in (action.get("ability_props") or {}).get("effects", []):
+                amount = effect.get("value", effect.get("amount"))
+                if effect.get("type") == "damage":
+                    damage += effect_expectation(rules, amount, actor_data, actor_entity, 5.0)
+                elif effect.get("type") == "heal":
+                    heal += effect_expectation(rules, amount, actor_data, actor_entity, 5.0)
+            outcome = ActionOutcome(1.0, 0.0, damage, heal)
+            outcomes.append([outcome] * len(target_dcs))
+    return outcomes
+
+
+def estimate_action_outcome(
+    rules: GuildRuleSnapshot,
+    actor_entity: Participant,
+    actor_data: Optional[Dict[str, Any]],
+    action: Dict[str, Any],
+    target: Dict[str, Any],
+) -> ActionOutcome:
+    return estimate_action_outcomes(rules, actor_entity, actor_data, [action], [target])[0][0]
+
+
+def estimator_cache_info() -> Dict[str, Any]:
+    """lru_cache statistics of the memoized building blocks (for benchmarks and diagnostics)."""
+    return {
+        fn.__name__: fn.cache_info()._asdict()
+        for fn in (dice_pmf, check_odds, attack_damage, parse_effect_expression, expression_expectation)
+    }
+
+
+logger.info("Outcome estimator module loaded.")
@@ -1,12 +1,13 @@
 # src/core/report_formatter.py
 import logging
-from typing import List, Dict, Any, Union, Tuple, Set
+from functools import lru_cache
+from typing import List, Dict, Any, AsyncIterator, Callable, Mapping, Sequence, Union, Tuple, Set, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Removed direct import of get_localized_entity_name
 # from .localization_utils import get_localized_entity_name
 from .localization_utils import get_batch_localized_entity_names # Import the new batch function
-from .rules import get_rule # Added import for get_rule
+from .rule_snapshot import GuildRuleSnapshot, build_guild_rule_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -27,624 +28,829 @@ def _safe_get(data: Dict, path: List[Union[str, int]], default: Any = None) -> A
             return default
     return current
 
-async def _format_log_entry_with_names_cache(
-    session: AsyncSession, # Added session parameter
-    log_entry_details_json: Dict[str, Any],
-    language: str,
-    names_cache: Dict[Tuple[str, int], str]
-) -> str:
+# --- Term catalog ---
+# Report terms are RuleConfig entries "{term_key}_{language}" (a string, or a dict keyed by language)
+# with a built-in default per term. A TermCatalog resolves all of them for one guild and language up
+# front, so formatting a report line is dict reads and str.format, with no rule lookup per verb.
+
+PRIMARY_FALLBACK_LANGUAGE = "en"
+
+# Built-in terms, used when the guild has no RuleConfig entry for the term in the report language.
+DEFAULT_TERMS: Dict[str, Dict[str, str]] = {
+    "terms.abilities.particle_on": {"en": "on", "ru": "на"},
+    "terms.abilities.verb_uses": {"en": "uses ability", "ru": "использует способность"},
+
+    "terms.actions.examine.sees": {"en": "You see", "ru": "Вы видите"},
+    "terms.actions.examine.verb": {"en": "examines", "ru": "осматривает"},
+    "terms.actions.go_to.particle_location": {"en": "within the current location", "ru": "внутри текущей локации"},
+    "terms.actions.go_to.verb": {"en": "moves to", "ru": "перемещается к"},
+    "terms.actions.interact.result_particle": {"en": "As a result", "ru": "В результате"},
+    "terms.actions.interact.verb": {"en": "interacts with", "ru": "взаимодействует с"},
+
+    "terms.character.from_source": {"en": "from {source}", "ru": "из {source}"},
+    "terms.character.level_up": {"en": "{player_name} has reached level {level_str}!", "ru": "{player_name} достиг(ла) уровня {level_str}!"},
+    "terms.character.some_xp": {"en": "some", "ru": "немного"},
+    "terms.character.unknown_level": {"en": "a new level", "ru": "новый уровень"},
+    "terms.character.xp": {"en": "XP", "ru": "опыта"},
+    "terms.character.xp_gained_simple": {"en": "{player_name} gained {amount_str} {xp_term}.", "ru": "{player_name} получил(а) {amount_str} {xp_term}."},
+    "terms.character.xp_gained_with_source": {"en": "{player_name} gained {amount_str} {xp_term} {source_str}.", "ru": "{player_name} получил(а) {amount_str} {xp_term} {source_str}."},
+
+    "terms.combat.an_action": {"en": "an action", "ru": "действие"},
+    "terms.combat.dealing_damage": {"en": "dealing", "ru": "нанося"},
+    "terms.combat.ended": {"en": "Combat at '{location_name}' has ended. Outcome: {outcome_readable}.", "ru": "Схватка в '{location_name}' окончена. Результат: {outcome_readable}."},
+    "terms.combat.on": {"en": "on", "ru": "против"},
+    "terms.combat.starts_involving": {"en": "Combat starts at '{location_name}' involving: {participants_str}.", "ru": "Начинается бой в '{location_name}' с участием: {participants_str}."},
+    "terms.combat.survivors": {"en": " Survivors: {survivors_str}.", "ru": " Уцелевшие: {survivors_str}."},
+    "terms.combat.uses": {"en": "uses", "ru": "использует"},
+
+    "terms.dialogue.ends_conversation_with": {"en": "{player_name} ends the conversation with {npc_name}.", "ru": "{player_name} заканчивает разговор с {npc_name}."},
+    "terms.dialogue.starts_conversation_with": {"en": "{player_name} starts a conversation with {npc_name}.", "ru": "{player_name} начинает разговор с {npc_name}."},
+
+    "terms.factions.a_faction": {"en": "a faction", "ru": "фракцией"},
+    "terms.factions.changed_from": {"en": "changed from", "ru": "изменилась с"},
+    "terms.factions.reputation_of": {"en": "Reputation of", "ru": "Репутация"},
+    "terms.factions.to_standing": {"en": "to", "ru": "на"},
+    "terms.factions.with_faction": {"en": "with", "ru": "с"},
+
+    "terms.general.a_combatant": {"en": "A combatant", "ru": "Боец"},
+    "terms.general.an_ability": {"en": "an ability", "ru": "способность"},
+    "terms.general.an_entity": {"en": "An entity", "ru": "Сущность"},
+    "terms.general.an_item": {"en": "an item", "ru": "предмет"},
+    "terms.general.an_npc": {"en": "An NPC", "ru": "НИП"},
+    "terms.general.another_combatant": {"en": "another combatant", "ru": "другого бойца"},
+    "terms.general.another_entity": {"en": "another entity", "ru": "другой сущностью"},
+    "terms.general.damage": {"en": "damage", "ru": "урона"},
+    "terms.general.new_mysterious_place": {"en": "a new mysterious place", "ru": "нового загадочного места"},
+    "terms.general.no_specific_target": {"en": "no specific target", "ru": "неопределенной цели"},
+    "terms.general.nobody": {"en": "nobody", "ru": "ни на кого"},
+    "terms.general.one_entity": {"en": "One entity", "ru": "Одна сущность"},
+    "terms.general.reason": {"en": "Reason", "ru": "Причина"},
+    "terms.general.someone": {"en": "Someone", "ru": "Некто"},
+    "terms.general.somewhere": {"en": "somewhere", "ru": "откуда-то"},
+    "terms.general.unknown_location": {"en": "an unknown location", "ru": "неизвестной локации"},
+    "terms.general.unknown_participants": {"en": "unknown participants", "ru": "неизвестными участниками"},
+    "terms.general.unknown_place": {"en": "an unknown place", "ru": "неизвестного места"},
+
+    "terms.items.acquired": {"en": "acquired", "ru": "получает"},
+    "terms.items.drops": {"en": "drops", "ru": "выбрасывает"},
+    "terms.items.from": {"en": "from", "ru": "из"},
+    "terms.items.on": {"en": "on", "ru": "на"},
+    "terms.items.uses": {"en": "uses", "ru": "использует"},
+
+    "terms.movement.moved_from": {"en": "moved from", "ru": "переместился из"},
+    "terms.movement.to": {"en": "to", "ru": "в"},
+
+    "terms.quests.a_quest": {"en": "a quest", "ru": "задание"},
+    "terms.quests.accepted": {"en": "{player_name} has accepted the quest: '{quest_name}'.", "ru": "{player_name} принял(а) задание: '{quest_name}'."},
+    "terms.quests.completed": {"en": "{player_name} has completed the quest: '{quest_name}'!", "ru": "{player_name} завершил(а) задание: '{quest_name}'!"},
+    "terms.quests.failed_simple": {"en": "{player_name} has failed the quest '{quest_name}'.", "ru": "{player_name} провалил(а) задание '{quest_name}'."},
+    "terms.quests.failed_with_reason": {"en": "{player_name} has failed the quest '{quest_name}' due to: {reason}.", "ru": "{player_name} провалил(а) задание '{quest_name}' по причине: {reason}."},
+    "terms.quests.step_completed_detailed": {"en": "{player_name} completed a step in '{quest_name}': {step_details}.", "ru": "{player_name} выполнил(а) этап в задании '{quest_name}': {step_details}."},
+    "terms.quests.step_completed_simple": {"en": "{player_name} completed a step in the quest '{quest_name}'.", "ru": "{player_name} выполнил(а) этап в задании '{quest_name}'."},
+
+    "terms.relationships.an_unknown_level": {"en": "an unknown level", "ru": "неизвестного уровня"},
+    "terms.relationships.due_to_reason": {"en": "due to: {change_reason}", "ru": "по причине: {change_reason}"},
+    "terms.relationships.is_now": {"en": "is now {value_str}", "ru": "теперь {value_str}"},
+    "terms.relationships.relation_between": {"en": "Relationship between {e1_name} and {e2_name}", "ru": "Отношения между {e1_name} и {e2_name}"},
+
+    "terms.results.nothing_happens": {"en": "nothing happens.", "ru": "ничего не происходит."},
+    "terms.results.nothing_special": {"en": "nothing special", "ru": "ничего особенного"},
+
+    "terms.statuses.a_status_effect": {"en": "a status effect", "ru": "эффект состояния"},
+    "terms.statuses.an_unknown_source": {"en": "an unknown source", "ru": "неизвестного источника"},
+    "terms.statuses.effect_ended_on": {"en": "'{status_name}' effect has ended on {target_name}.", "ru": "Эффект '{status_name}' закончился для {target_name}."},
+    "terms.statuses.for_duration": {"en": "for {duration_turns} turns", "ru": "на {duration_turns} ходов"},
+    "terms.statuses.from_source": {"en": "from", "ru": "от"},
+    "terms.statuses.is_now_affected_by": {"en": "is now affected by", "ru": "теперь под действием"},
+}
+
+
+def _pick_language(texts: Mapping[str, Any], language: str, first_available: bool = True) -> Optional[str]:
+    """`language`, then the primary fallback language, then (if `first_available`) any non-empty text."""
+    for lang in (language, PRIMARY_FALLBACK_LANGUAGE):
+        if texts.get(lang):
+            return str(texts[lang])
+    if first_available:
+        return next((str(text) for text in texts.values() if text), None)
+    return None
+
+
+@lru_cache(maxsize=32)
+def _default_terms(language: str) -> Dict[str, str]:
+    return {key: _pick_language(texts, language) or "" for key, texts in DEFAULT_TERMS.items()}
+
+
+class TermCatalog:
     """
-    Formats a single log entry's details_json into a human-readable string
-    in the specified language, using a pre-filled cache for entity names.
+    Report terms of one guild in one language: the guild's `terms.*` rules resolved for the language,
+    over the built-in defaults. Built once per rules version by get_term_catalog.
     """
-    guild_id = log_entry_details_json.get("guild_id")
-    event_type_str = str(log_entry_details_json.get("event_type", "UNKNOWN_EVENT")).upper()
 
-    if not guild_id: # Should ideally be caught before calling this if names_cache is guild-specific
-        logger.warning("_format_log_entry_with_names_cache: 'guild_id' not found.")
-        return "Error: Missing guild information in log entry (formatter)."
-    if not event_type_str or event_type_str == "UNKNOWN_EVENT":
-        logger.warning(f"_format_log_entry_with_names_cache: 'event_type' missing for guild {guild_id}.")
-        return f"Error: Missing event type in log entry (guild {guild_id})."
+    __slots__ = ("guild_id", "language", "version", "_rule_terms", "_default_terms")
+
+    def __init__(self, guild_id: int, language: str, rule_terms: Dict[str, str], version: Optional[int] = None):
+        self.guild_id = guild_id
+        self.language = language
+        self.version = version
+        self._rule_terms = rule_terms
+        self._default_terms = _default_terms(language)
+
+    def get(self, term_key: str, default: Optional[Mapping[str, str]] = None) -> str:
+        """
+        The term for `term_key`: the guild's rule, else `default` (by language, for terms whose key or
+        default text depends on the entry), else the built-in default. Unknown terms yield "".
+        """
+        term = self._rule_terms.get(term_key)
+        if term is not None:
+            return term
+        if default:
+            term = _pick_language(default, self.language)
+            if term is not None:
+                return term
+        term = self._default_terms.get(term_key)
+        if term is not None:
+            return term
+        logger.warning(f"Term '{term_key}' could not be resolved for language '{self.language}' or fallbacks.")
+        return ""
+
+    def __len__(self) -> int:
+        return len(self._rule_terms)
+
+    def __repr__(self) -> str:
+        return f"<TermCatalog(guild_id={self.guild_id}, language='{self.language}', version={self.version}, rule_terms={len(self._rule_terms)})>"
+
+
+def compile_term_catalog(guild_id: int, language: str, rules: Mapping[str, Any], version: Optional[int] = None) -> TermCatalog:
+    """Resolves every `terms.*_{language}` rule; rules without usable text for the language fall back to the defaults."""
+    suffix = f"_{language}"
+    rule_terms: Dict[str, str] = {}
+    for key, value in rules.items():
+        if not key.startswith("terms.") or not key.endswith(suffix) or not value:
+            continue
+        if isinstance(value, dict):
+            term = _pick_language(value, language, first_available=False)
+        elif isinstance(value, str):
+            term = value
+        else:
+            term = None
+        if term is not None:
+            rule_terms[key[:-len(suffix)]] = term
+    return TermCatalog(guild_id, language, rule_terms, version)
 
-    def get_name_from_cache(entity_type: str, entity_id: int, default_prefix: str = "Entity") -> str:
-        return names_cache.get((entity_type.lower(), entity_id), f"[{default_prefix} ID: {entity_id} (Cached?)]")
-
-    # Вспомогательная функция для получения терминов с использованием get_rule
-    async def get_term(term_key_base: str, default_text_map: Dict[str, str]) -> str:
-        # Полный ключ для RuleConfig, например, "terms.actions.examine.verb_en"
-        full_term_key = f"{term_key_base}_{language}"
-        # default_text_map должен содержать ключ для текущего языка
-        primary_fallback_language = "en" # Define a primary fallback
-
-        # Пытаемся получить правило из RuleConfig
-        # Теперь session передается корректно
-        rule_value_obj = await get_rule(session, guild_id, full_term_key, default=None)
-
-        if rule_value_obj:
-            if isinstance(rule_value_obj, dict):
-                if language in rule_value_obj and rule_value_obj[language]:
-                    return str(rule_value_obj[language])
-                # Try primary fallback language from rule_value_obj
-                if primary_fallback_language in rule_value_obj and rule_value_obj[primary_fallback_language]:
-                    logger.debug(f"Term '{term_key_base}' found in RuleConfig using primary fallback '{primary_fallback_language}'.")
-                    return str(rule_value_obj[primary_fallback_language])
-            elif isinstance(rule_value_obj, str) and rule_value_obj: # If it's a non-empty string directly
-                return rule_value_obj
-
-        # Fallback to default_text_map
-        if language in default_text_map and default_text_map[language]:
-            logger.debug(f"Term '{term_key_base}' not in RuleConfig or specific lang, using default_text_map for '{language}'.")
-            return default_text_map[language]
-
-        if primary_fallback_language in default_text_map and default_text_map[primary_fallback_language]:
-            logger.debug(f"Term '{term_key_base}' not in RuleConfig/default_text_map for '{language}', using default_text_map for primary fallback '{primary_fallback_language}'.")
-            return default_text_map[primary_fallback_language]
-
-        # Final fallback to the first value in default_text_map if any
-        if default_text_map:
-            first_value = next(iter(default_text_map.values()), None)
-            if first_value:
-                logger.debug(f"Term '{term_key_base}' falling back to first available value in default_text_map.")
-                return first_value
-
-        logger.warning(f"Term '{term_key_base}' could not be resolved for language '{language}' or fallbacks.")
-        return "" # Return empty string if no term can be found
-
-
-    fallback_message = ""
-    if language == "ru":
-        fallback_message = f"Произошло событие типа '{event_type_str}'. Детали: {str(log_entry_details_json)[:150]}..."
-    else:
-        fallback_message = f"Event of type '{event_type_str}' occurred. Details: {str(log_entry_details_json)[:150]}..."
 
-    if event_type_str == "PLAYER_ACTION":
-        action_intent = _safe_get(log_entry_details_json, ["action", "intent"], "unknown_action")
-        actor_id = _safe_get(log_entry_details_json, ["actor", "id"])
-        actor_type = _safe_get(log_entry_details_json, ["actor", "type"], "entity")
-        target_name_str = _safe_get(log_entry_details_json, ["action", "entities", 0, "name"], "something")
-
-        actor_name = get_name_from_cache(actor_type, actor_id, actor_type.capitalize()) if actor_id and actor_type else "Someone"
-
-        if action_intent == "examine":
-            verb = await get_term("terms.actions.examine.verb", {"en": "examines", "ru": "осматривает"})
-            sees_term = await get_term("terms.actions.examine.sees", {"en": "You see", "ru": "Вы видите"})
-            target_description = _safe_get(log_entry_details_json, ["result", "description"])
-            # Если описание соответствует ключу термина, используем термин, иначе используем как есть
-            if target_description == "it is empty": # Пример, как это могло бы быть
-                 desc_to_use = await get_term("terms.results.nothing_special", {"en": "nothing special", "ru": "ничего особенного"})
-            elif target_description:
-                 desc_to_use = target_description
-            else: # Если description пуст или отсутствует
-                 desc_to_use = await get_term("terms.results.nothing_special", {"en": "nothing special", "ru": "ничего особенного"})
-
-            return f"{actor_name} {verb} '{target_name_str}'. {sees_term}: {desc_to_use}"
-
-        elif action_intent == "interact":
-            verb = await get_term("terms.actions.interact.verb", {"en": "interacts with", "ru": "взаимодействует с"})
-            result_particle = await get_term("terms.actions.interact.result_particle", {"en": "As a result", "ru": "В результате"})
-            interaction_result = _safe_get(log_entry_details_json, ["result", "message"])
-            if not interaction_result:
-                interaction_result = await get_term("terms.results.nothing_happens", {"en": "nothing happens.", "ru": "ничего не происходит."})
-
-            return f"{actor_name} {verb} '{target_name_str}'. {result_particle}: {interaction_result}"
-
-        elif action_intent == "go_to": # move_to_sublocation
-            verb = await get_term("terms.actions.go_to.verb", {"en": "moves to", "ru": "перемещается к"})
-            particle = await get_term("terms.actions.go_to.particle_location", {"en": "within the current location", "ru": "внутри текущей локации"})
-            sublocation_name = target_name_str
-            return f"{actor_name} {verb} '{sublocation_name}' {particle}."
-        else:
-            # Generic fallback for other PLAYER_ACTION intents
-            verb = await get_term(f"terms.actions.{action_intent}.verb", {"en": f"performs action '{action_intent}' on", "ru": f"выполняет действие '{action_intent}' на"})
-            return f"{actor_name} {verb} '{target_name_str}'."
+# Latest catalog per (guild_id, language); replaced when the guild's rules version changes.
+_term_catalogs: Dict[Tuple[int, str], TermCatalog] = {}
 
-    elif event_type_str == "PLAYER_MOVE" or event_type_str == "MOVEMENT":
-        player_id = log_entry_details_json.get("player_id")
-        old_loc_id = log_entry_details_json.get("old_location_id")
-        new_loc_id = log_entry_details_json.get("new_location_id")
 
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else "Unknown Player"
-        old_loc_name = get_name_from_cache("location", old_loc_id, "Location") if old_loc_id else \
-                       await get_term("terms.general.unknown_place", {"en": "an unknown place", "ru": "неизвестного места"})
-        new_loc_name = get_name_from_cache("location", new_loc_id, "Location") if new_loc_id else \
-                       await get_term("terms.general.new_mysterious_place", {"en": "a new mysterious place", "ru": "нового загадочного места"})
+def get_term_catalog(rule_snapshot: GuildRuleSnapshot, language: str) -> TermCatalog:
+    """
+    The TermCatalog for the snapshot's guild and rules version. Snapshots without a version (rules not
+    loaded from the cache) get a fresh catalog each call.
+    """
+    cache_key = (rule_snapshot.guild_id, language)
+    catalog = _term_catalogs.get(cache_key)
+    if catalog is not None and rule_snapshot.version is not None and catalog.version == rule_snapshot.version:
+        return catalog
+    catalog = compile_term_catalog(rule_snapshot.guild_id, language, rule_snapshot.as_dict(), rule_snapshot.version)
+    if rule_snapshot.version is not None:
+        _term_catalogs[cache_key] = catalog
+    logger.debug(f"Compiled {catalog!r}.")
+    return catalog
+
+
+# --- Log entry formatters ---
+# One formatter per event type, registered in _FORMATTERS. A formatter gets the entry's details_json
+# and a _FormatContext and returns the line; it does no I/O.
+
+_GENERIC_EVENT_TYPES = (
+    "SYSTEM_EVENT", "WORLD_STATE_CHANGE", "MASTER_COMMAND", "ERROR_EVENT",
+    "AI_GENERATION_TRIGGERED", "AI_RESPONSE_RECEIVED", "AI_CONTENT_VALIDATION_SUCCESS",
+    "AI_CONTENT_VALIDATION_FAILED", "AI_CONTENT_APPROVED", "AI_CONTENT_REJECTED",
+    "AI_CONTENT_EDITED", "AI_CONTENT_SAVED", "WORLD_EVENT_LOCATION_GENERATED",
+    "MASTER_ACTION_LOCATION_ADDED", "MASTER_ACTION_LOCATION_REMOVED",
+    "MASTER_ACTION_LOCATIONS_CONNECTED", "MASTER_ACTION_LOCATIONS_DISCONNECTED",
+    "TRADE_INITIATED", "TRADE_COMPLETED" # Added trade events here for now
+)
+
+
+class _FormatContext:
+    """What a formatter reads besides the entry: report language, pre-fetched entity names and terms."""
+
+    __slots__ = ("event_type", "language", "names_cache", "terms")
+
+    def __init__(self, event_type: str, language: str, names_cache: Dict[Tuple[str, int], str], terms: TermCatalog):
+        self.event_type = event_type
+        self.language = language
+        self.names_cache = names_cache
+        self.terms = terms
+
+    def name(self, entity_type: str, entity_id: int, default_prefix: str = "Entity") -> str:
+        return self.names_cache.get((entity_type.lower(), entity_id), f"[{default_prefix} ID: {entity_id} (Cached?)]")
+
+    def term(self, term_key: str, default: Optional[Mapping[str, str]] = None) -> str:
+        return self.terms.get(term_key, default)
+
+
+Formatter = Callable[[Dict[str, Any], _FormatContext], str]
+_FORMATTERS: Dict[str, Formatter] = {}
+
+
+def _formats(*event_types: str) -> Callable[[Formatter], Formatter]:
+    def register(formatter: Formatter) -> Formatter:
+        for event_type in event_types:
+            _FORMATTERS[event_type] = formatter
+        return formatter
+    return register
+
+
+@_formats("PLAYER_ACTION")
+def _format_player_action(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    action_intent = _safe_get(entry, ["action", "intent"], "unknown_action")
+    actor_id = _safe_get(entry, ["actor", "id"])
+    actor_type = _safe_get(entry, ["actor", "type"], "entity")
+    target_name_str = _safe_get(entry, ["action", "entities", 0, "name"], "something")
+
+    actor_name = ctx.name(actor_type, actor_id, actor_type.capitalize()) if actor_id and actor_type else "Someone"
+
+    if action_intent == "examine":
+        verb = ctx.term("terms.actions.examine.verb")
+        sees_term = ctx.term("terms.actions.examine.sees")
+        target_description = _safe_get(entry, ["result", "description"])
+        # Если описание соответствует ключу термина, используем термин, иначе используем как есть
+        if target_description == "it is empty": # Пример, как это могло бы быть
+             desc_to_use = ctx.term("terms.results.nothing_special")
+        elif target_description:
+             desc_to_use = target_description
+        else: # Если description пуст или отсутствует
+             desc_to_use = ctx.term("terms.results.nothing_special")
+
+        return f"{actor_name} {verb} '{target_name_str}'. {sees_term}: {desc_to_use}"
+
+    elif action_intent == "interact":
+        verb = ctx.term("terms.actions.interact.verb")
+        result_particle = ctx.term("terms.actions.interact.result_particle")
+        interaction_result = _safe_get(entry, ["result", "message"])
+        if not interaction_result:
+            interaction_result = ctx.term("terms.results.nothing_happens")
+
+        return f"{actor_name} {verb} '{target_name_str}'. {result_particle}: {interaction_result}"
+
+    elif action_intent == "go_to": # move_to_sublocation
+        verb = ctx.term("terms.actions.go_to.verb")
+        particle = ctx.term("terms.actions.go_to.particle_location")
+        sublocation_name = target_name_str
+        return f"{actor_name} {verb} '{sublocation_name}' {particle}."
+    else:
+        # Generic fallback for other PLAYER_ACTION intents
+        verb = ctx.term(f"terms.actions.{action_intent}.verb", {"en": f"performs action '{action_intent}' on", "ru": f"выполняет действие '{action_intent}' на"})
+        return f"{actor_name} {verb} '{target_name_str}'."
+
+
+@_formats("PLAYER_MOVE", "MOVEMENT")
+def _format_player_move(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    old_loc_id = entry.get("old_location_id")
+    new_loc_id = entry.get("new_location_id")
+
+    player_name = ctx.name("player", player_id, "Player") if player_id else "Unknown Player"
+    old_loc_name = ctx.name("location", old_loc_id, "Location") if old_loc_id else \
+                   ctx.term("terms.general.unknown_place")
+    new_loc_name = ctx.name("location", new_loc_id, "Location") if new_loc_id else \
+                   ctx.term("terms.general.new_mysterious_place")
+
+    moved_from_term = ctx.term("terms.movement.moved_from")
+    to_term = ctx.term("terms.movement.to")
+
+    return f"{player_name} {moved_from_term} '{old_loc_name}' {to_term} '{new_loc_name}'."
+
+
+@_formats("ITEM_ACQUIRED")
+def _format_item_acquired(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    item_id = entry.get("item_id")
+    quantity = entry.get("quantity", 1)
+    source = entry.get("source", ctx.term("terms.general.somewhere"))
+
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    item_name = ctx.name("item", item_id, "Item") if item_id else \
+                ctx.term("terms.general.an_item")
+
+    acquired_term = ctx.term("terms.items.acquired")
+    from_term = ctx.term("terms.items.from")
+
+    return f"{player_name} {acquired_term} {item_name} (x{quantity}) {from_term} {source}."
+
+
+@_formats("ABILITY_USED")
+def _format_ability_used(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    actor_entity_id = _safe_get(entry, ["actor_entity", "id"])
+    actor_entity_type = _safe_get(entry, ["actor_entity", "type"], "entity")
+    ability_id = _safe_get(entry, ["ability", "id"])
+
+    actor_name = ctx.name(str(actor_entity_type), actor_entity_id, str(actor_entity_type).capitalize()) if actor_entity_id else \
+                 ctx.term("terms.general.someone")
+    ability_name = ctx.name("ability", ability_id, "Ability") if ability_id else \
+                   ctx.term("terms.general.an_ability")
+
+    targets_info = _safe_get(entry, ["targets"], [])
+    targets_str = ""
+    if targets_info:
+        target_names = []
+        for t_info in targets_info:
+            t_id = _safe_get(t_info, ["entity", "id"])
+            t_type = _safe_get(t_info, ["entity", "type"], "entity")
+            if t_id: target_names.append(ctx.name(str(t_type), t_id, str(t_type).capitalize()))
+        if target_names:
+            targets_str = ", ".join(target_names)
+        else:
+            targets_str = ctx.term("terms.general.no_specific_target")
+    else:
+        targets_str = ctx.term("terms.general.nobody")
 
-        moved_from_term = await get_term("terms.movement.moved_from", {"en": "moved from", "ru": "переместился из"})
-        to_term = await get_term("terms.movement.to", {"en": "to", "ru": "в"})
+    verb_uses = ctx.term("terms.abilities.verb_uses")
+    particle_on = ctx.term("terms.abilities.particle_on")
+    outcome_desc = _safe_get(entry, ["outcome", "description"], "")
 
-        return f"{player_name} {moved_from_term} '{old_loc_name}' {to_term} '{new_loc_name}'."
+    return f"{actor_name} {verb_uses} '{ability_name}' {particle_on} {targets_str}. {outcome_desc}".strip()
 
-    elif event_type_str == "ITEM_ACQUIRED":
-        player_id = log_entry_details_json.get("player_id")
-        item_id = log_entry_details_json.get("item_id")
-        quantity = log_entry_details_json.get("quantity", 1)
-        source = log_entry_details_json.get("source", await get_term("terms.general.somewhere", {"en": "somewhere", "ru": "откуда-то"}))
 
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        item_name = get_name_from_cache("item", item_id, "Item") if item_id else \
-                    await get_term("terms.general.an_item", {"en": "an item", "ru": "предмет"})
+@_formats("COMBAT_ACTION")
+def _format_combat_action(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    actor_id = _safe_get(entry, ["actor", "id"])
+    actor_type = _safe_get(entry, ["actor", "type"], "combatant")
+    target_id = _safe_get(entry, ["target", "id"])
+    target_type = _safe_get(entry, ["target", "type"], "combatant")
+    action_name = entry.get("action_name", ctx.term("terms.combat.an_action"))
+    damage = entry.get("damage")
 
-        acquired_term = await get_term("terms.items.acquired", {"en": "acquired", "ru": "получает"})
-        from_term = await get_term("terms.items.from", {"en": "from", "ru": "из"})
+    actor_name = ctx.name(actor_type, actor_id, actor_type.capitalize()) if actor_id and actor_type else \
+                 ctx.term("terms.general.a_combatant")
+    target_name = ctx.name(target_type, target_id, target_type.capitalize()) if target_id and target_type else \
+                  ctx.term("terms.general.another_combatant")
 
-        return f"{player_name} {acquired_term} {item_name} (x{quantity}) {from_term} {source}."
+    uses_term = ctx.term("terms.combat.uses")
+    on_term = ctx.term("terms.combat.on")
+    dealing_term = ctx.term("terms.combat.dealing_damage")
+    damage_term = ctx.term("terms.general.damage")
 
-    elif event_type_str == "ABILITY_USED":
-        actor_entity_id = _safe_get(log_entry_details_json, ["actor_entity", "id"])
-        actor_entity_type = _safe_get(log_entry_details_json, ["actor_entity", "type"], "entity")
-        ability_id = _safe_get(log_entry_details_json, ["ability", "id"])
-
-        actor_name = get_name_from_cache(str(actor_entity_type), actor_entity_id, str(actor_entity_type).capitalize()) if actor_entity_id else \
-                     await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        ability_name = get_name_from_cache("ability", ability_id, "Ability") if ability_id else \
-                       await get_term("terms.general.an_ability", {"en": "an ability", "ru": "способность"})
-
-        targets_info = _safe_get(log_entry_details_json, ["targets"], [])
-        targets_str = ""
-        if targets_info:
-            target_names = []
-            for t_info in targets_info:
-                t_id = _safe_get(t_info, ["entity", "id"])
-                t_type = _safe_get(t_info, ["entity", "type"], "entity")
-                if t_id: target_names.append(get_name_from_cache(str(t_type), t_id, str(t_type).capitalize()))
-            if target_names:
-                targets_str = ", ".join(target_names)
-            else:
-                targets_str = await get_term("terms.general.no_specific_target", {"en": "no specific target", "ru": "неопределенной цели"})
-        else:
-            targets_str = await get_term("terms.general.nobody", {"en": "nobody", "ru": "ни на кого"})
+    if damage is not None:
+        return f"{actor_name} {uses_term} '{action_name}' {on_term} {target_name}, {dealing_term} {damage} {damage_term}."
+    else:
+        return f"{actor_name} {uses_term} '{action_name}' {on_term} {target_name}."
+
+
+@_formats("COMBAT_END")
+def _format_combat_end(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    location_id = entry.get("location_id")
+    location_name = ctx.name("location", location_id, "Location") if location_id else \
+                    ctx.term("terms.general.unknown_location")
+    outcome_key = entry.get("outcome", "unknown") # e.g., "victory_players"
+
+    # Get localized outcome string
+    outcome_readable = ctx.term(f"terms.combat.outcomes.{outcome_key}", {
+        "en": outcome_key.replace("_", " ").capitalize(),
+        "ru": outcome_key.replace("_", " ") # Simple fallback if specific term not found
+    })
+
+    ended_template = ctx.term("terms.combat.ended")
+    base_message = ended_template.format(location_name=location_name, outcome_readable=outcome_readable)
+
+    survivors_list = _safe_get(entry, ["survivors"], [])
+    if survivors_list:
+        survivor_names = [
+            ctx.name(str(s_info.get("type")), s_info.get("id"), str(s_info.get("type")).capitalize())
+            for s_info in survivors_list if s_info.get("id") and s_info.get("type")
+        ]
+        if survivor_names:
+            survivors_str = ", ".join(survivor_names)
+            survivors_term_template = ctx.term("terms.combat.survivors")
+            base_message += survivors_term_template.format(survivors_str=survivors_str)
+    return base_message
+
+
+@_formats("COMBAT_START")
+def _format_combat_start(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    location_id = entry.get("location_id")
+    location_name = ctx.name("location", location_id, "Location") if location_id else \
+                    ctx.term("terms.general.unknown_location")
+    
+    participant_infos = _safe_get(entry, ["participant_ids"], [])
+    participant_names = []
+    if isinstance(participant_infos, list):
+        for p_info in participant_infos:
+            p_id = _safe_get(p_info, ["id"])
+            p_type = _safe_get(p_info, ["type"], "entity")
+            if p_id:
+                participant_names.append(ctx.name(str(p_type), p_id, str(p_type).capitalize()))
+    
+    participants_str = ", ".join(participant_names) if participant_names else \
+                       ctx.term("terms.general.unknown_participants")
 
-        verb_uses = await get_term("terms.abilities.verb_uses", {"en": "uses ability", "ru": "использует способность"})
-        particle_on = await get_term("terms.abilities.particle_on", {"en": "on", "ru": "на"})
-        outcome_desc = _safe_get(log_entry_details_json, ["outcome", "description"], "")
+    template = ctx.term("terms.combat.starts_involving")
+    return template.format(location_name=location_name, participants_str=participants_str)
 
-        return f"{actor_name} {verb_uses} '{ability_name}' {particle_on} {targets_str}. {outcome_desc}".strip()
 
-    elif event_type_str == "COMBAT_ACTION":
-        actor_id = _safe_get(log_entry_details_json, ["actor", "id"])
-        actor_type = _safe_get(log_entry_details_json, ["actor", "type"], "combatant")
-        target_id = _safe_get(log_entry_details_json, ["target", "id"])
-        target_type = _safe_get(log_entry_details_json, ["target", "type"], "combatant")
-        action_name = log_entry_details_json.get("action_name", await get_term("terms.combat.an_action", {"en": "an action", "ru": "действие"}))
-        damage = log_entry_details_json.get("damage")
-
-        actor_name = get_name_from_cache(actor_type, actor_id, actor_type.capitalize()) if actor_id and actor_type else \
-                     await get_term("terms.general.a_combatant", {"en": "A combatant", "ru": "Боец"})
-        target_name = get_name_from_cache(target_type, target_id, target_type.capitalize()) if target_id and target_type else \
-                      await get_term("terms.general.another_combatant", {"en": "another combatant", "ru": "другого бойца"})
-
-        uses_term = await get_term("terms.combat.uses", {"en": "uses", "ru": "использует"})
-        on_term = await get_term("terms.combat.on", {"en": "on", "ru": "против"})
-        dealing_term = await get_term("terms.combat.dealing_damage", {"en": "dealing", "ru": "нанося"})
-        damage_term = await get_term("terms.general.damage", {"en": "damage", "ru": "урона"})
-
-        if damage is not None:
-            return f"{actor_name} {uses_term} '{action_name}' {on_term} {target_name}, {dealing_term} {damage} {damage_term}."
-        else:
-            return f"{actor_name} {uses_term} '{action_name}' {on_term} {target_name}."
+@_formats("QUEST_ACCEPTED")
+def _format_quest_accepted(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    quest_id = entry.get("quest_id")
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    quest_name = ctx.name("quest", quest_id, "Quest") if quest_id else \
+                 ctx.term("terms.quests.a_quest")
+    
+    template = ctx.term("terms.quests.accepted")
+    return template.format(player_name=player_name, quest_name=quest_name)
 
-    elif event_type_str == "COMBAT_END":
-        location_id = log_entry_details_json.get("location_id")
-        location_name = get_name_from_cache("location", location_id, "Location") if location_id else \
-                        await get_term("terms.general.unknown_location", {"en": "an unknown location", "ru": "неизвестной локации"})
-        outcome_key = log_entry_details_json.get("outcome", "unknown") # e.g., "victory_players"
-
-        # Get localized outcome string
-        outcome_readable = await get_term(f"terms.combat.outcomes.{outcome_key}", {
-            "en": outcome_key.replace("_", " ").capitalize(),
-            "ru": outcome_key.replace("_", " ") # Simple fallback if specific term not found
-        })
 
-        ended_template = await get_term("terms.combat.ended", {
-            "en": "Combat at '{location_name}' has ended. Outcome: {outcome_readable}.",
-            "ru": "Схватка в '{location_name}' окончена. Результат: {outcome_readable}."
-        })
-        base_message = ended_template.format(location_name=location_name, outcome_readable=outcome_readable)
+@_formats("QUEST_STEP_COMPLETED")
+def _format_quest_step_completed(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    quest_id = entry.get("quest_id")
+    step_details = entry.get("step_details", "") # Optional: specific details about the step
 
-        survivors_list = _safe_get(log_entry_details_json, ["survivors"], [])
-        if survivors_list:
-            survivor_names = [
-                get_name_from_cache(str(s_info.get("type")), s_info.get("id"), str(s_info.get("type")).capitalize())
-                for s_info in survivors_list if s_info.get("id") and s_info.get("type")
-            ]
-            if survivor_names:
-                survivors_str = ", ".join(survivor_names)
-                survivors_term_template = await get_term("terms.combat.survivors", {
-                    "en": " Survivors: {survivors_str}.",
-                    "ru": " Уцелевшие: {survivors_str}."
-                })
-                base_message += survivors_term_template.format(survivors_str=survivors_str)
-        return base_message
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    quest_name = ctx.name("quest", quest_id, "Quest") if quest_id else \
+                 ctx.term("terms.quests.a_quest", {"en": "a quest", "ru": "задания"})
 
-    elif event_type_str == "COMBAT_START":
-        location_id = log_entry_details_json.get("location_id")
-        location_name = get_name_from_cache("location", location_id, "Location") if location_id else \
-                        await get_term("terms.general.unknown_location", {"en": "an unknown location", "ru": "неизвестной локации"})
-        
-        participant_infos = _safe_get(log_entry_details_json, ["participant_ids"], [])
-        participant_names = []
-        if isinstance(participant_infos, list):
-            for p_info in participant_infos:
-                p_id = _safe_get(p_info, ["id"])
-                p_type = _safe_get(p_info, ["type"], "entity")
-                if p_id:
-                    participant_names.append(get_name_from_cache(str(p_type), p_id, str(p_type).capitalize()))
-        
-        participants_str = ", ".join(participant_names) if participant_names else \
-                           await get_term("terms.general.unknown_participants", {"en": "unknown participants", "ru": "неизвестными участниками"})
-
-        template = await get_term("terms.combat.starts_involving", {
-            "en": "Combat starts at '{location_name}' involving: {participants_str}.",
-            "ru": "Начинается бой в '{location_name}' с участием: {participants_str}."
-        })
-        return template.format(location_name=location_name, participants_str=participants_str)
-
-    elif event_type_str == "QUEST_ACCEPTED":
-        player_id = log_entry_details_json.get("player_id")
-        quest_id = log_entry_details_json.get("quest_id")
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        quest_name = get_name_from_cache("quest", quest_id, "Quest") if quest_id else \
-                     await get_term("terms.quests.a_quest", {"en": "a quest", "ru": "задание"})
-        
-        template = await get_term("terms.quests.accepted", {
-            "en": "{player_name} has accepted the quest: '{quest_name}'.",
-            "ru": "{player_name} принял(а) задание: '{quest_name}'."
-        })
+    if step_details:
+        template = ctx.term("terms.quests.step_completed_detailed")
+        return template.format(player_name=player_name, quest_name=quest_name, step_details=step_details)
+    else:
+        template = ctx.term("terms.quests.step_completed_simple")
         return template.format(player_name=player_name, quest_name=quest_name)
 
-    elif event_type_str == "QUEST_STEP_COMPLETED":
-        player_id = log_entry_details_json.get("player_id")
-        quest_id = log_entry_details_json.get("quest_id")
-        step_details = log_entry_details_json.get("step_details", "") # Optional: specific details about the step
-
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        quest_name = get_name_from_cache("quest", quest_id, "Quest") if quest_id else \
-                     await get_term("terms.quests.a_quest", {"en": "a quest", "ru": "задания"})
-
-        if step_details:
-            template = await get_term("terms.quests.step_completed_detailed", {
-                "en": "{player_name} completed a step in '{quest_name}': {step_details}.",
-                "ru": "{player_name} выполнил(а) этап в задании '{quest_name}': {step_details}."
-            })
-            return template.format(player_name=player_name, quest_name=quest_name, step_details=step_details)
-        else:
-            template = await get_term("terms.quests.step_completed_simple", {
-                "en": "{player_name} completed a step in the quest '{quest_name}'.",
-                "ru": "{player_name} выполнил(а) этап в задании '{quest_name}'."
-            })
-            return template.format(player_name=player_name, quest_name=quest_name)
-
-    elif event_type_str == "QUEST_COMPLETED":
-        player_id = log_entry_details_json.get("player_id")
-        quest_id = log_entry_details_json.get("quest_id")
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        quest_name = get_name_from_cache("quest", quest_id, "Quest") if quest_id else \
-                     await get_term("terms.quests.a_quest", {"en": "a quest", "ru": "задание"})
-
-        template = await get_term("terms.quests.completed", {
-            "en": "{player_name} has completed the quest: '{quest_name}'!",
-            "ru": "{player_name} завершил(а) задание: '{quest_name}'!"
-        })
+
+@_formats("QUEST_COMPLETED")
+def _format_quest_completed(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    quest_id = entry.get("quest_id")
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    quest_name = ctx.name("quest", quest_id, "Quest") if quest_id else \
+                 ctx.term("terms.quests.a_quest")
+
+    template = ctx.term("terms.quests.completed")
+    return template.format(player_name=player_name, quest_name=quest_name)
+
+
+@_formats("LEVEL_UP")
+def _format_level_up(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    new_level = entry.get("new_level")
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    
+    level_str = str(new_level) if new_level is not None else \
+                ctx.term("terms.character.unknown_level")
+
+    template = ctx.term("terms.character.level_up")
+    return template.format(player_name=player_name, level_str=level_str)
+
+
+@_formats("XP_GAINED")
+def _format_xp_gained(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    amount = entry.get("amount")
+    source = entry.get("source") # Optional source string
+
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    amount_str = str(amount) if amount is not None else \
+                 ctx.term("terms.character.some_xp")
+    
+    xp_term = ctx.term("terms.character.xp")
+
+    if source:
+        from_source_term = ctx.term("terms.character.from_source")
+        source_str = from_source_term.format(source=source)
+        template = ctx.term("terms.character.xp_gained_with_source")
+        return template.format(player_name=player_name, amount_str=amount_str, xp_term=xp_term, source_str=source_str)
+    else:
+        template = ctx.term("terms.character.xp_gained_simple")
+        return template.format(player_name=player_name, amount_str=amount_str, xp_term=xp_term)
+
+
+@_formats("RELATIONSHIP_CHANGE")
+def _format_relationship_change(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    entity1_info = entry.get("entity1", {})
+    entity2_info = entry.get("entity2", {})
+    new_value = entry.get("new_value")
+    change_reason = entry.get("change_reason") # Optional
+
+    e1_id = entity1_info.get("id")
+    e1_type = entity1_info.get("type", "entity")
+    e1_name = ctx.name(str(e1_type), e1_id, str(e1_type).capitalize()) if e1_id else \
+              ctx.term("terms.general.one_entity")
+
+    e2_id = entity2_info.get("id")
+    e2_type = entity2_info.get("type", "entity")
+    e2_name = ctx.name(str(e2_type), e2_id, str(e2_type).capitalize()) if e2_id else \
+              ctx.term("terms.general.another_entity")
+    
+    value_str = str(new_value) if new_value is not None else \
+                ctx.term("terms.relationships.an_unknown_level")
+
+    relation_between = ctx.term("terms.relationships.relation_between")
+    is_now = ctx.term("terms.relationships.is_now")
+    
+    base_msg = f"{relation_between.format(e1_name=e1_name, e2_name=e2_name)} {is_now.format(value_str=value_str)}"
+    
+    if change_reason:
+        due_to_reason = ctx.term("terms.relationships.due_to_reason")
+        base_msg += f" ({due_to_reason.format(change_reason=change_reason)})."
+    else:
+        base_msg += "."
+    return base_msg
+
+
+@_formats("STATUS_APPLIED")
+def _format_status_applied(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    target_info = entry.get("target_entity", {})
+    status_effect_info = entry.get("status_effect", {})
+    source_info = entry.get("source_entity") # Optional
+    duration_turns = entry.get("duration_turns") # Optional
+
+    target_id = target_info.get("id")
+    target_type = target_info.get("type", "entity")
+    target_name = ctx.name(str(target_type), target_id, str(target_type).capitalize()) if target_id else \
+                  ctx.term("terms.general.someone")
+
+    status_id = status_effect_info.get("id")
+    status_name = ctx.name("status_effect", status_id, "Status") if status_id else \
+                  ctx.term("terms.statuses.a_status_effect")
+
+    msg_parts = [target_name]
+    is_now_affected_by = ctx.term("terms.statuses.is_now_affected_by")
+    msg_parts.extend([is_now_affected_by, f"'{status_name}'"])
+
+    if duration_turns is not None:
+        for_duration = ctx.term("terms.statuses.for_duration")
+        msg_parts.append(for_duration.format(duration_turns=duration_turns))
+
+    if source_info and isinstance(source_info, dict):
+        source_id = source_info.get("id")
+        source_type = source_info.get("type", "entity") # e.g., "ability", "item"
+        source_name_from_dict = source_info.get("name") # e.g. if source is a trap with a name
+
+        from_source_term = ctx.term("terms.statuses.from_source")
+        msg_parts.append(from_source_term)
+
+        if source_id and source_type: # If it's a known entity type with an ID
+            source_display_name = ctx.name(str(source_type), source_id, str(source_type).capitalize())
+            msg_parts.append(f"'{source_display_name}'")
+        elif source_name_from_dict: # If it's something like a trap name directly in details
+             msg_parts.append(f"'{source_name_from_dict}'")
+        else: # Fallback if source_info is there but not well-structured for naming
+            msg_parts.append(ctx.term("terms.statuses.an_unknown_source"))
+    
+    msg_parts.append(".")
+    return " ".join(msg_parts)
+
+
+@_formats("STATUS_REMOVED")
+def _format_status_removed(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    target_info = entry.get("target_entity", {})
+    status_effect_info = entry.get("status_effect", {})
+
+    target_id = target_info.get("id")
+    target_type = target_info.get("type", "entity")
+    target_name = ctx.name(str(target_type), target_id, str(target_type).capitalize()) if target_id else \
+                  ctx.term("terms.general.someone")
+
+    status_id = status_effect_info.get("id")
+    status_name = ctx.name("status_effect", status_id, "Status") if status_id else \
+                  ctx.term("terms.statuses.a_status_effect")
+
+    template = ctx.term("terms.statuses.effect_ended_on")
+    return template.format(status_name=status_name, target_name=target_name)
+
+
+@_formats("DIALOGUE_LINE")
+def _format_dialogue_line(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    speaker_info = entry.get("speaker_entity", {})
+    line_text = entry.get("line_text", "...")
+
+    speaker_id = speaker_info.get("id")
+    speaker_type = speaker_info.get("type", "entity")
+    speaker_name = ctx.name(str(speaker_type), speaker_id, str(speaker_type).capitalize()) if speaker_id else \
+                   ctx.term("terms.general.someone")
+    
+    # No specific term for the format, direct formatting
+    return f"{speaker_name}: \"{line_text}\""
+
+
+@_formats("QUEST_FAILED")
+def _format_quest_failed(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    quest_id = entry.get("quest_id")
+    reason = entry.get("reason") # Optional
+
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    quest_name = ctx.name("quest", quest_id, "Quest") if quest_id else \
+                 ctx.term("terms.quests.a_quest")
+
+    if reason:
+        template = ctx.term("terms.quests.failed_with_reason")
+        return template.format(player_name=player_name, quest_name=quest_name, reason=reason)
+    else:
+        template = ctx.term("terms.quests.failed_simple")
         return template.format(player_name=player_name, quest_name=quest_name)
 
-    elif event_type_str == "LEVEL_UP":
-        player_id = log_entry_details_json.get("player_id")
-        new_level = log_entry_details_json.get("new_level")
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        
-        level_str = str(new_level) if new_level is not None else \
-                    await get_term("terms.character.unknown_level", {"en": "a new level", "ru": "новый уровень"})
-
-        template = await get_term("terms.character.level_up", {
-            "en": "{player_name} has reached level {level_str}!",
-            "ru": "{player_name} достиг(ла) уровня {level_str}!"
-        })
-        return template.format(player_name=player_name, level_str=level_str)
 
-    elif event_type_str == "XP_GAINED":
-        player_id = log_entry_details_json.get("player_id")
-        amount = log_entry_details_json.get("amount")
-        source = log_entry_details_json.get("source") # Optional source string
-
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        amount_str = str(amount) if amount is not None else \
-                     await get_term("terms.character.some_xp", {"en": "some", "ru": "немного"})
-        
-        xp_term = await get_term("terms.character.xp", {"en": "XP", "ru": "опыта"})
-
-        if source:
-            from_source_term = await get_term("terms.character.from_source", {"en": "from {source}", "ru": "из {source}"})
-            source_str = from_source_term.format(source=source)
-            template = await get_term("terms.character.xp_gained_with_source", {
-                "en": "{player_name} gained {amount_str} {xp_term} {source_str}.",
-                "ru": "{player_name} получил(а) {amount_str} {xp_term} {source_str}."
-            })
-            return template.format(player_name=player_name, amount_str=amount_str, xp_term=xp_term, source_str=source_str)
-        else:
-            template = await get_term("terms.character.xp_gained_simple", {
-                "en": "{player_name} gained {amount_str} {xp_term}.",
-                "ru": "{player_name} получил(а) {amount_str} {xp_term}."
-            })
-            return template.format(player_name=player_name, amount_str=amount_str, xp_term=xp_term)
+@_formats("NPC_ACTION")
+def _format_npc_action(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    actor_id = _safe_get(entry, ["actor", "id"])
+    # actor_type = _safe_get(entry, ["actor", "type"], "npc") # Assuming type is npc
+    actor_name = ctx.name("npc", actor_id, "NPC") if actor_id else \
+                 ctx.term("terms.general.an_npc")
 
-    elif event_type_str == "RELATIONSHIP_CHANGE":
-        entity1_info = log_entry_details_json.get("entity1", {})
-        entity2_info = log_entry_details_json.get("entity2", {})
-        new_value = log_entry_details_json.get("new_value")
-        change_reason = log_entry_details_json.get("change_reason") # Optional
-
-        e1_id = entity1_info.get("id")
-        e1_type = entity1_info.get("type", "entity")
-        e1_name = get_name_from_cache(str(e1_type), e1_id, str(e1_type).capitalize()) if e1_id else \
-                  await get_term("terms.general.one_entity", {"en": "One entity", "ru": "Одна сущность"})
-
-        e2_id = entity2_info.get("id")
-        e2_type = entity2_info.get("type", "entity")
-        e2_name = get_name_from_cache(str(e2_type), e2_id, str(e2_type).capitalize()) if e2_id else \
-                  await get_term("terms.general.another_entity", {"en": "another entity", "ru": "другой сущностью"})
-        
-        value_str = str(new_value) if new_value is not None else \
-                    await get_term("terms.relationships.an_unknown_level", {"en": "an unknown level", "ru": "неизвестного уровня"})
-
-        relation_between = await get_term("terms.relationships.relation_between", {"en": "Relationship between {e1_name} and {e2_name}", "ru": "Отношения между {e1_name} и {e2_name}"})
-        is_now = await get_term("terms.relationships.is_now", {"en": "is now {value_str}", "ru": "теперь {value_str}"})
-        
-        base_msg = f"{relation_between.format(e1_name=e1_name, e2_name=e2_name)} {is_now.format(value_str=value_str)}"
-        
-        if change_reason:
-            due_to_reason = await get_term("terms.relationships.due_to_reason", {"en": "due to: {change_reason}", "ru": "по причине: {change_reason}"})
-            base_msg += f" ({due_to_reason.format(change_reason=change_reason)})."
-        else:
-            base_msg += "."
-        return base_msg
+    action_intent = _safe_get(entry, ["action", "intent"], "unknown_action")
+    target_name_str = _safe_get(entry, ["action", "entities", 0, "name"], "something") # Simplified target
+    result_message = _safe_get(entry, ["result", "message"], "")
 
-    elif event_type_str == "STATUS_APPLIED":
-        target_info = log_entry_details_json.get("target_entity", {})
-        status_effect_info = log_entry_details_json.get("status_effect", {})
-        source_info = log_entry_details_json.get("source_entity") # Optional
-        duration_turns = log_entry_details_json.get("duration_turns") # Optional
-
-        target_id = target_info.get("id")
-        target_type = target_info.get("type", "entity")
-        target_name = get_name_from_cache(str(target_type), target_id, str(target_type).capitalize()) if target_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-
-        status_id = status_effect_info.get("id")
-        status_name = get_name_from_cache("status_effect", status_id, "Status") if status_id else \
-                      await get_term("terms.statuses.a_status_effect", {"en": "a status effect", "ru": "эффект состояния"})
-
-        msg_parts = [target_name]
-        is_now_affected_by = await get_term("terms.statuses.is_now_affected_by", {"en": "is now affected by", "ru": "теперь под действием"})
-        msg_parts.extend([is_now_affected_by, f"'{status_name}'"])
-
-        if duration_turns is not None:
-            for_duration = await get_term("terms.statuses.for_duration", {"en": "for {duration_turns} turns", "ru": "на {duration_turns} ходов"})
-            msg_parts.append(for_duration.format(duration_turns=duration_turns))
-
-        if source_info and isinstance(source_info, dict):
-            source_id = source_info.get("id")
-            source_type = source_info.get("type", "entity") # e.g., "ability", "item"
-            source_name_from_dict = source_info.get("name") # e.g. if source is a trap with a name
-
-            from_source_term = await get_term("terms.statuses.from_source", {"en": "from", "ru": "от"})
-            msg_parts.append(from_source_term)
-
-            if source_id and source_type: # If it's a known entity type with an ID
-                source_display_name = get_name_from_cache(str(source_type), source_id, str(source_type).capitalize())
-                msg_parts.append(f"'{source_display_name}'")
-            elif source_name_from_dict: # If it's something like a trap name directly in details
-                 msg_parts.append(f"'{source_name_from_dict}'")
-            else: # Fallback if source_info is there but not well-structured for naming
-                msg_parts.append(await get_term("terms.statuses.an_unknown_source", {"en": "an unknown source", "ru": "неизвестного источника"}))
-        
-        msg_parts.append(".")
-        return " ".join(msg_parts)
-
-    elif event_type_str == "STATUS_REMOVED":
-        target_info = log_entry_details_json.get("target_entity", {})
-        status_effect_info = log_entry_details_json.get("status_effect", {})
-
-        target_id = target_info.get("id")
-        target_type = target_info.get("type", "entity")
-        target_name = get_name_from_cache(str(target_type), target_id, str(target_type).capitalize()) if target_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-
-        status_id = status_effect_info.get("id")
-        status_name = get_name_from_cache("status_effect", status_id, "Status") if status_id else \
-                      await get_term("terms.statuses.a_status_effect", {"en": "a status effect", "ru": "эффект состояния"})
-
-        template = await get_term("terms.statuses.effect_ended_on", {
-            "en": "'{status_name}' effect has ended on {target_name}.",
-            "ru": "Эффект '{status_name}' закончился для {target_name}."
-        })
-        return template.format(status_name=status_name, target_name=target_name)
+    verb = ctx.term(f"terms.actions.{action_intent}.verb_npc", {"en": f"performs '{action_intent}' on", "ru": f"совершает '{action_intent}' над"})
 
-    elif event_type_str == "DIALOGUE_LINE":
-        speaker_info = log_entry_details_json.get("speaker_entity", {})
-        line_text = log_entry_details_json.get("line_text", "...")
-
-        speaker_id = speaker_info.get("id")
-        speaker_type = speaker_info.get("type", "entity")
-        speaker_name = get_name_from_cache(str(speaker_type), speaker_id, str(speaker_type).capitalize()) if speaker_id else \
-                       await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        
-        # No specific term for the format, direct formatting
-        return f"{speaker_name}: \"{line_text}\""
-
-    elif event_type_str == "QUEST_FAILED":
-        player_id = log_entry_details_json.get("player_id")
-        quest_id = log_entry_details_json.get("quest_id")
-        reason = log_entry_details_json.get("reason") # Optional
-
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        quest_name = get_name_from_cache("quest", quest_id, "Quest") if quest_id else \
-                     await get_term("terms.quests.a_quest", {"en": "a quest", "ru": "задание"})
-
-        if reason:
-            template = await get_term("terms.quests.failed_with_reason", {
-                "en": "{player_name} has failed the quest '{quest_name}' due to: {reason}.",
-                "ru": "{player_name} провалил(а) задание '{quest_name}' по причине: {reason}."
-            })
-            return template.format(player_name=player_name, quest_name=quest_name, reason=reason)
-        else:
-            template = await get_term("terms.quests.failed_simple", {
-                "en": "{player_name} has failed the quest '{quest_name}'.",
-                "ru": "{player_name} провалил(а) задание '{quest_name}'."
-            })
-            return template.format(player_name=player_name, quest_name=quest_name)
+    # If target_name_str is an entity ID, try to resolve its name
+    # For MVP, assuming target_name_str is descriptive enough or a direct name.
+    # More complex target resolution would involve checking action.entities for type and id.
 
-    elif event_type_str == "NPC_ACTION":
-        actor_id = _safe_get(log_entry_details_json, ["actor", "id"])
-        # actor_type = _safe_get(log_entry_details_json, ["actor", "type"], "npc") # Assuming type is npc
-        actor_name = get_name_from_cache("npc", actor_id, "NPC") if actor_id else \
-                     await get_term("terms.general.an_npc", {"en": "An NPC", "ru": "НИП"})
+    base_msg = f"{actor_name} {verb} '{target_name_str}'."
+    if result_message:
+        base_msg += f" {result_message}"
+    return base_msg.strip()
 
-        action_intent = _safe_get(log_entry_details_json, ["action", "intent"], "unknown_action")
-        target_name_str = _safe_get(log_entry_details_json, ["action", "entities", 0, "name"], "something") # Simplified target
-        result_message = _safe_get(log_entry_details_json, ["result", "message"], "")
 
-        verb = await get_term(f"terms.actions.{action_intent}.verb_npc", {"en": f"performs '{action_intent}' on", "ru": f"совершает '{action_intent}' над"})
+@_formats("ITEM_USED")
+def _format_item_used(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    item_id = entry.get("item_id")
+    outcome_description = entry.get("outcome_description", "")
 
-        # If target_name_str is an entity ID, try to resolve its name
-        # For MVP, assuming target_name_str is descriptive enough or a direct name.
-        # More complex target resolution would involve checking action.entities for type and id.
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    item_name = ctx.name("item", item_id, "Item") if item_id else \
+                ctx.term("terms.general.an_item")
 
-        base_msg = f"{actor_name} {verb} '{target_name_str}'."
-        if result_message:
-            base_msg += f" {result_message}"
-        return base_msg.strip()
+    verb_uses = ctx.term("terms.items.uses")
 
-    elif event_type_str == "ITEM_USED":
-        player_id = log_entry_details_json.get("player_id")
-        item_id = log_entry_details_json.get("item_id")
-        outcome_description = log_entry_details_json.get("outcome_description", "")
-
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        item_name = get_name_from_cache("item", item_id, "Item") if item_id else \
-                    await get_term("terms.general.an_item", {"en": "an item", "ru": "предмет"})
-
-        verb_uses = await get_term("terms.items.uses", {"en": "uses", "ru": "использует"})
-
-        # Optional target
-        target_id = _safe_get(log_entry_details_json, ["target", "id"])
-        target_type = _safe_get(log_entry_details_json, ["target", "type"])
-        target_str = ""
-        if target_id and target_type:
-            target_name = get_name_from_cache(str(target_type), target_id, str(target_type).capitalize())
-            on_particle = await get_term("terms.items.on", {"en": "on", "ru": "на"})
-            target_str = f" {on_particle} '{target_name}'"
-
-        msg = f"{player_name} {verb_uses} '{item_name}'{target_str}."
-        if outcome_description:
-            msg += f" {outcome_description}"
-        return msg.strip()
+    # Optional target
+    target_id = _safe_get(entry, ["target", "id"])
+    target_type = _safe_get(entry, ["target", "type"])
+    target_str = ""
+    if target_id and target_type:
+        target_name = ctx.name(str(target_type), target_id, str(target_type).capitalize())
+        on_particle = ctx.term("terms.items.on")
+        target_str = f" {on_particle} '{target_name}'"
 
-    elif event_type_str == "ITEM_DROPPED":
-        player_id = log_entry_details_json.get("player_id")
-        item_id = log_entry_details_json.get("item_id")
-        quantity = log_entry_details_json.get("quantity", 1)
+    msg = f"{player_name} {verb_uses} '{item_name}'{target_str}."
+    if outcome_description:
+        msg += f" {outcome_description}"
+    return msg.strip()
 
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        item_name = get_name_from_cache("item", item_id, "Item") if item_id else \
-                    await get_term("terms.general.an_item", {"en": "an item", "ru": "предмет"})
 
-        verb_drops = await get_term("terms.items.drops", {"en": "drops", "ru": "выбрасывает"})
-        return f"{player_name} {verb_drops} '{item_name}' (x{quantity})."
+@_formats("ITEM_DROPPED")
+def _format_item_dropped(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = entry.get("player_id")
+    item_id = entry.get("item_id")
+    quantity = entry.get("quantity", 1)
 
-    elif event_type_str == "DIALOGUE_START":
-        player_id = _safe_get(log_entry_details_json, ["player_entity", "id"])
-        npc_id = _safe_get(log_entry_details_json, ["npc_entity", "id"])
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    item_name = ctx.name("item", item_id, "Item") if item_id else \
+                ctx.term("terms.general.an_item")
 
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        npc_name = get_name_from_cache("npc", npc_id, "NPC") if npc_id else \
-                   await get_term("terms.general.an_npc", {"en": "an NPC", "ru": "НИП"})
+    verb_drops = ctx.term("terms.items.drops")
+    return f"{player_name} {verb_drops} '{item_name}' (x{quantity})."
 
-        template = await get_term("terms.dialogue.starts_conversation_with", {
-            "en": "{player_name} starts a conversation with {npc_name}.",
-            "ru": "{player_name} начинает разговор с {npc_name}."
-        })
-        return template.format(player_name=player_name, npc_name=npc_name)
 
-    elif event_type_str == "DIALOGUE_END":
-        player_id = _safe_get(log_entry_details_json, ["player_entity", "id"])
-        npc_id = _safe_get(log_entry_details_json, ["npc_entity", "id"])
+@_formats("DIALOGUE_START")
+def _format_dialogue_start(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = _safe_get(entry, ["player_entity", "id"])
+    npc_id = _safe_get(entry, ["npc_entity", "id"])
 
-        player_name = get_name_from_cache("player", player_id, "Player") if player_id else \
-                      await get_term("terms.general.someone", {"en": "Someone", "ru": "Некто"})
-        npc_name = get_name_from_cache("npc", npc_id, "NPC") if npc_id else \
-                   await get_term("terms.general.an_npc", {"en": "an NPC", "ru": "НИП"})
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    npc_name = ctx.name("npc", npc_id, "NPC") if npc_id else \
+               ctx.term("terms.general.an_npc", {"en": "an NPC", "ru": "НИП"})
 
-        template = await get_term("terms.dialogue.ends_conversation_with", {
-            "en": "{player_name} ends the conversation with {npc_name}.",
-            "ru": "{player_name} заканчивает разговор с {npc_name}."
-        })
-        return template.format(player_name=player_name, npc_name=npc_name)
+    template = ctx.term("terms.dialogue.starts_conversation_with")
+    return template.format(player_name=player_name, npc_name=npc_name)
 
-    elif event_type_str == "FACTION_CHANGE":
-        entity_info = log_entry_details_json.get("entity", {}) # player or party
-        faction_id = log_entry_details_json.get("faction_id")
-        old_standing = log_entry_details_json.get("old_standing")
-        new_standing = log_entry_details_json.get("new_standing")
-        reason = log_entry_details_json.get("reason", "")
-
-        entity_id = entity_info.get("id")
-        entity_type = entity_info.get("type", "entity")
-        entity_name = get_name_from_cache(str(entity_type), entity_id, str(entity_type).capitalize()) if entity_id else \
-                      await get_term("terms.general.an_entity", {"en": "An entity", "ru": "Сущность"})
-
-        faction_name = get_name_from_cache("faction", faction_id, "Faction") if faction_id else \
-                       await get_term("terms.factions.a_faction", {"en": "a faction", "ru": "фракцией"})
-
-        reputation_of = await get_term("terms.factions.reputation_of", {"en": "Reputation of", "ru": "Репутация"})
-        with_faction = await get_term("terms.factions.with_faction", {"en": "with", "ru": "с"})
-        changed_from = await get_term("terms.factions.changed_from", {"en": "changed from", "ru": "изменилась с"})
-        to_standing = await get_term("terms.factions.to_standing", {"en": "to", "ru": "на"})
-
-        msg = f"{reputation_of} {entity_name} {with_faction} {faction_name} {changed_from} {old_standing} {to_standing} {new_standing}."
-        if reason:
-            reason_term = await get_term("terms.general.reason", {"en": "Reason", "ru": "Причина"})
-            msg += f" ({reason_term}: {reason})"
-        return msg
-
-    # Generic formatters for less player-facing events or as fallbacks
-    elif event_type_str in [
-        "SYSTEM_EVENT", "WORLD_STATE_CHANGE", "MASTER_COMMAND", "ERROR_EVENT",
-        "AI_GENERATION_TRIGGERED", "AI_RESPONSE_RECEIVED", "AI_CONTENT_VALIDATION_SUCCESS",
-        "AI_CONTENT_VALIDATION_FAILED", "AI_CONTENT_APPROVED", "AI_CONTENT_REJECTED",
-        "AI_CONTENT_EDITED", "AI_CONTENT_SAVED", "WORLD_EVENT_LOCATION_GENERATED",
-        "MASTER_ACTION_LOCATION_ADDED", "MASTER_ACTION_LOCATION_REMOVED",
-        "MASTER_ACTION_LOCATIONS_CONNECTED", "MASTER_ACTION_LOCATIONS_DISCONNECTED",
-        "TRADE_INITIATED", "TRADE_COMPLETED" # Added trade events here for now
-    ]:
-        description = log_entry_details_json.get("description", "")
-        if description:
-            return f"[{event_type_str.replace('_', ' ').title()}]: {description}"
+
+@_formats("DIALOGUE_END")
+def _format_dialogue_end(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    player_id = _safe_get(entry, ["player_entity", "id"])
+    npc_id = _safe_get(entry, ["npc_entity", "id"])
+
+    player_name = ctx.name("player", player_id, "Player") if player_id else \
+                  ctx.term("terms.general.someone")
+    npc_name = ctx.name("npc", npc_id, "NPC") if npc_id else \
+               ctx.term("terms.general.an_npc", {"en": "an NPC", "ru": "НИП"})
+
+    template = ctx.term("terms.dialogue.ends_conversation_with")
+    return template.format(player_name=player_name, npc_name=npc_name)
+
+
+@_formats("FACTION_CHANGE")
+def _format_faction_change(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    entity_info = entry.get("entity", {}) # player or party
+    faction_id = entry.get("faction_id")
+    old_standing = entry.get("old_standing")
+    new_standing = entry.get("new_standing")
+    reason = entry.get("reason", "")
+
+    entity_id = entity_info.get("id")
+    entity_type = entity_info.get("type", "entity")
+    entity_name = ctx.name(str(entity_type), entity_id, str(entity_type).capitalize()) if entity_id else \
+                  ctx.term("terms.general.an_entity")
+
+    faction_name = ctx.name("faction", faction_id, "Faction") if faction_id else \
+                   ctx.term("terms.factions.a_faction")
+
+    reputation_of = ctx.term("terms.factions.reputation_of")
+    with_faction = ctx.term("terms.factions.with_faction")
+    changed_from = ctx.term("terms.factions.changed_from")
+    to_standing = ctx.term("terms.factions.to_standing")
+
+    msg = f"{reputation_of} {entity_name} {with_faction} {faction_name} {changed_from} {old_standing} {to_standing} {new_standing}."
+    if reason:
+        reason_term = ctx.term("terms.general.reason")
+        msg += f" ({reason_term}: {reason})"
+    return msg
+
+
+# Generic formatter for less player-facing events
+@_formats(*_GENERIC_EVENT_TYPES)
+def _format_generic_event(entry: Dict[str, Any], ctx: _FormatContext) -> str:
+    description = entry.get("description", "")
+    if description:
+        return f"[{ctx.event_type.replace('_', ' ').title()}]: {description}"
+    else:
+        # Try to create a summary from details_json keys if no description
+        summary_parts = []
+        for key, value in entry.items():
+            if key not in ["guild_id", "event_type"]:
+                summary_parts.append(f"{key}: {str(value)[:50]}") # Truncate long values
+        summary = "; ".join(summary_parts)
+        if summary:
+             return f"[{ctx.event_type.replace('_', ' ').title()}]: {summary}"
         else:
-            # Try to create a summary from details_json keys if no description
-            summary_parts = []
-            for key, value in log_entry_details_json.items():
-                if key not in ["guild_id", "event_type"]:
-                    summary_parts.append(f"{key}: {str(value)[:50]}") # Truncate long values
-            summary = "; ".join(summary_parts)
-            if summary:
-                 return f"[{event_type_str.replace('_', ' ').title()}]: {summary}"
-            else:
-                 return f"Event: {event_type_str.replace('_', ' ').title()} occurred."
+             return f"Event: {ctx.event_type.replace('_', ' ').title()} occurred."
+
+
+def _format_log_entry(
+    log_entry_details_json: Dict[str, Any],
+    language: str,
+    names_cache: Dict[Tuple[str, int], str],
+    terms: TermCatalog
+) -> str:
+    """
+    Formats a single log entry's details_json into a human-readable string in the specified language,
+    using a pre-filled cache for entity names and the guild's TermCatalog. Synchronous: no lookups.
+    """
+    guild_id = log_entry_details_json.get("guild_id")
+    event_type_str = str(log_entry_details_json.get("event_type", "UNKNOWN_EVENT")).upper()
 
+    if not guild_id: # Should ideally be caught before calling this if names_cache is guild-specific
+        logger.warning("_format_log_entry: 'guild_id' not found.")
+        return "Error: Missing guild information in log entry (formatter)."
+    if not event_type_str or event_type_str == "UNKNOWN_EVENT":
+        logger.warning(f"_format_log_entry: 'event_type' missing for guild {guild_id}.")
+        return f"Error: Missing event type in log entry (guild {guild_id})."
 
-    logger.warning(f"Unhandled event_type '{event_type_str}' in _format_log_entry_with_names_cache for guild {guild_id}. Returning fallback.")
-    return fallback_message
+    formatter = _FORMATTERS.get(event_type_str)
+    if formatter is not None:
+        return formatter(log_entry_details_json, _FormatContext(event_type_str, language, names_cache, terms))
+
+    logger.warning(f"Unhandled event_type '{event_type_str}' in _format_log_entry for guild {guild_id}. Returning fallback.")
+    if language == "ru":
+        return f"Произошло событие типа '{event_type_str}'. Детали: {str(log_entry_details_json)[:150]}..."
+    return f"Event of type '{event_type_str}' occurred. Details: {str(log_entry_details_json)[:150]}..."
+
+
+async def _format_log_entry_with_names_cache(
+    session: AsyncSession, # Added session parameter
+    log_entry_details_json: Dict[str, Any],
+    language: str,
+    names_cache: Dict[Tuple[str, int], str],
+    rule_snapshot: Optional[GuildRuleSnapshot] = None
+) -> str:
+    """
+    Formats a single log entry with the TermCatalog of `rule_snapshot`, building the guild's
+    snapshot from the rules cache if none is given. Reports should use format_turn_report,
+    which resolves the catalog once for all entries.
+    """
+    guild_id = log_entry_details_json.get("guild_id")
+    if not guild_id:
+        logger.warning("_format_log_entry_with_names_cache: 'guild_id' not found.")
+        return "Error: Missing guild information in log entry (formatter)."
+    if rule_snapshot is None:
+        rule_snapshot = await build_guild_rule_snapshot(session, guild_id)
+    return _format_log_entry(log_entry_details_json, language, names_cache, get_term_catalog(rule_snapshot, language))
 
 
 def _collect_entity_refs_from_log_entry(log_entry_details: Dict[str, Any]) -> Set[Tuple[str, int]]:
@@ -792,15 +998,7 @@ def _collect_entity_refs_from_log_entry(log_entry_details: Dict[str, Any]) -> Se
 
     # For generic events, try to find common ID fields if they exist
     # This is a simple check, could be expanded if generic events have more structured entity refs
-    elif event_type_str in [
-        "SYSTEM_EVENT", "WORLD_STATE_CHANGE", "MASTER_COMMAND", "ERROR_EVENT",
-        "AI_GENERATION_TRIGGERED", "AI_RESPONSE_RECEIVED", "AI_CONTENT_VALIDATION_SUCCESS",
-        "AI_CONTENT_VALIDATION_FAILED", "AI_CONTENT_APPROVED", "AI_CONTENT_REJECTED",
-        "AI_CONTENT_EDITED", "AI_CONTENT_SAVED", "WORLD_EVENT_LOCATION_GENERATED",
-        "MASTER_ACTION_LOCATION_ADDED", "MASTER_ACTION_LOCATION_REMOVED",
-        "MASTER_ACTION_LOCATIONS_CONNECTED", "MASTER_ACTION_LOCATIONS_DISCONNECTED",
-        "TRADE_INITIATED", "TRADE_COMPLETED"
-    ]:
+    elif event_type_str in _GENERIC_EVENT_TYPES:
         # Example: if details_json contains "player_id", "target_npc_id", "location_id"
         p_id = log_entry_details.get("player_id")
         if p_id: refs.add(("player", p_id))
@@ -821,30 +1019,21 @@ def _collect_entity_refs_from_log_entry(log_entry_details: Dict[str, Any]) -> Se
     return refs
 
 
-async def format_turn_report(
-    session: AsyncSession,
-    guild_id: int,
-    log_entries: List[Dict[str, Any]],
-    player_id: int,
-    language: str,
-    fallback_language: str = "en" # Added fallback_language
-) -> str:
-    """
-    Formats a list of log entries into a single turn report string.
-    Optimized to pre-fetch all necessary localized entity names.
-    """
-    if not log_entries:
-        if language == "ru":
-            return "За этот ход ничего значительного не произошло."
-        return "Nothing significant happened this turn."
+def _empty_report(language: str) -> str:
+    if language == "ru":
+        return "За этот ход ничего значительного не произошло."
+    return "Nothing significant happened this turn."
+
+
+def _report_header(language: str, player_name: str) -> str:
+    if language == "ru":
+        return f"Отчет по ходу для {player_name}:\n"
+    return f"Turn Report for {player_name}:\n"
 
-    # 1. Collect all unique entity references from all log entries
-    all_entity_refs: Set[Tuple[str, int]] = set()
-    # Add the player for whom the report is generated, to ensure their name is in the cache for the header
-    if player_id is not None:
-        all_entity_refs.add(("player", player_id))
 
-    prepared_log_entries = []
+def _prepare_log_entries(guild_id: int, log_entries: Sequence[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """Entries positioned as in `log_entries`, with guild_id injected where missing; None for entries of another guild."""
+    prepared_log_entries: List[Optional[Dict[str, Any]]] = []
     for entry in log_entries:
         current_entry_guild_id = entry.get("guild_id")
         if current_entry_guild_id is None:
@@ -856,39 +1045,221 @@ async def format_turn_report(
             prepared_log_entries.append(entry)
         else:
             logger.warning(f"Guild ID mismatch in log entry for report. Expected {guild_id}, got {current_entry_guild_id}. Skipping entry.")
-            # This entry is skipped and will not be processed further
+            prepared_log_entries.append(None) # This entry is skipped and will not be processed further
+    return prepared_log_entries
 
-    # Now, collect entity_refs from the prepared_log_entries
-    for entry_details in prepared_log_entries:
-        all_entity_refs.update(_collect_entity_refs_from_log_entry(entry_details))
 
-    # 2. Batch fetch localized names for all collected references
-    names_cache: Dict[Tuple[str, int], str] = {}
-    if all_entity_refs: # Only call if there are refs to fetch
-        entity_refs_for_batch_call: List[Dict[str, Any]] = [
-            {"type": entity_type, "id": entity_id} for entity_type, entity_id in all_entity_refs
-        ]
-        names_cache = await get_batch_localized_entity_names(
-            session, guild_id, entity_refs_for_batch_call, language, fallback_language
-        )
-
-    # 3. Format each *prepared* log entry using the names_cache
-    formatted_parts = []
-    for entry_details in prepared_log_entries: # Iterate over prepared_log_entries
-        # guild_id is guaranteed to be in entry_details here due to preparation step
-        formatted_line = await _format_log_entry_with_names_cache(
-            session, entry_details, language, names_cache  # Pass session here
-        )
-        formatted_parts.append(formatted_line)
-
-    report_separator = "\n"
-    player_name = names_cache.get(("player", player_id), f"Player {player_id}") # Get player name from cache if available
+async def format_turn_reports(
+    session: AsyncSession,
+    guild_id: int,
+    log_entries: List[Dict[str, Any]],
+    recipients: Mapping[int, str],
+    fallback_language: str = "en",
+    rule_snapshot: Optional[GuildRuleSnapshot] = None,
+    entries_by_player: Optional[Mapping[int, Sequence[int]]] = None
+) -> Dict[int, str]:
+    """
+    Formats the turn reports of several players in one pass and returns them by player_id.
+    `recipients` maps player_id to report language. By default every player gets all entries; with
+    `entries_by_player`, a player gets the entries at the listed positions of `log_entries`.
 
-    if language == "ru":
-        report_header = f"Отчет по ходу для {player_name}:\n"
-        return report_header + report_separator.join(formatted_parts)
+    Recipients are grouped by language: names are fetched with one batch call per language and each
+    entry is rendered once per language, then every report is joined from those shared lines. The
+    work grows with languages x entries rather than players x entries.
+    """
+    if not recipients:
+        return {}
+
+    views: Dict[int, Sequence[int]] = {
+        player_id: range(len(log_entries)) if entries_by_player is None else entries_by_player.get(player_id, ())
+        for player_id in recipients
+    }
+    players_by_language: Dict[str, List[int]] = {}
+    for player_id, language in recipients.items():
+        players_by_language.setdefault(language, []).append(player_id)
+
+    prepared_log_entries = _prepare_log_entries(guild_id, log_entries)
+    entry_refs: Dict[int, Set[Tuple[str, int]]] = {} # Entity refs per entry position; the same in every language
+
+    if rule_snapshot is None and any(views.values()):
+        rule_snapshot = await build_guild_rule_snapshot(session, guild_id)
+
+    reports: Dict[int, str] = {}
+    for language, player_ids in players_by_language.items():
+        needed = sorted({
+            idx for player_id in player_ids for idx in views[player_id]
+            if 0 <= idx < len(prepared_log_entries) and prepared_log_entries[idx] is not None
+        })
+        reporting_players = [player_id for player_id in player_ids if views[player_id]]
+        if not reporting_players:
+            reports.update((player_id, _empty_report(language)) for player_id in player_ids)
+            continue
+
+        # 1. Collect all unique entity references of the entries this language needs, and the recipients for the headers
+        all_entity_refs: Set[Tuple[str, int]] = {("player", player_id) for player_id in reporting_players if player_id is not None}
+        for idx in needed:
+            if idx not in entry_refs:
+                entry_refs[idx] = _collect_entity_refs_from_log_entry(prepared_log_entries[idx])
+            all_entity_refs.update(entry_refs[idx])
+
+        # 2. Batch fetch localized names once for the language
+        names_cache: Dict[Tuple[str, int], str] = {}
+        if all_entity_refs: # Only call if there are refs to fetch
+            entity_refs_for_batch_call: List[Dict[str, Any]] = [
+                {"type": entity_type, "id": entity_id} for entity_type, entity_id in all_entity_refs
+            ]
+            names_cache = await get_batch_localized_entity_names(
+                session, guild_id, entity_refs_for_batch_call, language, fallback_language
+            )
 
-    report_header = f"Turn Report for {player_name}:\n"
-    return report_header + report_separator.join(formatted_parts)
+        # 3. Render every needed entry once (no further awaits)
+        terms = get_term_catalog(rule_snapshot, language)
+        lines = {idx: _format_log_entry(prepared_log_entries[idx], language, names_cache, terms) for idx in needed}
 
-logger.info("Report formatter module (report_formatter.py) created with placeholder functions.")
+        # 4. Assemble each player's report from the shared lines
+        report_separator = "\n"
+        for player_id in player_ids:
+            if not views[player_id]:
+                reports[player_id] = _empty_report(language)
+                continue
+            player_name = names_cache.get(("player", player_id), f"Player {player_id}") # Get player name from cache if available
+            reports[player_id] = _report_header(language, player_name) + report_separator.join(
+                lines[idx] for idx in views[player_id] if idx in lines
+            )
+
+    logger.debug(f"Guild {guild_id}: formatted {len(reports)} turn reports in {len(players_by_language)} languages from {len(log_entries)} entries.")
+    return reports
+
+
+async def format_turn_report(
+    session: AsyncSession,
+    guild_id: int,
+    log_entries: List[Dict[str, Any]],
+    player_id: int,
+    language: str,
+    fallback_language: str = "en", # Added fallback_language
+    rule_snapshot: Optional[GuildRuleSnapshot] = None
+) -> str:
+    """
+    Formats a list of log entries into a single turn report string.
+    Optimized to pre-fetch all necessary localized entity names; terms come from the guild's
+    TermCatalog. Pass a GuildRuleSnapshot built for the turn to skip the rules cache lookup.
+    To report to several players, use format_turn_reports, which shares the work between them.
+    """
+    reports = await format_turn_reports(
+        session, guild_id, log_entries, {player_id: language}, fallback_language, rule_snapshot
+    )
+    return reports[player_id]
+
+# --- Streaming reports ---
+# Discord rejects messages over 2000 characters (embed descriptions: 4096). stream_turn_report yields a
+# report as message-sized chunks while it renders, so the first message can go out before the last line
+# is formatted, and only one chunk plus one window of names is held at a time.
+
+DISCORD_MESSAGE_LIMIT = 2000
+DISCORD_EMBED_DESCRIPTION_LIMIT = 4096
+REPORT_NAMES_BATCH_SIZE = 100 # Entries whose entity names are fetched together while streaming
+
+
+class _MessageChunker:
+    """Packs lines into newline-joined chunks of at most `limit` characters; an overlong line is split, at a space if possible."""
+
+    def __init__(self, limit: int):
+        if limit <= 0:
+            raise ValueError(f"Chunk limit must be positive, got {limit}.")
+        self.limit = limit
+        self._lines: List[str] = []
+        self._length = 0
+
+    def add(self, line: str) -> List[str]:
+        """Adds a line and returns the chunks it completed."""
+        completed: List[str] = []
+        while len(line) > self.limit:
+            cut = line.rfind(" ", self.limit // 2, self.limit + 1)
+            if cut <= 0:
+                cut = self.limit
+            completed.extend(self.add(line[:cut]))
+            line = line[cut:].lstrip(" ")
+        added_length = len(line) + (1 if self._lines else 0)
+        if self._lines and self._length + added_length > self.limit:
+            completed.append(self.flush())
+            added_length = len(line)
+        self._lines.append(line)
+        self._length += added_length
+        return completed
+
+    def flush(self) -> str:
+        chunk = "\n".join(self._lines)
+        self._lines = []
+        self._length = 0
+        return chunk
+
+    def __bool__(self) -> bool:
+        return bool(self._lines)
+
+
+def split_report(report: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """Splits an already formatted report (e.g. from format_turn_reports) into message-sized chunks at line breaks."""
+    chunker = _MessageChunker(limit)
+    chunks: List[str] = []
+    for line in report.split("\n"):
+        chunks.extend(chunker.add(line))
+    if chunker:
+        chunks.append(chunker.flush())
+    return chunks
+
+
+async def stream_turn_report(
+    session: AsyncSession,
+    guild_id: int,
+    log_entries: List[Dict[str, Any]],
+    player_id: int,
+    language: str,
+    fallback_language: str = "en",
+    rule_snapshot: Optional[GuildRuleSnapshot] = None,
+    max_chunk_length: int = DISCORD_MESSAGE_LIMIT,
+    names_batch_size: int = REPORT_NAMES_BATCH_SIZE
+) -> AsyncIterator[str]:
+    """
+    Async-generator form of format_turn_report: yields the report in chunks of at most `max_chunk_length`
+    characters (pass DISCORD_EMBED_DESCRIPTION_LIMIT for embeds). Chunks break between lines; only a line
+    longer than the limit is split inside. Names are fetched for `names_batch_size` entries at a time, so
+    the first chunk is ready after the first window rather than after the whole report.
+    """
+    if not log_entries:
+        yield _empty_report(language)
+        return
+
+    if rule_snapshot is None:
+        rule_snapshot = await build_guild_rule_snapshot(session, guild_id)
+    terms = get_term_catalog(rule_snapshot, language)
+    chunker = _MessageChunker(max_chunk_length)
+    prepared_log_entries = [entry for entry in _prepare_log_entries(guild_id, log_entries) if entry is not None]
+    window_size = max(1, names_batch_size)
+
+    for window_start in range(0, max(len(prepared_log_entries), 1), window_size):
+        window = prepared_log_entries[window_start:window_start + window_size]
+        entity_refs: Set[Tuple[str, int]] = set()
+        if window_start == 0 and player_id is not None:
+            entity_refs.add(("player", player_id)) # For the header
+        for entry_details in window:
+            entity_refs.update(_collect_entity_refs_from_log_entry(entry_details))
+        names_cache: Dict[Tuple[str, int], str] = {}
+        if entity_refs:
+            names_cache = await get_batch_localized_entity_names(
+                session, guild_id, [{"type": entity_type, "id": entity_id} for entity_type, entity_id in entity_refs],
+                language, fallback_language
+            )
+
+        if window_start == 0:
+            player_name = names_cache.get(("player", player_id), f"Player {player_id}")
+            for chunk in chunker.add(_report_header(language, player_name).rstrip("\n")):
+                yield chunk
+        for entry_details in window:
+            for chunk in chunker.add(_format_log_entry(entry_details, language, names_cache, terms)):
+                yield chunk
+
+    if chunker:
+        yield chunker.flush()
+
+logger.info("Report formatter module (report_formatter.py) loaded.")
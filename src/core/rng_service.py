@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import secrets
+from typing import Hashable
+
+from ..models.combat_encounter import CombatEncounter
+from .combat_state import get_combat_state
+from .dice_roller import DiceRoller
+
+logger = logging.getLogger(__name__)
+
+# Seeded randomness for combats and guild turns.
+# Every combat gets a root seed at start_combat, recorded in its rules_config_snapshot_json under
+# RNG_SEED_RULE_KEY (and in the COMBAT_START event); every guild turn gets one recorded in its
+# GUILD_TURN_PROCESSED event. Rolls never draw from the root stream directly: each unit of work (the
+# initiative roll, one combat action, one guild turn action) gets a DiceRoller whose seed is derived
+# from the root seed and the unit's position. Derived streams do not depend on how many rolls other
+# units made or on the order concurrent actions finished in, so any single action can be replayed
+# on its own (see combat_replay).
+
+RNG_SEED_RULE_KEY = "rng:seed"
+
+
+def new_seed() -> int:
+    return secrets.randbits(63)
+
+
+def derive_seed(seed: int, *labels: Hashable) -> int:
+    """
+    Stable child seed of `seed` for `labels`. Uses blake2b over the labels' repr rather than hash(),
+    which is salted per process, so the same inputs give the same seed on every run and every worker.
+    """
+    material = repr((seed,) + labels).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(material, digest_size=8).digest(), "big") >> 1
+
+
+def get_combat_seed(combat_encounter: CombatEncounter) -> int:
+    """
+    The combat's root seed from its rules snapshot. Combats started before seeds were recorded get
+    one on first use; it is stored on the encounter and persisted with the caller's transaction.
+    """
+    snapshot = combat_encounter.rules_config_snapshot_json or {}
+    seed = snapshot.get(RNG_SEED_RULE_KEY)
+    if isinstance(seed, int):
+        return seed
+    seed = new_seed()
+    # Reassigned rather than mutated in place so the JSON column is marked as changed.
+    combat_encounter.rules_config_snapshot_json = {**snapshot, RNG_SEED_RULE_KEY: seed}
+    logger.info(f"Combat {combat_encounter.id}: no recorded RNG seed, assigned {seed}.")
+    return seed
+
+
+def combat_initiative_roller(combat_seed: int) -> DiceRoller:
+    return DiceRoller(derive_seed(combat_seed, "initiative"))
+
+
+def combat_action_seed(combat_encounter: CombatEncounter, actor_type: str, actor_id: int) -> int:
+    """Seed of an action, derived from the combat seed and the actor's slot (turn number, turn order index)."""
+    combat_state = get_combat_state(combat_encounter)
+    return derive_seed(
+        get_combat_seed(combat_encounter), "action",
+        combat_state.turn_number, combat_state.current_index, actor_type.lower(), actor_id,
+    )
+
+
+def guild_turn_action_roller(turn_seed: int, action_index: int) -> DiceRoller:
+    """Roller of the `action_index`-th action (submission order) of a guild turn."""
+    return DiceRoller(derive_seed(turn_seed, "action", action_index))
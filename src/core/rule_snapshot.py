@@ -0,0 +1,148 @@
+import logging
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .rules import get_all_rules_for_guild, _rules_cache
+from .dice_roller import parse_dice_string
+from .formula_engine import CompiledFormula, FormulaError, compile_formula, get_compiled_formula
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODIFIER_FORMULA = "(value - 10) // 2"
+
+
+class CheckRules(NamedTuple):
+    """Pre-resolved rules for one check_type (see check_resolver.resolve_check)."""
+    dice_notation: str
+    parsed_dice: Optional[Tuple[int, int, int]] # (num_dice, num_sides, modifier), None if the notation is invalid
+    base_attribute: Optional[str]
+    critical_success_threshold: int
+    critical_failure_threshold: int
+
+
+class CombatRules(NamedTuple):
+    """Pre-resolved combat rules with the same defaults combat_engine uses."""
+    attack_check_type: str
+    attacker_main_attribute: str
+    target_defense_attribute: str
+    damage_formula: str
+    damage_attribute: str
+    crit_damage_multiplier: float
+    crit_effect: str
+    initiative_dice: str
+    modifier_formula: CompiledFormula
+    default_modifier_if_stat_missing: int
+    player_default_max_hp: int
+
+
+class GuildRuleSnapshot:
+    """
+    Immutable view of a guild's RuleConfig, built once per turn or per combat.
+    Lookups are plain synchronous dict reads: no session, no coroutine, no log line on a miss.
+    Derived values (check rules, combat rules, compiled formulas, parsed dice) are resolved
+    on first use and memoized on the snapshot.
+    """
+
+    def __init__(self, guild_id: int, rules: Dict[str, Any], version: Optional[int] = None):
+        self.guild_id = guild_id
+        self.version = version
+        self._rules: Dict[str, Any] = dict(rules)
+        self._check_rules: Dict[str, CheckRules] = {}
+        self._combat_rules: Optional[CombatRules] = None
+
+    def __contains__(self, key: str) -> bool:
+        return self._rules.get(key) is not None
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        """Same semantics as rules.get_rule: a missing or None value yields `default`."""
+        value = self._rules.get(key)
+        return default if value is None else value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self._rules)
+
+    def with_overrides(self, overrides: Optional[Dict[str, Any]]) -> "GuildRuleSnapshot":
+        """
+        Returns a snapshot where `overrides` (e.g. CombatEncounter.rules_config_snapshot_json)
+        take precedence over the guild rules.
+        """
+        if not overrides:
+            return self
+        return GuildRuleSnapshot(self.guild_id, {**self._rules, **overrides}, self.version)
+
+    def dice(self, key: str, default: str) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+        """Returns (notation, parsed) for a dice rule; parsed is None if the notation is invalid."""
+        notation = self.get(key, default)
+        try:
+            return notation, parse_dice_string(notation)
+        except (ValueError, AttributeError):
+            logger.warning(f"Guild {self.guild_id}: invalid dice notation '{notation}' for rule '{key}'.")
+            return notation, None
+
+    def formula(self, key: str, default: str) -> CompiledFormula:
+        """Returns the compiled formula for `key`, falling back to `default` if the configured one is invalid."""
+        formula_text = self.get(key, default)
+        try:
+            return get_compiled_formula(self.guild_id, key, formula_text)
+        except FormulaError as e:
+            logger.error(f"Guild {self.guild_id}: invalid formula '{formula_text}' for rule '{key}': {e}. Using default '{default}'.")
+            return compile_formula(default)
+
+    def check_rules(self, check_type: str) -> CheckRules:
+        cached = self._check_rules.get(check_type)
+        if cached is not None:
+            return cached
+
+        # Defaults mirror resolve_check: `or` fallbacks, so falsy values also fall back.
+        dice_notation = self._rules.get(f"checks:{check_type}:dice_notation") or "1d20"
+        try:
+            parsed_dice = parse_dice_string(dice_notation)
+        except (ValueError, AttributeError):
+            parsed_dice = None
+        check_rules = CheckRules(
+            dice_notation=dice_notation,
+            parsed_dice=parsed_dice,
+            base_attribute=self._rules.get(f"checks:{check_type}:base_attribute"),
+            critical_success_threshold=self._rules.get(f"checks:{check_type}:critical_success_threshold") or 20,
+            critical_failure_threshold=self._rules.get(f"checks:{check_type}:critical_failure_threshold") or 1,
+        )
+        self._check_rules[check_type] = check_rules
+        return check_rules
+
+    @property
+    def combat(self) -> CombatRules:
+        if self._combat_rules is None:
+            self._combat_rules = CombatRules(
+                attack_check_type=self.get("combat:attack:check_type", "attack_roll"),
+                attacker_main_attribute=self.get("combat:attack:attacker_main_attribute", "strength"),
+                target_defense_attribute=self.get("combat:attack:target_defense_attribute", "armor_class"),
+                damage_formula=self.get("combat:attack:damage_formula", "1d4"),
+                damage_attribute=self.get("combat:attack:damage_attribute", "strength"),
+                crit_damage_multiplier=self.get("combat:attack:crit_damage_multiplier", 2.0),
+                crit_effect=self.get("combat:attack:crit_effect", "multiply_total_damage"),
+                initiative_dice=self.get("combat:initiative:dice", "1d20"),
+                modifier_formula=self.formula("combat:attributes:modifier_formula", DEFAULT_MODIFIER_FORMULA),
+                default_modifier_if_stat_missing=self.get("combat:attributes:default_modifier_if_stat_missing", 0),
+                player_default_max_hp=self.get("player:stats:default_max_hp", 50),
+            )
+        return self._combat_rules
+
+    def __repr__(self) -> str:
+        return f"<GuildRuleSnapshot(guild_id={self.guild_id}, version={self.version}, rules={len(self._rules)})>"
+
+
+async def build_guild_rule_snapshot(session: AsyncSession, guild_id: int) -> GuildRuleSnapshot:
+    """
+    Builds a GuildRuleSnapshot from the (versioned) rules cache. Call once per turn or per combat
+    and pass the snapshot down instead of awaiting get_rule for every key.
+    """
+    guild_rules = await get_all_rules_for_guild(session, guild_id)
+    entry = _rules_cache.get_entry(guild_id)
+    version = entry.version if entry is not None else None
+    snapshot = GuildRuleSnapshot(guild_id, guild_rules, version)
+    logger.debug(f"Built {snapshot!r}")
+    return snapshot
+
+
+logger.info("Rule snapshot module (GuildRuleSnapshot) loaded.")
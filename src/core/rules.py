@@ -1,45 +1,164 @@
+import asyncio
 import logging
+import time
+from collections import OrderedDict
 from typing import Any, Dict, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update as sqlalchemy_update, delete as sqlalchemy_delete
+from sqlalchemy import select, text, update as sqlalchemy_update, delete as sqlalchemy_delete
 
 from ..models.rule_config import RuleConfig
+from ..models.guild import GuildConfig
 # Corrected import path for CRUDBase and generic CRUD functions
 from .crud_base_definitions import CRUDBase, create_entity, get_entity_by_id, update_entity
 from .database import transactional # For transactional operations
+from ..config.settings import (
+    RULES_CACHE_MAX_GUILDS,
+    RULES_CACHE_POLL_INTERVAL_SECONDS,
+    RULES_CACHE_LISTEN_PROBE_INTERVAL_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
-# In-memory cache for rules, structured as {guild_id: {key: value_json}}
-_rules_cache: Dict[int, Dict[str, Any]] = {}
+# PostgreSQL NOTIFY channel used to tell other bot processes that a guild's rules changed.
+RULES_NOTIFY_CHANNEL = "rule_config_changed"
+
+
+class _CachedGuildRules:
+    """Rules of one guild together with the DB version they were loaded at."""
+    __slots__ = ("rules", "version", "checked_at")
+
+    def __init__(self, rules: Dict[str, Any], version: Optional[int], checked_at: float):
+        self.rules = rules
+        self.version = version
+        self.checked_at = checked_at
+
+
+class RulesCache:
+    """
+    Per-process LRU cache of guild rules, structured as {guild_id: _CachedGuildRules}.
+    An entry is trusted until its probe interval elapses or it is invalidated
+    (by update_rule_config in this process or by a NOTIFY from another process).
+    """
+
+    def __init__(self, max_guilds: int):
+        self.max_guilds = max_guilds
+        self._entries: "OrderedDict[int, _CachedGuildRules]" = OrderedDict()
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_entry(self, guild_id: int) -> Optional[_CachedGuildRules]:
+        entry = self._entries.get(guild_id)
+        if entry is not None:
+            self._entries.move_to_end(guild_id)
+        return entry
+
+    def get(self, guild_id: int, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(guild_id)
+        return entry.rules if entry is not None else default
+
+    def set(self, guild_id: int, rules: Dict[str, Any], version: Optional[int]) -> None:
+        self._entries[guild_id] = _CachedGuildRules(rules, version, time.monotonic())
+        self._entries.move_to_end(guild_id)
+        while len(self._entries) > self.max_guilds:
+            evicted_guild_id, _ = self._entries.popitem(last=False)
+            logger.debug(f"Evicted rules of guild {evicted_guild_id} from cache (LRU, max {self.max_guilds}).")
+
+    def invalidate(self, guild_id: int) -> None:
+        """Forces a version probe on the next access without dropping the cached rules."""
+        entry = self._entries.get(guild_id)
+        if entry is not None:
+            entry.checked_at = float("-inf")
+
+    def invalidate_all(self) -> None:
+        for entry in self._entries.values():
+            entry.checked_at = float("-inf")
+
+    def pop(self, guild_id: int) -> None:
+        self._entries.pop(guild_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# In-memory cache for rules (LRU over guilds, versioned against GuildConfig.rules_version)
+_rules_cache = RulesCache(max_guilds=RULES_CACHE_MAX_GUILDS)
+
+# Set while a LISTEN connection is active; cached rules are then trusted longer.
+_rules_listener_connection: Optional[Any] = None
+# asyncpg connection behind _rules_listener_connection, to recognise it in the termination callback.
+_rules_listener_driver_connection: Optional[Any] = None
 
 # CRUD instance for RuleConfig
 rule_config_crud = CRUDBase(RuleConfig)
 
+
+def _current_probe_interval() -> float:
+    if _rules_listener_connection is not None:
+        return RULES_CACHE_LISTEN_PROBE_INTERVAL_SECONDS
+    return RULES_CACHE_POLL_INTERVAL_SECONDS
+
+
+async def _fetch_rules_version(db: AsyncSession, guild_id: int) -> Optional[int]:
+    """Cheap primary-key probe of GuildConfig.rules_version. Returns None if the guild has no config row."""
+    result = await db.execute(select(GuildConfig.rules_version).where(GuildConfig.id == guild_id))
+    version = result.scalar_one_or_none()
+    return version if isinstance(version, int) else None
+
+
 async def load_rules_config_for_guild(db: AsyncSession, guild_id: int) -> Dict[str, Any]:
     """
     Loads all RuleConfig entries for a specific guild from the DB and updates the cache.
     This function is intended to be called when a guild's rules need to be refreshed in the cache.
     """
     logger.debug(f"Loading rules from DB for guild_id: {guild_id}")
+    # Version is read before the rules: a concurrent update then leaves us with an older
+    # version number and newer rules, which only costs one extra reload later.
+    version = await _fetch_rules_version(db, guild_id)
     statement = select(RuleConfig).where(RuleConfig.guild_id == guild_id)
     result = await db.execute(statement)
-    # Corrected: result.scalars() is not awaitable, but result.scalars().all() is.
-    rules_from_db = await result.scalars().all()
+    rules_from_db = result.scalars().all()
 
     guild_rules: Dict[str, Any] = {}
     for rule in rules_from_db:
         guild_rules[rule.key] = rule.value_json
 
-    _rules_cache[guild_id] = guild_rules
-    logger.info(f"Loaded and cached {len(guild_rules)} rules for guild_id: {guild_id}")
+    _rules_cache.set(guild_id, guild_rules, version)
+    logger.info(f"Loaded and cached {len(guild_rules)} rules for guild_id: {guild_id} (version {version})")
     return guild_rules
 
+
+async def _get_guild_rules(db: AsyncSession, guild_id: int) -> Dict[str, Any]:
+    """
+    Returns the cached rules of a guild, probing the DB version only when the probe interval
+    has elapsed or the entry was invalidated, and reloading only if the version changed.
+    """
+    entry = _rules_cache.get_entry(guild_id)
+    if entry is None:
+        logger.info(f"Guild {guild_id} not in rule cache. Loading from DB.")
+        return await load_rules_config_for_guild(db, guild_id)
+
+    now = time.monotonic()
+    if now - entry.checked_at < _current_probe_interval():
+        return entry.rules
+
+    db_version = await _fetch_rules_version(db, guild_id)
+    if db_version != entry.version:
+        logger.info(f"Rules version for guild {guild_id} changed ({entry.version} -> {db_version}). Reloading.")
+        return await load_rules_config_for_guild(db, guild_id)
+
+    entry.checked_at = now
+    return entry.rules
+
+
 async def get_rule(db: AsyncSession, guild_id: int, key: str, default: Optional[Any] = None) -> Any:
     """
     Retrieves a specific rule value for a guild from the cache.
-    If the guild is not in the cache, it loads all rules for that guild first.
+    If the guild is not in the cache (or its cached version is stale), it loads all rules for that guild first.
     If the key is not found after loading, returns the provided default value.
 
     :param db: AsyncSession for database operations if cache needs loading.
@@ -48,11 +167,7 @@ async def get_rule(db: AsyncSession, guild_id: int, key: str, default: Optional[
     :param default: The default value to return if the key is not found.
     :return: The rule value or the default.
     """
-    if guild_id not in _rules_cache:
-        logger.info(f"Guild {guild_id} not in rule cache. Loading from DB.")
-        await load_rules_config_for_guild(db, guild_id)
-
-    guild_cache = _rules_cache.get(guild_id, {})
+    guild_cache = await _get_guild_rules(db, guild_id)
     rule_value = guild_cache.get(key)
 
     if rule_value is None:
@@ -61,11 +176,30 @@ async def get_rule(db: AsyncSession, guild_id: int, key: str, default: Optional[
 
     return rule_value
 
+async def _bump_rules_version(db: AsyncSession, guild_id: int) -> Optional[int]:
+    """Increments GuildConfig.rules_version and, on PostgreSQL, notifies other processes on commit."""
+    statement = (
+        sqlalchemy_update(GuildConfig)
+        .where(GuildConfig.id == guild_id)
+        .values(rules_version=GuildConfig.rules_version + 1)
+        .returning(GuildConfig.rules_version)
+    )
+    result = await db.execute(statement)
+    new_version = result.scalar_one_or_none()
+
+    bind = getattr(db, "bind", None)
+    dialect_name = getattr(getattr(bind, "dialect", None), "name", None)
+    if dialect_name == "postgresql":
+        # NOTIFY is transactional: listeners receive it only after this transaction commits.
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": RULES_NOTIFY_CHANNEL, "payload": str(guild_id)})
+
+    return new_version if isinstance(new_version, int) else None
+
 @transactional
 async def update_rule_config(db: AsyncSession, guild_id: int, key: str, value: Any) -> RuleConfig:
     """
     Updates or creates a rule in the DB for the specified guild.
-    After successful saving, it refreshes the cache for this guild.
+    After successful saving, it bumps the guild's rules version and refreshes the cache for this guild.
 
     :param db: The database session (provided by @transactional).
     :param guild_id: The ID of the guild.
@@ -89,6 +223,8 @@ async def update_rule_config(db: AsyncSession, guild_id: int, key: str, value: A
         updated_rule = await create_entity(db, RuleConfig, {"key": key, "value_json": value}, guild_id=guild_id)
         # create_entity already does flush and refresh
 
+    await _bump_rules_version(db, guild_id)
+
     # Refresh cache for the guild
     await load_rules_config_for_guild(db, guild_id)
     logger.info(f"Rule for guild_id: {guild_id}, key: '{key}' updated successfully. Cache refreshed.")
@@ -98,13 +234,88 @@ async def update_rule_config(db: AsyncSession, guild_id: int, key: str, value: A
 async def get_all_rules_for_guild(db: AsyncSession, guild_id: int) -> Dict[str, Any]:
     """
     Retrieves all rules for a guild, utilizing the cache.
-    If not in cache, loads from DB. This is an alias for ensuring cache is populated
-    and then returning the cached dict.
+    If not in cache (or the cached version is stale), loads from DB. This is an alias for ensuring
+    cache is populated and then returning the cached dict.
     """
-    if guild_id not in _rules_cache:
-        logger.info(f"Guild {guild_id} rules not in cache. Loading for 'get_all_rules_for_guild'.")
-        await load_rules_config_for_guild(db, guild_id)
-    return _rules_cache.get(guild_id, {})
+    return await _get_guild_rules(db, guild_id)
+
+def invalidate_guild_rules(guild_id: int) -> None:
+    """Marks a guild's cached rules as stale so the next access probes the DB version."""
+    _rules_cache.invalidate(guild_id)
+    logger.debug(f"Rules cache for guild {guild_id} invalidated.")
+
+def _on_rules_notification(connection: Any, pid: int, channel: str, payload: str) -> None:
+    """asyncpg listener callback for RULES_NOTIFY_CHANNEL; payload is the guild_id."""
+    try:
+        guild_id = int(payload)
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring malformed rules invalidation payload on '{channel}': {payload!r}")
+        return
+    invalidate_guild_rules(guild_id)
+
+async def _close_listener_connection(connection: Any) -> None:
+    try:
+        await connection.close()
+    except Exception as e:
+        logger.warning(f"Error while closing rules invalidation listener connection: {e}")
+
+def _on_rules_listener_terminated(driver_connection: Any) -> None:
+    """
+    asyncpg termination callback: the LISTEN connection is gone (server restart, network error), so
+    notifications are no longer received. Falls back to version polling; the listener can be started again.
+    """
+    global _rules_listener_connection, _rules_listener_driver_connection
+    if _rules_listener_connection is None or driver_connection is not _rules_listener_driver_connection:
+        return # Closed by stop_rules_invalidation_listener
+    connection = _rules_listener_connection
+    _rules_listener_connection, _rules_listener_driver_connection = None, None
+    # Notifications may have been missed while the connection was dying.
+    _rules_cache.invalidate_all()
+    logger.warning("Rules invalidation listener connection lost. Falling back to version polling.")
+    try:
+        asyncio.get_running_loop().create_task(_close_listener_connection(connection))
+    except RuntimeError:
+        pass # No running loop: nothing left to release
+
+async def start_rules_invalidation_listener(engine: Any) -> bool:
+    """
+    Subscribes to RULES_NOTIFY_CHANNEL on PostgreSQL so rule changes made by other bot processes
+    invalidate this process' cache immediately. On other databases (e.g. SQLite in tests) this is a
+    no-op and the cache falls back to polling GuildConfig.rules_version.
+
+    :return: True if the listener is active.
+    """
+    global _rules_listener_connection, _rules_listener_driver_connection
+    if _rules_listener_connection is not None:
+        return True
+    if engine.dialect.name != "postgresql":
+        logger.info(f"Rules invalidation listener not started: dialect '{engine.dialect.name}' has no LISTEN/NOTIFY. Using version polling.")
+        return False
+
+    connection = await engine.connect()
+    try:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        await driver_connection.add_listener(RULES_NOTIFY_CHANNEL, _on_rules_notification)
+        driver_connection.add_termination_listener(_on_rules_listener_terminated)
+    except Exception as e:
+        await connection.close()
+        logger.error(f"Failed to start rules invalidation listener: {e}. Using version polling.", exc_info=True)
+        return False
+
+    _rules_listener_connection, _rules_listener_driver_connection = connection, driver_connection
+    # Anything cached before the listener was attached may have missed notifications.
+    _rules_cache.invalidate_all()
+    logger.info(f"Rules invalidation listener started on channel '{RULES_NOTIFY_CHANNEL}'.")
+    return True
+
+async def stop_rules_invalidation_listener() -> None:
+    global _rules_listener_connection, _rules_listener_driver_connection
+    if _rules_listener_connection is None:
+        return
+    connection, _rules_listener_connection, _rules_listener_driver_connection = _rules_listener_connection, None, None
+    await _close_listener_connection(connection)
+    logger.info("Rules invalidation listener stopped.")
 
 # Example of how this might be used in bot command or event handler:
 # async def some_bot_function(guild_id: int):
@@ -121,4 +332,4 @@ async def get_all_rules_for_guild(db: AsyncSession, guild_id: int) -> Dict[str,
 #         all_guild_rules = await get_all_rules_for_guild(db_session, guild_id)
 #         print(f"All rules for guild {guild_id}: {all_guild_rules}")
 
-logger.info("RuleConfig specific utilities (load, get, update, cache) defined in core.rules.")
+logger.info("RuleConfig specific utilities (load, get, update, versioned cache, invalidation listener) defined in core.rules.")
@@ -0,0 +1,240 @@
+import logging
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from ..models import Player, GeneratedNpc
+from ..models.combat_encounter import CombatEncounter
+from .formula_engine import CompiledFormula
+
+logger = logging.getLogger(__name__)
+
+# Per-participant stat sheets for combat.
+# A StatSheet flattens everything combat reads about a participant into one dict, once: the entity's
+# base stats (Player attributes and attributes_json, GeneratedNpc properties_json["stats"]), the
+# participant's overrides from participants_json on top, an attribute modifier for every integer stat
+# (one pass of the guild's modifier formula) and the derived values (armor_class, max_hp, initiative_modifier).
+# Sheets are cached per encounter and reused across actions and combat passes. A sheet is rebuilt when the
+# rules version changes, when the participant's dict is replaced (encounter reloaded), or when the entity's
+# stat version is bumped by invalidate_stat_sheet: status effects, equipment changes and level-ups call it.
+# HP is not part of the sheet; it changes every hit and combat reads it from CombatState.
+
+StatKey = Tuple[int, str, int] # (guild_id, entity type as in participants_json, entity_id)
+
+MODIFIER_SUFFIX = "_modifier"
+DEFAULT_MODIFIER_FORMULA = "(value - 10) // 2"
+# Participant fields that change during combat or only identify the participant.
+_VOLATILE_FIELDS = frozenset({"id", "type", "current_hp", "hp", "team", "name", "base_entity_id"})
+# Player attributes that are stats; the other columns (ids, gold, xp, ...) are not. Only those set on the
+# instance are read. Attribute points spent by the player come from attributes_json.
+_PLAYER_STAT_ATTRIBUTES = (
+    "level", "strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma", "armor_class", "max_hp",
+)
+# Entity types as used by status effects and relationships, mapped to participants_json types.
+_ENTITY_TYPE_ALIASES = {"generated_npc": "npc"}
+
+_MISSING = object()
+
+
+def _normalize_entity_type(entity_type: str) -> str:
+    entity_type = entity_type.lower()
+    return _ENTITY_TYPE_ALIASES.get(entity_type, entity_type)
+
+
+# --- Invalidation ---
+
+_stat_versions: Dict[StatKey, int] = {}
+
+
+def stat_version(guild_id: int, entity_type: str, entity_id: int) -> int:
+    return _stat_versions.get((guild_id, _normalize_entity_type(entity_type), entity_id), 0)
+
+
+def invalidate_stat_sheet(guild_id: int, entity_type: str, entity_id: int) -> None:
+    """
+    Marks the cached stat sheets of an entity as stale in every combat it takes part in.
+    Call after anything that changes its stats: a status effect applied or removed, equipment changed, a level-up.
+    """
+    key = (guild_id, _normalize_entity_type(entity_type), entity_id)
+    _stat_versions[key] = _stat_versions.get(key, 0) + 1
+    logger.debug(f"Guild {guild_id}: stat sheet of {key[1]}:{entity_id} invalidated (version {_stat_versions[key]}).")
+
+
+# --- Sheet ---
+
+class StatSheet:
+    """
+    Stats of one combat participant, computed once. Read them as attributes (`sheet.strength_modifier`,
+    `sheet.armor_class`) or with `get` for names that come from rules or contain dots (`sheet.get("stats.luck")`).
+    A missing `*_modifier` resolves to the guild's default modifier, any other missing stat to the given default.
+    """
+
+    __slots__ = ("entity_type", "entity_id", "stats", "default_modifier", "rules_version", "stat_version", "_participant_data")
+
+    def __init__(
+        self,
+        entity_type: str,
+        entity_id: int,
+        stats: Dict[str, Any],
+        default_modifier: Any = 0,
+        rules_version: Optional[int] = None,
+        stat_version: int = 0,
+        participant_data: Optional[Dict[str, Any]] = None,
+    ):
+        self.entity_type = entity_type
+        self.entity_id = entity_id
+        self.stats = stats
+        self.default_modifier = default_modifier
+        self.rules_version = rules_version
+        self.stat_version = stat_version
+        self._participant_data = participant_data
+
+    def __getattr__(self, name: str) -> Any:
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise AttributeError(f"Stat '{name}' not found for {self.entity_type}:{self.entity_id}.")
+        return value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.stats
+
+    def get(self, name: str, default: Optional[Any] = None) -> Any:
+        value = self.stats.get(name, _MISSING)
+        if value is not _MISSING:
+            return value
+        if name.endswith(MODIFIER_SUFFIX):
+            return self.default_modifier
+        return default
+
+    def is_current(self, guild_id: int, participant_data: Optional[Dict[str, Any]], rules_version: Optional[int]) -> bool:
+        return (
+            self._participant_data is participant_data
+            and self.rules_version == rules_version
+            and self.stat_version == stat_version(guild_id, self.entity_type, self.entity_id)
+        )
+
+    def __repr__(self) -> str:
+        return f"<StatSheet({self.entity_type}:{self.entity_id}, stats={len(self.stats)}, version={self.stat_version})>"
+
+
+def _flatten(values: Dict[str, Any], prefix: str = "") -> Iterable[Tuple[str, Any]]:
+    """(dotted path, value) of every entry, descending into nested dicts; nested dicts are kept under their own path as well."""
+    for key, value in values.items():
+        if not isinstance(key, str):
+            continue
+        path = f"{prefix}{key}"
+        yield path, value
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{path}.")
+
+
+def _base_stats(entity: Union[Player, GeneratedNpc]) -> Dict[str, Any]:
+    if isinstance(entity, GeneratedNpc):
+        stats = (entity.properties_json or {}).get("stats")
+        return dict(_flatten(stats)) if isinstance(stats, dict) else {}
+    loaded = vars(entity) # Read from the instance dict, so an unloaded attribute never triggers a lazy load
+    stats = {key: loaded[key] for key in _PLAYER_STAT_ATTRIBUTES if key in loaded}
+    attributes = getattr(entity, "attributes_json", None)
+    if isinstance(attributes, dict):
+        stats.update(_flatten(attributes)) # Attribute points spent by the player
+    return stats
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _default_modifier(value: int) -> int:
+    return (value - 10) // 2
+
+
+def _compute_modifiers(formula: Optional[CompiledFormula], base_values: List[int]) -> List[int]:
+    if formula is None:
+        return [_default_modifier(v) for v in base_values]
+    try:
+        return [int(m) for m in formula.evaluate_many(base_values)]
+    except Exception:
+        pass
+    # Some value failed: evaluate one by one, so only the failing values get the default calculation.
+    modifiers = []
+    for value in base_values:
+        try:
+            modifiers.append(int(formula.evaluate(value=value)))
+        except Exception as e:
+            logger.error(f"Error evaluating attribute modifier formula '{formula.source}' for value {value}: {e}. Using default calculation.")
+            modifiers.append(_default_modifier(value))
+    return modifiers
+
+
+def build_stat_sheet(
+    guild_id: int,
+    entity_type: str,
+    entity_id: int,
+    participant_data: Optional[Dict[str, Any]],
+    entity: Union[Player, GeneratedNpc],
+    modifier_formula: Optional[CompiledFormula],
+    default_modifier: Any = 0,
+    default_max_hp: Optional[Any] = None,
+    rules_version: Optional[int] = None,
+) -> StatSheet:
+    """
+    Computes the sheet of a participant. Overrides from `participant_data` win over the entity's stats, and a
+    `*_modifier` override is used as is; every other modifier is computed from the (overridden) base stat.
+    A `*_modifier` stored on the entity itself is ignored, as the modifier formula is the rule.
+    """
+    entity_type = _normalize_entity_type(entity_type)
+    stats = {key: value for key, value in _base_stats(entity).items() if not key.endswith(MODIFIER_SUFFIX)}
+    override_modifiers: Dict[str, Any] = {}
+    if participant_data:
+        for key, value in _flatten(participant_data):
+            if key in _VOLATILE_FIELDS:
+                continue
+            if key.endswith(MODIFIER_SUFFIX):
+                if _is_int(value):
+                    override_modifiers[key] = value
+                continue
+            stats[key] = value
+
+    for name in _VOLATILE_FIELDS:
+        stats.pop(name, None)
+
+    base_names = [name for name, value in stats.items() if _is_int(value)]
+    modifiers = _compute_modifiers(modifier_formula, [stats[name] for name in base_names])
+    stats.update((f"{name}{MODIFIER_SUFFIX}", modifier) for name, modifier in zip(base_names, modifiers))
+    stats.update(override_modifiers)
+
+    # Derived values
+    if "max_hp" not in stats and default_max_hp is not None:
+        stats["max_hp"] = default_max_hp
+    if "initiative_modifier" not in stats:
+        stats["initiative_modifier"] = stats.get("dexterity_modifier", 0)
+
+    return StatSheet(
+        entity_type, entity_id, stats, default_modifier, rules_version,
+        stat_version(guild_id, entity_type, entity_id), participant_data,
+    )
+
+
+# --- Cache ---
+
+_sheets: "weakref.WeakKeyDictionary[CombatEncounter, Dict[Tuple[str, int], StatSheet]]" = weakref.WeakKeyDictionary()
+
+
+def get_cached_stat_sheet(
+    combat_encounter: CombatEncounter,
+    entity_type: str,
+    entity_id: int,
+    participant_data: Optional[Dict[str, Any]],
+    rules_version: Optional[int] = None,
+) -> Optional[StatSheet]:
+    """The encounter's sheet for the participant, or None if there is none or it is stale."""
+    sheet = _sheets.get(combat_encounter, {}).get((_normalize_entity_type(entity_type), entity_id))
+    if sheet is None or not sheet.is_current(combat_encounter.guild_id, participant_data, rules_version):
+        return None
+    return sheet
+
+
+def store_stat_sheet(combat_encounter: CombatEncounter, sheet: StatSheet) -> None:
+    _sheets.setdefault(combat_encounter, {})[(sheet.entity_type, sheet.entity_id)] = sheet
+
+
+logger.info("Stat sheet module loaded.")
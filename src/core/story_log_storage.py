@@ -0,0 +1,446 @@
+import asyncio
+import datetime
+import gzip
+import itertools
+import json
+import logging
+import os
+from typing import Any, AsyncContextManager, Callable, Dict, IO, List, Optional, Union
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config.settings import (
+    STORY_LOG_ARCHIVE_BATCH_SIZE,
+    STORY_LOG_ARCHIVE_DIR,
+    STORY_LOG_DEFAULT_RETENTION_DAYS,
+    STORY_LOG_MAINTENANCE_INTERVAL_SECONDS,
+    STORY_LOG_PARTITIONS_AHEAD,
+    STORY_LOG_RESTORE_HOLD_DAYS,
+)
+from ..models import GuildConfig, Location, RuleConfig, StoryLog, StoryLogArchive
+from ..models.enums import EventType
+
+logger = logging.getLogger(__name__)
+
+# Month-partitioned StoryLog storage with per-guild retention and a cold archive.
+# - PostgreSQL: story_logs is partitioned by RANGE (timestamp), one partition per UTC month
+#   (story_logs_y2026m10) plus story_logs_default (migration 0012). Partitions are created ahead of time, so an
+#   insert only touches the current month's table and indexes, whatever the size of the history.
+# - SQLite (and an unpartitioned PostgreSQL table, e.g. created by init_db): a month is a range of
+#   ix_story_logs_guild_id_timestamp; the same functions work on it, partition management is a no-op.
+# - Retention: rule "story_log:retention_days" of each guild (RuleConfig), STORY_LOG_DEFAULT_RETENTION_DAYS
+#   without it, 0 = keep forever. Months that ended before the retention cutoff are written to a gzip NDJSON
+#   file under STORY_LOG_ARCHIVE_DIR, recorded in story_log_archives and deleted from story_logs. Partitions
+#   left empty are dropped. restore_story_log_month puts a guild's month back on demand; restored events
+#   are not archived again for STORY_LOG_RESTORE_HOLD_DAYS.
+
+RETENTION_RULE_KEY = "story_log:retention_days"
+PARTITION_PREFIX = "story_logs_y"
+DEFAULT_PARTITION = "story_logs_default"
+
+Month = Union[str, datetime.datetime, datetime.date]
+
+
+# --- Months ---
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _as_utc(value: datetime.datetime) -> datetime.datetime:
+    # SQLite returns naive timestamps (UTC).
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value.astimezone(datetime.timezone.utc)
+
+
+def month_start(month: Month) -> datetime.datetime:
+    """First instant (UTC) of a month given as 'YYYY-MM', a date or a datetime."""
+    if isinstance(month, str):
+        year, _, number = month.partition("-")
+        return datetime.datetime(int(year), int(number), 1, tzinfo=datetime.timezone.utc)
+    if isinstance(month, datetime.datetime):
+        month = _as_utc(month)
+    return datetime.datetime(month.year, month.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def next_month(start: datetime.datetime) -> datetime.datetime:
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def month_key(start: datetime.datetime) -> str:
+    return f"{start.year:04d}-{start.month:02d}"
+
+
+def partition_name(start: datetime.datetime) -> str:
+    return f"{PARTITION_PREFIX}{start.year:04d}m{start.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[datetime.datetime]:
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    year, _, number = name[len(PARTITION_PREFIX):].partition("m")
+    if not (year.isdigit() and number.isdigit()):
+        return None
+    return datetime.datetime(int(year), int(number), 1, tzinfo=datetime.timezone.utc)
+
+
+# --- Partitions (PostgreSQL) ---
+
+async def is_story_log_partitioned(session: AsyncSession) -> bool:
+    if session.get_bind().dialect.name != "postgresql":
+        return False
+    stmt = text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'story_logs' AND c.relnamespace = to_regnamespace(current_schema())"
+    )
+    return (await session.execute(stmt)).scalar() is not None
+
+
+def _bound(value: datetime.datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S+00")
+
+
+async def _create_partition(session: AsyncSession, start: datetime.datetime) -> bool:
+    """Creates the month's partition if it does not exist. Rows of that month already in the default partition are moved into it."""
+    name, end = partition_name(start), next_month(start)
+    exists = (await session.execute(text("SELECT to_regclass(:name)"), {"name": name})).scalar()
+    if exists is not None:
+        return False
+    bounds = f"FROM ('{_bound(start)}') TO ('{_bound(end)}')"
+    in_range = f"\"timestamp\" >= '{_bound(start)}' AND \"timestamp\" < '{_bound(end)}'"
+    stranded = (await session.execute(text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1"))).scalar()
+    if stranded is None:
+        await session.execute(text(f"CREATE TABLE {name} PARTITION OF story_logs FOR VALUES {bounds}"))
+        return True
+    # A partition cannot be attached while the default partition holds rows of its range.
+    await session.execute(text(f"ALTER TABLE story_logs DETACH PARTITION {DEFAULT_PARTITION}"))
+    await session.execute(text(f"CREATE TABLE {name} PARTITION OF story_logs FOR VALUES {bounds}"))
+    await session.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+    await session.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"))
+    await session.execute(text(f"ALTER TABLE story_logs ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    logger.warning(f"StoryLog: moved events of {month_key(start)} from {DEFAULT_PARTITION} into the new partition {name}.")
+    return True
+
+
+async def ensure_story_log_partitions(
+    session: AsyncSession, now: Optional[datetime.datetime] = None, months_ahead: Optional[int] = None
+) -> List[str]:
+    """
+    Creates the partitions of the current month and of the next `months_ahead` months. Returns the names of the
+    created partitions. No-op unless story_logs is partitioned. Does not commit.
+    """
+    if not await is_story_log_partitioned(session):
+        return []
+    start = month_start(now or _utcnow())
+    created = []
+    for _ in range(1 + (STORY_LOG_PARTITIONS_AHEAD if months_ahead is None else months_ahead)):
+        if await _create_partition(session, start):
+            created.append(partition_name(start))
+        start = next_month(start)
+    if created:
+        logger.info(f"StoryLog: created partitions {created}.")
+    return created
+
+
+async def drop_empty_story_log_partitions(session: AsyncSession, before: datetime.datetime) -> List[str]:
+    """Drops the monthly partitions of months ended by `before` that hold no rows. Returns their names. Does not commit."""
+    if not await is_story_log_partitioned(session):
+        return []
+    names = (await session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'story_logs'"
+    ))).scalars().all()
+    dropped = []
+    for name in sorted(names):
+        start = _partition_month(name)
+        if start is None or next_month(start) > before:
+            continue
+        if (await session.execute(text(f"SELECT 1 FROM {name} LIMIT 1"))).scalar() is not None:
+            continue
+        await session.execute(text(f"ALTER TABLE story_logs DETACH PARTITION {name}"))
+        await session.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    if dropped:
+        logger.info(f"StoryLog: dropped empty partitions {dropped}.")
+    return dropped
+
+
+# --- Retention ---
+
+def _retention_days(guild_id: int, value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    logger.warning(f"Guild {guild_id}: invalid {RETENTION_RULE_KEY} rule {value!r}, using {STORY_LOG_DEFAULT_RETENTION_DAYS}.")
+    return STORY_LOG_DEFAULT_RETENTION_DAYS
+
+
+async def get_story_log_retention_days(session: AsyncSession) -> Dict[int, int]:
+    """Retention in days of every guild (0 = keep forever), from RuleConfig in one query."""
+    retention = {guild_id: STORY_LOG_DEFAULT_RETENTION_DAYS for guild_id in (await session.execute(select(GuildConfig.id))).scalars()}
+    rules = await session.execute(select(RuleConfig.guild_id, RuleConfig.value_json).where(RuleConfig.key == RETENTION_RULE_KEY))
+    for guild_id, value in rules:
+        retention[guild_id] = _retention_days(guild_id, value)
+    return retention
+
+
+def retention_cutoff(retention_days: int, now: Optional[datetime.datetime] = None) -> Optional[datetime.datetime]:
+    """Start of the first month that is kept: months that ended before now - retention_days are archived."""
+    if retention_days <= 0:
+        return None
+    return month_start((now or _utcnow()) - datetime.timedelta(days=retention_days))
+
+
+# --- Archive files ---
+
+def _archive_root(archive_dir: Optional[str]) -> str:
+    return archive_dir or STORY_LOG_ARCHIVE_DIR
+
+
+def _row_to_json(row: Any) -> str:
+    record = dict(row._mapping)
+    record["timestamp"] = _as_utc(record["timestamp"]).isoformat() if record["timestamp"] else None
+    record["event_type"] = record["event_type"].name
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def _row_from_json(line: str) -> Dict[str, Any]:
+    record = json.loads(line)
+    record["timestamp"] = datetime.datetime.fromisoformat(record["timestamp"]) if record.get("timestamp") else None
+    record["event_type"] = EventType[record["event_type"]]
+    return record
+
+
+def _open_archive_for_writing(path: str) -> IO[bytes]:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return gzip.open(path, "wb")
+
+
+def _write_lines(archive: IO[bytes], lines: List[str]) -> None:
+    archive.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def _finish_archive(archive: IO[bytes], temp_path: str, path: str) -> None:
+    archive.close()
+    with open(temp_path, "rb") as written:
+        os.fsync(written.fileno())
+    os.replace(temp_path, path)
+
+
+def _discard_archive(archive: IO[bytes], temp_path: str) -> None:
+    archive.close()
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+# --- Archive and restore ---
+
+async def archive_story_log_month(
+    session: AsyncSession, guild_id: int, month: Month, archive_dir: Optional[str] = None
+) -> Optional[StoryLogArchive]:
+    """
+    Writes a guild's events of one month to a gzip NDJSON file, records it in story_log_archives and deletes the
+    events from story_logs. The file is complete on disk before the rows are deleted. Returns None if the month
+    has no events. Does not commit.
+    """
+    start = month_start(month)
+    end = next_month(start)
+    root = _archive_root(archive_dir)
+    relative_path = os.path.join(f"guild_{guild_id}", f"{month_key(start)}-{_utcnow():%Y%m%dT%H%M%S%f}.ndjson.gz")
+    path = os.path.join(root, relative_path)
+    temp_path = f"{path}.tmp"
+
+    table = StoryLog.__table__
+    in_month = (table.c.guild_id == guild_id, table.c.timestamp >= start, table.c.timestamp < end)
+    archive = await asyncio.to_thread(_open_archive_for_writing, temp_path)
+    row_count, first_id, last_id = 0, None, 0
+    try:
+        while True:
+            # Keyset pages over the guild's month: memory stays flat however many events it holds.
+            rows = (await session.execute(
+                select(table).where(*in_month, table.c.id > last_id).order_by(table.c.id).limit(STORY_LOG_ARCHIVE_BATCH_SIZE)
+            )).all()
+            if not rows:
+                break
+            await asyncio.to_thread(_write_lines, archive, [_row_to_json(row) for row in rows])
+            row_count += len(rows)
+            first_id = rows[0].id if first_id is None else first_id
+            last_id = rows[-1].id
+        if not row_count:
+            await asyncio.to_thread(_discard_archive, archive, temp_path)
+            return None
+        await asyncio.to_thread(_finish_archive, archive, temp_path, path)
+    except BaseException:
+        await asyncio.to_thread(_discard_archive, archive, temp_path)
+        raise
+
+    await session.execute(delete(table).where(*in_month, table.c.id <= last_id))
+    # Archives of this month that were restored are superseded: their events are in the new file.
+    superseded = (await session.execute(select(StoryLogArchive).where(
+        StoryLogArchive.guild_id == guild_id, StoryLogArchive.month == month_key(start), StoryLogArchive.restored_at.isnot(None)
+    ))).scalars().all()
+    for old in superseded:
+        await session.delete(old)
+    record = StoryLogArchive(
+        guild_id=guild_id, month=month_key(start), path=relative_path,
+        row_count=row_count, first_event_id=first_id, last_event_id=last_id,
+    )
+    session.add(record)
+    await session.flush()
+    for old in superseded:
+        old_path = os.path.join(root, old.path)
+        if os.path.exists(old_path):
+            await asyncio.to_thread(os.remove, old_path)
+    logger.info(f"Guild {guild_id}: archived {row_count} StoryLog events of {month_key(start)} to {relative_path}.")
+    return record
+
+
+async def restore_story_log_month(session: AsyncSession, guild_id: int, month: Month, archive_dir: Optional[str] = None) -> int:
+    """
+    Puts a guild's archived events of one month back into story_logs, with their original ids and timestamps.
+    The archive files are kept. Returns the number of restored events. Does not commit.
+    """
+    start = month_start(month)
+    archives = (await session.execute(select(StoryLogArchive).where(
+        StoryLogArchive.guild_id == guild_id, StoryLogArchive.month == month_key(start), StoryLogArchive.restored_at.is_(None)
+    ).order_by(StoryLogArchive.id))).scalars().all()
+    if not archives:
+        return 0
+    if await is_story_log_partitioned(session):
+        await _create_partition(session, start)
+
+    restored = 0
+    for archive in archives:
+        path = os.path.join(_archive_root(archive_dir), archive.path)
+        source = await asyncio.to_thread(gzip.open, path, "rt", encoding="utf-8")
+        try:
+            while True:
+                lines = await asyncio.to_thread(lambda: list(itertools.islice(source, STORY_LOG_ARCHIVE_BATCH_SIZE)))
+                if not lines:
+                    break
+                rows = [_row_from_json(line) for line in lines if line.strip()]
+                await _clear_missing_locations(session, rows)
+                await session.execute(insert(StoryLog.__table__), rows)
+                restored += len(rows)
+        finally:
+            await asyncio.to_thread(source.close)
+        archive.restored_at = _utcnow()
+    await session.flush()
+    logger.info(f"Guild {guild_id}: restored {restored} StoryLog events of {month_key(start)} from {len(archives)} archives.")
+    return restored
+
+
+async def _clear_missing_locations(session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+    # The foreign key is ON DELETE SET NULL: a location removed since archiving is restored as NULL.
+    location_ids = {row["location_id"] for row in rows if row.get("location_id") is not None}
+    if not location_ids:
+        return
+    existing = set((await session.execute(select(Location.id).where(Location.id.in_(location_ids)))).scalars())
+    for row in rows:
+        if row.get("location_id") is not None and row["location_id"] not in existing:
+            row["location_id"] = None
+
+
+async def _held_months(session: AsyncSession, guild_id: int, now: datetime.datetime) -> set:
+    """Months of the guild restored less than STORY_LOG_RESTORE_HOLD_DAYS ago."""
+    held_since = now - datetime.timedelta(days=STORY_LOG_RESTORE_HOLD_DAYS)
+    return set((await session.execute(select(StoryLogArchive.month).where(
+        StoryLogArchive.guild_id == guild_id, StoryLogArchive.restored_at >= held_since
+    ))).scalars())
+
+
+async def archive_expired_story_logs(
+    session_maker: Callable[[], AsyncContextManager[AsyncSession]],
+    now: Optional[datetime.datetime] = None,
+    archive_dir: Optional[str] = None,
+) -> Dict[int, List[str]]:
+    """
+    Archives, for every guild with a retention period, each month that ended before its cutoff. Every month is
+    archived and committed in its own transaction. Returns the archived months per guild.
+    """
+    now = now or _utcnow()
+    async with session_maker() as session:
+        retention = await get_story_log_retention_days(session)
+
+    archived: Dict[int, List[str]] = {}
+    for guild_id, days in sorted(retention.items()):
+        cutoff = retention_cutoff(days, now)
+        if cutoff is None:
+            continue
+        async with session_maker() as session:
+            oldest = (await session.execute(select(func.min(StoryLog.timestamp)).where(
+                StoryLog.guild_id == guild_id, StoryLog.timestamp < cutoff
+            ))).scalar()
+            held = await _held_months(session, guild_id, now) if oldest is not None else set()
+        if oldest is None:
+            continue
+        start = month_start(oldest)
+        while start < cutoff:
+            if month_key(start) not in held:
+                try:
+                    async with session_maker() as session:
+                        record = await archive_story_log_month(session, guild_id, start, archive_dir)
+                        await session.commit()
+                    if record is not None:
+                        archived.setdefault(guild_id, []).append(record.month)
+                except Exception as e:
+                    logger.error(f"Guild {guild_id}: failed to archive StoryLog events of {month_key(start)}: {e}", exc_info=True)
+            start = next_month(start)
+    return archived
+
+
+# --- Maintenance ---
+
+async def run_story_log_maintenance(
+    session_maker: Optional[Callable[[], AsyncContextManager[AsyncSession]]] = None,
+    now: Optional[datetime.datetime] = None,
+    archive_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Creates upcoming partitions, archives expired months and drops the partitions left empty."""
+    if session_maker is None:
+        from .database import get_db_session
+        session_maker = get_db_session
+    now = now or _utcnow()
+    async with session_maker() as session:
+        created = await ensure_story_log_partitions(session, now)
+        await session.commit()
+    archived = await archive_expired_story_logs(session_maker, now, archive_dir)
+    async with session_maker() as session:
+        dropped = await drop_empty_story_log_partitions(session, before=month_start(now))
+        await session.commit()
+    summary = {"partitions_created": created, "archived": archived, "partitions_dropped": dropped}
+    logger.info(f"StoryLog maintenance: {summary}")
+    return summary
+
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+async def _maintenance_loop(interval: float) -> None:
+    while True:
+        try:
+            await run_story_log_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"StoryLog maintenance failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
+
+
+async def start_story_log_maintenance(interval: Optional[float] = None) -> None:
+    global _maintenance_task
+    if _maintenance_task is not None and not _maintenance_task.done():
+        return
+    interval = STORY_LOG_MAINTENANCE_INTERVAL_SECONDS if interval is None else interval
+    _maintenance_task = asyncio.create_task(_maintenance_loop(interval), name="story-log-maintenance")
+    logger.info(f"StoryLog maintenance started (every {interval}s).")
+
+
+async def stop_story_log_maintenance() -> None:
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        await asyncio.gather(_maintenance_task, return_exceptions=True)
+        _maintenance_task = None
+
+
+logger.info("StoryLog storage module loaded.")
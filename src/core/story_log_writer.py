@@ -0,0 +1,163 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+from ..models.enums import EventType
+from ..models.story_log import StoryLog
+
+logger = logging.getLogger(__name__)
+
+# Buffered StoryLog writes.
+# Sessions of the app's sessionmaker (database.AsyncSessionLocal) are StoryLogSessions: log_event appends a row
+# to the session's StoryLogBuffer instead of adding one ORM object per event, and the buffer is written with a
+# single multi-row INSERT into story_logs whenever the session flushes (explicitly, by autoflush before a query,
+# or before a savepoint begins) and at commit, even when nothing else is pending.
+# A rollback discards the buffer; a rolled back savepoint discards the rows logged inside it and not flushed yet.
+# Other sessions (scripts, tests with their own sessionmaker) have no buffer and get one StoryLog object per event.
+
+STORY_LOG_BUFFER_KEY = "story_log_buffer"
+
+# "PLAYER_ACTION" -> EventType.PLAYER_ACTION, computed once instead of an enum lookup per event.
+EVENT_TYPES_BY_NAME: Dict[str, EventType] = {member.name: member for member in EventType}
+
+StoryLogRow = Dict[str, Any]
+
+
+def resolve_event_type(event_type: str) -> Optional[EventType]:
+    """The EventType named `event_type` (case-insensitive), or None if there is none."""
+    member = EVENT_TYPES_BY_NAME.get(event_type)
+    if member is None:
+        member = EVENT_TYPES_BY_NAME.get(event_type.upper())
+    return member
+
+
+def make_story_log_row(
+    guild_id: int,
+    event_type: EventType,
+    details_json: Optional[Dict[str, Any]],
+    location_id: Optional[int] = None,
+    entity_ids_json: Optional[Dict[str, Any]] = None,
+) -> StoryLogRow:
+    # Every row has the same keys, so a buffer is written as one batch; timestamp is the server default.
+    return {
+        "guild_id": guild_id,
+        "event_type": event_type,
+        "details_json": details_json,
+        "location_id": location_id,
+        "entity_ids_json": entity_ids_json,
+    }
+
+
+class StoryLogBuffer:
+    """StoryLog rows of one session that are not written yet."""
+
+    __slots__ = ("rows", "_savepoint_marks")
+
+    def __init__(self) -> None:
+        self.rows: List[StoryLogRow] = []
+        # Open nested transaction -> number of buffered rows when it began
+        self._savepoint_marks: Dict[SessionTransaction, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def append(self, row: StoryLogRow) -> None:
+        self.rows.append(row)
+
+    def take(self) -> List[StoryLogRow]:
+        rows, self.rows = self.rows, []
+        # Written rows are undone by the database if their savepoint rolls back.
+        for transaction in self._savepoint_marks:
+            self._savepoint_marks[transaction] = 0
+        return rows
+
+    def begin_savepoint(self, transaction: SessionTransaction) -> None:
+        self._savepoint_marks[transaction] = len(self.rows)
+
+    def end_savepoint(self, transaction: SessionTransaction, rolled_back: bool) -> None:
+        mark = self._savepoint_marks.pop(transaction, None)
+        if rolled_back and mark is not None:
+            del self.rows[mark:]
+
+    def clear(self) -> None:
+        self.rows.clear()
+        self._savepoint_marks.clear()
+
+
+class StoryLogSession(Session):
+    """Session that buffers log_event rows and writes them in one INSERT per flush."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.info[STORY_LOG_BUFFER_KEY] = StoryLogBuffer()
+
+    def flush(self, objects: Optional[Any] = None) -> None:
+        _flush_buffer(self)
+        super().flush(objects)
+
+
+def get_story_log_buffer(session: AsyncSession) -> Optional[StoryLogBuffer]:
+    """The session's buffer, or None if the session does not buffer StoryLog rows."""
+    buffer = session.info.get(STORY_LOG_BUFFER_KEY)
+    return buffer if isinstance(buffer, StoryLogBuffer) else None
+
+
+def _flush_buffer(sync_session: Session) -> int:
+    buffer: Optional[StoryLogBuffer] = sync_session.info.get(STORY_LOG_BUFFER_KEY)
+    if not buffer:
+        return 0
+    rows = buffer.take()
+    # Core insert on the table: one executemany (multi-row VALUES on PostgreSQL and SQLite), no ORM events.
+    sync_session.execute(insert(StoryLog.__table__), rows)
+    logger.debug(f"StoryLog: wrote {len(rows)} buffered events.")
+    return len(rows)
+
+
+async def flush_story_log(session: AsyncSession) -> int:
+    """Writes the session's buffered StoryLog rows now. Returns the number of rows written. Does not commit."""
+    if not get_story_log_buffer(session):
+        return 0
+    return await session.run_sync(_flush_buffer)
+
+
+# --- Session hooks ---
+
+@event.listens_for(StoryLogSession, "before_commit")
+def _write_buffer_before_commit(sync_session: Session) -> None:
+    # Commit flushes only when ORM state is pending, so buffered rows are written here.
+    _flush_buffer(sync_session)
+
+
+@event.listens_for(StoryLogSession, "after_transaction_create")
+def _mark_savepoint(sync_session: Session, transaction: SessionTransaction) -> None:
+    if transaction.nested:
+        sync_session.info[STORY_LOG_BUFFER_KEY].begin_savepoint(transaction)
+
+
+@event.listens_for(StoryLogSession, "after_rollback")
+def _discard_rolled_back_rows(sync_session: Session) -> None:
+    buffer: StoryLogBuffer = sync_session.info[STORY_LOG_BUFFER_KEY]
+    savepoint = sync_session.get_nested_transaction() # Still current while its rollback is dispatched
+    if savepoint is not None:
+        buffer.end_savepoint(savepoint, rolled_back=True)
+        return
+    if buffer:
+        logger.debug(f"StoryLog: discarded {len(buffer)} buffered events on rollback.")
+    buffer.clear()
+
+
+@event.listens_for(StoryLogSession, "after_transaction_end")
+def _end_transaction(sync_session: Session, transaction: SessionTransaction) -> None:
+    buffer: StoryLogBuffer = sync_session.info[STORY_LOG_BUFFER_KEY]
+    if transaction.nested:
+        buffer.end_savepoint(transaction, rolled_back=False) # Released: its rows belong to the enclosing transaction
+    elif transaction.parent is None and buffer:
+        # Closed without commit or rollback (Session.close): nothing the rows were logged in was committed.
+        logger.debug(f"StoryLog: discarded {len(buffer)} buffered events of a closed transaction.")
+        buffer.clear()
+
+
+logger.info("StoryLog writer module loaded.")
@@ -1,29 +1,130 @@
 import logging
 import asyncio # Added import
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, union, update
 from sqlalchemy.future import select
-from typing import Callable, Awaitable, AsyncContextManager, Any # Added AsyncContextManager and Any
+from typing import Callable, Awaitable, AsyncContextManager, Any, Iterable, Optional # Added AsyncContextManager and Any
 
 from .database import get_db_session, transactional # Assuming transactional might be useful here or in called functions
 from ..models import Player, Party, GuildConfig # GuildConfig might be needed for guild-specific turn rules
 from ..models.enums import PlayerStatus, PartyTurnStatus
+from .turn_lease import acquire_guild_turn_lease, release_guild_turn_lease
+from .turn_queue import enqueue_turn_job
 
 logger = logging.getLogger(__name__)
 
-# In-memory store for guild turn processing locks. Key: guild_id, Value: True if processing.
-_guild_turn_processing_locks = {}
+# Turn processing is guarded by a lease row in the DB (see turn_lease), so only one worker in any
+# bot process claims a guild's turn at a time. The claimed turn is queued as a durable TurnJob
+# (see turn_queue); the worker that runs it keeps the lease alive until the pipeline finishes.
 
-async def _start_action_processing_worker(guild_id: int, entities_to_process: list[dict[str, Any]]):
+
+async def claim_pending_turn_entities_for_guilds(
+    session: AsyncSession, guild_ids: Optional[Iterable[int]] = None
+) -> dict[int, list[dict[str, Any]]]:
+    """
+    Set-based claim of everything waiting for turn resolution, in one statement pair:
+    1. UPDATE parties ... TURN_ENDED_PENDING_RESOLUTION -> PROCESSING_GUILD_TURN RETURNING the claimed parties;
+    2. UPDATE players ... for players in TURN_ENDED_PENDING_RESOLUTION and members of the claimed parties
+       RETURNING the claimed players.
+    guild_ids=None claims across all guilds (the caller must hold the turn lease of every affected guild).
+    Returns {guild_id: entity descriptors for process_actions_for_guild}. Players covered by a claimed party
+    are represented by the party entry only.
+    """
+    guild_filter_ids = None if guild_ids is None else list(guild_ids)
+    if guild_filter_ids is not None and not guild_filter_ids:
+        return {}
+
+    party_stmt = (
+        update(Party)
+        .where(Party.turn_status == PartyTurnStatus.TURN_ENDED_PENDING_RESOLUTION)
+        .values(turn_status=PartyTurnStatus.PROCESSING_GUILD_TURN)
+        .returning(Party.guild_id, Party.id, Party.name, Party.player_ids_json)
+        .execution_options(synchronize_session=False)
+    )
+    if guild_filter_ids is not None:
+        party_stmt = party_stmt.where(Party.guild_id.in_(guild_filter_ids))
+    claimed_parties = sorted((await session.execute(party_stmt)).all(), key=lambda row: (row.guild_id, row.id))
+
+    party_member_ids: set[int] = set()
+    for party_row in claimed_parties:
+        party_member_ids.update(party_row.player_ids_json or [])
+
+    player_condition = Player.current_status == PlayerStatus.TURN_ENDED_PENDING_RESOLUTION
+    if party_member_ids:
+        # Safeguard for members whose status was not set by /end_party_turn
+        player_condition = or_(
+            player_condition,
+            and_(Player.id.in_(party_member_ids), Player.current_status != PlayerStatus.PROCESSING_GUILD_TURN),
+        )
+    player_stmt = (
+        update(Player)
+        .where(player_condition)
+        .values(current_status=PlayerStatus.PROCESSING_GUILD_TURN)
+        .returning(Player.guild_id, Player.id, Player.discord_id)
+        .execution_options(synchronize_session=False)
+    )
+    if guild_filter_ids is not None:
+        player_stmt = player_stmt.where(Player.guild_id.in_(guild_filter_ids))
+    claimed_players = sorted((await session.execute(player_stmt)).all(), key=lambda row: (row.guild_id, row.id))
+
+    entities_by_guild: dict[int, list[dict[str, Any]]] = {}
+    for player_row in claimed_players:
+        if player_row.id in party_member_ids:
+            continue
+        entities_by_guild.setdefault(player_row.guild_id, []).append(
+            {"id": player_row.id, "type": "player", "discord_id": player_row.discord_id}
+        )
+    for party_row in claimed_parties:
+        entities_by_guild.setdefault(party_row.guild_id, []).append(
+            {"id": party_row.id, "type": "party", "name": party_row.name}
+        )
+
+    for claimed_guild_id, entities in entities_by_guild.items():
+        logger.info(f"[TURN_CONTROLLER] Guild {claimed_guild_id}: claimed {len(entities)} entities for turn processing.")
+    return entities_by_guild
+
+
+async def claim_pending_turn_entities(session: AsyncSession, guild_id: int) -> list[dict[str, Any]]:
+    """Single-guild variant of claim_pending_turn_entities_for_guilds."""
+    return (await claim_pending_turn_entities_for_guilds(session, [guild_id])).get(guild_id, [])
+
+
+async def find_guilds_with_pending_turns(session: AsyncSession) -> list[int]:
+    """Ids of all guilds with at least one player or party in TURN_ENDED_PENDING_RESOLUTION (one query)."""
+    pending_guilds = union(
+        select(Player.guild_id).where(Player.current_status == PlayerStatus.TURN_ENDED_PENDING_RESOLUTION),
+        select(Party.guild_id).where(Party.turn_status == PartyTurnStatus.TURN_ENDED_PENDING_RESOLUTION),
+    )
+    result = await session.execute(select(pending_guilds.subquery().c.guild_id).order_by("guild_id"))
+    return list(result.scalars().all())
+
+
+@transactional
+async def sweep_ready_guild_turns(session: AsyncSession) -> dict[int, int]:
     """
-    Placeholder for the actual worker that processes actions (Task 6.11).
-    entities_to_process is a list of dicts, e.g., [{'id': 1, 'type': 'player', 'discord_id': 123}]
+    Scheduler entry point: finds every guild with pending turns, takes the turn lease of each free guild,
+    claims their entities with one statement pair and queues one turn job per guild.
+    Returns {guild_id: turn_job_id}.
     """
-    logger.info(f"[TURN_CONTROLLER] Worker for Task 6.11 (Action Processing) would start now for guild_id: {guild_id}.")
-    logger.info(f"[TURN_CONTROLLER] Entities to process: {entities_to_process}")
-    # In a real scenario, this would likely be:
-    from .action_processor import process_actions_for_guild
-    asyncio.create_task(process_actions_for_guild(guild_id, entities_to_process))
-    # pass # No longer just pass
+    leases: dict[int, str] = {}
+    for guild_id in await find_guilds_with_pending_turns(session):
+        lease_token = await acquire_guild_turn_lease(session, guild_id)
+        if lease_token is not None:
+            leases[guild_id] = lease_token
+    if not leases:
+        return {}
+
+    entities_by_guild = await claim_pending_turn_entities_for_guilds(session, leases.keys())
+    queued_jobs: dict[int, int] = {}
+    for guild_id, lease_token in leases.items():
+        entities = entities_by_guild.get(guild_id)
+        if not entities:
+            await release_guild_turn_lease(session, guild_id, lease_token)
+            continue
+        job = await enqueue_turn_job(session, guild_id, entities, lease_owner=lease_token)
+        queued_jobs[guild_id] = job.id
+    logger.info(f"[TURN_CONTROLLER] Sweep queued turn jobs for {len(queued_jobs)} guilds: {queued_jobs}")
+    return queued_jobs
 
 
 @transactional # Ensures DB operations within are atomic if this function itself does them.
@@ -34,92 +135,46 @@ async def process_guild_turn_if_ready(session: AsyncSession, guild_id: int):
     """
     logger.info(f"[TURN_CONTROLLER] Checking if guild turn can be processed for guild_id: {guild_id}")
 
-    if _guild_turn_processing_locks.get(guild_id):
+    lease_token = await acquire_guild_turn_lease(session, guild_id)
+    if lease_token is None:
         logger.info(f"[TURN_CONTROLLER] Guild {guild_id} turn is already being processed. Skipping.")
         return
+    lease_handed_to_worker = False
 
     # --- Condition Check (MVP) ---
     # For MVP, we assume that if this function is called, and not already locked,
     # we can try to process. A more robust check would verify if all *expected*
     # players/parties have submitted their turns.
+    entities_for_action_module: list[dict[str, Any]] = []
 
-    # Fetch players and parties that have ended their turn and are pending resolution
-    stmt_players = select(Player).where(
-        Player.guild_id == guild_id,
-        Player.current_status == PlayerStatus.TURN_ENDED_PENDING_RESOLUTION
-    )
-    result_players = await session.execute(stmt_players)
-    players_pending = result_players.scalars().all()
-
-    stmt_parties = select(Party).where(
-        Party.guild_id == guild_id,
-        Party.turn_status == PartyTurnStatus.TURN_ENDED_PENDING_RESOLUTION
-    )
-    result_parties = await session.execute(stmt_parties)
-    parties_pending = result_parties.scalars().all()
-
-    if not players_pending and not parties_pending:
-        logger.info(f"[TURN_CONTROLLER] No players or parties pending turn resolution for guild {guild_id}. Nothing to process.")
-        return
-
-    # --- Lock and Proceed ---
-    _guild_turn_processing_locks[guild_id] = True
-    logger.info(f"[TURN_CONTROLLER] Acquired processing lock for guild {guild_id}.")
+    try:
+        # Flip pending players, parties and party members to PROCESSING_GUILD_TURN (two UPDATE ... RETURNING statements)
+        entities_for_action_module = await claim_pending_turn_entities(session, guild_id)
 
-    entities_for_action_module = []
+        if not entities_for_action_module:
+            logger.info(f"[TURN_CONTROLLER] No players or parties pending turn resolution for guild {guild_id}. Nothing to process.")
+            return # The lease is released in `finally`
 
-    try:
-        # Update statuses to PROCESSING_GUILD_TURN
-        for player in players_pending:
-            player.current_status = PlayerStatus.PROCESSING_GUILD_TURN
-            session.add(player)
-            entities_for_action_module.append({"id": player.id, "type": "player", "discord_id": player.discord_id})
-            logger.info(f"[TURN_CONTROLLER] Player {player.id} status set to PROCESSING_GUILD_TURN.")
-
-        for party in parties_pending:
-            party.turn_status = PartyTurnStatus.PROCESSING_GUILD_TURN
-            session.add(party)
-            entities_for_action_module.append({"id": party.id, "type": "party", "name": party.name})
-            logger.info(f"[TURN_CONTROLLER] Party {party.id} status set to PROCESSING_GUILD_TURN.")
-
-            # Also update statuses of players within these parties if not already covered
-            # (though they should have been set by /end_party_turn)
-            for player_id_int in (party.player_ids_json or []):
-                member_player = await session.get(Player, player_id_int)
-                if member_player and member_player.current_status != PlayerStatus.PROCESSING_GUILD_TURN:
-                    # This is a safeguard or for players who were not individually processed
-                    # but whose party is now being processed.
-                    member_player.current_status = PlayerStatus.PROCESSING_GUILD_TURN
-                    session.add(member_player)
-                    logger.info(f"[TURN_CONTROLLER] Player {member_player.id} (in party {party.id}) status set to PROCESSING_GUILD_TURN.")
-
-
-        # The commit for status updates should happen within the @transactional scope of this function
-        # or, if called by another @transactional function, as part of that outer transaction.
-        # For clarity, if this is the main entry point for this logic, @transactional here is good.
-
-        # Call the (placeholder) async worker for the Action Processing Module (Task 6.11)
-        # This should not block the current flow.
-        # In a real scenario, use asyncio.create_task or a proper task queue system.
-        if entities_for_action_module:
-            logger.info(f"[TURN_CONTROLLER] Starting action processing worker for guild {guild_id} with entities: {entities_for_action_module}")
-            # For MVP, we'll call it directly and it will be a simple log.
-            # In a real app, this would be:
-            import asyncio # Ensure asyncio is imported at the top of the file if not already
-            asyncio.create_task(_start_action_processing_worker(guild_id, entities_for_action_module))
-            # await _start_action_processing_worker(guild_id, entities_for_action_module) # No longer direct await
-            logger.info(f"[TURN_CONTROLLER] Action processing worker task created for guild {guild_id}.")
-        else:
-            logger.info(f"[TURN_CONTROLLER] No entities to send to action processing worker for guild {guild_id}.")
+        logger.info(f"[TURN_CONTROLLER] Acquired turn lease {lease_token} for guild {guild_id}.")
 
+        # Queue the action processing job in this same transaction: if the status updates are rolled back,
+        # the job is too. A worker of the turn job pool picks it up after commit.
+        job = await enqueue_turn_job(session, guild_id, entities_for_action_module, lease_owner=lease_token)
+        lease_handed_to_worker = True
+        logger.info(f"[TURN_CONTROLLER] Turn job {job.id} queued for guild {guild_id} with entities: {entities_for_action_module}")
 
     except Exception as e:
         logger.error(f"[TURN_CONTROLLER] Error during guild turn processing for guild {guild_id}: {e}", exc_info=True)
         # Rollback will be handled by @transactional if an error occurs before commit
         # Reset statuses if appropriate, or handle error states
     finally:
-        _guild_turn_processing_locks.pop(guild_id, None)
-        logger.info(f"[TURN_CONTROLLER] Released processing lock for guild {guild_id}.")
+        if not lease_handed_to_worker:
+            try:
+                await release_guild_turn_lease(session, guild_id, lease_token)
+                logger.info(f"[TURN_CONTROLLER] Released turn lease for guild {guild_id}.")
+            except Exception as release_e:
+                # The lease will expire on its own after GUILD_TURN_LEASE_TTL_SECONDS.
+                logger.error(f"[TURN_CONTROLLER] Failed to release turn lease for guild {guild_id}: {release_e}", exc_info=True)
 
 # This function will be called by the TurnManagementCog commands
 async def trigger_guild_turn_processing(guild_id: int, session_maker: Callable[[], AsyncContextManager[AsyncSession]]):
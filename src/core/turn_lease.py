@@ -0,0 +1,197 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import os
+import socket
+import uuid
+from typing import AsyncContextManager, AsyncIterator, Callable, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config.settings import GUILD_TURN_LEASE_TTL_SECONDS, GUILD_TURN_LEASE_HEARTBEAT_SECONDS
+from ..models.guild_turn_lease import GuildTurnLease
+from .database import get_db_session
+
+logger = logging.getLogger(__name__)
+
+# Identifies this bot process in lease rows; every acquisition appends a random suffix,
+# so two workers in the same process never share a token.
+PROCESS_OWNER_PREFIX = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def new_lease_token() -> str:
+    return f"{PROCESS_OWNER_PREFIX}:{uuid.uuid4().hex[:12]}"
+
+
+async def _insert_lease_if_absent(session: AsyncSession, values: dict) -> bool:
+    """INSERT ... ON CONFLICT DO NOTHING; returns True if the row was created."""
+    dialect_name = session.get_bind().dialect.name
+    if dialect_name in ("postgresql", "sqlite"):
+        insert_fn = pg_insert if dialect_name == "postgresql" else sqlite_insert
+        stmt = insert_fn(GuildTurnLease).values(**values).on_conflict_do_nothing(index_elements=[GuildTurnLease.guild_id])
+        result = await session.execute(stmt)
+        return result.rowcount == 1
+    try:
+        async with session.begin_nested():
+            session.add(GuildTurnLease(**values))
+        return True
+    except IntegrityError:
+        return False
+
+
+async def acquire_guild_turn_lease(
+    session: AsyncSession,
+    guild_id: int,
+    ttl_seconds: Optional[float] = None,
+    owner_id: Optional[str] = None
+) -> Optional[str]:
+    """
+    Tries to take the turn lease of a guild. Succeeds if nobody holds it or the current lease has expired.
+    Returns the lease token (owner_id) on success, None if another worker holds a live lease.
+    The lease becomes visible to other processes when the caller's transaction commits; on PostgreSQL a
+    concurrent acquirer blocks on the row until then and then sees it as taken.
+    """
+    token = owner_id or new_lease_token()
+    ttl = GUILD_TURN_LEASE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    now = _utcnow()
+    values = {
+        "guild_id": guild_id,
+        "owner_id": token,
+        "acquired_at": now,
+        "heartbeat_at": now,
+        "expires_at": now + datetime.timedelta(seconds=ttl),
+    }
+
+    if await _insert_lease_if_absent(session, values):
+        logger.info(f"Guild {guild_id}: turn lease acquired by {token} (ttl {ttl}s).")
+        return token
+
+    takeover_stmt = (
+        update(GuildTurnLease)
+        .where(GuildTurnLease.guild_id == guild_id, GuildTurnLease.expires_at < now)
+        .values(owner_id=token, acquired_at=now, heartbeat_at=now, expires_at=values["expires_at"])
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(takeover_stmt)
+    if result.rowcount == 1:
+        logger.warning(f"Guild {guild_id}: took over an expired turn lease, new owner {token}.")
+        return token
+
+    logger.info(f"Guild {guild_id}: turn lease is held by another worker.")
+    return None
+
+
+async def renew_guild_turn_lease(
+    session: AsyncSession, guild_id: int, owner_id: str, ttl_seconds: Optional[float] = None
+) -> bool:
+    """Heartbeat: extends the lease if `owner_id` still holds it. Returns False if the lease was lost."""
+    ttl = GUILD_TURN_LEASE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    now = _utcnow()
+    stmt = (
+        update(GuildTurnLease)
+        .where(GuildTurnLease.guild_id == guild_id, GuildTurnLease.owner_id == owner_id)
+        .values(heartbeat_at=now, expires_at=now + datetime.timedelta(seconds=ttl))
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    return result.rowcount == 1
+
+
+async def release_guild_turn_lease(session: AsyncSession, guild_id: int, owner_id: str) -> bool:
+    """Drops the lease if `owner_id` still holds it. Returns True if a row was deleted."""
+    stmt = (
+        delete(GuildTurnLease)
+        .where(GuildTurnLease.guild_id == guild_id, GuildTurnLease.owner_id == owner_id)
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    released = result.rowcount == 1
+    if released:
+        logger.info(f"Guild {guild_id}: turn lease released by {owner_id}.")
+    return released
+
+
+async def get_guild_turn_lease(session: AsyncSession, guild_id: int) -> Optional[GuildTurnLease]:
+    result = await session.execute(select(GuildTurnLease).where(GuildTurnLease.guild_id == guild_id))
+    return result.scalars().first()
+
+
+class GuildTurnLeaseLost(RuntimeError):
+    """The guild turn lease was taken over while the turn was still being processed."""
+
+    def __init__(self, guild_id: int, owner_id: str):
+        super().__init__(f"Guild {guild_id}: turn lease of {owner_id} was lost.")
+        self.guild_id = guild_id
+        self.owner_id = owner_id
+
+
+class HeldLease:
+    """State of a lease kept alive by hold_guild_turn_lease; `lost` is set if a heartbeat found it taken over."""
+
+    def __init__(self, guild_id: int, owner_id: str):
+        self.guild_id = guild_id
+        self.owner_id = owner_id
+        self.lost = False
+
+
+@contextlib.asynccontextmanager
+async def hold_guild_turn_lease(
+    guild_id: int,
+    owner_id: str,
+    session_maker: Optional[Callable[[], AsyncContextManager[AsyncSession]]] = None,
+    ttl_seconds: Optional[float] = None,
+    heartbeat_seconds: Optional[float] = None
+) -> AsyncIterator[HeldLease]:
+    """
+    Keeps an already acquired lease alive with a background heartbeat while the body runs,
+    and releases it on exit (also on error). Each heartbeat and the release use their own short session.
+    """
+    session_maker = session_maker or get_db_session
+    interval = GUILD_TURN_LEASE_HEARTBEAT_SECONDS if heartbeat_seconds is None else heartbeat_seconds
+    held = HeldLease(guild_id, owner_id)
+    stop_event = asyncio.Event()
+
+    async def _heartbeat() -> None:
+        while True:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                async with session_maker() as session:
+                    renewed = await renew_guild_turn_lease(session, guild_id, owner_id, ttl_seconds)
+                    await session.commit()
+            except Exception as e:
+                logger.error(f"Guild {guild_id}: turn lease heartbeat failed: {e}", exc_info=True)
+                continue
+            if not renewed:
+                held.lost = True
+                logger.error(f"Guild {guild_id}: turn lease of {owner_id} was lost (expired and taken over).")
+                return
+
+    heartbeat_task = asyncio.create_task(_heartbeat())
+    try:
+        yield held
+    finally:
+        stop_event.set()
+        with contextlib.suppress(Exception):
+            await heartbeat_task
+        try:
+            async with session_maker() as session:
+                await release_guild_turn_lease(session, guild_id, owner_id)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Guild {guild_id}: failed to release turn lease of {owner_id}: {e}", exc_info=True)
+
+
+logger.info("Turn lease module loaded.")
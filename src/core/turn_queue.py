@@ -0,0 +1,516 @@
+import asyncio
+import datetime
+import logging
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, event, exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..config.settings import (
+    GUILD_TURN_LEASE_TTL_SECONDS,
+    TURN_JOB_WORKERS,
+    TURN_JOB_MAX_ATTEMPTS,
+    TURN_JOB_RETRY_BASE_SECONDS,
+    TURN_JOB_RETRY_MAX_SECONDS,
+    TURN_JOB_POLL_INTERVAL_SECONDS,
+    TURN_JOB_SWEEP_INTERVAL_SECONDS,
+)
+from ..models import Player, Party
+from ..models.enums import PlayerStatus, PartyTurnStatus, TurnJobStatus
+from ..models.guild_turn_lease import GuildTurnLease
+from ..models.turn_job import TurnJob
+from .database import get_db_session
+from .turn_lease import (
+    PROCESS_OWNER_PREFIX,
+    HeldLease,
+    acquire_guild_turn_lease,
+    renew_guild_turn_lease,
+    hold_guild_turn_lease,
+)
+
+logger = logging.getLogger(__name__)
+
+# Guild turns are persisted as TurnJob rows and executed by a pool of async workers:
+# - FIFO per guild: a job is only claimed when its guild has no running job and no older queued job;
+# - global limit: each process runs at most TURN_JOB_WORKERS jobs at once, the rest wait in the table;
+# - retries: a job whose pipeline raised goes back to QUEUED with exponential backoff until max_attempts;
+# - crash safety: RUNNING jobs whose guild lease is gone are re-queued on startup and by a periodic sweep,
+#   jobs left RUNNING by an earlier process with this worker identity are re-queued on startup, and guilds
+#   left in PROCESSING_GUILD_TURN without any job get a new one;
+# - missed triggers: the periodic sweep also queues the turns of guilds with entities still waiting in
+#   TURN_ENDED_PENDING_RESOLUTION (e.g. a turn ended while the guild's lease was held by a running turn).
+
+ProcessTurnFn = Callable[[int, List[Dict[str, Any]]], Awaitable[Any]]
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def compute_retry_delay(attempts: int) -> float:
+    """Exponential backoff in seconds after the given number of failed attempts."""
+    return min(TURN_JOB_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)), TURN_JOB_RETRY_MAX_SECONDS)
+
+
+async def enqueue_turn_job(
+    session: AsyncSession,
+    guild_id: int,
+    entities: List[Dict[str, Any]],
+    lease_owner: Optional[str] = None,
+    max_attempts: Optional[int] = None
+) -> TurnJob:
+    """
+    Adds a turn job in the caller's transaction. Local workers are woken up once that transaction commits.
+    """
+    now = _utcnow()
+    job = TurnJob(
+        guild_id=guild_id,
+        status=TurnJobStatus.QUEUED,
+        entities_json=entities,
+        lease_owner=lease_owner,
+        attempts=0,
+        max_attempts=max_attempts if max_attempts is not None else TURN_JOB_MAX_ATTEMPTS,
+        created_at=now,
+        available_at=now,
+    )
+    session.add(job)
+    await session.flush()
+    if isinstance(session, AsyncSession):
+        event.listen(session.sync_session, "after_commit", lambda _s: notify_turn_job_workers(), once=True)
+    logger.info(f"Guild {guild_id}: turn job {job.id} queued for {len(entities)} entities.")
+    return job
+
+
+async def claim_next_turn_job(session: AsyncSession, worker_id: str) -> Optional[TurnJob]:
+    """
+    Atomically moves the next eligible job to RUNNING and returns it (None if nothing is claimable).
+    Eligible: QUEUED, available, and first in line for its guild with no RUNNING job of the same guild.
+    """
+    now = _utcnow()
+    running_job = aliased(TurnJob)
+    earlier_job = aliased(TurnJob)
+    next_job_id = (
+        select(TurnJob.id)
+        .where(
+            TurnJob.status == TurnJobStatus.QUEUED,
+            TurnJob.available_at <= now,
+            ~exists().where(running_job.guild_id == TurnJob.guild_id, running_job.status == TurnJobStatus.RUNNING),
+            ~exists().where(earlier_job.guild_id == TurnJob.guild_id, earlier_job.status == TurnJobStatus.QUEUED, earlier_job.id < TurnJob.id),
+        )
+        .order_by(TurnJob.available_at, TurnJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(TurnJob)
+        .where(TurnJob.id == next_job_id, TurnJob.status == TurnJobStatus.QUEUED)
+        .values(status=TurnJobStatus.RUNNING, attempts=TurnJob.attempts + 1, locked_by=worker_id, started_at=now)
+        .returning(TurnJob)
+        .execution_options(synchronize_session=False)
+    )
+    return (await session.execute(stmt)).scalars().first()
+
+
+async def complete_turn_job(session: AsyncSession, job_id: int) -> None:
+    await session.execute(
+        update(TurnJob)
+        .where(TurnJob.id == job_id)
+        .values(status=TurnJobStatus.SUCCEEDED, finished_at=_utcnow(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def defer_turn_job(session: AsyncSession, job_id: int, delay: float, reason: str) -> bool:
+    """
+    Puts a RUNNING job back in the queue after `delay` seconds without using up an attempt
+    (the job did not run, e.g. its guild lease is held elsewhere). Returns False if the job is no longer RUNNING.
+    """
+    result = await session.execute(
+        update(TurnJob)
+        .where(TurnJob.id == job_id, TurnJob.status == TurnJobStatus.RUNNING)
+        .values(
+            status=TurnJobStatus.QUEUED,
+            attempts=TurnJob.attempts - 1,
+            locked_by=None,
+            started_at=None,
+            available_at=_utcnow() + datetime.timedelta(seconds=delay),
+            last_error=reason[:2000],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def fail_turn_job(session: AsyncSession, job_id: int, error: str) -> Optional[TurnJobStatus]:
+    """Re-queues the job with backoff, or marks it FAILED once max_attempts is reached. Returns the new status."""
+    job = await session.get(TurnJob, job_id)
+    if job is None:
+        return None
+    job.last_error = error[:2000]
+    job.locked_by = None
+    if job.attempts < job.max_attempts:
+        delay = compute_retry_delay(job.attempts)
+        job.status = TurnJobStatus.QUEUED
+        job.available_at = _utcnow() + datetime.timedelta(seconds=delay)
+        logger.warning(f"Guild {job.guild_id}: turn job {job.id} failed (attempt {job.attempts}/{job.max_attempts}), retrying in {delay}s: {error}")
+    else:
+        job.status = TurnJobStatus.FAILED
+        job.finished_at = _utcnow()
+        logger.error(f"Guild {job.guild_id}: turn job {job.id} failed permanently after {job.attempts} attempts: {error}")
+    session.add(job)
+    return job.status
+
+
+async def requeue_orphaned_turn_jobs(
+    session: AsyncSession,
+    owner_prefix: Optional[str] = None,
+    min_running_seconds: float = 0.0
+) -> List[int]:
+    """
+    RUNNING jobs whose guild lease is no longer held by the job (worker crashed and the lease expired)
+    are put back in the queue, or failed if they already used all attempts. Returns the affected job ids.
+    owner_prefix: jobs locked by a worker id with this prefix are orphaned even if their lease is still live
+    (this process restarted under the identity of the one that crashed, before the lease expired).
+    min_running_seconds: jobs claimed more recently are left alone, since a worker re-acquires an expired
+    lease right after claiming its job.
+    """
+    now = _utcnow()
+    live_lease = exists().where(
+        GuildTurnLease.guild_id == TurnJob.guild_id,
+        GuildTurnLease.owner_id == TurnJob.lease_owner,
+        GuildTurnLease.expires_at >= now,
+    )
+    orphan_condition = ~live_lease
+    if min_running_seconds > 0:
+        orphan_condition = and_(orphan_condition, TurnJob.started_at <= now - datetime.timedelta(seconds=min_running_seconds))
+    if owner_prefix:
+        orphan_condition = or_(orphan_condition, TurnJob.locked_by.startswith(owner_prefix, autoescape=True))
+    orphaned = (await session.execute(
+        select(TurnJob).where(TurnJob.status == TurnJobStatus.RUNNING, orphan_condition)
+    )).scalars().all()
+    for job in orphaned:
+        await fail_turn_job(session, job.id, f"Worker {job.locked_by} stopped while processing the job.")
+    return [job.id for job in orphaned]
+
+
+async def recover_stuck_guild_turns(session: AsyncSession) -> List[TurnJob]:
+    """
+    Queues a job for every guild that still has players/parties in PROCESSING_GUILD_TURN but no QUEUED or
+    RUNNING job (e.g. the process died between claiming the turn and queueing it under the old create_task flow).
+    Guilds whose turn lease is currently held by someone else are skipped.
+    """
+    active_job = exists().where(
+        TurnJob.status.in_([TurnJobStatus.QUEUED, TurnJobStatus.RUNNING])
+    )
+    stuck_players = (await session.execute(
+        select(Player.guild_id, Player.id, Player.discord_id)
+        .where(Player.current_status == PlayerStatus.PROCESSING_GUILD_TURN, ~active_job.where(TurnJob.guild_id == Player.guild_id))
+        .order_by(Player.guild_id, Player.id)
+    )).all()
+    stuck_parties = (await session.execute(
+        select(Party.guild_id, Party.id, Party.name)
+        .where(Party.turn_status == PartyTurnStatus.PROCESSING_GUILD_TURN, ~active_job.where(TurnJob.guild_id == Party.guild_id))
+        .order_by(Party.guild_id, Party.id)
+    )).all()
+
+    entities_by_guild: Dict[int, List[Dict[str, Any]]] = {}
+    for guild_id, player_id, discord_id in stuck_players:
+        entities_by_guild.setdefault(guild_id, []).append({"id": player_id, "type": "player", "discord_id": discord_id})
+    for guild_id, party_id, party_name in stuck_parties:
+        entities_by_guild.setdefault(guild_id, []).append({"id": party_id, "type": "party", "name": party_name})
+
+    recovered_jobs: List[TurnJob] = []
+    for guild_id, entities in entities_by_guild.items():
+        lease_token = await acquire_guild_turn_lease(session, guild_id)
+        if lease_token is None:
+            continue
+        recovered_jobs.append(await enqueue_turn_job(session, guild_id, entities, lease_owner=lease_token))
+        logger.warning(f"Guild {guild_id}: recovered a turn stuck in PROCESSING_GUILD_TURN ({len(entities)} entities).")
+    return recovered_jobs
+
+
+async def get_turn_queue_metrics(session: AsyncSession) -> Dict[str, Any]:
+    """Queue depth per status and the age (seconds) of the oldest job still waiting to run."""
+    counts = {status.value: 0 for status in TurnJobStatus}
+    for status, count in (await session.execute(select(TurnJob.status, func.count()).group_by(TurnJob.status))).all():
+        counts[status.value] = count
+    oldest_queued = (await session.execute(
+        select(func.min(TurnJob.created_at)).where(TurnJob.status == TurnJobStatus.QUEUED)
+    )).scalar()
+    oldest_age = None
+    if oldest_queued is not None:
+        now = _utcnow() if oldest_queued.tzinfo else _utcnow().replace(tzinfo=None)
+        oldest_age = round((now - oldest_queued).total_seconds(), 3)
+    return {"depth": counts, "oldest_queued_age_seconds": oldest_age}
+
+
+class TurnQueueStats:
+    """In-process counters of a worker pool (latencies in milliseconds)."""
+
+    def __init__(self) -> None:
+        self.jobs_succeeded = 0
+        self.jobs_failed = 0
+        self.jobs_retried = 0
+        self.jobs_deferred = 0
+        self.jobs_lease_lost = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.in_flight = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        finished = self.jobs_succeeded + self.jobs_failed + self.jobs_retried
+        return {
+            "jobs_succeeded": self.jobs_succeeded,
+            "jobs_failed": self.jobs_failed,
+            "jobs_retried": self.jobs_retried,
+            "jobs_deferred": self.jobs_deferred,
+            "jobs_lease_lost": self.jobs_lease_lost,
+            "in_flight": self.in_flight,
+            "avg_wait_ms": round(self.total_wait_ms / finished, 2) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "avg_run_ms": round(self.total_run_ms / finished, 2) if finished else 0.0,
+        }
+
+
+class TurnJobWorkerPool:
+    """
+    A fixed number of asyncio workers that claim and run TurnJobs. Several bot processes can run a pool
+    against the same database; claiming is a single conditional UPDATE, so a job is run by one worker only.
+    """
+
+    def __init__(
+        self,
+        session_maker: Optional[Callable[[], AsyncContextManager[AsyncSession]]] = None,
+        worker_count: Optional[int] = None,
+        process_fn: Optional[ProcessTurnFn] = None,
+        poll_interval: Optional[float] = None,
+        sweep_interval: Optional[float] = None
+    ):
+        self._session_maker = session_maker or get_db_session
+        self.worker_count = max(1, worker_count if worker_count is not None else TURN_JOB_WORKERS)
+        self._process_fn = process_fn
+        self._poll_interval = TURN_JOB_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self._sweep_interval = TURN_JOB_SWEEP_INTERVAL_SECONDS if sweep_interval is None else sweep_interval
+        self.worker_id_prefix = f"{PROCESS_OWNER_PREFIX}:w"
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = TurnQueueStats()
+
+    async def _process(self, guild_id: int, entities: List[Dict[str, Any]], lease: HeldLease) -> None:
+        if self._process_fn is not None:
+            await self._process_fn(guild_id, entities)
+            return
+        from .action_processor import process_actions_for_guild
+        await process_actions_for_guild(guild_id, entities, lease=lease)
+
+    async def recover(self, owner_prefix: Optional[str] = None) -> None:
+        async with self._session_maker() as session:
+            requeued = await requeue_orphaned_turn_jobs(session, owner_prefix=owner_prefix)
+            recovered = await recover_stuck_guild_turns(session)
+            await session.commit()
+        if requeued or recovered:
+            logger.warning(f"Turn queue recovery: re-queued jobs {requeued}, created {len(recovered)} jobs for stuck guild turns.")
+
+    async def start(self, recover: bool = True) -> None:
+        if self._workers:
+            return
+        self._stopping = False
+        if recover:
+            try:
+                # No worker of this pool runs yet: anything still locked under its worker ids is left from a crash.
+                await self.recover(owner_prefix=self.worker_id_prefix)
+            except Exception as e:
+                logger.error(f"Turn queue recovery failed: {e}", exc_info=True)
+        self._workers = [
+            asyncio.create_task(self._worker_loop(f"{self.worker_id_prefix}{i}"), name=f"turn-job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        if self._sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="turn-job-sweeper")
+        logger.info(f"Turn job worker pool started with {self.worker_count} workers.")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        tasks = self._workers + ([self._sweeper] if self._sweeper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._sweeper = None
+        logger.info(f"Turn job worker pool stopped. Stats: {self.stats.as_dict()}")
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def sweep(self) -> Dict[str, Any]:
+        """
+        Re-queues RUNNING jobs whose worker died after startup recovery (its guild lease expired), then queues
+        the turns of guilds whose pending entities were not picked up (see turn_controller.sweep_ready_guild_turns).
+        Returns {"requeued": [job_id, ...], "queued": {guild_id: job_id}}.
+        """
+        from .turn_controller import sweep_ready_guild_turns # turn_controller imports this module
+
+        async with self._session_maker() as session:
+            requeued = await requeue_orphaned_turn_jobs(session, min_running_seconds=GUILD_TURN_LEASE_TTL_SECONDS)
+            await session.commit()
+        if requeued:
+            logger.warning(f"Turn queue sweep: re-queued orphaned jobs {requeued}.")
+            self.notify()
+        async with self._session_maker() as session:
+            queued = await sweep_ready_guild_turns(session)
+            await session.commit()
+        return {"requeued": requeued, "queued": queued}
+
+    async def _sweep_loop(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self._sweep_interval)
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Turn queue sweep failed: {e}", exc_info=True)
+
+    async def _worker_loop(self, worker_id: str) -> None:
+        while not self._stopping:
+            try:
+                ran_job = await self.run_one(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Turn job worker {worker_id}: unexpected error: {e}", exc_info=True)
+                ran_job = False
+            if ran_job:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_one(self, worker_id: str) -> bool:
+        """Claims and runs one job. Returns False if no job was claimable."""
+        async with self._session_maker() as session:
+            job = await claim_next_turn_job(session, worker_id)
+            await session.commit()
+        if job is None:
+            return False
+
+        lease_owner = await self._ensure_lease(job)
+        if lease_owner is None:
+            # Another worker holds the guild lease: running now could process the guild's turn twice.
+            async with self._session_maker() as session:
+                await defer_turn_job(session, job.id, TURN_JOB_RETRY_BASE_SECONDS, "Guild turn lease held by another worker.")
+                await session.commit()
+            self.stats.jobs_deferred += 1
+            logger.warning(f"Guild {job.guild_id}: turn job {job.id} deferred by {TURN_JOB_RETRY_BASE_SECONDS}s, the guild turn lease is held by another worker.")
+            return True
+
+        self.stats.in_flight += 1
+        try:
+            wait_ms = max(0.0, (job.started_at - job.created_at).total_seconds() * 1000) if job.started_at and job.created_at else 0.0
+            started = asyncio.get_running_loop().time()
+            error: Optional[str] = None
+            lease_lost = False
+            try:
+                async with hold_guild_turn_lease(job.guild_id, lease_owner, session_maker=self._session_maker) as held:
+                    try:
+                        await self._process(job.guild_id, job.entities_json, held)
+                    finally:
+                        lease_lost = held.lost
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.error(f"Guild {job.guild_id}: turn job {job.id} raised: {error}", exc_info=True)
+            run_ms = (asyncio.get_running_loop().time() - started) * 1000
+
+            if lease_lost:
+                # The sweep re-queues a job whose lease is gone, and another worker may already run it:
+                # its status belongs to that worker now.
+                self.stats.jobs_lease_lost += 1
+                logger.error(f"Guild {job.guild_id}: turn job {job.id} lost its guild turn lease while running; its status is left to the sweep.")
+                return True
+
+            async with self._session_maker() as session:
+                if error is None:
+                    await complete_turn_job(session, job.id)
+                    new_status: Optional[TurnJobStatus] = TurnJobStatus.SUCCEEDED
+                else:
+                    new_status = await fail_turn_job(session, job.id, error)
+                await session.commit()
+        finally:
+            self.stats.in_flight -= 1
+
+        self.stats.total_wait_ms += wait_ms
+        self.stats.max_wait_ms = max(self.stats.max_wait_ms, wait_ms)
+        self.stats.total_run_ms += run_ms
+        if new_status == TurnJobStatus.SUCCEEDED:
+            self.stats.jobs_succeeded += 1
+        elif new_status == TurnJobStatus.QUEUED:
+            self.stats.jobs_retried += 1
+        else:
+            self.stats.jobs_failed += 1
+        logger.info(f"Guild {job.guild_id}: turn job {job.id} {new_status.value if new_status else 'missing'} (waited {wait_ms:.1f}ms, ran {run_ms:.1f}ms, attempt {job.attempts}).")
+        return True
+
+    async def _ensure_lease(self, job: TurnJob) -> Optional[str]:
+        """
+        Makes sure the job holds its guild lease before running: renews the token it was queued with,
+        or re-acquires it if it expired while the job was waiting. Returns the lease token, or None if
+        another worker holds the lease (the job must not run then).
+        """
+        lease_owner = job.lease_owner or f"{PROCESS_OWNER_PREFIX}:job{job.id}"
+        async with self._session_maker() as session:
+            holds_lease = await renew_guild_turn_lease(session, job.guild_id, lease_owner)
+            if not holds_lease:
+                holds_lease = await acquire_guild_turn_lease(session, job.guild_id, owner_id=lease_owner) is not None
+            await session.commit()
+        return lease_owner if holds_lease else None
+
+    async def drain(self, worker_id: str = "drain") -> int:
+        """Runs claimable jobs one by one until none is left. Returns the number of jobs run."""
+        count = 0
+        while await self.run_one(worker_id):
+            count += 1
+        return count
+
+    async def collect_metrics(self) -> Dict[str, Any]:
+        """Queue depth/age from the DB plus this pool's counters."""
+        async with self._session_maker() as session:
+            queue_metrics = await get_turn_queue_metrics(session)
+        return {**queue_metrics, "pool": self.stats.as_dict()}
+
+
+_turn_job_pool: Optional[TurnJobWorkerPool] = None
+
+
+def get_turn_job_pool() -> Optional[TurnJobWorkerPool]:
+    return _turn_job_pool
+
+
+def notify_turn_job_workers() -> None:
+    """Wakes idle local workers (new job committed). No-op if this process runs no pool."""
+    if _turn_job_pool is not None:
+        _turn_job_pool.notify()
+
+
+async def start_turn_job_workers(worker_count: Optional[int] = None) -> TurnJobWorkerPool:
+    global _turn_job_pool
+    if _turn_job_pool is None:
+        _turn_job_pool = TurnJobWorkerPool(worker_count=worker_count)
+    await _turn_job_pool.start()
+    return _turn_job_pool
+
+
+async def stop_turn_job_workers() -> None:
+    global _turn_job_pool
+    if _turn_job_pool is not None:
+        await _turn_job_pool.stop()
+        _turn_job_pool = None
+
+
+logger.info("Turn queue module loaded.")
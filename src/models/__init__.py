@@ -31,6 +31,13 @@ from .actions import ParsedAction, ActionEntity # Import Action models
 from .pending_conflict import PendingConflict # Import PendingConflict model
 from .enums import ConflictStatus # Import ConflictStatus enum
 from .combat_encounter import CombatEncounter # Import CombatEncounter model
+from .combat_participant import CombatParticipant # Import CombatParticipant model
+from .combat_log_entry import CombatLogEntry # Import CombatLogEntry model
+from .guild_turn_lease import GuildTurnLease # Import GuildTurnLease model
+from .turn_job import TurnJob # Import TurnJob model
+from .story_log_archive import StoryLogArchive # Import StoryLogArchive model
+from .enums import TurnJobStatus # Import TurnJobStatus enum
+from .queued_action import QueuedAction # Import QueuedAction model
 from .ability_outcomes import ( # Import Ability Outcome models
     AbilityOutcomeDetails,
     AppliedStatusDetail,
@@ -90,8 +97,8 @@ logger.info(
     "PlayerStatus, PartyTurnStatus, OwnerEntityType, EventType, RelationshipEntityType, QuestStatus, ConflictStatus, CombatStatus, Player, Party, "
     "GeneratedNpc, GeneratedFaction, Item, InventoryItem, StoryLog, Relationship, PlayerNpcMemory, Ability, Skill, "
     "StatusEffect, ActiveStatusEffect, Questline, GeneratedQuest, QuestStep, PlayerQuestProgress, MobileGroup, "
-    "CraftingRecipe, PendingGeneration, ParsedAction, ActionEntity, PendingConflict, CombatEncounter, AbilityOutcomeDetails, "
-    "AppliedStatusDetail, DamageDetail, HealingDetail, CasterUpdateDetail, CombatActionResult, CheckResult, CheckOutcome, ModifierDetail."
+    "CraftingRecipe, PendingGeneration, ParsedAction, ActionEntity, PendingConflict, CombatEncounter, CombatParticipant, CombatLogEntry, GuildTurnLease, TurnJob, TurnJobStatus, QueuedAction, StoryLogArchive, "
+    "AbilityOutcomeDetails, AppliedStatusDetail, DamageDetail, HealingDetail, CasterUpdateDetail, CombatActionResult, CheckResult, CheckOutcome, ModifierDetail."
 )
 
 # Perform model rebuilds here after all models are known
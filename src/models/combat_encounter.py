@@ -1,5 +1,5 @@
 from typing import Optional, List, TYPE_CHECKING
-from sqlalchemy import Integer, BigInteger, String, ForeignKey, Enum as SQLAlchemyEnum, Text
+from sqlalchemy import Integer, BigInteger, String, ForeignKey, Enum as SQLAlchemyEnum, Text, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -37,9 +37,13 @@ class CombatEncounter(Base):
     # E.g., {"entities": [{"id": 123, "type": "player", "team": "A", "initial_hp": 100, "current_hp": 80, "status_effects": []}, ...]}
     participants_json: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
 
-    # combat_log_json: Could store a chronological log of actions and events specific to this combat.
-    # E.g., {"entries": [{"turn": 1, "actor_id": 123, "action": "attack", "target_id": 45, "damage": 10, "timestamp": "..."}]}
+    # combat_log_json: Legacy. The combat log is now written to combat_log_entries (see CombatLogEntry, core.combat_log);
+    # this column is no longer written and is kept for encounters created before the change.
     combat_log_json: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    # Entries 1..combat_log_archived_count of a finished combat, compacted out of combat_log_entries:
+    # zlib-compressed JSON list of [seq, entry] pairs.
+    combat_log_archive: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    combat_log_archived_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationships
     guild: Mapped["GuildConfig"] = relationship(back_populates="combat_encounters")
@@ -0,0 +1,33 @@
+import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from .base import Base
+from .custom_types import JsonBForSQLite
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class CombatLogEntry(Base):
+    """
+    One entry of a combat encounter's log. Entries are append-only and numbered per encounter (seq starts at 1),
+    so logging an action is a single INSERT no matter how long the fight is. When a combat ends its entries may be
+    compacted into CombatEncounter.combat_log_archive. See core.combat_log.
+    """
+    __tablename__ = "combat_log_entries"
+
+    combat_encounter_id: Mapped[int] = mapped_column(Integer, ForeignKey("combat_encounters.id", ondelete="CASCADE"), primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    guild_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("guild_configs.id", ondelete="CASCADE"), nullable=False)
+    turn_number: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    entry_json: Mapped[Dict[str, Any]] = mapped_column(JsonBForSQLite, nullable=False) # E.g., {"turn": 1, "actor": "player:1", "action_details": {...}}
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<CombatLogEntry(combat_encounter_id={self.combat_encounter_id}, seq={self.seq}, turn_number={self.turn_number})>"
+
+logger.info("CombatLogEntry model defined.")
@@ -0,0 +1,30 @@
+from sqlalchemy import BigInteger, ForeignKey, Index, Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class CombatParticipant(Base):
+    """
+    Index of who takes part in which combat encounter, so "is this entity in an active combat?" is an indexed
+    lookup instead of a scan over CombatEncounter.participants_json (which remains the source of participant state).
+    Rows are written by start_combat and removed when the combat ends; see CRUDCombatEncounter.
+    """
+    __tablename__ = "combat_participants"
+
+    combat_encounter_id: Mapped[int] = mapped_column(Integer, ForeignKey("combat_encounters.id", ondelete="CASCADE"), primary_key=True)
+    entity_type: Mapped[str] = mapped_column(Text, primary_key=True) # "player" or "npc", as in participants_json
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    guild_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("guild_configs.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_combat_participants_guild_entity", "guild_id", "entity_type", "entity_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<CombatParticipant(combat_encounter_id={self.combat_encounter_id}, entity='{self.entity_type}:{self.entity_id}')>"
+
+logger.info("CombatParticipant model defined.")
@@ -95,6 +95,9 @@ class EventType(enum.Enum):
     MASTER_ACTION_LOCATIONS_CONNECTED = "master_action_locations_connected" # Master connected
     MASTER_ACTION_LOCATIONS_DISCONNECTED = "master_action_locations_disconnected" # Master disconnected
 
+    # Turn processing
+    GUILD_TURN_PROCESSED = "guild_turn_processed" # A guild turn was resolved; records its rng_seed
+
     # TODO: Add more event types as needed for other modules
     # e.g., QUEST_ACCEPTED, QUEST_STEP_COMPLETED, QUEST_COMPLETED, COMBAT_STARTED, COMBAT_ENDED, ITEM_CRAFTED, etc.
 
@@ -176,6 +179,15 @@ class ConflictStatus(enum.Enum):
     RESOLVED_BY_MASTER_REJECTED = "resolved_by_master_rejected"   # Master rejected the action(s)
     EXPIRED = "expired"                                     # Conflict resolution timed out (future use)
 
+class TurnJobStatus(enum.Enum):
+    """
+    Represents the state of a queued guild turn processing job (see core.turn_queue).
+    """
+    QUEUED = "queued"          # Waiting for a worker (also after a failed attempt that will be retried)
+    RUNNING = "running"        # Claimed by a worker
+    SUCCEEDED = "succeeded"    # Action pipeline finished
+    FAILED = "failed"          # Gave up after max_attempts
+
 import logging
 logger = logging.getLogger(__name__)
-logger.info("Game-specific Enums (PlayerStatus, PartyTurnStatus, OwnerEntityType, ModerationStatus, ConflictStatus, etc.) defined.")
+logger.info("Game-specific Enums (PlayerStatus, PartyTurnStatus, OwnerEntityType, ModerationStatus, ConflictStatus, TurnJobStatus, etc.) defined.")
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Text, Column
+from sqlalchemy import BigInteger, Text, Column, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import TYPE_CHECKING
 from .base import Base
@@ -30,6 +30,10 @@ class GuildConfig(Base):
     main_language: Mapped[str] = mapped_column(Text, default="en", nullable=False)
     name: Mapped[str | None] = mapped_column(Text, nullable=True) # Added guild name
 
+    # Incremented on every RuleConfig change for this guild. Bot processes compare it
+    # against their cached copy to detect stale rules (see core.rules).
+    rules_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
     # Relationships
     # Ensure "PendingConflict" is imported or use forward reference if needed.
     # For now, assuming PendingConflict will be imported where GuildConfig is used or via __init__.
@@ -0,0 +1,29 @@
+import datetime
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class GuildTurnLease(Base):
+    """
+    Lease on processing a guild's turn. At most one row per guild; the holder (owner_id) keeps it alive with
+    heartbeats, and any bot process may take it over once expires_at has passed (e.g. after a crash).
+    See core.turn_lease.
+    """
+    __tablename__ = "guild_turn_leases"
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("guild_configs.id", ondelete="CASCADE"), primary_key=True, autoincrement=False)
+    owner_id: Mapped[str] = mapped_column(Text, nullable=False, comment="Unique token of the lease holder (process id + random suffix)")
+    acquired_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    heartbeat_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<GuildTurnLease(guild_id={self.guild_id}, owner_id='{self.owner_id}', expires_at={self.expires_at})>"
+
+logger.info("GuildTurnLease model defined.")
@@ -37,7 +37,7 @@ class Player(Base):
         nullable=False
     )
 
-    collected_actions_json: Mapped[Optional[List[Dict[str, Any]]]] = mapped_column(JSON, nullable=True) # Stores queued actions
+    collected_actions_json: Mapped[Optional[List[Dict[str, Any]]]] = mapped_column(JSON, nullable=True) # Legacy action queue; actions now live in queued_actions (see QueuedAction)
 
     current_party_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("parties.id"), nullable=True)
     current_sublocation_name: Mapped[Optional[str]] = mapped_column(Text, nullable=True) # New field for sub-location
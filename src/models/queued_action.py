@@ -0,0 +1,37 @@
+import datetime
+from typing import Any, Dict
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from .base import Base
+from .custom_types import JsonBForSQLite
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class QueuedAction(Base):
+    """
+    One parsed player action waiting for the next guild turn (a serialized ParsedAction).
+    Queuing an action is a plain INSERT; the turn pipeline drains a player's queue with DELETE ... RETURNING.
+    See core.action_queue.
+    """
+    __tablename__ = "queued_actions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    guild_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("guild_configs.id", ondelete="CASCADE"), nullable=False)
+    player_id: Mapped[int] = mapped_column(Integer, ForeignKey("players.id", ondelete="CASCADE"), nullable=False)
+    seq: Mapped[int] = mapped_column(Integer, nullable=False, comment="Submission order within the player's queue")
+    action_json: Mapped[Dict[str, Any]] = mapped_column(JsonBForSQLite, nullable=False, comment="ParsedAction.model_dump(mode='json')")
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_queued_actions_guild_player_seq", "guild_id", "player_id", "seq"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<QueuedAction(id={self.id}, guild_id={self.guild_id}, player_id={self.player_id}, seq={self.seq})>"
+
+logger.info("QueuedAction model defined.")
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Column, ForeignKey, Integer, Text, DateTime, func # Removed JSON
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer, Text, DateTime, func # Removed JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 # from sqlalchemy.dialects.postgresql import JSONB # Removed
 from sqlalchemy import Enum as SQLAlchemyEnum
@@ -55,6 +55,11 @@ class StoryLog(Base):
     narrative_i18n: Mapped[Optional[Dict[str, str]]] = mapped_column(JsonBForSQLite, nullable=True, default=lambda: {})
     # Example: {"en": "The goblin shrieks as the fireball engulfs it!", "ru": "Гоблин визжит, охваченный огненным шаром!"}
 
+    # A guild's events of one month are a range of this index; on PostgreSQL the table is partitioned by month
+    # of timestamp (migration 0012, core.story_log_storage).
+    __table_args__ = (
+        Index("ix_story_logs_guild_id_timestamp", "guild_id", "timestamp"),
+    )
 
     def __repr__(self) -> str:
         return f"<StoryLog(id={self.id}, guild_id={self.guild_id}, type='{self.event_type.value}', ts='{self.timestamp}')>"
@@ -0,0 +1,41 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from .base import Base
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class StoryLogArchive(Base):
+    """
+    One cold archive of a guild's StoryLog events for one month: a gzip-compressed NDJSON file written by the
+    retention job, after which the rows were deleted from story_logs. See core.story_log_storage.
+    """
+    __tablename__ = "story_log_archives"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    guild_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("guild_configs.id", ondelete="CASCADE"), nullable=False)
+    month: Mapped[str] = mapped_column(Text, nullable=False, comment="Month of the archived events, 'YYYY-MM' (UTC)")
+    path: Mapped[str] = mapped_column(Text, nullable=False, comment="Archive file, relative to STORY_LOG_ARCHIVE_DIR")
+    row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_event_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    last_event_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    archived_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    restored_at: Mapped[Optional[datetime.datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True, comment="Set while the events are back in story_logs"
+    )
+
+    __table_args__ = (
+        Index("ix_story_log_archives_guild_id_month", "guild_id", "month"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<StoryLogArchive(id={self.id}, guild_id={self.guild_id}, month='{self.month}', rows={self.row_count})>"
+
+logger.info("StoryLogArchive model defined.")
@@ -0,0 +1,53 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, Text
+from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from .base import Base
+from .enums import TurnJobStatus
+from .custom_types import JsonBForSQLite
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class TurnJob(Base):
+    """
+    A durable request to run the action pipeline for one guild turn.
+    Jobs of the same guild are processed strictly in id order (FIFO); see core.turn_queue.
+    """
+    __tablename__ = "turn_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    guild_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("guild_configs.id", ondelete="CASCADE"), nullable=False)
+
+    status: Mapped[TurnJobStatus] = mapped_column(
+        SQLAlchemyEnum(TurnJobStatus, name="turn_job_status_enum"),
+        nullable=False,
+        default=TurnJobStatus.QUEUED
+    )
+    entities_json: Mapped[list] = mapped_column(JsonBForSQLite, nullable=False, comment="Entity descriptors for process_actions_for_guild, e.g. [{'id': 1, 'type': 'player'}]")
+    lease_owner: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="Guild turn lease token taken when the turn was claimed")
+
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    locked_by: Mapped[Optional[str]] = mapped_column(Text, nullable=True, comment="Worker that claimed the job")
+
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    available_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, comment="Not picked up before this time (retry backoff)")
+    started_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_turn_jobs_status_available_at", "status", "available_at"),
+        Index("ix_turn_jobs_guild_id_status", "guild_id", "status"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<TurnJob(id={self.id}, guild_id={self.guild_id}, status='{self.status.value}', attempts={self.attempts})>"
+
+logger.info("TurnJob model defined.")
@@ -0,0 +1,90 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, CombatEncounter, CombatParticipant
+from src.models.enums import CombatStatus
+from src.core.crud.crud_combat_encounter import combat_encounter_crud
+
+
+class TestCRUDCombatEncounterParticipants(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    test_guild_id = 301
+    other_guild_id = 302
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add_all([GuildConfig(id=self.test_guild_id, main_language="en"), GuildConfig(id=self.other_guild_id, main_language="en")])
+            await session.commit()
+
+    async def _create_combat(self, session: AsyncSession, guild_id: int, status: CombatStatus, entities: list) -> CombatEncounter:
+        combat = CombatEncounter(guild_id=guild_id, status=status,
+                                 participants_json={"entities": [{"type": t, "id": i} for t, i in entities]})
+        session.add(combat)
+        await session.flush()
+        await combat_encounter_crud.add_participants(session, combat_encounter=combat, entities=entities)
+        return combat
+
+    async def test_batch_lookup_returns_only_active_combats_of_the_guild(self):
+        async with self.SessionLocal() as session:
+            active = await self._create_combat(session, self.test_guild_id, CombatStatus.ACTIVE, [("player", 1), ("npc", 7)])
+            await self._create_combat(session, self.test_guild_id, CombatStatus.ENDED_VICTORY_PLAYERS, [("player", 2)])
+            await self._create_combat(session, self.other_guild_id, CombatStatus.ACTIVE, [("player", 3)])
+            await session.commit()
+
+            combats = await combat_encounter_crud.get_active_combats_for_entities(
+                session, guild_id=self.test_guild_id,
+                entities=[("player", 1), ("npc", 7), ("player", 2), ("player", 3), ("npc", 1)]
+            )
+            self.assertEqual({key: combat.id for key, combat in combats.items()},
+                             {("player", 1): active.id, ("npc", 7): active.id})
+
+            single = await combat_encounter_crud.get_active_combat_for_entity(
+                session, guild_id=self.test_guild_id, entity_id=7, entity_type="npc"
+            )
+            self.assertEqual(single.id, active.id)
+            self.assertIsNone(await combat_encounter_crud.get_active_combat_for_entity(
+                session, guild_id=self.test_guild_id, entity_id=1, entity_type="npc"
+            ))
+            self.assertEqual(await combat_encounter_crud.get_active_combats_for_entities(
+                session, guild_id=self.test_guild_id, entities=[]
+            ), {})
+
+    async def test_remove_participants_drops_index_rows(self):
+        async with self.SessionLocal() as session:
+            combat = await self._create_combat(session, self.test_guild_id, CombatStatus.ACTIVE, [("player", 1), ("player", 1)])
+            rows = (await session.execute(select(CombatParticipant))).scalars().all()
+            self.assertEqual(len(rows), 1) # Duplicate entries are registered once
+
+            await combat_encounter_crud.remove_participants(session, combat_encounter_id=combat.id)
+            await session.commit()
+
+            self.assertIsNone(await combat_encounter_crud.get_active_combat_for_entity(
+                session, guild_id=self.test_guild_id, entity_id=1, entity_type="player"
+            ))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import pytest
+import pytest_asyncio
 import asyncio
-import json
 import logging
 import datetime
 from unittest.mock import AsyncMock, patch, MagicMock, call, ANY
@@ -20,7 +20,7 @@ PLAYER_ID_PK_2 = 2
 PLAYER_DISCORD_ID_2 = 102
 PARTY_ID_PK_1 = 10
 
-# Using direct dicts for collected_actions_json to ensure exact parsing input
+# Using direct dicts for queued action payloads to ensure exact parsing input
 fixed_dt_str = datetime.datetime(2023, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc).isoformat()
 
 look_action_data = {
@@ -34,42 +34,18 @@ move_action_data = {
 }
 
 @pytest.fixture
-def mock_player_1_with_look_action() -> Player:
-    return Player(
-        id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID,
-        name="Player1WithLookAction", collected_actions_json=json.dumps([look_action_data]),
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
-
-@pytest.fixture
-def mock_player_1_with_move_action() -> Player:
-    return Player(
-        id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID,
-        name="Player1WithMoveAction", collected_actions_json=json.dumps([move_action_data]),
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
-
-@pytest.fixture
-def mock_player_1_with_both_actions() -> Player:
-    return Player(
-        id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID,
-        name="Player1WithBothActions", collected_actions_json=json.dumps([look_action_data, move_action_data]),
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
+def player_1_look_actions() -> list:
+    return [(PLAYER_ID_PK_1, ParsedAction(**look_action_data))]
 
 @pytest.fixture
-def mock_player_2_no_actions() -> Player:
-    return Player(
-        id=PLAYER_ID_PK_2, discord_id=PLAYER_DISCORD_ID_2, guild_id=DEFAULT_GUILD_ID,
-        name="Player2NoActions", collected_actions_json="[]",
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
+def player_1_both_actions() -> list:
+    return [(PLAYER_ID_PK_1, ParsedAction(**look_action_data)), (PLAYER_ID_PK_1, ParsedAction(**move_action_data))]
 
 @pytest.fixture
-def mock_party_with_player_1(mock_player_1_with_both_actions: Player) -> Party:
+def mock_party_with_player_1() -> Party:
     return Party(
         id=PARTY_ID_PK_1, guild_id=DEFAULT_GUILD_ID, name="TestParty",
-        player_ids_json=[mock_player_1_with_both_actions.id],
+        player_ids_json=[PLAYER_ID_PK_1],
         turn_status=PartyTurnStatus.PROCESSING_GUILD_TURN
     )
 
@@ -79,6 +55,7 @@ def mock_session() -> AsyncMock:
     session.commit = AsyncMock()
     session.rollback = AsyncMock()
     session.add = MagicMock()
+    session.execute = AsyncMock(return_value=MagicMock()) # Result rows (e.g. player locations) default to empty
     mock_transaction_cm = AsyncMock()
     async def mock_aenter_for_begin(): return None
     async def mock_aexit_for_begin(exc_type, exc, tb):
@@ -134,22 +111,16 @@ def configure_module_logging(caplog):
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.get_db_session")
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock) # Patch for player_crud
-@patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)   # Patch for party_crud
+@patch("src.core.action_processor.take_queued_actions", new_callable=AsyncMock)
+@patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
-# mock_get_player and mock_get_party might not be needed if _load_and_clear_all_actions only uses get_many_by_ids
-# but _finalize_turn_processing still uses get_player/get_party individually.
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_party", new_callable=AsyncMock)
 async def test_process_actions_single_player_only_look(
-    mock_get_party_ap: AsyncMock, # Renamed to avoid conflict if used elsewhere
-    mock_get_player_ap: AsyncMock, # Renamed
     mock_log_event_ap: AsyncMock,
     mock_party_crud_get_many: AsyncMock,
-    mock_player_crud_get_many: AsyncMock,
+    mock_take_queued: AsyncMock,
     mock_session_maker_in_ap: MagicMock, # This is patching get_db_session in action_processor
     mock_session: AsyncMock, # This is the session object returned by the maker
-    mock_player_1_with_look_action: Player
+    player_1_look_actions: list
 ):
     import src.core.action_processor
     placeholder_handler_mock: AsyncMock = src.core.action_processor._handle_placeholder_action # type: ignore
@@ -159,38 +130,26 @@ async def test_process_actions_single_player_only_look(
     move_handler_mock.reset_mock()
     mock_log_event_ap.reset_mock()
 
-    # Setup mocks for _load_and_clear_all_actions
-    mock_player_crud_get_many.return_value = [mock_player_1_with_look_action]
-    mock_party_crud_get_many.return_value = [] # No parties in this test case
-
-    # Setup mocks for _finalize_turn_processing (uses individual getters)
-    mock_get_player_ap.return_value = mock_player_1_with_look_action
-    # mock_get_party_ap is not strictly needed here as no parties are processed
-
+    mock_take_queued.return_value = player_1_look_actions
     mock_session_maker_in_ap.return_value.__aenter__.return_value = mock_session
 
     await process_actions_for_guild(DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}])
 
+    mock_take_queued.assert_called_once_with(mock_session, DEFAULT_GUILD_ID, [PLAYER_ID_PK_1])
+    mock_party_crud_get_many.assert_not_called()
     placeholder_handler_mock.assert_called_once()
     move_handler_mock.assert_not_called()
-    # ... (further assertions on args and player state)
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.get_db_session")
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
-@patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)
+@patch("src.core.action_processor.take_queued_actions", new_callable=AsyncMock)
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock) # For _finalize_turn_processing
-@patch("src.core.action_processor.get_party", new_callable=AsyncMock)   # For _finalize_turn_processing (not used in this test)
 async def test_process_actions_single_player_with_both_actions(
-    mock_get_party_ap: AsyncMock,
-    mock_get_player_ap: AsyncMock,
     mock_log_event_ap: AsyncMock,
-    mock_party_crud_get_many: AsyncMock,
-    mock_player_crud_get_many: AsyncMock,
+    mock_take_queued: AsyncMock,
     mock_session_maker_in_ap: MagicMock,
     mock_session: AsyncMock,
-    mock_player_1_with_both_actions: Player
+    player_1_both_actions: list
 ):
     import src.core.action_processor
     placeholder_handler_mock: AsyncMock = src.core.action_processor._handle_placeholder_action # type: ignore
@@ -200,34 +159,26 @@ async def test_process_actions_single_player_with_both_actions(
     move_handler_mock.reset_mock()
     mock_log_event_ap.reset_mock()
 
-    mock_player_crud_get_many.return_value = [mock_player_1_with_both_actions]
-    mock_party_crud_get_many.return_value = []
-    mock_get_player_ap.return_value = mock_player_1_with_both_actions # For finalize step
-
+    mock_take_queued.return_value = player_1_both_actions
     mock_session_maker_in_ap.return_value.__aenter__.return_value = mock_session
 
     await process_actions_for_guild(DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}])
 
     assert placeholder_handler_mock.call_count == 1
     assert move_handler_mock.call_count == 1
-    # ... (further assertions)
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.get_db_session")
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
+@patch("src.core.action_processor.take_queued_actions", new_callable=AsyncMock)
 @patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock) # For _finalize_turn_processing
-@patch("src.core.action_processor.get_party", new_callable=AsyncMock)   # For _finalize_turn_processing
 async def test_process_actions_party_with_one_player_actions(
-    mock_get_party_ap: AsyncMock,
-    mock_get_player_ap: AsyncMock,
     mock_log_event_ap: AsyncMock,
     mock_party_crud_get_many: AsyncMock,
-    mock_player_crud_get_many: AsyncMock,
+    mock_take_queued: AsyncMock,
     mock_session_maker_in_ap: MagicMock,
     mock_session: AsyncMock,
-    mock_player_1_with_both_actions: Player, mock_party_with_player_1: Party
+    player_1_both_actions: list, mock_party_with_player_1: Party
 ):
     import src.core.action_processor
     placeholder_handler_mock: AsyncMock = src.core.action_processor._handle_placeholder_action # type: ignore
@@ -238,30 +189,23 @@ async def test_process_actions_party_with_one_player_actions(
     mock_log_event_ap.reset_mock()
 
     mock_party_crud_get_many.return_value = [mock_party_with_player_1]
-    # _load_and_clear_all_actions will fetch players based on party.player_ids_json
-    mock_player_crud_get_many.return_value = [mock_player_1_with_both_actions]
-
-    # For _finalize_turn_processing
-    mock_get_player_ap.return_value = mock_player_1_with_both_actions
-    mock_get_party_ap.return_value = mock_party_with_player_1
-
-
+    # _load_and_clear_all_actions takes the queued actions of the party members
+    mock_take_queued.return_value = player_1_both_actions
     mock_session_maker_in_ap.return_value.__aenter__.return_value = mock_session
 
     await process_actions_for_guild(DEFAULT_GUILD_ID, [{"id": PARTY_ID_PK_1, "type": "party"}])
 
+    mock_take_queued.assert_called_once_with(mock_session, DEFAULT_GUILD_ID, [PLAYER_ID_PK_1])
     assert placeholder_handler_mock.call_count == 1
     assert move_handler_mock.call_count == 1
-    # ... (further assertions)
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.get_db_session")
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock)
+@patch("src.core.action_processor.take_queued_actions", new_callable=AsyncMock, return_value=[])
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
 async def test_process_actions_player_no_actions(
-    mock_log_event_ap: AsyncMock, mock_get_player: AsyncMock,
-    mock_session_maker_in_ap: MagicMock, mock_session: AsyncMock,
-    mock_player_2_no_actions: Player
+    mock_log_event_ap: AsyncMock, mock_take_queued: AsyncMock,
+    mock_session_maker_in_ap: MagicMock, mock_session: AsyncMock
 ):
     import src.core.action_processor
     placeholder_handler_mock: AsyncMock = src.core.action_processor._handle_placeholder_action # type: ignore
@@ -269,26 +213,18 @@ async def test_process_actions_player_no_actions(
     placeholder_handler_mock.reset_mock()
 
     mock_session_maker_in_ap.return_value.__aenter__.return_value = mock_session
-    mock_get_player.return_value = mock_player_2_no_actions
 
     await process_actions_for_guild(DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_2, "type": "player"}])
 
     placeholder_handler_mock.assert_not_called()
-    # ... (further assertions)
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.get_db_session")
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
-@patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)
+@patch("src.core.action_processor.take_queued_actions", new_callable=AsyncMock)
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock) # For _finalize_turn_processing
-@patch("src.core.action_processor.get_party", new_callable=AsyncMock)   # For _finalize_turn_processing
 async def test_process_actions_unknown_intent_uses_placeholder(
-    mock_get_party_ap: AsyncMock,
-    mock_get_player_ap: AsyncMock,
     mock_log_event_ap: AsyncMock,
-    mock_party_crud_get_many: AsyncMock,
-    mock_player_crud_get_many: AsyncMock,
+    mock_take_queued: AsyncMock,
     mock_session_maker_in_ap: MagicMock,
     mock_session: AsyncMock
 ):
@@ -302,138 +238,114 @@ async def test_process_actions_unknown_intent_uses_placeholder(
         "raw_text": "gibberish", "intent": "unknown_intent", "guild_id": DEFAULT_GUILD_ID,
         "player_id": PLAYER_DISCORD_ID_1, "timestamp": fixed_dt_unknown_str, "entities": []
     }
-    player_for_test = Player(
-        id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="TestPlayerUnknown",
-        collected_actions_json=json.dumps([unknown_action_data]),
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
-
-    mock_player_crud_get_many.return_value = [player_for_test]
-    mock_party_crud_get_many.return_value = []
-    mock_get_player_ap.return_value = player_for_test # For finalize step
-
+    mock_take_queued.return_value = [(PLAYER_ID_PK_1, ParsedAction(**unknown_action_data))]
     mock_session_maker_in_ap.return_value.__aenter__.return_value = mock_session
 
     await process_actions_for_guild(DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}])
 
     placeholder_handler_mock.assert_called_once()
-    # ... (further assertions on args)
 
 # --- Granular tests for helper functions ---
 
 from src.core.action_processor import _load_and_clear_all_actions, _execute_player_actions, _finalize_turn_processing
+from src.core.action_queue import queue_player_actions, count_queued_actions
+from src.models import GuildConfig, QueuedAction
 
 @pytest.mark.asyncio
 async def test_load_and_clear_all_actions_empty_entities(mock_session: AsyncMock):
     actions = await _load_and_clear_all_actions(mock_session, DEFAULT_GUILD_ID, [])
     assert actions == []
 
-@pytest.mark.asyncio
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
-@patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)
-async def test_load_and_clear_all_actions_single_player_with_actions(
-    mock_party_crud_get_many: AsyncMock,
-    mock_player_crud_get_many: AsyncMock,
-    mock_session: AsyncMock,
-    mock_player_1_with_both_actions: Player # Has 2 actions
-):
-    mock_player_crud_get_many.return_value = [mock_player_1_with_both_actions]
-    mock_party_crud_get_many.return_value = [] # No parties
-
-    entities_to_process = [{"id": PLAYER_ID_PK_1, "type": "player"}]
-
-    player_action_tuples = await _load_and_clear_all_actions(mock_session, DEFAULT_GUILD_ID, entities_to_process)
 
-    assert len(player_action_tuples) == 2
-    assert player_action_tuples[0][0] == PLAYER_ID_PK_1
-    assert player_action_tuples[0][1].intent == "look"
-    assert player_action_tuples[1][0] == PLAYER_ID_PK_1
-    assert player_action_tuples[1][1].intent == "move"
-
-    # Check that actions were cleared and player added to session
-    assert mock_player_1_with_both_actions.collected_actions_json == []
-    mock_session.add.assert_called_with(mock_player_1_with_both_actions)
-    mock_player_crud_get_many.assert_called_once_with(db=mock_session, ids=[PLAYER_ID_PK_1], guild_id=DEFAULT_GUILD_ID) # Changed {P_ID} to [P_ID]
-    mock_party_crud_get_many.assert_not_called()
+@pytest_asyncio.fixture
+async def sqlite_session_maker():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from src.models.base import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _seed_players_with_queued_actions(session_maker) -> None:
+    async with session_maker() as session:
+        session.add(GuildConfig(id=DEFAULT_GUILD_ID, main_language="en"))
+        session.add_all([
+            Player(id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="P1",
+                   current_location_id=None, current_status=PlayerStatus.PROCESSING_GUILD_TURN),
+            Player(id=PLAYER_ID_PK_2, discord_id=PLAYER_DISCORD_ID_2, guild_id=DEFAULT_GUILD_ID, name="P2",
+                   current_status=PlayerStatus.PROCESSING_GUILD_TURN),
+            Party(id=PARTY_ID_PK_1, guild_id=DEFAULT_GUILD_ID, name="TestParty",
+                  player_ids_json=[PLAYER_ID_PK_2], turn_status=PartyTurnStatus.PROCESSING_GUILD_TURN),
+        ])
+        await session.flush()
+        await queue_player_actions(session, DEFAULT_GUILD_ID, PLAYER_ID_PK_1, [ParsedAction(**look_action_data)])
+        await queue_player_actions(session, DEFAULT_GUILD_ID, PLAYER_ID_PK_2, [ParsedAction(**move_action_data)])
+        await queue_player_actions(session, DEFAULT_GUILD_ID, PLAYER_ID_PK_1, [ParsedAction(**move_action_data)])
+        await session.commit()
 
 
 @pytest.mark.asyncio
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
-@patch("src.core.crud.crud_party.party_crud.get_many_by_ids", new_callable=AsyncMock)
-async def test_load_and_clear_all_actions_party_with_player_actions(
-    mock_party_crud_get_many: AsyncMock,
-    mock_player_crud_get_many: AsyncMock,
-    mock_session: AsyncMock,
-    mock_player_1_with_look_action: Player, # Has 1 action
-    mock_party_with_player_1: Party # Party contains player 1
-):
-    # Modify fixture for this test: party contains player_1_with_look_action
-    mock_party_with_player_1.player_ids_json = [mock_player_1_with_look_action.id]
-
-    mock_party_crud_get_many.return_value = [mock_party_with_player_1]
-    mock_player_crud_get_many.return_value = [mock_player_1_with_look_action]
-
-    entities_to_process = [{"id": PARTY_ID_PK_1, "type": "party"}]
-
-    player_action_tuples = await _load_and_clear_all_actions(mock_session, DEFAULT_GUILD_ID, entities_to_process)
-
-    assert len(player_action_tuples) == 1
-    assert player_action_tuples[0][0] == mock_player_1_with_look_action.id
-    assert player_action_tuples[0][1].intent == "look"
-
-    assert mock_player_1_with_look_action.collected_actions_json == []
-    mock_session.add.assert_called_with(mock_player_1_with_look_action)
-    mock_party_crud_get_many.assert_called_once_with(db=mock_session, ids=[PARTY_ID_PK_1], guild_id=DEFAULT_GUILD_ID) # Changed {P_ID} to [P_ID]
-    mock_player_crud_get_many.assert_called_once_with(db=mock_session, ids=[mock_player_1_with_look_action.id], guild_id=DEFAULT_GUILD_ID) # Changed {P_ID} to [P_ID]
+async def test_load_and_clear_all_actions_takes_player_and_party_member_actions(sqlite_session_maker):
+    await _seed_players_with_queued_actions(sqlite_session_maker)
+    player_locations: dict = {}
+
+    async with sqlite_session_maker() as session:
+        player_action_tuples = await _load_and_clear_all_actions(
+            session, DEFAULT_GUILD_ID,
+            [{"id": PLAYER_ID_PK_1, "type": "player"}, {"id": PARTY_ID_PK_1, "type": "party"}],
+            player_locations
+        )
+        await session.commit()
+
+    # Submission order across players is preserved
+    assert [(p_id, a.intent) for p_id, a in player_action_tuples] == [
+        (PLAYER_ID_PK_1, "look"), (PLAYER_ID_PK_2, "move"), (PLAYER_ID_PK_1, "move")
+    ]
+    assert player_locations == {PLAYER_ID_PK_1: None, PLAYER_ID_PK_2: None}
+    async with sqlite_session_maker() as session:
+        assert await count_queued_actions(session, DEFAULT_GUILD_ID) == 0
 
 
 @pytest.mark.asyncio
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
-async def test_load_and_clear_all_actions_player_malformed_json(
-    mock_player_crud_get_many: AsyncMock,
-    mock_session: AsyncMock
-):
-    malformed_player = Player(
-        id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID,
-        name="MalformedPlayer", collected_actions_json='[{"intent": "test", "entities": []}, {"bad_json"', # Malformed
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
-    mock_player_crud_get_many.return_value = [malformed_player]
-    entities_to_process = [{"id": PLAYER_ID_PK_1, "type": "player"}]
+async def test_load_and_clear_all_actions_leaves_other_players_queued(sqlite_session_maker):
+    await _seed_players_with_queued_actions(sqlite_session_maker)
 
-    with patch('src.core.action_processor.logger.error') as mock_logger_error:
-        player_action_tuples = await _load_and_clear_all_actions(mock_session, DEFAULT_GUILD_ID, entities_to_process)
+    async with sqlite_session_maker() as session:
+        player_action_tuples = await _load_and_clear_all_actions(session, DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}])
+        await session.commit()
 
-    assert len(player_action_tuples) == 0 # Should skip malformed and not load actions
-    assert malformed_player.collected_actions_json == [] # Actions should be cleared
-    mock_session.add.assert_called_with(malformed_player)
-    mock_logger_error.assert_any_call(f"[ACTION_PROCESSOR] Failed to decode actions for player {PLAYER_ID_PK_1}", exc_info=True)
+    assert [a.intent for _, a in player_action_tuples] == ["look", "move"]
+    async with sqlite_session_maker() as session:
+        assert await count_queued_actions(session, DEFAULT_GUILD_ID, PLAYER_ID_PK_2) == 1
 
 
 @pytest.mark.asyncio
-@patch("src.core.crud.crud_player.player_crud.get_many_by_ids", new_callable=AsyncMock)
-async def test_load_and_clear_all_actions_player_action_parsing_error(
-    mock_player_crud_get_many: AsyncMock,
-    mock_session: AsyncMock
-):
-    # Valid JSON, but content doesn't match ParsedAction model (e.g., missing 'intent')
+async def test_load_and_clear_all_actions_drops_invalid_queued_action(sqlite_session_maker):
+    # Valid JSON, but content doesn't match ParsedAction model (e.g., missing 'guild_id')
     action_bad_schema = {"raw_text": "do something", "timestamp": fixed_dt_str}
-    player_bad_action_schema = Player(
-        id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID,
-        name="PlayerBadActionSchema", collected_actions_json=json.dumps([look_action_data, action_bad_schema]),
-        current_status=PlayerStatus.PROCESSING_GUILD_TURN
-    )
-    mock_player_crud_get_many.return_value = [player_bad_action_schema]
-    entities_to_process = [{"id": PLAYER_ID_PK_1, "type": "player"}]
-
-    with patch('src.core.action_processor.logger.error') as mock_logger_error:
-        player_action_tuples = await _load_and_clear_all_actions(mock_session, DEFAULT_GUILD_ID, entities_to_process)
+    async with sqlite_session_maker() as session:
+        session.add(GuildConfig(id=DEFAULT_GUILD_ID, main_language="en"))
+        session.add(Player(id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="P1"))
+        await session.flush()
+        session.add_all([
+            QueuedAction(guild_id=DEFAULT_GUILD_ID, player_id=PLAYER_ID_PK_1, seq=1, action_json=look_action_data),
+            QueuedAction(guild_id=DEFAULT_GUILD_ID, player_id=PLAYER_ID_PK_1, seq=2, action_json=action_bad_schema),
+        ])
+        await session.commit()
+
+    async with sqlite_session_maker() as session:
+        with patch('src.core.action_queue.logger.error') as mock_logger_error:
+            player_action_tuples = await _load_and_clear_all_actions(session, DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}])
+        await session.commit()
 
     assert len(player_action_tuples) == 1 # Only the valid 'look' action
     assert player_action_tuples[0][1].intent == "look"
-    assert player_bad_action_schema.collected_actions_json == []
-    mock_session.add.assert_called_with(player_bad_action_schema)
-    mock_logger_error.assert_any_call(f"Player {PLAYER_ID_PK_1}, action item 1 failed Pydantic parsing: {action_bad_schema}", exc_info=True)
+    mock_logger_error.assert_called_once()
+    async with sqlite_session_maker() as session:
+        assert await count_queued_actions(session, DEFAULT_GUILD_ID) == 0 # The invalid row is removed too
 
 
 @pytest.mark.asyncio
@@ -531,69 +443,36 @@ async def test_execute_player_actions_dispatch_and_results(
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_party", new_callable=AsyncMock)
 async def test_finalize_turn_processing_updates_statuses_and_logs(
-    mock_get_party_finalize: AsyncMock,
-    mock_get_player_finalize: AsyncMock,
     mock_log_event_finalize: AsyncMock,
-    mock_session_maker: MagicMock, # From conftest or defined here
-    mock_session: AsyncMock, # The session object returned by the maker
-    mock_player_1_with_look_action: Player, # Re-use existing fixture, status will be PROCESSING_GUILD_TURN
-    mock_party_with_player_1: Party # Re-use existing fixture, status will be PROCESSING_GUILD_TURN
+    sqlite_session_maker,
 ):
-    # Ensure fixtures are in the state expected by _finalize_turn_processing
-    mock_player_1_with_look_action.current_status = PlayerStatus.PROCESSING_GUILD_TURN
-    # Player 2 is part of the party but will be fetched individually by id if party.player_ids_json is processed
-    player_2_in_party = Player(id=PLAYER_ID_PK_2, guild_id=DEFAULT_GUILD_ID, current_status=PlayerStatus.PROCESSING_GUILD_TURN)
-
-    mock_party_with_player_1.turn_status = PartyTurnStatus.PROCESSING_GUILD_TURN
-    mock_party_with_player_1.player_ids_json = [mock_player_1_with_look_action.id, player_2_in_party.id]
+    async with sqlite_session_maker() as setup_session:
+        setup_session.add_all([
+            Player(id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="P1",
+                   current_status=PlayerStatus.PROCESSING_GUILD_TURN),
+            Player(id=PLAYER_ID_PK_2, discord_id=PLAYER_DISCORD_ID_2, guild_id=DEFAULT_GUILD_ID, name="P2",
+                   current_status=PlayerStatus.PROCESSING_GUILD_TURN),
+            Player(id=3, discord_id=103, guild_id=DEFAULT_GUILD_ID, name="P3 not in turn",
+                   current_status=PlayerStatus.PROCESSING_GUILD_TURN),
+            Party(id=PARTY_ID_PK_1, guild_id=DEFAULT_GUILD_ID, name="TestParty",
+                  player_ids_json=[PLAYER_ID_PK_1, PLAYER_ID_PK_2], turn_status=PartyTurnStatus.PROCESSING_GUILD_TURN),
+        ])
+        await setup_session.commit()
 
     entities_to_process = [
-        {"id": mock_player_1_with_look_action.id, "type": "player"}, # This player is also in party
-        {"id": mock_party_with_player_1.id, "type": "party"}
+        {"id": PLAYER_ID_PK_1, "type": "player"}, # This player is also in party
+        {"id": PARTY_ID_PK_1, "type": "party"}
     ]
 
-    # Side effect for get_player: return specific players based on ID
-    def get_player_side_effect(session, guild_id, player_id_pk):
-        if player_id_pk == mock_player_1_with_look_action.id:
-            return mock_player_1_with_look_action
-        if player_id_pk == player_2_in_party.id:
-            return player_2_in_party
-        return None
-    mock_get_player_finalize.side_effect = get_player_side_effect
-    mock_get_party_finalize.return_value = mock_party_with_player_1
-
-    await _finalize_turn_processing(mock_session_maker, DEFAULT_GUILD_ID, entities_to_process, 5) # 5 dummy results count
-
-    # Player 1 status (directly processed and as party member)
-    assert mock_player_1_with_look_action.current_status == PlayerStatus.EXPLORING
-    # Player 2 status (as party member)
-    assert player_2_in_party.current_status == PlayerStatus.EXPLORING
-    # Party status
-    assert mock_party_with_player_1.turn_status == PartyTurnStatus.IDLE
-
-    # Check session.add calls
-    expected_add_calls = [
-        call(mock_player_1_with_look_action), # Updated directly
-        call(mock_party_with_player_1),       # Party updated
-        # call(mock_player_1_with_look_action), # Updated again as party member - MagicMock tracks unique calls by default
-        call(player_2_in_party)               # Player 2 as party member updated
-    ]
-    # mock_session.add.assert_has_calls(expected_add_calls, any_order=True)
-    # More robust: check how many times add was called on each specific object
-    # For this, we'd need to inspect call_args_list of mock_session.add
-    # For simplicity, let's check total calls to add. Player1 is added twice effectively if not careful.
-    # The code adds player1 first, then party, then iterates party members.
-    # If player1 is already EXPLORING, it won't be added again. But the first add would have happened.
-    # Let's check the number of distinct objects added.
-    added_objects = {c.args[0] for c in mock_session.add.call_args_list}
-    assert mock_player_1_with_look_action in added_objects
-    assert mock_party_with_player_1 in added_objects
-    assert player_2_in_party in added_objects
-    assert len(added_objects) == 3
+    reset = await _finalize_turn_processing(sqlite_session_maker, DEFAULT_GUILD_ID, entities_to_process, 5, rng_seed=1234) # 5 dummy results count
 
+    assert reset == {"players": [PLAYER_ID_PK_1, PLAYER_ID_PK_2], "parties": [PARTY_ID_PK_1]}
+    async with sqlite_session_maker() as check_session:
+        assert (await check_session.get(Player, PLAYER_ID_PK_1)).current_status == PlayerStatus.EXPLORING
+        assert (await check_session.get(Player, PLAYER_ID_PK_2)).current_status == PlayerStatus.EXPLORING
+        assert (await check_session.get(Player, 3)).current_status == PlayerStatus.PROCESSING_GUILD_TURN
+        assert (await check_session.get(Party, PARTY_ID_PK_1)).turn_status == PartyTurnStatus.IDLE
 
     mock_log_event_finalize.assert_called_once()
     log_kwargs = mock_log_event_finalize.call_args[1]
@@ -601,41 +480,86 @@ async def test_finalize_turn_processing_updates_statuses_and_logs(
     assert log_kwargs["guild_id"] == DEFAULT_GUILD_ID
     assert log_kwargs["details_json"]["processed_entities"] == entities_to_process
     assert log_kwargs["details_json"]["results_summary_count"] == 5
+    assert log_kwargs["details_json"]["reset_player_ids"] == [PLAYER_ID_PK_1, PLAYER_ID_PK_2]
+    assert log_kwargs["details_json"]["reset_party_ids"] == [PARTY_ID_PK_1]
+    assert log_kwargs["details_json"]["rng_seed"] == 1234
 
-    assert mock_session.commit.call_count == 1 # Commit by the session's context manager in finalize
 
 @pytest.mark.asyncio
 @patch("src.core.action_processor.log_event", new_callable=AsyncMock)
-@patch("src.core.action_processor.get_player", new_callable=AsyncMock)
 async def test_finalize_turn_processing_player_not_processing(
-    mock_get_player_finalize: AsyncMock,
     mock_log_event_finalize: AsyncMock,
-    mock_session_maker: MagicMock,
-    mock_session: AsyncMock,
+    sqlite_session_maker,
 ):
-    player_exploring = Player(id=PLAYER_ID_PK_1, guild_id=DEFAULT_GUILD_ID, current_status=PlayerStatus.EXPLORING)
-    mock_get_player_finalize.return_value = player_exploring
-    entities_to_process = [{"id": PLAYER_ID_PK_1, "type": "player"}]
-
-    await _finalize_turn_processing(mock_session_maker, DEFAULT_GUILD_ID, entities_to_process, 0)
-
-    assert player_exploring.current_status == PlayerStatus.EXPLORING # Should remain unchanged
-    # mock_session.add should not be called for this player as status didn't change
-    # However, if other entities were processed and changed, add would be called for them.
-    # Here, only one player, no change.
-    # If we want to be strict, we'd check that add was NOT called with player_exploring.
-    # For this isolated test, it means add wasn't called at all for entity updates.
-
-    # Check if session.add was called with player_exploring
-    player_added_to_session = False
-    for call_args_tuple in mock_session.add.call_args_list:
-        if call_args_tuple.args[0] == player_exploring:
-            player_added_to_session = True
-            break
-    assert not player_added_to_session
+    async with sqlite_session_maker() as setup_session:
+        setup_session.add(Player(id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="P1",
+                                 current_status=PlayerStatus.EXPLORING))
+        await setup_session.commit()
+
+    reset = await _finalize_turn_processing(sqlite_session_maker, DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}], 0)
+
+    assert reset == {"players": [], "parties": []} # Status didn't need a reset
+    async with sqlite_session_maker() as check_session:
+        assert (await check_session.get(Player, PLAYER_ID_PK_1)).current_status == PlayerStatus.EXPLORING
 
     mock_log_event_finalize.assert_called_once() # Log event still happens
-    assert mock_session.commit.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_finalize_turn_processing_writes_turn_event_with_rng_seed():
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from src.core.story_log_writer import StoryLogSession
+    from src.models import StoryLog
+    from src.models.base import Base
+    from src.models.enums import EventType
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    # Like the app's sessionmaker: log_event rows are buffered and written at commit.
+    session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, sync_session_class=StoryLogSession, expire_on_commit=False)
+    try:
+        async with session_maker() as setup_session:
+            setup_session.add(GuildConfig(id=DEFAULT_GUILD_ID, main_language="en"))
+            setup_session.add(Player(id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="P1",
+                                     current_status=PlayerStatus.PROCESSING_GUILD_TURN))
+            await setup_session.commit()
+
+        await _finalize_turn_processing(session_maker, DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}], 1, rng_seed=987654321)
+
+        async with session_maker() as check_session:
+            rows = (await check_session.execute(select(StoryLog).where(StoryLog.guild_id == DEFAULT_GUILD_ID))).scalars().all()
+        assert [row.event_type for row in rows] == [EventType.GUILD_TURN_PROCESSED]
+        assert rows[0].details_json["rng_seed"] == 987654321
+        assert rows[0].details_json["reset_player_ids"] == [PLAYER_ID_PK_1]
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+@patch("src.core.action_processor.log_event", new_callable=AsyncMock)
+async def test_finalize_turn_processing_aborts_when_lease_lost(
+    mock_log_event_finalize: AsyncMock,
+    sqlite_session_maker,
+):
+    from src.core.turn_lease import GuildTurnLeaseLost, HeldLease, acquire_guild_turn_lease
+
+    async with sqlite_session_maker() as setup_session:
+        setup_session.add(Player(id=PLAYER_ID_PK_1, discord_id=PLAYER_DISCORD_ID_1, guild_id=DEFAULT_GUILD_ID, name="P1",
+                                 current_status=PlayerStatus.PROCESSING_GUILD_TURN))
+        await acquire_guild_turn_lease(setup_session, DEFAULT_GUILD_ID, owner_id="other-worker") # Took over the expired lease
+        await setup_session.commit()
+
+    lease = HeldLease(DEFAULT_GUILD_ID, "this-worker")
+    with pytest.raises(GuildTurnLeaseLost):
+        await _finalize_turn_processing(sqlite_session_maker, DEFAULT_GUILD_ID, [{"id": PLAYER_ID_PK_1, "type": "player"}], 0, lease=lease)
+
+    assert lease.lost
+    async with sqlite_session_maker() as check_session:
+        assert (await check_session.get(Player, PLAYER_ID_PK_1)).current_status == PlayerStatus.PROCESSING_GUILD_TURN
+    mock_log_event_finalize.assert_not_called()
+
 
 # --- Tests for _handle_move_action_wrapper specifically ---
 
@@ -756,3 +680,45 @@ async def test_handle_move_action_wrapper_execute_move_raises_exception(
     assert result["status"] == "error"
     assert f"Failed to execute move action due to an internal error: {error_message}" in result["message"]
     mock_execute_move.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_execute_player_actions_runs_independent_locations_concurrently(
+    mock_session_maker: MagicMock,
+):
+    import src.core.action_processor
+    placeholder_handler_mock: AsyncMock = src.core.action_processor._handle_placeholder_action # type: ignore
+
+    in_flight = 0
+    peak_in_flight = 0
+
+    async def slow_handler(session, guild_id, player_id, action):
+        nonlocal in_flight, peak_in_flight
+        in_flight += 1
+        peak_in_flight = max(peak_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"status": "done", "player": player_id}
+
+    placeholder_handler_mock.reset_mock()
+    placeholder_handler_mock.side_effect = slow_handler
+
+    actions_to_run = [
+        (PLAYER_ID_PK_1, ParsedAction(**look_action_data)),
+        (PLAYER_ID_PK_2, ParsedAction(**look_action_data)),
+    ]
+    player_locations = {PLAYER_ID_PK_1: 100, PLAYER_ID_PK_2: 200}
+
+    results = await _execute_player_actions(
+        mock_session_maker, DEFAULT_GUILD_ID, actions_to_run, player_locations, max_concurrency=2
+    )
+
+    assert [r["player_id"] for r in results] == [PLAYER_ID_PK_1, PLAYER_ID_PK_2]
+    assert peak_in_flight == 2
+
+    # Same location -> same group -> sequential
+    peak_in_flight = 0
+    await _execute_player_actions(
+        mock_session_maker, DEFAULT_GUILD_ID, actions_to_run, {PLAYER_ID_PK_1: 100, PLAYER_ID_PK_2: 100}, max_concurrency=2
+    )
+    assert peak_in_flight == 1
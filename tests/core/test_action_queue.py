@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, Player, QueuedAction
+from src.models.actions import ParsedAction
+from src.core.action_queue import (
+    count_queued_actions,
+    queue_player_action,
+    queue_player_actions,
+    take_queued_actions,
+)
+
+
+class TestActionQueue(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    guild_id = 601
+    other_guild_id = 602
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add_all([GuildConfig(id=self.guild_id, main_language="en"), GuildConfig(id=self.other_guild_id, main_language="en")])
+            await session.flush()
+            session.add_all([
+                Player(id=1, discord_id=1001, guild_id=self.guild_id, name="P1"),
+                Player(id=2, discord_id=1002, guild_id=self.guild_id, name="P2"),
+                Player(id=3, discord_id=1003, guild_id=self.other_guild_id, name="P3"),
+            ])
+            await session.commit()
+
+    def _action(self, intent: str, guild_id: Optional[int] = None) -> ParsedAction:
+        return ParsedAction(raw_text=intent, intent=intent, guild_id=guild_id or self.guild_id, player_id=0)
+
+    async def test_queue_appends_with_increasing_seq(self):
+        async with self.SessionLocal() as session:
+            self.assertEqual(await queue_player_actions(session, self.guild_id, 1, [self._action("look"), self._action("move")]), 2)
+            await queue_player_action(session, self.guild_id, 1, self._action("talk"))
+            self.assertEqual(await queue_player_actions(session, self.guild_id, 1, []), 0)
+            await session.commit()
+
+            rows = (await session.execute(select(QueuedAction).order_by(QueuedAction.seq))).scalars().all()
+        self.assertEqual([(row.seq, row.action_json["intent"]) for row in rows], [(1, "look"), (2, "move"), (3, "talk")])
+
+    async def test_take_returns_submission_order_and_removes_rows(self):
+        async with self.SessionLocal() as session:
+            await queue_player_action(session, self.guild_id, 2, self._action("look"))
+            await queue_player_action(session, self.guild_id, 1, self._action("move"))
+            await queue_player_action(session, self.other_guild_id, 3, self._action("talk", self.other_guild_id))
+            await session.commit()
+
+        async with self.SessionLocal() as session:
+            taken = await take_queued_actions(session, self.guild_id) # All players of the guild
+            await session.commit()
+            self.assertEqual([(p_id, a.intent) for p_id, a in taken], [(2, "look"), (1, "move")])
+            self.assertEqual(await count_queued_actions(session, self.guild_id), 0)
+            self.assertEqual(await count_queued_actions(session, self.other_guild_id), 1)
+            self.assertEqual(await take_queued_actions(session, self.guild_id, []), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
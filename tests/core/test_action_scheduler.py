@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from src.core.action_scheduler import (
+    PhaseTimer,
+    ScheduledAction,
+    get_action_conflict_keys,
+    partition_actions,
+    run_action_groups,
+)
+from src.models.actions import ActionEntity, ParsedAction
+
+GUILD_ID = 1
+
+
+def _action(intent: str, *entities: tuple) -> ParsedAction:
+    return ParsedAction(
+        raw_text=intent, intent=intent, guild_id=GUILD_ID, player_id=0,
+        entities=[ActionEntity(type=t, value=v) for t, v in entities]
+    )
+
+
+def test_conflict_keys_include_player_location_and_targets():
+    keys = get_action_conflict_keys(7, _action("attack", ("target_npc", "42"), ("player_name", "Bob")), 3)
+    assert keys == {("player", 7), ("location", 3), ("npc", 42), ("target", "bob")}
+
+
+def test_move_conflict_keys_include_destination():
+    move = _action("move", ("location_name", "Dark Forest"))
+    assert get_action_conflict_keys(7, move, 3, {"dark forest": 12}) == {("player", 7), ("location", 3), ("location", 12)}
+    # Unresolved destinations are keyed by their identifier
+    assert ("location", "dark forest") in get_action_conflict_keys(7, move, 3)
+    assert ("location", "forest_01") in get_action_conflict_keys(7, _action("move", ("destination", "forest_01"), ("speed", "fast")), 3)
+
+
+def test_partition_serializes_moves_into_an_occupied_location():
+    locations = {1: 10, 2: 20}
+    actions = [(1, _action("attack", ("npc", "5"))), (2, _action("move", ("location_static_id", "cave")))]
+    assert len(partition_actions(actions, locations)) == 2
+    assert len(partition_actions(actions, locations, {"cave": 10})) == 1
+
+def test_partition_groups_by_location_and_keeps_order():
+    locations = {1: 10, 2: 20, 3: 10, 4: 30}
+    actions = [
+        (1, _action("look")),
+        (2, _action("look")),
+        (3, _action("examine")),
+        (1, _action("move", ("location_name", "forest"))),
+        (4, _action("look")),
+    ]
+    groups = partition_actions(actions, locations)
+
+    assert [[(s.index, s.player_id) for s in g] for g in groups] == [
+        [(0, 1), (2, 3), (3, 1)], # location 10, submission order preserved
+        [(1, 2)],
+        [(4, 4)],
+    ]
+
+
+def test_partition_merges_groups_sharing_a_target():
+    locations = {1: 10, 2: 20}
+    actions = [(1, _action("attack", ("npc", "5"))), (2, _action("attack", ("npc", "5")))]
+    assert len(partition_actions(actions, locations)) == 1
+
+
+def test_partition_without_locations_is_a_single_group():
+    actions = [(1, _action("look")), (2, _action("look"))]
+    groups = partition_actions(actions)
+    assert len(groups) == 1
+    assert [s.index for s in groups[0]] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_run_action_groups_bounded_concurrency_and_result_order():
+    running = 0
+    peak = 0
+    order: list = []
+
+    async def run(scheduled: ScheduledAction) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        order.append(scheduled.index)
+        running -= 1
+        return scheduled.index * 10
+
+    look = _action("look")
+    groups = [
+        [ScheduledAction(0, 1, look), ScheduledAction(3, 1, look)],
+        [ScheduledAction(1, 2, look)],
+        [ScheduledAction(2, 3, look)],
+    ]
+    results = await run_action_groups(groups, run, max_concurrency=2)
+
+    assert results == [0, 10, 20, 30]
+    assert peak == 2
+    assert order.index(0) < order.index(3) # same group stays sequential
+
+
+def test_phase_timer_records_phases():
+    timer = PhaseTimer()
+    with timer.phase("load"):
+        pass
+    with timer.phase("execute"):
+        pass
+    assert list(timer.timings_ms) == ["load", "execute"]
+    assert "total=" in timer.summary()
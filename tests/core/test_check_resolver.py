@@ -15,8 +15,12 @@ from src.core.check_resolver import (
     ModifierDetail,
     ENTITY_TYPE_PLAYER,
     ENTITY_TYPE_NPC,
-    CheckError
+    CheckError,
+    CheckRequest,
+    build_check_context,
+    resolve_checks_batch
 )
+from src.core.rule_snapshot import GuildRuleSnapshot
 
 # Default values for rule fetching, can be overridden in tests
 DEFAULT_RULE_VALUES = {
@@ -52,8 +56,8 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
 
     async def asyncSetUp(self):
         # Patch external dependencies for all tests
-        self.patch_get_rule = patch('src.core.check_resolver.get_rule', new_callable=AsyncMock)
-        self.mock_get_rule = self.patch_get_rule.start()
+        self.patch_build_snapshot = patch('src.core.check_resolver.build_guild_rule_snapshot', new_callable=AsyncMock)
+        self.mock_build_snapshot = self.patch_build_snapshot.start()
 
         self.patch_roll_dice = patch('src.core.check_resolver.roll_dice')
         self.mock_roll_dice = self.patch_roll_dice.start()
@@ -62,24 +66,28 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
         self.mock_get_entity_attribute = self.patch_get_entity_attribute.start()
 
         # Default mock behaviors
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: DEFAULT_RULE_VALUES.get(key)
+        self.set_rules(DEFAULT_RULE_VALUES)
 
 
     async def asyncTearDown(self):
-        self.patch_get_rule.stop()
+        self.patch_build_snapshot.stop()
         self.patch_roll_dice.stop()
         self.patch_get_entity_attribute.stop()
 
+    def set_rules(self, rules):
+        """The guild rules resolve_check sees (through build_guild_rule_snapshot)."""
+        self.mock_build_snapshot.return_value = GuildRuleSnapshot(self.guild_id, rules)
+
     async def test_simple_success(self):
         check_type = "some_check"
         dc = 15
 
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "strength",
             f"checks:{check_type}:critical_success_threshold": 20,
             f"checks:{check_type}:critical_failure_threshold": 1,
-        }.get(key)
+        })
 
         self.mock_get_entity_attribute.return_value = 3 # Player's strength modifier
         self.mock_roll_dice.return_value = (14, [14]) # Total, individual rolls
@@ -103,12 +111,12 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
         check_type = "some_check"
         dc = 15
 
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "strength",
             f"checks:{check_type}:critical_success_threshold": 20,
             f"checks:{check_type}:critical_failure_threshold": 1,
-        }.get(key)
+        })
 
         self.mock_get_entity_attribute.return_value = 1 # NPC's strength modifier
         self.mock_roll_dice.return_value = (10, [10])
@@ -127,12 +135,12 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
     async def test_critical_success(self):
         check_type = "attack"
         dc = 10
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "attack_bonus",
             f"checks:{check_type}:critical_success_threshold": 20,
             f"checks:{check_type}:critical_failure_threshold": 1,
-        }.get(key)
+        })
         self.mock_get_entity_attribute.return_value = 5 # Player's attack bonus
         self.mock_roll_dice.return_value = (20, [20]) # Natural 20
 
@@ -148,12 +156,12 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
     async def test_critical_failure(self):
         check_type = "attack"
         dc = 10
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "attack_bonus",
             f"checks:{check_type}:critical_success_threshold": 20,
             f"checks:{check_type}:critical_failure_threshold": 1,
-        }.get(key)
+        })
         self.mock_get_entity_attribute.return_value = 5
         self.mock_roll_dice.return_value = (1, [1]) # Natural 1
 
@@ -170,10 +178,11 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
         check_type = "some_check"
         dc = 15
         context = {"situational_bonus": 2}
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
+            **DEFAULT_RULE_VALUES,
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "strength",
-        }.get(key, DEFAULT_RULE_VALUES.get(key)) # Fallback to defaults for crit thresholds
+        }) # Fallback to defaults for crit thresholds
 
         self.mock_get_entity_attribute.return_value = 1 # Base strength mod
         self.mock_roll_dice.return_value = (12, [12])
@@ -192,10 +201,11 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
         check_type = "some_check"
         dc = 10
         context = {"situational_penalty": 3}
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
+            **DEFAULT_RULE_VALUES,
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "strength",
-        }.get(key, DEFAULT_RULE_VALUES.get(key))
+        })
 
         self.mock_get_entity_attribute.return_value = 2 # Base strength mod
         self.mock_roll_dice.return_value = (10, [10])
@@ -212,10 +222,11 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
 
     async def test_no_dc_provided(self):
         check_type = "perception" # Assuming no specific rules, defaults will be used
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
+            **DEFAULT_RULE_VALUES,
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "wisdom", # Let's say wisdom is not set up on mock
-        }.get(key, DEFAULT_RULE_VALUES.get(key))
+        })
 
         self.mock_get_entity_attribute.return_value = 0 # Assume wisdom mod is 0 or attr not found
         self.mock_roll_dice.return_value = (18, [18])
@@ -230,10 +241,10 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
 
     async def test_invalid_dice_notation_rule(self):
         check_type = "bad_dice_check"
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
             f"checks:{check_type}:dice_notation": "invalid_dice", # This will cause roll_dice to fail
             f"checks:{check_type}:base_attribute": "strength",
-        }.get(key)
+        })
 
         self.mock_get_entity_attribute.return_value = 1
         # Configure mock_roll_dice to raise ValueError for this specific input
@@ -250,10 +261,11 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
     async def test_base_attribute_not_found(self):
         check_type = "some_check"
         dc = 10
-        self.mock_get_rule.side_effect = lambda db, guild_id, key: {
+        self.set_rules({
+            **DEFAULT_RULE_VALUES,
             f"checks:{check_type}:dice_notation": "1d20",
             f"checks:{check_type}:base_attribute": "non_existent_stat", # This attribute won't be found
-        }.get(key, DEFAULT_RULE_VALUES.get(key))
+        })
 
         self.mock_get_entity_attribute.return_value = None # Simulate attribute not found
         self.mock_roll_dice.return_value = (12, [12])
@@ -270,6 +282,86 @@ class TestCheckResolver(unittest.IsolatedAsyncioTestCase):
         # Check that no modifier detail was added for the missing base_stat, or it was added with value 0
         self.assertFalse(any(md.source == "base_stat:non_existent_stat" and md.value != 0 for md in result.modifier_details))
 
+    async def test_rules_read_from_snapshot_without_get_rule(self):
+        snapshot = GuildRuleSnapshot(self.guild_id, {
+            "checks:attack:dice_notation": "1d20",
+            "checks:attack:base_attribute": "attack_bonus",
+            "checks:attack:critical_success_threshold": 19,
+        })
+        self.mock_get_entity_attribute.return_value = 5
+        self.mock_roll_dice.return_value = (19, [19])
+
+        result = await resolve_check(
+            db=self.mock_db_session,
+            guild_id=self.guild_id,
+            check_type="attack",
+            entity_doing_check_id=self.player_id,
+            entity_doing_check_type=ENTITY_TYPE_PLAYER,
+            difficulty_dc=30,
+            rule_snapshot=snapshot
+        )
+
+        self.mock_build_snapshot.assert_not_called()
+        self.assertEqual(result.outcome.status, "critical_success") # 19 meets the snapshot threshold
+        self.assertEqual(result.final_value, 24)
+        self.assertEqual(result.rule_config_snapshot["checks:attack:critical_failure_threshold"], 1)
+
+    async def test_build_check_context_loads_each_entity_type_once(self):
+        with patch('src.core.check_resolver.player_crud') as mock_player_crud, \
+             patch('src.core.check_resolver.npc_crud') as mock_npc_crud:
+            mock_player_crud.get_many_by_ids = AsyncMock(return_value=[self.mock_player])
+            mock_npc_crud.get_many_by_ids = AsyncMock(return_value=[self.mock_npc])
+            prepared = await build_check_context(
+                self.mock_db_session, self.guild_id, "some_check",
+                [("player", self.player_id), (ENTITY_TYPE_NPC, self.npc_id), (ENTITY_TYPE_NPC, 999)]
+            )
+
+        self.mock_build_snapshot.assert_awaited_once()
+        mock_player_crud.get_many_by_ids.assert_awaited_once()
+        mock_npc_crud.get_many_by_ids.assert_awaited_once()
+        self.assertEqual(prepared.rules.base_attribute, "strength")
+        self.assertEqual(prepared.attribute_value(ENTITY_TYPE_PLAYER, self.player_id), 3)
+        self.assertEqual(prepared.attribute_value("npc", self.npc_id), 1)
+        self.assertTrue(prepared.has_entity(ENTITY_TYPE_NPC, 999)) # Missing entities resolve to no modifier
+        self.assertIsNone(prepared.attribute_value(ENTITY_TYPE_NPC, 999))
+
+    async def test_resolve_check_with_prepared_context_awaits_nothing(self):
+        with patch('src.core.check_resolver.player_crud') as mock_player_crud:
+            mock_player_crud.get_many_by_ids = AsyncMock(return_value=[self.mock_player])
+            prepared = await build_check_context(self.mock_db_session, self.guild_id, "attack", [(ENTITY_TYPE_PLAYER, self.player_id)])
+        self.mock_build_snapshot.reset_mock()
+        self.mock_roll_dice.return_value = (10, [10])
+
+        result = await resolve_check(
+            db=self.mock_db_session, guild_id=self.guild_id, check_type="attack",
+            entity_doing_check_id=self.player_id, entity_doing_check_type=ENTITY_TYPE_PLAYER,
+            difficulty_dc=15, prepared=prepared
+        )
+
+        self.mock_build_snapshot.assert_not_called()
+        self.mock_get_entity_attribute.assert_not_called()
+        self.assertEqual(result.final_value, 15) # 10 + 5 attack_bonus
+        self.assertEqual(result.outcome.status, "success")
+
+    async def test_resolve_checks_batch(self):
+        self.mock_roll_dice.return_value = (10, [10])
+        requests = [
+            CheckRequest(entity_id=self.player_id, entity_type=ENTITY_TYPE_PLAYER, difficulty_dc=12),
+            CheckRequest(entity_id=self.npc_id, entity_type=ENTITY_TYPE_NPC, difficulty_dc=12, check_context={"situational_bonus": 2}),
+        ]
+        with patch('src.core.check_resolver.player_crud') as mock_player_crud, \
+             patch('src.core.check_resolver.npc_crud') as mock_npc_crud:
+            mock_player_crud.get_many_by_ids = AsyncMock(return_value=[self.mock_player])
+            mock_npc_crud.get_many_by_ids = AsyncMock(return_value=[self.mock_npc])
+            results = await resolve_checks_batch(self.mock_db_session, self.guild_id, "some_check", requests)
+
+        self.mock_build_snapshot.assert_awaited_once()
+        self.mock_get_entity_attribute.assert_not_called()
+        self.assertEqual([r.entity_doing_check_id for r in results], [self.player_id, self.npc_id])
+        self.assertEqual([r.final_value for r in results], [13, 13]) # 10 + 3 strength; 10 + 1 strength + 2 bonus
+        self.assertTrue(all(r.outcome.status == "success" for r in results))
+        self.assertEqual(await resolve_checks_batch(self.mock_db_session, self.guild_id, "some_check", []), [])
+
 
 if __name__ == "__main__":
     unittest.main()
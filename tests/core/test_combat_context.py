@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from typing import Optional
+from unittest.mock import patch
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, Player, GeneratedNpc, CombatEncounter, Relationship
+from src.models.enums import CombatStatus, RelationshipEntityType
+from src.core.combat_context import load_combat_context
+from src.core.combat_state import get_combat_state
+from src.core.rule_snapshot import GuildRuleSnapshot
+
+
+class TestCombatContext(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    test_guild_id = 901
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add_all([
+                GuildConfig(id=self.test_guild_id, main_language="en"),
+                GuildConfig(id=self.test_guild_id + 1, main_language="en"),
+            ])
+            await session.flush()
+            session.add_all([
+                Player(id=1, discord_id=9001, guild_id=self.test_guild_id, name="Hero"),
+                GeneratedNpc(id=2, guild_id=self.test_guild_id, name_i18n={"en": "Goblin"}),
+                GeneratedNpc(id=3, guild_id=self.test_guild_id + 1, name_i18n={"en": "Elsewhere"}),
+            ])
+            await session.commit()
+
+    async def test_loads_participant_entities_once(self):
+        encounter = CombatEncounter(
+            id=7, guild_id=self.test_guild_id, status=CombatStatus.ACTIVE,
+            participants_json={"entities": [
+                {"id": 1, "type": "player", "team": "players", "current_hp": 10},
+                {"id": 2, "type": "npc", "team": "npcs", "current_hp": 5},
+                {"id": 3, "type": "npc", "team": "npcs", "current_hp": 5}, # Belongs to another guild
+            ]},
+            turn_order_json={"order": [], "current_index": 0, "current_turn_number": 1},
+        )
+        snapshot = GuildRuleSnapshot(self.test_guild_id, {}, None)
+
+        async with self.SessionLocal() as session:
+            with patch("src.core.combat_context.build_guild_rule_snapshot") as mock_build_snapshot:
+                context = await load_combat_context(session, self.test_guild_id, encounter, guild_rules=snapshot)
+            mock_build_snapshot.assert_not_called()
+
+        self.assertEqual(set(context.entities), {("player", 1), ("npc", 2)})
+        self.assertEqual(context.entity("player", 1).name, "Hero")
+        self.assertIsNone(context.entity("npc", 3))
+        self.assertIs(context.guild_rules, snapshot)
+        self.assertIs(context.state, get_combat_state(encounter))
+
+    async def test_loads_relationships_among_participants(self):
+        async with self.SessionLocal() as session:
+            session.add(GeneratedNpc(id=4, guild_id=self.test_guild_id, name_i18n={"en": "Bystander"}))
+            session.add_all([
+                Relationship(guild_id=self.test_guild_id, entity1_type=RelationshipEntityType.GENERATED_NPC, entity1_id=2,
+                             entity2_type=RelationshipEntityType.PLAYER, entity2_id=1, value=-40),
+                # Not between participants of this combat
+                Relationship(guild_id=self.test_guild_id, entity1_type=RelationshipEntityType.GENERATED_NPC, entity1_id=4,
+                             entity2_type=RelationshipEntityType.PLAYER, entity2_id=1, value=75),
+            ])
+            await session.commit()
+
+        encounter = CombatEncounter(
+            id=8, guild_id=self.test_guild_id, status=CombatStatus.ACTIVE,
+            participants_json={"entities": [
+                {"id": 1, "type": "player", "team": "players", "current_hp": 10},
+                {"id": 2, "type": "npc", "team": "npcs", "current_hp": 5},
+            ]},
+            turn_order_json={"order": [], "current_index": 0, "current_turn_number": 1},
+        )
+        async with self.SessionLocal() as session:
+            context = await load_combat_context(session, self.test_guild_id, encounter, guild_rules=GuildRuleSnapshot(self.test_guild_id, {}, None))
+
+        self.assertEqual(context.relationship_value("npc", 2, "player", 1), -40)
+        self.assertEqual(context.relationship_value("player", 1, "npc", 2), -40)
+        self.assertIsNone(context.relationship_value("npc", 4, "player", 1))
+        self.assertEqual(len(context.relationships), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,12 +6,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.combat_cycle_manager import start_combat, process_combat_turn #, _handle_combat_end_consequences (private)
 from src.models import Player, GeneratedNpc, CombatEncounter, Party
 from src.models.enums import CombatStatus, PlayerStatus, PartyTurnStatus, EventType
-from src.core.rules import get_rule # For mocking
-from src.core.dice_roller import roll_dice # For mocking
+from src.core import rng_service
+from src.core.rule_snapshot import GuildRuleSnapshot
+from src.core.dice_roller import roll_many # For mocking
 from src.core.game_events import log_event # For mocking
 from src.core.npc_combat_strategy import get_npc_combat_action
 from src.core.combat_engine import process_combat_action as engine_process_combat_action
 from src.models.combat_outcomes import CombatActionResult # Added import
+from src.core.combat_context import CombatContext
 
 
 # --- Fixtures ---
@@ -85,33 +87,33 @@ def mock_player_entity_2() -> Player: # Another player for multi-player scenario
 # --- Tests for start_combat ---
 
 @pytest.mark.asyncio
-@patch('src.core.rules.get_rule')
-@patch('src.core.dice_roller.roll_dice')
+@patch('src.core.combat_cycle_manager.build_guild_rule_snapshot', new_callable=AsyncMock)
+@patch('src.core.dice_roller.roll_many')
 @patch('src.core.game_events.log_event')
+@patch('src.core.crud.crud_combat_encounter.combat_encounter_crud.add_participants', new_callable=AsyncMock)
 async def test_start_combat_successful_creation(
+    mock_add_participants: AsyncMock,
     mock_log_event: AsyncMock,
-    mock_roll_dice: MagicMock,
-    mock_get_rule: AsyncMock,
+    mock_roll_many: MagicMock,
+    mock_build_rules: AsyncMock,
     mock_session: AsyncMock,
     mock_player_entity: Player,
     mock_npc_entity: GeneratedNpc
 ):
-    # Mock rule calls
-    # Lambda now uses keyword arguments matching the call to get_rule
-    def get_rule_mock_side_effect(*, db, guild_id, key, default): # Use actual param names
-        return {
-            "player:stats:default_max_hp": 100,
-            "combat:initiative:dice": "1d20",
-            "combat:attack:check_type": "attack_roll_vs_ac",
-            "combat:attributes:modifier_formula": "(value - 10) // 2"
-        }.get(key, default)
-    mock_get_rule.side_effect = get_rule_mock_side_effect
+    # The guild's rules, read once by start_combat
+    mock_build_rules.return_value = GuildRuleSnapshot(100, {
+        "player:stats:default_max_hp": 100,
+        "combat:initiative:dice": "1d20",
+        "combat:attack:check_type": "attack_roll_vs_ac",
+        "combat:attributes:modifier_formula": "(value - 10) // 2",
+        "ai_behavior:npc_default_strategy": {}, # Not a combat rule: not snapshotted
+    })
 
     # Mock dice rolls for initiative: Player (15 + 2 = 17), NPC (10 + 1 = 11)
-    # roll_dice returns (total, list_of_dice_values)
-    mock_roll_dice.side_effect = [
-        (15, [15]), # Player's initiative roll (1d20)
-        (10, [10])  # NPC's initiative roll (1d20)
+    # roll_many returns one total per participant, in participant order
+    mock_roll_many.return_value = [
+        15, # Player's initiative roll (1d20)
+        10  # NPC's initiative roll (1d20)
     ]
 
     participant_entities = [mock_player_entity, mock_npc_entity]
@@ -144,6 +146,9 @@ async def test_start_combat_successful_creation(
     assert npc_p_data["max_hp"] == 50 # From mock_npc_entity.properties_json
     assert npc_p_data["initiative_modifier"] == 1 # (12-10)//2
 
+    # Initiative is rolled for all participants in one batch
+    mock_roll_many.assert_called_once_with("1d20", 2)
+
     # Check turn_order_json (Player should be first due to higher initiative roll)
     assert len(combat_encounter.turn_order_json["order"]) == 2
     assert combat_encounter.turn_order_json["order"][0]["id"] == mock_player_entity.id
@@ -156,9 +161,15 @@ async def test_start_combat_successful_creation(
     assert combat_encounter.turn_order_json["current_turn_number"] == 1
 
 
-    # Check rules snapshot (basic check)
-    assert "combat:initiative:dice" in combat_encounter.rules_config_snapshot_json
-    assert combat_encounter.rules_config_snapshot_json["combat:initiative:dice"] == "1d20"
+    # Check rules snapshot: the combat rules from the one guild snapshot, plus the combat's seed
+    mock_build_rules.assert_awaited_once_with(mock_session, guild_id)
+    snapshot = dict(combat_encounter.rules_config_snapshot_json)
+    assert isinstance(snapshot.pop(rng_service.RNG_SEED_RULE_KEY), int)
+    assert snapshot == {
+        "combat:initiative:dice": "1d20",
+        "combat:attack:check_type": "attack_roll_vs_ac",
+        "combat:attributes:modifier_formula": "(value - 10) // 2",
+    }
 
     # Check player status update
     assert mock_player_entity.current_status == PlayerStatus.COMBAT # Changed IN_COMBAT
@@ -189,13 +200,19 @@ async def test_start_combat_successful_creation(
     # Check session.flush was called
     mock_session.flush.assert_called()
 
+    # Participants are registered in the combat_participants index
+    mock_add_participants.assert_called_once_with(
+        mock_session, combat_encounter=combat_encounter,
+        entities=[("player", mock_player_entity.id), ("npc", mock_npc_entity.id)]
+    )
+
 
 @pytest.mark.asyncio
-@patch('src.core.rules.get_rule')
-@patch('src.core.dice_roller.roll_dice')
+@patch('src.core.combat_cycle_manager.build_guild_rule_snapshot', new_callable=AsyncMock)
+@patch('src.core.dice_roller.roll_many')
 async def test_start_combat_initiative_tie_break_order(
-    mock_roll_dice: MagicMock,
-    mock_get_rule: AsyncMock,
+    mock_roll_many: MagicMock,
+    mock_build_rules: AsyncMock,
     mock_session: AsyncMock,
     mock_player_entity: Player, # Dex 14 (+2)
     mock_npc_entity: GeneratedNpc, # Dex 12 (+1)
@@ -213,11 +230,11 @@ async def test_start_combat_initiative_tie_break_order(
     # If rolls are P1=10 (score 12), NPC=11 (score 12), P2=12 (score 12)
     # Order should be P1, NPC, P2 (if input order was P1, NPC, P2)
 
-    mock_get_rule.side_effect = lambda *, db, guild_id, key, default: {"combat:initiative:dice": "1d20"}.get(key, default)
-    mock_roll_dice.side_effect = [
-        (10, [10]), # P1 (id 1, mod +2) -> total 12
-        (11, [11]), # NPC (id 2, mod +1) -> total 12
-        (12, [12])  # P2 (id 3, mod +0) -> total 12
+    mock_build_rules.return_value = GuildRuleSnapshot(100, {"combat:initiative:dice": "1d20"})
+    mock_roll_many.return_value = [
+        10, # P1 (id 1, mod +2) -> total 12
+        11, # NPC (id 2, mod +1) -> total 12
+        12  # P2 (id 3, mod +0) -> total 12
     ]
     participant_entities = [mock_player_entity, mock_npc_entity, mock_player_entity_2]
 
@@ -236,7 +253,31 @@ async def test_start_combat_initiative_tie_break_order(
     # Current code doesn't have secondary sort key.
 
 @pytest.mark.asyncio
-async def test_start_combat_no_participants(mock_session: AsyncMock):
+@patch('src.core.combat_cycle_manager.build_guild_rule_snapshot', new_callable=AsyncMock)
+@patch('src.core.dice_roller.roll_many')
+async def test_start_combat_initiative_uses_guild_modifier_formula(
+    mock_roll_many: MagicMock,
+    mock_build_rules: AsyncMock,
+    mock_session: AsyncMock,
+    mock_player_entity: Player, # Dex 14
+    mock_npc_entity: GeneratedNpc # Dex 12
+):
+    mock_build_rules.return_value = GuildRuleSnapshot(100, {
+        "combat:initiative:dice": "1d20",
+        "combat:attributes:modifier_formula": "value - 10",
+    })
+    mock_roll_many.return_value = [10, 11]
+
+    combat_encounter = await start_combat(mock_session, 100, 10, [mock_player_entity, mock_npc_entity])
+
+    modifiers = [p["initiative_modifier"] for p in combat_encounter.participants_json["entities"]]
+    assert modifiers == [4, 2] # Not the default (value - 10) // 2
+    assert [p["id"] for p in combat_encounter.turn_order_json["order"]] == [mock_player_entity.id, mock_npc_entity.id] # 14 vs 13
+
+
+@pytest.mark.asyncio
+@patch('src.core.combat_cycle_manager.build_guild_rule_snapshot', new_callable=AsyncMock, return_value=GuildRuleSnapshot(100, {}))
+async def test_start_combat_no_participants(mock_build_rules: AsyncMock, mock_session: AsyncMock):
     # Should ideally not happen, but test robustness
     with patch('src.core.game_events.log_event', new_callable=AsyncMock) as mock_log_event_empty: # Avoid conflict
         combat_encounter = await start_combat(mock_session, 100, 10, [])
@@ -258,85 +299,86 @@ async def test_start_combat_no_participants(mock_session: AsyncMock):
 # These will be more complex as they involve mocking more interactions.
 
 @pytest.mark.asyncio
-@patch('src.core.combat_cycle_manager._handle_combat_end_consequences', new_callable=AsyncMock)
-@patch('src.core.combat_cycle_manager._check_combat_end', new_callable=AsyncMock)
-@patch('src.core.combat_cycle_manager._advance_turn', new_callable=AsyncMock)
+@patch('src.core.combat_cycle_manager.load_combat_context', new_callable=AsyncMock)
 @patch('src.core.npc_combat_strategy.get_npc_combat_action', new_callable=AsyncMock)
-@patch('src.core.combat_engine.process_combat_action', new_callable=AsyncMock) # engine_process_combat_action
-@pytest.mark.skip(reason="Temporarily skipping due to RecursionError, needs detailed mock setup for turn progression.")
-async def test_process_combat_turn_npc_action(
+@patch('src.core.combat_engine.process_combat_action', new_callable=AsyncMock)
+async def test_process_combat_turn_runs_npc_turns_until_player_turn(
     mock_engine_process_action: AsyncMock,
     mock_get_npc_action: AsyncMock,
-    mock_advance_turn: AsyncMock,
-    mock_check_combat_end: AsyncMock,
-    mock_handle_end_consequences: AsyncMock,
-    mock_session: AsyncMock,
-    mock_npc_entity: GeneratedNpc # This will be the active entity
+    mock_load_context: AsyncMock,
+    mock_session: AsyncMock
 ):
     guild_id = 100
     combat_id = 1
+    combat = CombatEncounter(
+        id=combat_id, guild_id=guild_id, location_id=10, status=CombatStatus.ACTIVE,
+        current_turn_entity_id=2, current_turn_entity_type="npc",
+        turn_order_json={
+            "order": [{"id": 2, "type": "npc"}, {"id": 3, "type": "npc"}, {"id": 1, "type": "player"}],
+            "current_index": 0, "current_turn_number": 1
+        },
+        participants_json={"entities": [
+            {"id": 1, "type": "player", "team": "players", "current_hp": 30},
+            {"id": 2, "type": "npc", "team": "npcs", "current_hp": 10},
+            {"id": 3, "type": "npc", "team": "npcs", "current_hp": 10},
+        ]}
+    )
+    mock_session.get.return_value = combat
+    context = CombatContext(guild_id, combat, entities={})
+    mock_load_context.return_value = context
 
-    # Setup CombatEncounter mock
-    mock_combat_encounter = MagicMock(spec=CombatEncounter)
-    mock_combat_encounter.id = combat_id
-    mock_combat_encounter.guild_id = guild_id
-    mock_combat_encounter.status = CombatStatus.ACTIVE
-    mock_combat_encounter.current_turn_entity_id = mock_npc_entity.id
-    mock_combat_encounter.current_turn_entity_type = "npc"
-    mock_combat_encounter.turn_order_json = {
-        "order": [{"id": mock_npc_entity.id, "type": "npc"}], # Simplified
-        "current_index": 0,
-        "current_turn_number": 1
-    }
-    mock_combat_encounter.participants_json = {
-        "entities": [{
-            "id": mock_npc_entity.id, "type": "npc", "name": "Goblin", "team": "npcs",
-            "current_hp": 30, "max_hp": 50, # NPC is alive
-            # ... other participant data
-        }]
-    }
-    mock_combat_encounter.rules_config_snapshot_json = {}
-    mock_combat_encounter.location_id = 10
-
-    mock_session.get.return_value = mock_combat_encounter
-
-    # NPC action setup
     npc_chosen_action = {"action_type": "attack", "target_id": 1, "target_type": "player"}
     mock_get_npc_action.return_value = npc_chosen_action
+    mock_engine_process_action.return_value = CombatActionResult(success=True, action_type="attack", actor_id=2, actor_type="npc")
 
-    # Combat engine result setup
-    mock_action_result = AsyncMock(spec=type(CombatActionResult)) # Use type for spec
-    mock_action_result.success = True
-    mock_action_result.description_i18n = {"en": "NPC attacked!"}
-    mock_action_result.model_dump = MagicMock(return_value={"success": True, "description_i18n": {"en": "NPC attacked!"}})
-    mock_action_result.model_dump_json = MagicMock(return_value='{"success": true, "description_i18n": {"en": "NPC attacked!"}}')
-    mock_engine_process_action.return_value = mock_action_result
-
+    returned_encounter = await process_combat_turn(mock_session, guild_id, combat_id)
 
-    # Combat end check setup
-    mock_check_combat_end.return_value = (False, None) # Combat does not end
+    assert returned_encounter is combat
+    # Both NPCs acted in one pass over one context; the pass stopped at the player's turn
+    mock_load_context.assert_awaited_once_with(mock_session, guild_id, combat)
+    assert [c.kwargs["npc_id"] for c in mock_get_npc_action.await_args_list] == [2, 3]
+    assert all(c.kwargs["combat_context"] is context for c in mock_get_npc_action.await_args_list)
+    assert [c.kwargs["actor_id"] for c in mock_engine_process_action.await_args_list] == [2, 3]
+    assert all(c.kwargs["combat_context"] is context for c in mock_engine_process_action.await_args_list)
+    assert (combat.current_turn_entity_type, combat.current_turn_entity_id) == ("player", 1)
+    assert combat.turn_order_json["current_index"] == 2
+    mock_session.refresh.assert_not_called()
+    mock_session.flush.assert_awaited_once() # A single flush for the whole pass
 
-    # Call the function
-    returned_encounter = await process_combat_turn(mock_session, guild_id, combat_id)
 
-    mock_get_npc_action.assert_called_once_with(
-        session=mock_session, guild_id=guild_id, npc_id=mock_npc_entity.id, combat_instance_id=combat_id
-    )
-    mock_engine_process_action.assert_called_once_with(
-        guild_id=guild_id, session=mock_session, combat_instance_id=combat_id,
-        actor_id=mock_npc_entity.id, actor_type="npc", action_data=npc_chosen_action
+@pytest.mark.asyncio
+@patch('src.core.combat_cycle_manager.load_combat_context', new_callable=AsyncMock)
+@patch('src.core.combat_cycle_manager.combat_log.compact_combat_log', new_callable=AsyncMock)
+@patch('src.core.crud.crud_combat_encounter.combat_encounter_crud.remove_participants', new_callable=AsyncMock)
+@patch('src.core.combat_cycle_manager._handle_combat_end_consequences', new_callable=AsyncMock)
+@patch('src.core.combat_cycle_manager._check_combat_end', new_callable=AsyncMock)
+async def test_process_combat_turn_combat_ends_sets_status_and_clears_participants(
+    mock_check_combat_end: AsyncMock,
+    mock_handle_end_consequences: AsyncMock,
+    mock_remove_participants: AsyncMock,
+    mock_compact_combat_log: AsyncMock,
+    mock_load_context: AsyncMock,
+    mock_session: AsyncMock
+):
+    combat = CombatEncounter(
+        id=5, guild_id=100, location_id=10, status=CombatStatus.ACTIVE,
+        current_turn_entity_id=1, current_turn_entity_type="player",
+        turn_order_json={"order": [{"id": 1, "type": "player"}], "current_index": 0, "current_turn_number": 1},
+        participants_json={"entities": [{"id": 1, "type": "player", "team": "players", "current_hp": 10}]}
     )
-    mock_check_combat_end.assert_called_once_with(mock_session, guild_id, mock_combat_encounter)
-    mock_advance_turn.assert_called_once_with(mock_session, mock_combat_encounter) # Ensure session is passed
-    mock_handle_end_consequences.assert_not_called() # Combat did not end
+    mock_session.get.return_value = combat
+    mock_load_context.return_value = CombatContext(100, combat, entities={})
+    mock_check_combat_end.return_value = (True, "players")
+
+    returned = await process_combat_turn(mock_session, 100, 5)
 
-    assert returned_encounter == mock_combat_encounter
-    mock_session.add.assert_called_with(mock_combat_encounter) # Should be added for updates
-    mock_session.refresh.assert_called_once_with(mock_combat_encounter)
+    assert returned.status == CombatStatus.ENDED_VICTORY_PLAYERS
+    mock_handle_end_consequences.assert_called_once_with(mock_session, 100, combat, "players")
+    mock_remove_participants.assert_called_once_with(mock_session, combat_encounter_id=5)
+    mock_compact_combat_log.assert_called_once_with(mock_session, combat) # COMBAT_LOG_COMPACT_ON_END defaults to true
 
 
 # TODO: test_process_combat_turn_player_action_advances_turn (if player action already processed)
-# TODO: test_process_combat_turn_combat_ends
 # TODO: test_process_combat_turn_active_entity_defeated_skips_action
 # TODO: test_process_combat_turn_recursive_npc_turns
 
@@ -439,13 +481,13 @@ def test_check_combat_end_scenarios():
 
 # Test for player in a party status update
 @pytest.mark.asyncio
-@patch('src.core.rules.get_rule')
-@patch('src.core.dice_roller.roll_dice')
+@patch('src.core.combat_cycle_manager.build_guild_rule_snapshot', new_callable=AsyncMock)
+@patch('src.core.dice_roller.roll_many')
 @patch('src.core.game_events.log_event')
 async def test_start_combat_player_in_party_status_update(
     mock_log_event: AsyncMock,
-    mock_roll_dice: MagicMock,
-    mock_get_rule: AsyncMock,
+    mock_roll_many: MagicMock,
+    mock_build_rules: AsyncMock,
     mock_session: AsyncMock,
     mock_player_entity: Player, # Player 1
     mock_npc_entity: GeneratedNpc  # NPC
@@ -462,14 +504,11 @@ async def test_start_combat_player_in_party_status_update(
     mock_party.turn_status = PartyTurnStatus.IDLE
     mock_party.current_combat_id = None # Assuming this attribute exists
 
-    # Mock rule calls
-    def get_rule_party_test_side_effect(*, db, guild_id, key, default):
-        return {
-            "player:stats:default_max_hp": 100,
-            "combat:initiative:dice": "1d20",
-        }.get(key, default)
-    mock_get_rule.side_effect = get_rule_party_test_side_effect
-    mock_roll_dice.return_value = (10, [10]) # Single roll for simplicity
+    mock_build_rules.return_value = GuildRuleSnapshot(guild_id, {
+        "player:stats:default_max_hp": 100,
+        "combat:initiative:dice": "1d20",
+    })
+    mock_roll_many.return_value = [10, 10] # Same roll for both participants
 
     participant_entities = [mock_player_entity, mock_npc_entity]
 
@@ -25,7 +25,9 @@ def clear_rules_cache_fixture():
 
 @pytest.fixture
 def mock_session() -> AsyncMock:
-    return AsyncMock(spec=AsyncSession)
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock(return_value=MagicMock()) # Result objects are synchronous
+    return session
 
 @pytest.fixture
 def mock_player() -> Player:
@@ -549,3 +551,15 @@ async def test_process_combat_action_unknown_action( # Removed mock_get_entity f
             assert result_rerun.success is False # Re-assert from rerun
             assert "Action type 'dance' is not recognized" in result_rerun.description_i18n["en"]
             mock_log_event_unknown.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_calculate_attribute_modifiers_many(mock_session: AsyncMock, mock_combat_encounter: CombatEncounter):
+    from src.core.combat_engine import _calculate_attribute_modifiers_many
+    result = await _calculate_attribute_modifiers_many([16, 7, 10], mock_session, 1, mock_combat_encounter.rules_config_snapshot_json)
+    assert result == [3, -2, 0]
+
+@pytest.mark.asyncio
+async def test_calculate_attribute_modifier_rejects_unsafe_formula(mock_session: AsyncMock):
+    snapshot = {"combat:attributes:modifier_formula": "__import__('os').getpid()"}
+    result = await _calculate_attribute_modifier(16, mock_session, 1, snapshot)
+    assert result == 3 # Falls back to the default calculation
@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, CombatEncounter, CombatLogEntry
+from src.models.enums import CombatStatus
+from src.core.combat_log import (
+    append_combat_log_entries,
+    append_combat_log_entry,
+    compact_combat_log,
+    count_combat_log_entries,
+    get_combat_log_page,
+)
+
+
+class TestCombatLog(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    test_guild_id = 801
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add(GuildConfig(id=self.test_guild_id, main_language="en"))
+            encounter = CombatEncounter(guild_id=self.test_guild_id, status=CombatStatus.ACTIVE)
+            session.add(encounter)
+            await session.commit()
+            self.encounter = encounter
+
+    async def _append_turns(self, turns: range) -> None:
+        async with self.SessionLocal() as session:
+            await append_combat_log_entries(session, self.encounter, [{"turn": t, "actor": "player:1"} for t in turns])
+            await session.commit()
+
+    async def test_append_numbers_entries_and_pages_by_seq(self):
+        await self._append_turns(range(1, 4))
+        async with self.SessionLocal() as session:
+            self.assertEqual(await append_combat_log_entry(session, self.encounter, {"turn": 4, "actor": "npc:2"}), 4)
+            await session.commit()
+
+            first = await get_combat_log_page(session, self.encounter.id, limit=3)
+            second = await get_combat_log_page(session, self.encounter.id, after_seq=first[-1]["seq"], limit=3)
+            turn_numbers = (await session.execute(
+                select(CombatLogEntry.turn_number).order_by(CombatLogEntry.seq)
+            )).scalars().all()
+
+        self.assertEqual([e["seq"] for e in first], [1, 2, 3])
+        self.assertEqual(second, [{"turn": 4, "actor": "npc:2", "seq": 4}])
+        self.assertEqual(turn_numbers, [1, 2, 3, 4])
+
+    async def test_compaction_keeps_the_log_readable_and_numbering_continues(self):
+        await self._append_turns(range(1, 6))
+        async with self.SessionLocal() as session:
+            encounter = await session.get(CombatEncounter, self.encounter.id)
+            self.assertEqual(await compact_combat_log(session, encounter), 5)
+            await session.commit()
+            self.assertEqual(encounter.combat_log_archived_count, 5)
+            live_rows = (await session.execute(select(CombatLogEntry))).scalars().all()
+            self.assertEqual(live_rows, [])
+
+            self.assertEqual(await append_combat_log_entry(session, encounter, {"turn": 6}), 6)
+            await session.commit()
+
+            self.assertEqual(await count_combat_log_entries(session, encounter.id), 6)
+            # A page spanning the archive and the live rows
+            page = await get_combat_log_page(session, encounter.id, after_seq=3, limit=10)
+            self.assertEqual([e["seq"] for e in page], [4, 5, 6])
+            self.assertEqual(page[0], {"turn": 4, "actor": "player:1", "seq": 4})
+            self.assertEqual([e["seq"] for e in await get_combat_log_page(session, encounter.id, limit=2)], [1, 2])
+
+            # A second compaction extends the archive
+            self.assertEqual(await compact_combat_log(session, encounter), 1)
+            await session.commit()
+            self.assertEqual([e["turn"] for e in await get_combat_log_page(session, encounter.id)], [1, 2, 3, 4, 5, 6])
+            self.assertEqual(await compact_combat_log(session, encounter), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
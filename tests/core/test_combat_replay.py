@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, Player, GeneratedNpc, CombatEncounter, CombatLogEntry
+from src.core import rng_service
+from src.core.combat_cycle_manager import start_combat
+from src.core.combat_engine import process_combat_action
+from src.core.combat_replay import replay_combat
+from src.core.dice_roller import DiceRoller, get_active_dice_roller, roll_dice, use_dice_roller
+from src.core.rules import _rules_cache
+
+
+class TestRngService(unittest.TestCase):
+
+    def test_derive_seed_is_stable_and_label_specific(self):
+        self.assertEqual(rng_service.derive_seed(42, "action", 1, 0), rng_service.derive_seed(42, "action", 1, 0))
+        self.assertNotEqual(rng_service.derive_seed(42, "action", 1, 0), rng_service.derive_seed(42, "action", 1, 1))
+        self.assertNotEqual(rng_service.derive_seed(42, "initiative"), rng_service.derive_seed(43, "initiative"))
+        self.assertTrue(0 <= rng_service.derive_seed(42) < 2 ** 63)
+
+    def test_guild_turn_action_rollers_are_independent_streams(self):
+        first = rng_service.guild_turn_action_roller(7, 0)
+        self.assertEqual(first.seed, rng_service.guild_turn_action_roller(7, 0).seed)
+        self.assertNotEqual(first.seed, rng_service.guild_turn_action_roller(7, 1).seed)
+
+    def test_use_dice_roller_scopes_unseeded_rolls(self):
+        with use_dice_roller(DiceRoller(5)):
+            scoped = [roll_dice("3d6") for _ in range(5)]
+        self.assertIsNone(get_active_dice_roller())
+        replay = DiceRoller(5)
+        self.assertEqual(scoped, [replay.roll("3d6") for _ in range(5)])
+
+
+class TestCombatReplay(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    test_guild_id = 951
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        _rules_cache.clear()
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add(GuildConfig(id=self.test_guild_id, main_language="en"))
+            await session.flush()
+            session.add_all([
+                Player(id=1, discord_id=9101, guild_id=self.test_guild_id, name="Hero", current_hp=300),
+                GeneratedNpc(id=2, guild_id=self.test_guild_id, name_i18n={"en": "Ogre"},
+                             properties_json={"stats": {"hp": 500, "armor_class": 8}}),
+            ])
+            await session.commit()
+
+        async with self.SessionLocal() as session:
+            player = await session.get(Player, 1)
+            npc = await session.get(GeneratedNpc, 2)
+            encounter = await start_combat(session, self.test_guild_id, None, [player, npc])
+            await session.commit()
+            self.combat_id = encounter.id
+            self.seed = encounter.rules_config_snapshot_json[rng_service.RNG_SEED_RULE_KEY]
+
+        for turn in range(6):
+            async with self.SessionLocal() as session:
+                actor_id, actor_type, target_id, target_type = (1, "player", 2, "npc") if turn % 2 == 0 else (2, "npc", 1, "player")
+                await process_combat_action(
+                    self.test_guild_id, session, self.combat_id, actor_id, actor_type,
+                    {"action_type": "attack", "target_id": target_id, "target_type": target_type},
+                )
+                await session.commit()
+
+    async def asyncTearDown(self):
+        _rules_cache.clear()
+
+    async def test_replay_reproduces_logged_combat(self):
+        async with self.SessionLocal() as session:
+            replay = await replay_combat(session, self.test_guild_id, self.combat_id)
+
+        self.assertEqual(replay.seed, self.seed)
+        self.assertTrue(replay.initiative_matches)
+        self.assertEqual(len(replay.actions), 6)
+        self.assertTrue(replay.matches, replay.mismatches)
+
+    async def test_replay_reports_diverging_actions(self):
+        async with self.SessionLocal() as session:
+            await session.execute(
+                update(CombatLogEntry)
+                .where(CombatLogEntry.combat_encounter_id == self.combat_id, CombatLogEntry.seq == 3)
+                .values(entry_json={"turn": 1, "actor": "player:1", "action_details": {"action_type": "attack", "target_id": 2, "target_type": "npc"}, "rng_seed": 1})
+            )
+            await session.commit()
+            replay = await replay_combat(session, self.test_guild_id, self.combat_id)
+
+        self.assertFalse(replay.matches)
+        self.assertEqual([action.seq for action in replay.mismatches], [3])
+
+    async def test_replay_requires_recorded_seed(self):
+        async with self.SessionLocal() as session:
+            await session.execute(
+                update(CombatEncounter).where(CombatEncounter.id == self.combat_id).values(rules_config_snapshot_json={})
+            )
+            await session.commit()
+            with self.assertRaises(ValueError):
+                await replay_combat(session, self.test_guild_id, self.combat_id)
+            with self.assertRaises(ValueError):
+                await replay_combat(session, self.test_guild_id + 1, self.combat_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
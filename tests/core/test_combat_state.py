@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, CombatEncounter
+from src.models.enums import CombatStatus
+from src.core.combat_state import CombatState, get_combat_state
+from src.core.combat_log import get_combat_log_page
+
+
+def _encounter(**overrides) -> CombatEncounter:
+    fields = dict(
+        guild_id=701, status=CombatStatus.ACTIVE,
+        current_turn_entity_id=1, current_turn_entity_type="player",
+        participants_json={"entities": [
+            {"id": 1, "type": "player", "team": "players", "current_hp": 20},
+            {"id": 5, "type": "npc", "team": "npcs", "current_hp": 8},
+            {"id": 6, "type": "npc", "team": "npcs", "current_hp": 0},
+        ]},
+        turn_order_json={"order": [{"id": 1, "type": "player"}, {"id": 6, "type": "npc"}, {"id": 5, "type": "npc"}],
+                         "current_index": 0, "current_turn_number": 1},
+    )
+    fields.update(overrides)
+    return CombatEncounter(**fields)
+
+
+class TestCombatStateInMemory(unittest.TestCase):
+
+    def test_lookup_damage_and_team_counts(self):
+        encounter = _encounter()
+        state = CombatState(encounter)
+
+        self.assertIs(state.get("npc", 5), encounter.participants_json["entities"][1])
+        self.assertIsNone(state.get("npc", 1))
+        self.assertEqual(state.apply_damage("npc", 5, 10), 0) # HP never goes below 0
+        self.assertEqual(encounter.participants_json["entities"][1]["current_hp"], 0)
+        self.assertEqual(state.alive_counts_by_team(), {"players": 1, "npcs": 0})
+
+    def test_advance_turn_skips_defeated_and_counts_rounds(self):
+        encounter = _encounter()
+        state = CombatState(encounter)
+
+        self.assertEqual(state.advance_turn(), ("npc", 5)) # npc 6 is down
+        self.assertEqual(encounter.turn_order_json["current_index"], 2)
+        self.assertEqual(state.advance_turn(), ("player", 1))
+        self.assertEqual(encounter.turn_order_json["current_turn_number"], 2)
+        self.assertEqual((encounter.current_turn_entity_type, encounter.current_turn_entity_id), ("player", 1))
+
+    def test_state_is_reused_until_documents_are_replaced(self):
+        encounter = _encounter()
+        state = get_combat_state(encounter)
+        self.assertIs(get_combat_state(encounter), state)
+        encounter.participants_json = {"entities": []} # e.g. after session.refresh
+        self.assertIsNot(get_combat_state(encounter), state)
+
+
+class TestCombatStateFlush(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add(GuildConfig(id=701, main_language="en"))
+            encounter = _encounter()
+            session.add(encounter)
+            await session.commit()
+            self.combat_id = encounter.id
+
+    async def test_flush_writes_changed_fields_log_and_turn(self):
+        async with self.SessionLocal() as session:
+            encounter = await session.get(CombatEncounter, self.combat_id)
+            state = CombatState(encounter)
+            state.apply_damage("npc", 5, 3)
+            state.append_log({"turn": 1, "actor": "player:1", "action_details": {"damage_dealt": 3}})
+            state.advance_turn()
+            self.assertTrue(state.is_dirty)
+            await state.flush(session)
+            self.assertFalse(state.is_dirty)
+            await session.commit()
+
+        async with self.SessionLocal() as session:
+            stored = await session.get(CombatEncounter, self.combat_id)
+            self.assertEqual(stored.participants_json["entities"][1], {"id": 5, "type": "npc", "team": "npcs", "current_hp": 5})
+            self.assertEqual(stored.participants_json["entities"][0]["current_hp"], 20)
+            self.assertEqual(await get_combat_log_page(session, self.combat_id),
+                             [{"turn": 1, "actor": "player:1", "action_details": {"damage_dealt": 3}, "seq": 1}])
+            self.assertEqual(stored.turn_order_json["current_index"], 2)
+            self.assertEqual(len(stored.turn_order_json["order"]), 3)
+            self.assertEqual((stored.current_turn_entity_type, stored.current_turn_entity_id), ("npc", 5))
+
+    async def test_reassigned_document_is_written_whole(self):
+        async with self.SessionLocal() as session:
+            encounter = await session.get(CombatEncounter, self.combat_id)
+            state = CombatState(encounter)
+            state.apply_damage("player", 1, 5)
+            # A caller replaces the document on the ORM object; it has to be written as a whole
+            entities = [dict(p) for p in encounter.participants_json["entities"]]
+            entities[2]["current_hp"] = 4
+            encounter.participants_json = {"entities": entities}
+            await state.flush(session)
+            await session.commit()
+
+        async with self.SessionLocal() as session:
+            stored = await session.get(CombatEncounter, self.combat_id)
+            self.assertEqual([p["current_hp"] for p in stored.participants_json["entities"]], [15, 8, 4])
+            self.assertIsNone(stored.combat_log_json)
+
+if __name__ == "__main__":
+    unittest.main()
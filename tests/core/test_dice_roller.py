@@ -4,7 +4,9 @@ from typing import List, Tuple
 
 # Adjust the import path based on your project structure
 # If src is a top-level package and your tests are run from the project root:
-from src.core.dice_roller import roll_dice
+from src.core.dice_roller import (
+    DiceRoller, parse_dice_expression, parse_dice_string, roll_dice, roll_many
+)
 
 class TestDiceRoller(unittest.TestCase):
 
@@ -91,5 +93,65 @@ class TestDiceRoller(unittest.TestCase):
             with self.assertRaises(ValueError, msg=f"Expected ValueError for '{s}'"):
                 roll_dice(s)
 
+    def test_parse_is_cached_per_notation(self):
+        self.assertIs(parse_dice_expression("2d6+1"), parse_dice_expression("2d6+1"))
+        self.assertEqual(parse_dice_string(" 2d6 + 1 "), (2, 6, 1))
+
+    def test_parse_dice_string_rejects_rich_notation(self):
+        for s in ["d20adv", "4d6kh3", "2d6!", "1d8+1d6"]:
+            parse_dice_expression(s) # Valid expression...
+            with self.assertRaises(ValueError, msg=f"Expected ValueError for '{s}'"):
+                parse_dice_string(s) # ...but no (N, X, M) form
+
+    def test_keep_highest_and_advantage(self):
+        expression = parse_dice_expression("d20adv")
+        self.assertEqual(expression.terms[0].num_dice, 2)
+        self.assertEqual(expression.terms[0].keep, 1)
+        for _ in range(50):
+            total, rolls = roll_dice("4d6kh3+1")
+            self.assertEqual(len(rolls), 3)
+            self.assertEqual(total, sum(rolls) + 1)
+            total, rolls = roll_dice("d20dis")
+            self.assertEqual(len(rolls), 1)
+            self.assertTrue(1 <= total <= 20)
+
+    def test_exploding_dice(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            total, rolls = roll_dice("3d2!", rng=rng)
+            self.assertGreaterEqual(len(rolls), 3)
+            self.assertEqual(total, sum(rolls))
+            self.assertEqual(len(rolls) - 3, rolls.count(2)) # Every maximum face added one die
+
+    def test_multiple_terms(self):
+        for _ in range(50):
+            total, rolls = roll_dice("1d8+2d6-1d4+3")
+            self.assertEqual(len(rolls), 4)
+            self.assertEqual(total, rolls[0] + rolls[1] + rolls[2] - rolls[3] + 3)
+
+    def test_invalid_rich_notation(self):
+        for s in ["2d6kh3", "2d6kh0", "1d1!", "d20adv+", "1d6+-1", "600d6adv"]:
+            with self.assertRaises(ValueError, msg=f"Expected ValueError for '{s}'"):
+                roll_dice(s)
+
+    def test_roll_many(self):
+        totals = roll_many("2d6+1", 500)
+        self.assertEqual(len(totals), 500)
+        self.assertTrue(all(3 <= t <= 13 for t in totals))
+        self.assertEqual(roll_many("1d20", 0), [])
+        self.assertTrue(all(2 <= t <= 7 for t in roll_many("d6kh1+1", 100)))
+        with self.assertRaises(ValueError):
+            roll_many("1d6", -1)
+        with self.assertRaises(ValueError):
+            roll_many("1000d6", 10_000)
+
+    def test_seeded_roller_replays(self):
+        first, second = DiceRoller(seed=42), DiceRoller(seed=42)
+        self.assertEqual(
+            [first.roll("d20adv+2") for _ in range(10)] + [first.roll_many("3d6!", 20)],
+            [second.roll("d20adv+2") for _ in range(10)] + [second.roll_many("3d6!", 20)],
+        )
+        self.assertIsInstance(DiceRoller().seed, int)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+import pytest
+
+from src.core.formula_engine import (
+    FormulaError,
+    compile_formula,
+    get_compiled_formula,
+    clear_formula_cache,
+    _formula_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_formula_cache_fixture():
+    clear_formula_cache()
+    yield
+    clear_formula_cache()
+
+
+def test_compile_and_evaluate_modifier_formula():
+    compiled = compile_formula("(value - 10) // 2")
+    assert compiled.evaluate(value=16) == 3
+    assert compiled.evaluate(value=7) == -2
+    assert compiled.evaluate({"value": 10}) == 0
+    assert compiled.variables == frozenset({"value"})
+
+
+def test_whitelisted_functions_and_conditionals():
+    compiled = compile_formula("max(0, min(5, floor(value / 3))) if value > 0 else -1")
+    assert compiled.evaluate(value=9) == 3
+    assert compiled.evaluate(value=30) == 5
+    assert compiled.evaluate(value=-4) == -1
+    assert compile_formula("1 <= value < 10 and abs(value)").evaluate(value=4) == 4
+
+
+def test_evaluate_many():
+    compiled = compile_formula("(value - 10) // 2 + bonus")
+    assert compiled.evaluate_many([8, 10, 16, 20], extra_scope={"bonus": 1}) == [0, 1, 4, 6]
+    assert compile_formula("level * 2").evaluate_many([1, 2, 3], variable="level") == [2, 4, 6]
+
+
+@pytest.mark.parametrize("formula", [
+    "__import__('os').system('echo hi')",
+    "value.__class__",
+    "open('x')",
+    "[value]",
+    "value[0]",
+    "lambda: 1",
+    "'abc'",
+    "max",
+    "2 ** 1000",
+    "value +",
+])
+def test_rejected_formulas(formula):
+    with pytest.raises(FormulaError):
+        compile_formula(formula).evaluate(value=1)
+
+
+def test_undefined_variable_and_runtime_error():
+    with pytest.raises(FormulaError):
+        compile_formula("strength + 1").evaluate(value=1)
+    with pytest.raises(FormulaError):
+        compile_formula("value // 0").evaluate(value=1)
+
+
+def test_get_compiled_formula_caches_per_guild_and_rule():
+    first = get_compiled_formula(1, "combat:attributes:modifier_formula", "(value - 10) // 2")
+    second = get_compiled_formula(1, "combat:attributes:modifier_formula", "(value - 10) // 2")
+    other_guild = get_compiled_formula(2, "combat:attributes:modifier_formula", "(value - 10) // 2")
+    updated = get_compiled_formula(1, "combat:attributes:modifier_formula", "value // 2")
+
+    assert first is second
+    assert other_guild is not first
+    assert updated.evaluate(value=20) == 10
+    assert len(_formula_cache) == 3
+
+    clear_formula_cache(guild_id=1)
+    assert list(_formula_cache.keys()) == [(2, "combat:attributes:modifier_formula", "(value - 10) // 2")]
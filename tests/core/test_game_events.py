@@ -1,9 +1,14 @@
 import pytest
+import pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from src.core.game_events import log_event
+from src.core.game_events import get_last_turn_log_entries, log_event
+from src.core.story_log_writer import STORY_LOG_BUFFER_KEY, StoryLogBuffer, StoryLogSession, get_story_log_buffer
+from src.models import GuildConfig
+from src.models.base import Base
 from src.models.enums import EventType
 from src.models.story_log import StoryLog # To inspect the object passed to session.add
 
@@ -145,3 +150,131 @@ async def test_log_event_minimal_parameters():
     assert added_log_entry.location_id is None
     assert added_log_entry.entity_ids_json is None # Because no player/party/initial provided
     # added_log_entry.timestamp will be None here as server_default is a DB-level instruction
+
+
+@pytest.mark.asyncio
+async def test_log_event_buffers_rows_in_story_log_sessions():
+    mock_session = AsyncMock(spec=AsyncSession)
+    mock_session.info = {STORY_LOG_BUFFER_KEY: StoryLogBuffer()}
+
+    await log_event(mock_session, guild_id=1, event_type="system_event", details_json={"n": 1},
+                    player_id=1, entity_ids_json={"players": [3, 1, 3]})
+
+    mock_session.add.assert_not_called()
+    rows = mock_session.info[STORY_LOG_BUFFER_KEY].rows
+    assert len(rows) == 1
+    assert rows[0]["event_type"] == EventType.SYSTEM_EVENT
+    assert rows[0]["entity_ids_json"] == {"players": [3, 1]} # Caller duplicates removed too
+
+
+@pytest_asyncio.fixture
+async def story_log_session_maker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(
+        bind=engine, class_=AsyncSession, sync_session_class=StoryLogSession, expire_on_commit=False
+    )
+    async with session_maker() as session:
+        session.add(GuildConfig(id=1, main_language="en"))
+        await session.commit()
+    yield session_maker
+    await engine.dispose()
+
+
+async def _logged_details(session: AsyncSession) -> list:
+    return list((await session.execute(select(StoryLog.details_json).order_by(StoryLog.id))).scalars())
+
+
+@pytest.mark.asyncio
+async def test_buffered_events_written_in_one_insert_at_commit(story_log_session_maker):
+    inserts = []
+
+    def count_story_log_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO story_logs"):
+            inserts.append(statement)
+
+    async with story_log_session_maker() as session:
+        engine = session.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", count_story_log_inserts)
+        try:
+            for n in range(5):
+                await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": n}, player_id=7)
+            assert len(get_story_log_buffer(session)) == 5
+            await session.commit()
+        finally:
+            event.remove(engine, "before_cursor_execute", count_story_log_inserts)
+
+    assert len(inserts) == 1
+    async with story_log_session_maker() as session:
+        rows = (await session.execute(select(StoryLog).order_by(StoryLog.id))).scalars().all()
+    assert [row.details_json for row in rows] == [{"n": n} for n in range(5)]
+    assert rows[0].event_type == EventType.SYSTEM_EVENT
+    assert rows[0].entity_ids_json == {"players": [7]}
+    assert rows[0].timestamp is not None
+
+
+@pytest.mark.asyncio
+async def test_buffered_events_written_on_flush_and_discarded_on_rollback(story_log_session_maker):
+    async with story_log_session_maker() as session:
+        await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": 1})
+        await session.flush()
+        assert len(get_story_log_buffer(session)) == 0
+        assert await _logged_details(session) == [{"n": 1}]
+
+        await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": 2})
+        assert await _logged_details(session) == [{"n": 1}, {"n": 2}] # Autoflush before the query
+
+        await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": 3})
+        savepoint = await session.begin_nested() # Flushes n=3 into the enclosing transaction
+        await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": 4})
+        await savepoint.rollback()
+        savepoint = await session.begin_nested()
+        await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": 5})
+        await savepoint.commit()
+        await session.commit()
+        assert await _logged_details(session) == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 5}]
+
+        await log_event(session, guild_id=1, event_type="SYSTEM_EVENT", details_json={"n": 6})
+        await session.rollback()
+        await session.commit()
+        assert await _logged_details(session) == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 5}]
+
+
+@pytest.mark.asyncio
+async def test_last_turn_log_entries_for_player(story_log_session_maker):
+    async with story_log_session_maker() as session:
+        assert await get_last_turn_log_entries(session, 1, 7) == []
+
+        await log_event(session, 1, "MOVEMENT", {"turn": 1}, player_id=7)
+        await log_event(session, 1, "GUILD_TURN_PROCESSED", {"rng_seed": 1})
+        await log_event(session, 1, "MOVEMENT", {"turn": 2, "old_location_id": 1, "new_location_id": 2}, player_id=7, location_id=None)
+        await log_event(session, 1, "MOVEMENT", {"turn": 2}, player_id=8)
+        await log_event(session, 1, "PLAYER_ACTION", {"turn": 2, "player_id": 9}, entity_ids_json={"players": [9, 7]})
+        await log_event(session, 1, "GUILD_TURN_PROCESSED", {"rng_seed": 2})
+        await log_event(session, 1, "MOVEMENT", {"turn": 3}, player_id=7) # Next turn, not processed yet
+        await session.commit()
+
+        entries = await get_last_turn_log_entries(session, 1, 7)
+
+    assert entries == [
+        {"turn": 2, "old_location_id": 1, "new_location_id": 2, "guild_id": 1, "event_type": EventType.MOVEMENT.value, "location_id": None, "player_id": 7},
+        {"turn": 2, "player_id": 9, "guild_id": 1, "event_type": EventType.PLAYER_ACTION.value, "location_id": None},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_first_turn_log_entries_are_bounded(story_log_session_maker):
+    async with story_log_session_maker() as session:
+        for n in range(5):
+            await log_event(session, 1, "MOVEMENT", {"n": n}, player_id=7)
+            await log_event(session, 1, "MOVEMENT", {"n": n}, player_id=8)
+        await log_event(session, 1, "SYSTEM_EVENT", {"n": 5}) # No entity ids
+        await log_event(session, 1, "GUILD_TURN_PROCESSED", {"rng_seed": 1}) # The guild's first turn
+        await session.commit()
+
+        entries = await get_last_turn_log_entries(session, 1, 7, limit=3)
+
+    # Only the player's last 3 events, oldest first; other players' rows don't use up the limit.
+    assert [entry["n"] for entry in entries] == [2, 3, 4]
+    assert all(entry["player_id"] == 7 for entry in entries)
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.movement_logic import handle_move_action, MovementError
 from src.models import Player, Party, Location, LocationType
 from src.models.enums import PlayerStatus, PartyTurnStatus
+from src.core.rules import _rules_cache
 
 
 # Default attributes for mock objects
@@ -22,6 +23,12 @@ UNCONNECTED_LOCATION_ID = 3
 UNCONNECTED_LOCATION_STATIC_ID = "mountain"
 NON_EXISTENT_LOCATION_STATIC_ID = "void"
 
+@pytest.fixture(autouse=True)
+def clear_rules_cache_fixture():
+    _rules_cache.clear()
+    yield
+    _rules_cache.clear()
+
 @pytest.fixture
 def mock_session() -> AsyncMock:
     session = AsyncMock(spec=AsyncSession)
@@ -541,7 +548,7 @@ async def test_execute_move_successful_solo_player(
     mock_scalar_result_rules = MagicMock() # Result of execution_result.scalars()
     mock_execution_result_rules.scalars.return_value = mock_scalar_result_rules
 
-    mock_scalar_result_rules.all = AsyncMock(return_value=[]) # No rules found, get_rule returns default
+    mock_scalar_result_rules.all = MagicMock(return_value=[]) # No rules found, get_rule returns default
 
     from src.core.movement_logic import execute_move_for_player_action # Import here
     result = await execute_move_for_player_action(
@@ -606,7 +613,7 @@ async def test_execute_move_successful_party_move(
     mock_session.execute.return_value = mock_execution_result_rules
     mock_scalar_result_rules = MagicMock()
     mock_execution_result_rules.scalars.return_value = mock_scalar_result_rules
-    mock_scalar_result_rules.all = AsyncMock(return_value=[]) # No rules found
+    mock_scalar_result_rules.all = MagicMock(return_value=[]) # No rules found
 
     from src.core.movement_logic import execute_move_for_player_action
     result = await execute_move_for_player_action(
@@ -693,7 +700,7 @@ async def test_execute_move_target_location_not_found_by_static_id(
     # Mock setup for rule fetching (first call to session.execute)
     mock_exec_rules_result = MagicMock() # Correct: this is the direct return of session.execute
     mock_rules_scalars_obj = MagicMock() # Correct: this is the return of .scalars()
-    mock_rules_scalars_obj.all = AsyncMock(return_value=[]) # Correct: .all() is async and returns list
+    mock_rules_scalars_obj.all = MagicMock(return_value=[]) # .all() on a sync Result returns list
     mock_exec_rules_result.scalars.return_value = mock_rules_scalars_obj # Wiring it up
 
     # Mock setup for name searching (next 3 calls to session.execute)
@@ -702,7 +709,11 @@ async def test_execute_move_target_location_not_found_by_static_id(
     mock_name_search_scalars_obj.all = AsyncMock(return_value=[]) # Correct
     mock_exec_name_search_result.scalars.return_value = mock_name_search_scalars_obj # Wiring
 
+    mock_exec_rules_version_result = MagicMock()
+    mock_exec_rules_version_result.scalar_one_or_none.return_value = 0
+
     mock_session.execute.side_effect = [
+        mock_exec_rules_version_result, # For get_rule (rules version probe)
         mock_exec_rules_result, # For get_rule
         mock_exec_name_search_result, # For name search lang 1
         mock_exec_name_search_result, # For name search lang 2
@@ -739,7 +750,7 @@ async def test_execute_move_not_connected(
     mock_session.execute.return_value = mock_execution_result_rules
     mock_scalar_result_rules = MagicMock()
     mock_execution_result_rules.scalars.return_value = mock_scalar_result_rules
-    mock_scalar_result_rules.all = AsyncMock(return_value=[]) # No rules found
+    mock_scalar_result_rules.all = MagicMock(return_value=[]) # No rules found
 
     # Ensure start_location does not list unconnected_location as a neighbor
     mock_start_location.neighbor_locations_json = [
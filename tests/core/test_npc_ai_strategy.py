@@ -0,0 +1,101 @@
+import types
+
+import pytest
+
+from src.core.npc_ai_strategy import (
+    DEFAULT_NPC_STRATEGY,
+    NPC_STRATEGY_RULE_KEY,
+    TARGET_METRIC_SCORERS,
+    CompiledNpcStrategy,
+    compile_npc_strategy,
+    get_compiled_npc_strategy,
+    get_npc_strategy_cache_stats,
+    clear_npc_strategy_cache,
+)
+from src.core.rule_snapshot import GuildRuleSnapshot
+from src.models.generated_npc import GeneratedNpc
+from src.models.player import Player
+
+
+@pytest.fixture(autouse=True)
+def clean_strategy_cache():
+    clear_npc_strategy_cache()
+    yield
+    clear_npc_strategy_cache()
+
+
+def _npc(npc_id: int, personality=None) -> GeneratedNpc:
+    return GeneratedNpc(id=npc_id, guild_id=100, name_i18n={"en": f"NPC {npc_id}"},
+                        properties_json={}, ai_metadata_json={"personality": personality} if personality else {})
+
+
+def test_compile_fills_defaults_and_applies_personality():
+    guild_strategy = {"action_selection": {"offensive_bias": 0.5}, "target_selection": {"priority_order": ["highest_absolute_hp"]}}
+
+    strategy = compile_npc_strategy(guild_strategy, "cautious")
+
+    assert strategy["action_selection"]["offensive_bias"] == pytest.approx(0.3)
+    assert strategy["action_selection"]["resource_thresholds"]["self_hp_below_for_heal_ability"] == pytest.approx(0.5)
+    assert strategy["simulation"]["enabled"] is False # Section taken from the defaults
+    assert [m.name for m in strategy.priority_metrics] == ["highest_absolute_hp"]
+    assert strategy.priority_metrics[0].descending is True
+    # Inputs are left untouched
+    assert guild_strategy == {"action_selection": {"offensive_bias": 0.5}, "target_selection": {"priority_order": ["highest_absolute_hp"]}}
+    assert DEFAULT_NPC_STRATEGY["action_selection"]["offensive_bias"] == 0.75
+
+
+def test_compiled_strategy_is_read_only():
+    strategy = compile_npc_strategy({}, None)
+
+    with pytest.raises(TypeError):
+        strategy["action_selection"]["offensive_bias"] = 1.0
+    assert isinstance(strategy["action_selection"]["abilities_priority"], tuple)
+    # Still usable where a rules dict is expected
+    overridden = {**strategy, "simulation": {**strategy.get("simulation", {}), "enabled": True}}
+    assert overridden["simulation"]["enabled"] is True
+    assert strategy["simulation"]["enabled"] is False
+
+
+def test_same_archetype_compiles_once_per_rules_version():
+    rules = GuildRuleSnapshot(100, {NPC_STRATEGY_RULE_KEY: {"action_selection": {"offensive_bias": 0.6}}}, version=3)
+
+    first = get_compiled_npc_strategy(rules, _npc(1, "aggressive"))
+    for npc_id in range(2, 101):
+        assert get_compiled_npc_strategy(rules, _npc(npc_id, "aggressive")) is first
+    other = get_compiled_npc_strategy(rules, _npc(200, "cautious"))
+
+    assert isinstance(first, CompiledNpcStrategy)
+    assert first["action_selection"]["offensive_bias"] == pytest.approx(0.8)
+    assert other is not first
+    stats = get_npc_strategy_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (99, 2, 2)
+    assert stats["hit_rate"] == pytest.approx(99 / 101)
+
+
+def test_new_rules_version_recompiles():
+    npc = _npc(1, "aggressive")
+    old = get_compiled_npc_strategy(GuildRuleSnapshot(100, {NPC_STRATEGY_RULE_KEY: {"action_selection": {"offensive_bias": 0.1}}}, version=1), npc)
+    new = get_compiled_npc_strategy(GuildRuleSnapshot(100, {NPC_STRATEGY_RULE_KEY: {"action_selection": {"offensive_bias": 0.5}}}, version=2), npc)
+
+    assert old["action_selection"]["offensive_bias"] == pytest.approx(0.3)
+    assert new["action_selection"]["offensive_bias"] == pytest.approx(0.7)
+
+
+def test_unversioned_rules_are_keyed_by_content():
+    npc = _npc(1)
+    a = get_compiled_npc_strategy(GuildRuleSnapshot(100, {NPC_STRATEGY_RULE_KEY: {"action_selection": {"offensive_bias": 0.1}}}), npc)
+    b = get_compiled_npc_strategy(GuildRuleSnapshot(100, {NPC_STRATEGY_RULE_KEY: {"action_selection": {"offensive_bias": 0.9}}}), npc)
+
+    assert a["action_selection"]["offensive_bias"] == pytest.approx(0.1)
+    assert b["action_selection"]["offensive_bias"] == pytest.approx(0.9)
+
+
+def test_target_scorers_read_current_hp_of_encounter_participants():
+    context = types.SimpleNamespace(relationship_value=lambda *args: None)
+    target = Player(id=7, guild_id=100, discord_id=7, name="P")
+    combat_data = {"id": 7, "type": "player", "current_hp": 10, "max_hp": 40} # As participants_json stores them
+    strategy = {"target_selection": {"threat_factors": {"low_hp_target_bonus": 0.2}}}
+
+    assert TARGET_METRIC_SCORERS["lowest_hp_percentage"](context, _npc(1), target, combat_data, strategy) == pytest.approx(25.0)
+    assert TARGET_METRIC_SCORERS["highest_absolute_hp"](context, _npc(1), target, combat_data, strategy) == 10
+    assert TARGET_METRIC_SCORERS["highest_threat_score"](context, _npc(1), target, combat_data, strategy) == pytest.approx(10.0) # Low HP bonus
@@ -0,0 +1,98 @@
+import pytest
+
+from src.core.outcome_estimator import (
+    ActionOutcome,
+    attack_damage,
+    check_odds,
+    dice_pmf,
+    effect_expectation,
+    estimate_action_outcomes,
+    estimator_cache_info,
+    expected_dice_value,
+    parse_effect_expression,
+)
+from src.core.rule_snapshot import GuildRuleSnapshot
+from src.models.generated_npc import GeneratedNpc
+from src.models.player import Player
+
+
+@pytest.fixture
+def rules() -> GuildRuleSnapshot:
+    return GuildRuleSnapshot(1, {"combat:attack:damage_formula": "1d8"}, 1)
+
+
+@pytest.fixture
+def actor() -> GeneratedNpc:
+    return GeneratedNpc(id=1, guild_id=1, name_i18n={"en": "Orc"}, properties_json={"stats": {"strength": 14}})
+
+
+def test_dice_pmf_is_the_convolution_of_single_dice():
+    low, probs = dice_pmf(2, 6)
+    assert low == 2
+    assert len(probs) == 11
+    assert sum(probs) == pytest.approx(1.0)
+    assert probs[7 - low] == pytest.approx(6 / 36)
+    assert sum((low + i) * p for i, p in enumerate(probs)) == pytest.approx(expected_dice_value("2d6"))
+
+
+def test_expected_dice_value_closed_form():
+    assert expected_dice_value("3d8-2") == pytest.approx(11.5)
+
+
+def test_check_odds_follow_resolve_check_rules():
+    odds = check_odds("1d20", 0, 11, 20, 1)
+    assert odds.hit == pytest.approx(0.5)
+    assert odds.critical == pytest.approx(0.05)
+    assert odds.critical_failure == pytest.approx(0.05)
+
+    # Only a natural 20 lands against an unreachable DC; a natural 1 misses even an easy one.
+    assert check_odds("1d20", 0, 30, 20, 1).hit == pytest.approx(0.05)
+    assert check_odds("1d20", 10, 2, 20, 1).hit == pytest.approx(0.95)
+    # A single die is read as its face, so the notation's own modifier does not count.
+    assert check_odds("1d20+5", 0, 11, 20, 1) == check_odds("1d20", 0, 11, 20, 1)
+    assert check_odds("bad", 0, 10, 20, 1).hit == 0.0
+
+
+def test_attack_damage_crit_effects():
+    assert attack_damage("1d4", 0, "multiply_total_damage", 2.0) == pytest.approx((2.5, 5.0))
+    # Damage below zero is dealt as 0: rolls -1, 0, 1, 2
+    assert attack_damage("1d4", -2, "multiply_total_damage", 2.0)[0] == pytest.approx(0.75)
+    assert attack_damage("1d6+2", 1, "double_damage_dice", 2.0) == pytest.approx((6.5, 10.0))
+    assert attack_damage("2d6+3", 0, "maximize_and_add_dice", 2.0) == pytest.approx((10.0, 19.0))
+    assert attack_damage("nonsense", 0, "multiply_total_damage", 2.0) == (0.0, 0.0)
+
+
+def test_effect_expressions(rules, actor):
+    assert parse_effect_expression("2d4+1+dexterity_modifier") == (((1, 2, 4),), 1, ((1, "dexterity_modifier"),))
+    assert parse_effect_expression("1d6*2") is None
+    assert effect_expectation(rules, "1d6+strength_modifier", None, actor, 5.0) == pytest.approx(5.5) # 3.5 + (14 - 10) // 2
+    assert effect_expectation(rules, 7, None, actor, 5.0) == 7.0
+    assert effect_expectation(rules, "???", None, actor, 5.0) == 5.0
+    assert effect_expectation(rules, "1d4-3", None, actor, 5.0) == pytest.approx(0.25) # Clamped at 0
+
+
+def test_estimate_action_outcomes_matrix(rules, actor):
+    armored = {"entity": Player(id=2, guild_id=1, discord_id=2, name="Knight"), "combat_data": {"hp": 30, "armor_class": 18}}
+    unarmored = {"entity": Player(id=3, guild_id=1, discord_id=3, name="Mage"), "combat_data": {"hp": 12}}
+    actions = [
+        {"type": "attack"},
+        {"type": "ability", "ability_props": {"effects": [{"type": "damage", "value": "2d6"}, {"type": "heal", "amount": 4}]}},
+    ]
+
+    outcomes = estimate_action_outcomes(rules, actor, {}, actions, [armored, unarmored])
+
+    assert len(outcomes) == 2 and all(len(row) == 2 for row in outcomes)
+    attack_vs_armored, attack_vs_unarmored = outcomes[0]
+    assert attack_vs_armored.hit_chance == pytest.approx(0.15) # 18-20
+    assert attack_vs_unarmored.hit_chance == pytest.approx(0.55) # 10-20 against the default DC 10
+    # 1d8 + 2 (strength 14): 6.5 on a hit, doubled to 13 on a crit
+    assert attack_vs_unarmored.expected_damage == pytest.approx((0.50 * 6.5 + 0.05 * 13.0) / 0.55)
+    assert outcomes[1][0] == pytest.approx(ActionOutcome(1.0, 0.0, 7.0, 4.0))
+
+
+def test_estimates_are_memoized(rules, actor):
+    target = {"entity": None, "combat_data": {"armor_class": 13}}
+    estimate_action_outcomes(rules, actor, {}, [{"type": "attack"}], [target])
+    before = estimator_cache_info()["check_odds"]["hits"]
+    estimate_action_outcomes(rules, actor, {}, [{"type": "attack"}], [target])
+    assert estimator_cache_info()["check_odds"]["hits"] == before + 1
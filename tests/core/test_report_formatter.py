@@ -4,8 +4,9 @@ from typing import Dict, Tuple, Any, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.core.report_formatter import format_turn_report, _format_log_entry_with_names_cache, _collect_entity_refs_from_log_entry
+from src.core.report_formatter import format_turn_report, format_turn_reports, stream_turn_report, split_report, _format_log_entry, _format_log_entry_with_names_cache, _collect_entity_refs_from_log_entry
 from src.models.enums import EventType
+from src.core.rule_snapshot import GuildRuleSnapshot
 
 # Fixtures
 
@@ -28,16 +29,14 @@ def mock_names_cache_fixture() -> Dict[Tuple[str, int], str]:
     }
 
 @pytest.fixture
-def mock_get_rule_fixture():
-    """Mock for get_rule function."""
+def mock_rule_snapshot_fixture():
+    """Mock for build_guild_rule_snapshot, serving the rules set with set_map_for_test."""
     captured_custom_rules_map_for_fixture = {}
 
-    async def _mock_get_rule(session, guild_id, key, default=None):
-        if key in captured_custom_rules_map_for_fixture:
-            return captured_custom_rules_map_for_fixture[key]
-        return default
+    async def _mock_build_snapshot(session, guild_id):
+        return GuildRuleSnapshot(guild_id, captured_custom_rules_map_for_fixture)
 
-    mock_fn = AsyncMock(side_effect=_mock_get_rule)
+    mock_fn = AsyncMock(side_effect=_mock_build_snapshot)
 
     def set_custom_map(new_map: dict):
         nonlocal captured_custom_rules_map_for_fixture
@@ -228,8 +227,8 @@ def test_collect_refs_generic_event_no_ids():
 
 # Tests for _format_log_entry_with_names_cache
 @pytest.mark.asyncio
-async def test_format_player_action_examine_en_with_terms(mock_session, mock_names_cache_fixture, mock_get_rule_fixture):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_player_action_examine_en_with_terms(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture):
+    mock_rule_snapshot_fixture.set_map_for_test({
         "terms.actions.examine.verb_en": {"en": "inspects"},
         "terms.actions.examine.sees_en": {"en": "Observations"},
         "terms.results.nothing_special_en": {"en": "it is empty"}
@@ -240,25 +239,43 @@ async def test_format_player_action_examine_en_with_terms(mock_session, mock_nam
         "action": {"intent": "examine", "entities": [{"name": "a Dusty Box"}]},
         "result": {"description": "it is empty"}
     }
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, "en", mock_names_cache_fixture)
     assert "TestPlayer inspects 'a Dusty Box'. Observations: it is empty" in result
 
 @pytest.mark.asyncio
-async def test_format_player_action_examine_ru_default_terms(mock_session, mock_names_cache_fixture, mock_get_rule_fixture):
+async def test_format_player_action_examine_en_with_rule_snapshot(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture):
+    from src.core.rule_snapshot import GuildRuleSnapshot
+    snapshot = GuildRuleSnapshot(1, {
+        "terms.actions.examine.verb_en": {"en": "inspects"},
+        "terms.actions.examine.sees_en": "Observations",
+    })
+    log_details = {
+        "guild_id": 1, "event_type": EventType.PLAYER_ACTION.value,
+        "actor": {"type": "player", "id": 1},
+        "action": {"intent": "examine", "entities": [{"name": "a Dusty Box"}]},
+        "result": {"description": "cobwebs"}
+    }
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
+        result = await _format_log_entry_with_names_cache(mock_session, log_details, "en", mock_names_cache_fixture, rule_snapshot=snapshot)
+    assert "TestPlayer inspects 'a Dusty Box'. Observations: cobwebs" in result
+    mock_rule_snapshot_fixture.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_format_player_action_examine_ru_default_terms(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture):
     log_details = {
         "guild_id": 1, "event_type": EventType.PLAYER_ACTION.value,
         "actor": {"type": "player", "id": 1},
         "action": {"intent": "examine", "entities": [{"name": "Старый сундук"}]},
         "result": {"description": "внутри пыльно"}
     }
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, "ru", mock_names_cache_fixture)
     assert "TestPlayer осматривает 'Старый сундук'. Вы видите: внутри пыльно" in result
 
 @pytest.mark.asyncio
-async def test_format_combat_end_ru_with_terms_and_survivors(mock_session, mock_names_cache_fixture, mock_get_rule_fixture):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_combat_end_ru_with_terms_and_survivors(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture):
+    mock_rule_snapshot_fixture.set_map_for_test({
         "terms.combat.outcomes.victory_players_ru": {"ru": "победа игроков"},
         "terms.combat.ended_ru": {"ru": "Схватка в '{location_name}' окончена. Результат: {outcome_readable}."},
         "terms.combat.survivors_ru": {"ru": " Уцелевшие: {survivors_str}."}
@@ -268,7 +285,7 @@ async def test_format_combat_end_ru_with_terms_and_survivors(mock_session, mock_
         "location_id": 101, "outcome": "victory_players",
         "survivors": [{"type": "player", "id": 1}, {"type": "npc", "id": 602}]
     }
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, "ru", mock_names_cache_fixture)
     assert "Схватка в 'Old Location' окончена. Результат: победа игроков. Уцелевшие: TestPlayer, Ogre." in result
 
@@ -282,19 +299,19 @@ async def test_format_turn_report_empty_logs_integration(mock_session, mock_get_
         assert "За этот ход ничего значительного не произошло." in report_ru
 
 @pytest.mark.asyncio
-async def test_format_turn_report_with_logs_integration(mock_session, mock_get_rule_fixture, mock_get_batch_localized_entity_names_fixture):
+async def test_format_turn_report_with_logs_integration(mock_session, mock_rule_snapshot_fixture, mock_get_batch_localized_entity_names_fixture):
     log_entries = [
         {"guild_id": 1, "event_type": EventType.MOVEMENT.value, "player_id": 1, "old_location_id": 101, "new_location_id": 102},
         {"guild_id": 1, "event_type": EventType.ITEM_ACQUIRED.value, "player_id": 1, "item_id": 201, "source": "a chest"}
     ]
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture),          patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture),          patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture):
         report_en = await format_turn_report(mock_session, 1, log_entries, 1, "en", "en")
 
     assert "Turn Report for PlayerOne:" in report_en
     assert "PlayerOne moved from 'Old Town' to 'New City'." in report_en
     assert "PlayerOne acquired Sword of Testing (x1) from a chest." in report_en
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture),          patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture),          patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture):
         report_ru = await format_turn_report(mock_session, 1, log_entries, 1, "ru", "en")
 
     assert "Отчет по ходу для ИгрокОдин:" in report_ru
@@ -307,8 +324,8 @@ async def test_format_turn_report_with_logs_integration(mock_session, mock_get_r
     ("en", "uses ability", "on"),
     ("ru", "использует способность", "на")
 ])
-async def test_format_ability_used_with_terms(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, expected_verb, expected_particle):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_ability_used_with_terms(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, expected_verb, expected_particle):
+    mock_rule_snapshot_fixture.set_map_for_test({
         f"terms.abilities.verb_uses_{lang}": {lang: expected_verb},
         f"terms.abilities.particle_on_{lang}": {lang: expected_particle},
         # Corrected key and ensure mock returns direct string for this specific term
@@ -321,7 +338,7 @@ async def test_format_ability_used_with_terms(mock_session, mock_names_cache_fix
         "targets": [], 
         "outcome": {"description": "The air crackles." if lang == "en" else "Воздух трещит."}
     }
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
 
     actor_name = mock_names_cache_fixture[("player", 1)]
@@ -341,8 +358,8 @@ async def test_format_ability_used_with_terms(mock_session, mock_names_cache_fix
     ("ru", "terms.combat.starts_involving_ru", "Начинается бой в '{location_name}' с участием: {participants_str}.", ("location",101), [("player",1),("npc",601)], "TestPlayer, Goblin"),
     ("en", "terms.combat.starts_involving_en", "Combat starts at '{location_name}' involving: {participants_str}.", ("location",101), [], "unknown participants"),
 ])
-async def test_format_combat_start(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, expected_template_key, default_template, location_name_key, participants_key, expected_participants_str_default):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_combat_start(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, expected_template_key, default_template, location_name_key, participants_key, expected_participants_str_default):
+    mock_rule_snapshot_fixture.set_map_for_test({
         expected_template_key: {lang: default_template},
         f"terms.general.unknown_location_{lang}": {lang: "some place"},
         f"terms.general.unknown_participants_{lang}": {lang: expected_participants_str_default if not participants_key else ""}
@@ -361,7 +378,7 @@ async def test_format_combat_start(mock_session, mock_names_cache_fixture, mock_
     
     expected_msg = default_template.format(location_name=location_name, participants_str=participants_str_rendered)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -373,9 +390,9 @@ async def test_format_combat_start(mock_session, mock_names_cache_fixture, mock_
     ("ru", ("npc", 602), "guard", "the treasure", "successfully", ".verb_npc", "совершает '{action_intent}' над"),
     ("en", ("npc", 601), "special_move", "themselves", "", ".verb_npc", "performs '{action_intent}' on"),
 ])
-async def test_format_npc_action(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, actor_key, action_intent, target_name_str, result_message, expected_verb_key_suffix, default_verb_format):
+async def test_format_npc_action(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, actor_key, action_intent, target_name_str, result_message, expected_verb_key_suffix, default_verb_format):
     verb_key = f"terms.actions.{action_intent}{expected_verb_key_suffix}_{lang}"
-    mock_get_rule_fixture.set_map_for_test({
+    mock_rule_snapshot_fixture.set_map_for_test({
         verb_key: {lang: default_verb_format.format(action_intent=action_intent)},
         f"terms.general.an_npc_{lang}": {lang: "An NPC" if lang == "en" else "НИП"}
     })
@@ -395,7 +412,7 @@ async def test_format_npc_action(mock_session, mock_names_cache_fixture, mock_ge
         expected_msg += f" {result_message}"
     expected_msg = expected_msg.strip()
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -406,7 +423,7 @@ async def test_format_npc_action(mock_session, mock_names_cache_fixture, mock_ge
     ("ru", ("player", 2), ("item", 999), None, "Предмет исчезает.", "использует", "на"),
     ("en", ("player", 1), ("item", 201), {"type": "location", "id": 101}, "", "uses", "on"),
 ])
-async def test_format_item_used(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, player_key, item_key, target_info, outcome_desc, uses_term_default, on_term_default):
+async def test_format_item_used(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, player_key, item_key, target_info, outcome_desc, uses_term_default, on_term_default):
     term_map = {
         f"terms.items.uses_{lang}": {lang: uses_term_default},
         f"terms.general.someone_{lang}": {lang: "Someone" if lang == "en" else "Некто"},
@@ -415,7 +432,7 @@ async def test_format_item_used(mock_session, mock_names_cache_fixture, mock_get
     if target_info:
         term_map[f"terms.items.on_{lang}"] = {lang: on_term_default}
 
-    mock_get_rule_fixture.set_map_for_test(term_map)
+    mock_rule_snapshot_fixture.set_map_for_test(term_map)
 
     log_details = {
         "guild_id": 1, "event_type": EventType.ITEM_USED.value,
@@ -441,7 +458,7 @@ async def test_format_item_used(mock_session, mock_names_cache_fixture, mock_get
         expected_msg += f" {outcome_desc}"
     expected_msg = expected_msg.strip()
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -451,8 +468,8 @@ async def test_format_item_used(mock_session, mock_names_cache_fixture, mock_get
     ("en", ("player", 1), ("item", 201), 1, "drops"),
     ("ru", ("player", 2), ("item", 999), 5, "выбрасывает"),
 ])
-async def test_format_item_dropped(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, player_key, item_key, quantity, drops_term_default):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_item_dropped(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, player_key, item_key, quantity, drops_term_default):
+    mock_rule_snapshot_fixture.set_map_for_test({
         f"terms.items.drops_{lang}": {lang: drops_term_default},
         f"terms.general.someone_{lang}": {lang: "Someone" if lang == "en" else "Некто"},
         f"terms.general.an_item_{lang}": {lang: "an item" if lang == "en" else "предмет"},
@@ -467,7 +484,7 @@ async def test_format_item_dropped(mock_session, mock_names_cache_fixture, mock_
     item_name = mock_names_cache_fixture.get(item_key, "an item" if lang == "en" else "предмет")
     expected_msg = f"{player_name} {drops_term_default} '{item_name}' (x{quantity})."
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -477,8 +494,8 @@ async def test_format_item_dropped(mock_session, mock_names_cache_fixture, mock_
     ("en", ("player", 1), ("npc", 601), "{player_name} starts a conversation with {npc_name}."),
     ("ru", ("player", 2), ("npc", 602), "{player_name} начинает разговор с {npc_name}."),
 ])
-async def test_format_dialogue_start(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, player_key, npc_key, template_default):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_dialogue_start(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, player_key, npc_key, template_default):
+    mock_rule_snapshot_fixture.set_map_for_test({
         f"terms.dialogue.starts_conversation_with_{lang}": {lang: template_default},
         f"terms.general.someone_{lang}": {lang: "Someone" if lang == "en" else "Некто"},
         f"terms.general.an_npc_{lang}": {lang: "An NPC" if lang == "en" else "НИП"},
@@ -492,7 +509,7 @@ async def test_format_dialogue_start(mock_session, mock_names_cache_fixture, moc
     npc_name = mock_names_cache_fixture.get(npc_key, "An NPC" if lang == "en" else "НИП")
     expected_msg = template_default.format(player_name=player_name, npc_name=npc_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -502,8 +519,8 @@ async def test_format_dialogue_start(mock_session, mock_names_cache_fixture, moc
     ("en", ("player", 1), ("npc", 601), "{player_name} ends the conversation with {npc_name}."),
     ("ru", ("player", 2), ("npc", 602), "{player_name} заканчивает разговор с {npc_name}."),
 ])
-async def test_format_dialogue_end(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, player_key, npc_key, template_default):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_dialogue_end(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, player_key, npc_key, template_default):
+    mock_rule_snapshot_fixture.set_map_for_test({
         f"terms.dialogue.ends_conversation_with_{lang}": {lang: template_default},
         # Add other general fallbacks if needed by get_name_from_cache for this test
     })
@@ -516,7 +533,7 @@ async def test_format_dialogue_end(mock_session, mock_names_cache_fixture, mock_
     npc_name = mock_names_cache_fixture[npc_key]       # Assume NPC is always in cache
     expected_msg = template_default.format(player_name=player_name, npc_name=npc_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -526,7 +543,7 @@ async def test_format_dialogue_end(mock_session, mock_names_cache_fixture, mock_
     ("en", ("player", 1), ("faction", 701), "Neutral", "Friendly", "Helped them"),
     ("ru", ("party", 11), ("faction", 702), "Враждебность", "Нейтралитет", None),
 ])
-async def test_format_faction_change(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, entity_key, faction_key, old_s, new_s, reason):
+async def test_format_faction_change(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, entity_key, faction_key, old_s, new_s, reason):
     # Add faction to names_cache_fixture for the test
     mock_names_cache_fixture[("faction", 701)] = "The Protectors" if lang == "en" else "Защитники"
     mock_names_cache_fixture[("faction", 702)] = "Shadow Syndicate" if lang == "en" else "Теневой Синдикат"
@@ -545,7 +562,7 @@ async def test_format_faction_change(mock_session, mock_names_cache_fixture, moc
     if reason:
         term_map[f"terms.general.reason_{lang}"] = {lang: "Reason" if lang == "en" else "Причина"}
 
-    mock_get_rule_fixture.set_map_for_test(term_map)
+    mock_rule_snapshot_fixture.set_map_for_test(term_map)
 
     log_details = {
         "guild_id": 1, "event_type": EventType.FACTION_CHANGE.value,
@@ -568,7 +585,7 @@ async def test_format_faction_change(mock_session, mock_names_cache_fixture, moc
         reason_term_fmt = "Reason" if lang == "en" else "Причина"
         expected_msg_base += f" ({reason_term_fmt}: {reason})"
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg_base
 
@@ -582,13 +599,13 @@ async def test_format_faction_change(mock_session, mock_names_cache_fixture, moc
     ("en", EventType.AI_GENERATION_TRIGGERED, {"context": "new_npc_for_tavern"}, "[Ai Generation Triggered]:", "context: new_npc_for_tavern"),
     ("ru", EventType.TRADE_INITIATED, {"player_id": 1, "npc_id": 601}, "[Trade Initiated]:", "player_id: 1; npc_id: 601"),
 ])
-async def test_format_generic_events(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, event_type_enum, details, expected_prefix, expected_content_part):
+async def test_format_generic_events(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, event_type_enum, details, expected_prefix, expected_content_part):
     log_details = {"guild_id": 1, "event_type": event_type_enum.value, **details}
 
     # No specific terms needed for generic formatter, it uses event_type and details_json keys
-    mock_get_rule_fixture.set_map_for_test({})
+    mock_rule_snapshot_fixture.set_map_for_test({})
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
 
     assert result.startswith(expected_prefix)
@@ -601,8 +618,8 @@ async def test_format_generic_events(mock_session, mock_names_cache_fixture, moc
     ("ru", ("npc", 601), "Привет, мир!"),
     ("en", ("player", 99), "No speaker in cache."), 
 ])
-async def test_format_dialogue_line(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, speaker_key, line_text):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_dialogue_line(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, speaker_key, line_text):
+    mock_rule_snapshot_fixture.set_map_for_test({
         f"terms.general.someone_{lang}": {lang: "SomeoneViaTerm" if lang == "en" else "НектоЧерезТермин"}
     })
     
@@ -625,7 +642,7 @@ async def test_format_dialogue_line(mock_session, mock_names_cache_fixture, mock
     expected_msg = f'{speaker_name}: "{line_text}"' # Added quotes around line_text
 
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -635,8 +652,8 @@ async def test_format_dialogue_line(mock_session, mock_names_cache_fixture, mock
     ("en", "terms.statuses.effect_ended_on_en", "'{status_name}' effect has ended on {target_name}.", ("player", 1), ("status_effect", 401)),
     ("ru", "terms.statuses.effect_ended_on_ru", "Эффект '{status_name}' закончился для {target_name}.", ("npc", 601), ("status_effect", 402)),
 ])
-async def test_format_status_removed(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, template_key, default_template, target_key, status_key):
-    mock_get_rule_fixture.set_map_for_test({
+async def test_format_status_removed(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, template_key, default_template, target_key, status_key):
+    mock_rule_snapshot_fixture.set_map_for_test({
         template_key: {lang: default_template},
         f"terms.general.someone_{lang}": {lang: "Someone" if lang == "en" else "Некто"}, 
         f"terms.statuses.a_status_effect_{lang}": {lang: "a status effect" if lang == "en" else "эффект состояния"}
@@ -650,7 +667,7 @@ async def test_format_status_removed(mock_session, mock_names_cache_fixture, moc
     status_name = mock_names_cache_fixture.get(status_key, "a status effect" if lang == "en" else "эффект состояния")
     expected_msg = default_template.format(status_name=status_name, target_name=target_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -662,9 +679,9 @@ async def test_format_status_removed(mock_session, mock_names_cache_fixture, moc
     ("en", None, "simple", "{player_name} has failed the quest '{quest_name}'.", ("player",1), ("quest",501)),
     ("ru", None, "simple", "{player_name} провалил(а) задание '{quest_name}'.", ("player",1), ("quest",501)),
 ])
-async def test_format_quest_failed(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, reason, template_key_suffix, default_template_format, player_key, quest_key):
+async def test_format_quest_failed(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, reason, template_key_suffix, default_template_format, player_key, quest_key):
     template_key = f"terms.quests.failed_{template_key_suffix}_{lang}"
-    mock_get_rule_fixture.set_map_for_test({
+    mock_rule_snapshot_fixture.set_map_for_test({
         template_key: {lang: default_template_format},
         f"terms.general.someone_{lang}": {lang: "Someone" if lang == "en" else "Некто"},
         f"terms.quests.a_quest_{lang}": {lang: "a quest" if lang == "en" else "задание"}
@@ -685,7 +702,7 @@ async def test_format_quest_failed(mock_session, mock_names_cache_fixture, mock_
     else:
         expected_msg = default_template_format.format(player_name=player_name, quest_name=quest_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -695,8 +712,8 @@ async def test_format_quest_failed(mock_session, mock_names_cache_fixture, mock_
     ("en", "terms.quests.accepted_en", "{player_name} has accepted the quest: '{quest_name}'.", ("player",1), ("quest",501)),
     ("ru", "terms.quests.accepted_ru", "{player_name} принял(а) задание: '{quest_name}'.", ("player",1), ("quest",501)),
 ])
-async def test_format_quest_accepted(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, template_key, default_template, player_key, quest_key):
-    mock_get_rule_fixture.set_map_for_test({template_key: {lang: default_template}})
+async def test_format_quest_accepted(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, template_key, default_template, player_key, quest_key):
+    mock_rule_snapshot_fixture.set_map_for_test({template_key: {lang: default_template}})
     log_details = {
         "guild_id": 1, "event_type": EventType.QUEST_ACCEPTED.value,
         "player_id": player_key[1], "quest_id": quest_key[1]
@@ -705,7 +722,7 @@ async def test_format_quest_accepted(mock_session, mock_names_cache_fixture, moc
     quest_name = mock_names_cache_fixture[quest_key]
     expected_msg = default_template.format(player_name=player_name, quest_name=quest_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -717,9 +734,9 @@ async def test_format_quest_accepted(mock_session, mock_names_cache_fixture, moc
     ("en", None, "simple", "{player_name} completed a step in the quest '{quest_name}'."),
     ("ru", None, "simple", "{player_name} выполнил(а) этап в задании '{quest_name}'."),
 ])
-async def test_format_quest_step_completed(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, step_details, template_key_suffix, default_template_format):
+async def test_format_quest_step_completed(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, step_details, template_key_suffix, default_template_format):
     template_key = f"terms.quests.step_completed_{template_key_suffix}_{lang}"
-    mock_get_rule_fixture.set_map_for_test({template_key: {lang: default_template_format}})
+    mock_rule_snapshot_fixture.set_map_for_test({template_key: {lang: default_template_format}})
     
     player_key = ("player", 1)
     quest_key = ("quest", 501)
@@ -738,7 +755,7 @@ async def test_format_quest_step_completed(mock_session, mock_names_cache_fixtur
     else:
         expected_msg = default_template_format.format(player_name=player_name, quest_name=quest_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -748,8 +765,8 @@ async def test_format_quest_step_completed(mock_session, mock_names_cache_fixtur
     ("en", "terms.quests.completed_en", "{player_name} has completed the quest: '{quest_name}'!", ("player",1), ("quest",501)),
     ("ru", "terms.quests.completed_ru", "{player_name} завершил(а) задание: '{quest_name}'!", ("player",1), ("quest",501)),
 ])
-async def test_format_quest_completed(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, template_key, default_template, player_key, quest_key):
-    mock_get_rule_fixture.set_map_for_test({template_key: {lang: default_template}})
+async def test_format_quest_completed(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, template_key, default_template, player_key, quest_key):
+    mock_rule_snapshot_fixture.set_map_for_test({template_key: {lang: default_template}})
     log_details = {
         "guild_id": 1, "event_type": EventType.QUEST_COMPLETED.value,
         "player_id": player_key[1], "quest_id": quest_key[1]
@@ -758,7 +775,7 @@ async def test_format_quest_completed(mock_session, mock_names_cache_fixture, mo
     quest_name = mock_names_cache_fixture[quest_key]
     expected_msg = default_template.format(player_name=player_name, quest_name=quest_name)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -769,9 +786,9 @@ async def test_format_quest_completed(mock_session, mock_names_cache_fixture, mo
     ("ru", 5, "terms.character.level_up_ru", "{player_name} достиг(ла) уровня {level_str}!"),
     ("en", None, "terms.character.level_up_en", "{player_name} has reached level {level_str}!"), 
 ])
-async def test_format_level_up(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, new_level, template_key, default_template):
+async def test_format_level_up(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, new_level, template_key, default_template):
     player_key = ("player", 1)
-    mock_get_rule_fixture.set_map_for_test({
+    mock_rule_snapshot_fixture.set_map_for_test({
         template_key: {lang: default_template},
         f"terms.character.unknown_level_{lang}": {lang: "a new level" if lang == "en" else "новый уровень"}
     })
@@ -784,7 +801,7 @@ async def test_format_level_up(mock_session, mock_names_cache_fixture, mock_get_
     
     expected_msg = default_template.format(player_name=player_name, level_str=level_str)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -797,7 +814,7 @@ async def test_format_level_up(mock_session, mock_names_cache_fixture, mock_get_
     ("ru", 50, None, "simple", "{player_name} получил(а) {amount_str} {xp_term}."),
     ("en", None, "a mysterious event", "with_source", "{player_name} gained {amount_str} {xp_term} {source_str}."),
 ])
-async def test_format_xp_gained(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, amount, source, template_key_suffix, default_template_format):
+async def test_format_xp_gained(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, amount, source, template_key_suffix, default_template_format):
     player_key = ("player", 1)
     template_key = f"terms.character.xp_gained_{template_key_suffix}_{lang}"
     
@@ -809,7 +826,7 @@ async def test_format_xp_gained(mock_session, mock_names_cache_fixture, mock_get
     if source:
         term_map[f"terms.character.from_source_{lang}"] = {lang: "from {source}" if lang == "en" else "из {source}"}
 
-    mock_get_rule_fixture.set_map_for_test(term_map)
+    mock_rule_snapshot_fixture.set_map_for_test(term_map)
 
     log_details = {
         "guild_id": 1, "event_type": EventType.XP_GAINED.value,
@@ -829,7 +846,7 @@ async def test_format_xp_gained(mock_session, mock_names_cache_fixture, mock_get
     else:
         expected_msg = default_template_format.format(player_name=player_name, amount_str=amount_str, xp_term=xp_term)
 
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -841,7 +858,7 @@ async def test_format_xp_gained(mock_session, mock_names_cache_fixture, mock_get
     ("en", 0, None, ("player", 1), ("player", 2)), 
     ("ru", None, "таинственное событие", ("quest", 501), ("location", 101)), 
 ])
-async def test_format_relationship_change(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, new_value, reason, e1_key, e2_key):
+async def test_format_relationship_change(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, new_value, reason, e1_key, e2_key):
     term_map = {
         f"terms.relationships.relation_between_{lang}": {lang: "Relationship between {e1_name} and {e2_name}" if lang == "en" else "Отношения между {e1_name} и {e2_name}"},
         f"terms.relationships.is_now_{lang}": {lang: "is now {value_str}" if lang == "en" else "теперь {value_str}"},
@@ -852,7 +869,7 @@ async def test_format_relationship_change(mock_session, mock_names_cache_fixture
     if reason:
         term_map[f"terms.relationships.due_to_reason_{lang}"] = {lang: "due to: {change_reason}" if lang == "en" else "по причине: {change_reason}"}
     
-    mock_get_rule_fixture.set_map_for_test(term_map)
+    mock_rule_snapshot_fixture.set_map_for_test(term_map)
 
     log_details = {
         "guild_id": 1, "event_type": EventType.RELATIONSHIP_CHANGE.value,
@@ -877,7 +894,7 @@ async def test_format_relationship_change(mock_session, mock_names_cache_fixture
     else:
         expected_msg += "."
         
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
     assert result == expected_msg
 
@@ -889,7 +906,7 @@ async def test_format_relationship_change(mock_session, mock_names_cache_fixture
     ("en", 5, None, ("player", 2), ("status_effect", 401)), 
     ("ru", 2, {"type": "item", "id": 999}, ("npc", 602), ("status_effect", 402)), 
 ])
-async def test_format_status_applied(mock_session, mock_names_cache_fixture, mock_get_rule_fixture, lang, duration, source_info, target_key, status_key):
+async def test_format_status_applied(mock_session, mock_names_cache_fixture, mock_rule_snapshot_fixture, lang, duration, source_info, target_key, status_key):
     term_map = {
         f"terms.statuses.is_now_affected_by_{lang}": {lang: "is now affected by" if lang == "en" else "теперь под действием"},
         f"terms.statuses.a_status_effect_{lang}": {lang: "a status effect" if lang == "en" else "эффект состояния"},
@@ -902,7 +919,7 @@ async def test_format_status_applied(mock_session, mock_names_cache_fixture, moc
         if not (source_info.get("id") and source_info.get("type")) and not source_info.get("name"):
              term_map[f"terms.statuses.an_unknown_source_{lang}"] = {lang: "an unknown source" if lang == "en" else "неизвестного источника"}
 
-    mock_get_rule_fixture.set_map_for_test(term_map)
+    mock_rule_snapshot_fixture.set_map_for_test(term_map)
 
     log_details = {
         "guild_id": 1, "event_type": EventType.STATUS_APPLIED.value,
@@ -945,6 +962,118 @@ async def test_format_status_applied(mock_session, mock_names_cache_fixture, moc
     msg_parts.append(".")
     expected_msg = " ".join(msg_parts)
         
-    with patch('src.core.report_formatter.get_rule', new=mock_get_rule_fixture):
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
         result = await _format_log_entry_with_names_cache(mock_session, log_details, lang, mock_names_cache_fixture)
-    assert result == expected_msg
\ No newline at end of file
+    assert result == expected_msg
+
+# Tests for the term catalog
+
+def test_compile_term_catalog_precedence():
+    from src.core.report_formatter import compile_term_catalog
+    catalog = compile_term_catalog(1, "ru", {
+        "terms.movement.to_ru": {"ru": "к", "en": "towards"},
+        "terms.items.from_ru": {"de": "von"}, # Nothing usable for ru/en: built-in default
+        "terms.combat.uses_ru": "применяет",
+        "terms.combat.on_en": "against", # Other language: ignored
+        "combat:attack:damage_formula": "1d6",
+    })
+    assert catalog.get("terms.movement.to") == "к"
+    assert catalog.get("terms.items.from") == "из"
+    assert catalog.get("terms.combat.uses") == "применяет"
+    assert catalog.get("terms.combat.on") == "против"
+    assert catalog.get("terms.combat.outcomes.draw", {"en": "Draw"}) == "Draw" # Call-site default, primary fallback language
+    assert catalog.get("terms.unknown") == ""
+    assert len(catalog) == 2
+
+def test_get_term_catalog_reused_per_rules_version():
+    from src.core.report_formatter import get_term_catalog
+    first = get_term_catalog(GuildRuleSnapshot(77, {"terms.movement.to_en": "into"}, version=5), "en")
+    assert get_term_catalog(GuildRuleSnapshot(77, {}, version=5), "en") is first
+    changed = get_term_catalog(GuildRuleSnapshot(77, {}, version=6), "en")
+    assert changed is not first
+    assert changed.get("terms.movement.to") == "to"
+    assert get_term_catalog(GuildRuleSnapshot(77, {}), "en") is not get_term_catalog(GuildRuleSnapshot(77, {}), "en") # Unversioned: never cached
+
+@pytest.mark.asyncio
+async def test_format_turn_report_resolves_terms_once(mock_session, mock_rule_snapshot_fixture, mock_get_batch_localized_entity_names_fixture):
+    mock_rule_snapshot_fixture.set_map_for_test({"terms.movement.moved_from_en": "walked from"})
+    log_entries = [
+        {"guild_id": 1, "event_type": EventType.MOVEMENT.value, "player_id": 1, "old_location_id": 101, "new_location_id": 102}
+        for _ in range(50)
+    ]
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture), \
+         patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture):
+        report = await format_turn_report(mock_session, 1, log_entries, 1, "en")
+    assert report.count("PlayerOne walked from 'Old Town' to 'New City'.") == 50
+    mock_rule_snapshot_fixture.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_format_turn_reports_shares_work_per_language(mock_session, mock_rule_snapshot_fixture, mock_get_batch_localized_entity_names_fixture):
+    log_entries = [
+        {"guild_id": 1, "event_type": EventType.MOVEMENT.value, "player_id": 1, "old_location_id": 101, "new_location_id": 102},
+        {"guild_id": 1, "event_type": EventType.ITEM_ACQUIRED.value, "player_id": 2, "item_id": 201, "source": "a chest"},
+        {"guild_id": 2, "event_type": EventType.LEVEL_UP.value, "player_id": 3, "new_level": 2}, # Other guild: skipped
+    ]
+    recipients = {1: "en", 2: "ru", 3: "en", 4: "ru"}
+    entries_by_player = {1: [0, 1, 2], 2: [1], 3: [0], 4: []}
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture), \
+         patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture), \
+         patch('src.core.report_formatter._format_log_entry', wraps=_format_log_entry) as mock_format:
+        reports = await format_turn_reports(mock_session, 1, log_entries, recipients, entries_by_player=entries_by_player)
+
+    assert reports[1] == ("Turn Report for PlayerOne:\n"
+                          "PlayerOne moved from 'Old Town' to 'New City'.\n"
+                          "PlayerTwo acquired Sword of Testing (x1) from a chest.")
+    assert reports[3] == "Turn Report for Unknown player 3:\nPlayerOne moved from 'Old Town' to 'New City'."
+    assert reports[2] == "Отчет по ходу для ИгрокДва:\nИгрокДва получает Меч Тестирования (x1) из a chest."
+    assert reports[4] == "За этот ход ничего значительного не произошло."
+    assert mock_get_batch_localized_entity_names_fixture.await_count == 2 # Once per language
+    assert mock_format.call_count == 3 # en: entries 0 and 1, ru: entry 1
+    mock_rule_snapshot_fixture.assert_awaited_once()
+
+
+# Tests for streaming reports
+
+def test_split_report_respects_limit():
+    report = "Header:\n" + "\n".join(f"line {i:02d}" for i in range(10)) + "\n" + "word " * 12
+    chunks = split_report(report, limit=24)
+    assert all(len(chunk) <= 24 for chunk in chunks)
+    assert chunks[0] == "Header:\nline 00\nline 01"
+    assert "".join(chunks).replace("\n", "").replace(" ", "") == report.replace("\n", "").replace(" ", "")
+    with pytest.raises(ValueError):
+        split_report(report, limit=0)
+
+@pytest.mark.asyncio
+async def test_stream_turn_report_matches_full_report(mock_session, mock_rule_snapshot_fixture, mock_get_batch_localized_entity_names_fixture):
+    log_entries = [
+        {"guild_id": 1, "event_type": EventType.MOVEMENT.value, "player_id": 1 + i % 2, "old_location_id": 101, "new_location_id": 102}
+        for i in range(30)
+    ]
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture), \
+         patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture):
+        full_report = await format_turn_report(mock_session, 1, log_entries, 1, "en")
+        mock_get_batch_localized_entity_names_fixture.reset_mock()
+        chunks = [chunk async for chunk in stream_turn_report(mock_session, 1, log_entries, 1, "en", max_chunk_length=200, names_batch_size=8)]
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert "\n".join(chunks) == full_report
+    assert mock_get_batch_localized_entity_names_fixture.await_count == 4 # 30 entries in windows of 8
+
+@pytest.mark.asyncio
+async def test_stream_turn_report_yields_before_rendering_everything(mock_session, mock_rule_snapshot_fixture, mock_get_batch_localized_entity_names_fixture):
+    log_entries = [
+        {"guild_id": 1, "event_type": EventType.MOVEMENT.value, "player_id": 1, "old_location_id": 101, "new_location_id": 102}
+        for _ in range(40)
+    ]
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture), \
+         patch('src.core.report_formatter.get_batch_localized_entity_names', new=mock_get_batch_localized_entity_names_fixture), \
+         patch('src.core.report_formatter._format_log_entry', wraps=_format_log_entry) as mock_format:
+        stream = stream_turn_report(mock_session, 1, log_entries, 1, "en", max_chunk_length=150, names_batch_size=10)
+        first_chunk = await stream.__anext__()
+        assert first_chunk.startswith("Turn Report for PlayerOne:")
+        assert mock_format.call_count < 10
+        await stream.aclose()
+
+    with patch('src.core.report_formatter.build_guild_rule_snapshot', new=mock_rule_snapshot_fixture):
+        assert [chunk async for chunk in stream_turn_report(mock_session, 1, [], 1, "ru")] == ["За этот ход ничего значительного не произошло."]
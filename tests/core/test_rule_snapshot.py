@@ -0,0 +1,82 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.rule_snapshot import GuildRuleSnapshot, build_guild_rule_snapshot
+from src.core.formula_engine import clear_formula_cache
+from src.core.rules import _rules_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_caches_fixture():
+    clear_formula_cache()
+    _rules_cache.clear()
+    yield
+    clear_formula_cache()
+    _rules_cache.clear()
+
+
+def test_get_mirrors_get_rule_defaults():
+    snapshot = GuildRuleSnapshot(1, {"a": 5, "b": None})
+    assert snapshot.get("a") == 5
+    assert snapshot.get("b", "fallback") == "fallback"
+    assert snapshot.get("missing", 7) == 7
+    assert "a" in snapshot
+    assert "b" not in snapshot
+
+
+def test_check_rules_pre_resolved_and_memoized():
+    snapshot = GuildRuleSnapshot(1, {
+        "checks:stealth:dice_notation": "2d10+1",
+        "checks:stealth:base_attribute": "dexterity",
+        "checks:bad:dice_notation": "not dice",
+    })
+    stealth = snapshot.check_rules("stealth")
+    assert stealth.dice_notation == "2d10+1"
+    assert stealth.parsed_dice == (2, 10, 1)
+    assert stealth.base_attribute == "dexterity"
+    assert stealth.critical_success_threshold == 20
+    assert stealth.critical_failure_threshold == 1
+    assert snapshot.check_rules("stealth") is stealth
+
+    default_check = snapshot.check_rules("perception")
+    assert default_check.dice_notation == "1d20"
+    assert default_check.base_attribute is None
+    assert snapshot.check_rules("bad").parsed_dice is None
+
+
+def test_combat_rules_defaults_and_formula():
+    snapshot = GuildRuleSnapshot(1, {"combat:attack:damage_formula": "1d8", "combat:attributes:modifier_formula": "value // 2"})
+    combat = snapshot.combat
+    assert combat.damage_formula == "1d8"
+    assert combat.attack_check_type == "attack_roll"
+    assert combat.crit_effect == "multiply_total_damage"
+    assert combat.modifier_formula.evaluate(value=14) == 7
+    assert snapshot.combat is combat
+
+
+def test_invalid_formula_falls_back_to_default():
+    snapshot = GuildRuleSnapshot(1, {"combat:attributes:modifier_formula": "open('x')"})
+    assert snapshot.combat.modifier_formula.evaluate(value=16) == 3
+
+
+def test_with_overrides_layers_encounter_snapshot():
+    snapshot = GuildRuleSnapshot(1, {"combat:attack:crit_effect": "double_damage_dice", "x": 1}, version=3)
+    layered = snapshot.with_overrides({"combat:attack:crit_effect": "maximize_and_add_dice"})
+    assert layered.get("combat:attack:crit_effect") == "maximize_and_add_dice"
+    assert layered.get("x") == 1
+    assert layered.version == 3
+    assert snapshot.get("combat:attack:crit_effect") == "double_damage_dice"
+    assert snapshot.with_overrides(None) is snapshot
+
+
+@pytest.mark.asyncio
+async def test_build_guild_rule_snapshot_uses_rules_cache():
+    session = AsyncMock(spec=AsyncSession)
+    with patch("src.core.rule_snapshot.get_all_rules_for_guild", new_callable=AsyncMock) as mock_get_all:
+        mock_get_all.return_value = {"checks:attack:dice_notation": "1d20"}
+        snapshot = await build_guild_rule_snapshot(session, 42)
+    mock_get_all.assert_awaited_once_with(session, 42)
+    assert snapshot.guild_id == 42
+    assert snapshot.check_rules("attack").parsed_dice == (1, 20, 0)
@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+from typing import Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+from sqlalchemy import select
+
+from src.models.base import Base
+from src.models.guild import GuildConfig
+from src.models.rule_config import RuleConfig
+from src.core import rules
+from src.core.rules import (
+    RulesCache,
+    _rules_cache,
+    _bump_rules_version,
+    get_rule,
+    get_all_rules_for_guild,
+    invalidate_guild_rules,
+    start_rules_invalidation_listener,
+    stop_rules_invalidation_listener,
+)
+
+
+class TestVersionedRulesCache(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    test_guild_id = 301
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            import asyncio
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+        self.session: AsyncSession = self.SessionLocal()
+        self.session.add(GuildConfig(id=self.test_guild_id, main_language="en"))
+        self.session.add(RuleConfig(guild_id=self.test_guild_id, key="max_players", value_json=5))
+        await self.session.commit()
+        _rules_cache.clear()
+
+    async def asyncTearDown(self):
+        _rules_cache.clear()
+        await self.session.close()
+
+    async def _update_rule_from_other_process(self, key: str, value) -> None:
+        """Simulates another bot process changing a rule (own session, own commit)."""
+        assert self.SessionLocal is not None
+        async with self.SessionLocal() as other_session:
+            rule = (await other_session.execute(
+                select(RuleConfig).where(RuleConfig.guild_id == self.test_guild_id, RuleConfig.key == key)
+            )).scalar_one()
+            rule.value_json = value
+            await _bump_rules_version(other_session, self.test_guild_id)
+            await other_session.commit()
+
+    async def test_get_rule_loads_and_caches_with_version(self):
+        self.assertEqual(await get_rule(self.session, self.test_guild_id, "max_players", default=10), 5)
+        self.assertEqual(await get_rule(self.session, self.test_guild_id, "missing", default=10), 10)
+        entry = _rules_cache.get_entry(self.test_guild_id)
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry.version, 0)
+
+    async def test_stale_rules_reloaded_after_version_probe(self):
+        with patch.object(rules, "RULES_CACHE_POLL_INTERVAL_SECONDS", 0):
+            self.assertEqual(await get_rule(self.session, self.test_guild_id, "max_players"), 5)
+            await self._update_rule_from_other_process("max_players", 8)
+            self.assertEqual(await get_rule(self.session, self.test_guild_id, "max_players"), 8)
+            self.assertEqual(_rules_cache.get_entry(self.test_guild_id).version, 1)
+
+    async def test_cached_rules_trusted_within_probe_interval_until_invalidated(self):
+        with patch.object(rules, "RULES_CACHE_POLL_INTERVAL_SECONDS", 3600):
+            self.assertEqual(await get_rule(self.session, self.test_guild_id, "max_players"), 5)
+            await self._update_rule_from_other_process("max_players", 9)
+            # No probe yet: the cached value is served without touching the DB.
+            self.assertEqual(await get_rule(self.session, self.test_guild_id, "max_players"), 5)
+
+            # What a NOTIFY from the other process would trigger.
+            rules._on_rules_notification(None, 0, rules.RULES_NOTIFY_CHANNEL, str(self.test_guild_id))
+            all_rules = await get_all_rules_for_guild(self.session, self.test_guild_id)
+            self.assertEqual(all_rules["max_players"], 9)
+
+    async def test_invalidate_without_version_change_keeps_rules(self):
+        with patch.object(rules, "RULES_CACHE_POLL_INTERVAL_SECONDS", 3600):
+            first = await get_all_rules_for_guild(self.session, self.test_guild_id)
+            invalidate_guild_rules(self.test_guild_id)
+            second = await get_all_rules_for_guild(self.session, self.test_guild_id)
+            self.assertIs(first, second)
+
+    async def test_listener_not_started_on_sqlite(self):
+        self.assertFalse(await start_rules_invalidation_listener(self.engine))
+
+    async def test_listener_state_reset_when_connection_terminates(self):
+        driver_connection = MagicMock(add_listener=AsyncMock())
+        connection = MagicMock(close=AsyncMock())
+        connection.get_raw_connection = AsyncMock(return_value=MagicMock(driver_connection=driver_connection))
+        engine = MagicMock(connect=AsyncMock(return_value=connection))
+        engine.dialect.name = "postgresql"
+
+        self.assertTrue(await start_rules_invalidation_listener(engine))
+        self.assertIs(rules._rules_listener_connection, connection)
+        on_terminated = driver_connection.add_termination_listener.call_args.args[0]
+
+        on_terminated(driver_connection)
+        self.assertIsNone(rules._rules_listener_connection)
+        await asyncio.sleep(0) # Let the scheduled close run
+        connection.close.assert_awaited_once()
+
+        # Started again after the loss, then stopped: the connection is closed once more and state cleared.
+        self.assertTrue(await start_rules_invalidation_listener(engine))
+        await stop_rules_invalidation_listener()
+        self.assertIsNone(rules._rules_listener_connection)
+        self.assertEqual(connection.close.await_count, 2)
+        on_terminated(driver_connection) # Termination after stop is ignored
+        self.assertEqual(connection.close.await_count, 2)
+
+
+class TestRulesCacheLRU(unittest.TestCase):
+    def test_lru_eviction_over_guilds(self):
+        cache = RulesCache(max_guilds=2)
+        cache.set(1, {"a": 1}, 0)
+        cache.set(2, {"b": 2}, 0)
+        cache.get_entry(1) # Touch guild 1 so guild 2 becomes least recently used
+        cache.set(3, {"c": 3}, 0)
+
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
+        self.assertIn(3, cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get(3), {"c": 3})
+        self.assertIsNone(cache.get(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
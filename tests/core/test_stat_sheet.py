@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from src.models import Player, GeneratedNpc, CombatEncounter
+from src.models.enums import CombatStatus, PlayerStatus
+from src.core.formula_engine import compile_formula
+from src.core.stat_sheet import build_stat_sheet, invalidate_stat_sheet, get_cached_stat_sheet, store_stat_sheet
+from src.core.combat_engine import _get_stat_sheet
+
+
+def _npc(**stats) -> GeneratedNpc:
+    return GeneratedNpc(id=5, guild_id=702, name_i18n={"en": "Orc"}, properties_json={"stats": stats})
+
+
+def _encounter(participants) -> CombatEncounter:
+    return CombatEncounter(
+        id=9, guild_id=702, location_id=1, status=CombatStatus.ACTIVE,
+        participants_json={"entities": participants},
+        turn_order_json={"order": [], "current_index": 0, "current_turn_number": 1},
+        rules_config_snapshot_json={"combat:attributes:modifier_formula": "(value - 10) // 2"},
+    )
+
+
+class TestBuildStatSheet(unittest.TestCase):
+
+    def test_npc_stats_modifiers_and_overrides(self):
+        npc = _npc(strength=16, dexterity=14, armor_class=13, hp=30, strength_modifier=9, nested={"luck": 12})
+        participant = {"id": 5, "type": "npc", "current_hp": 30, "dexterity": 8, "wisdom_modifier": 4}
+
+        sheet = build_stat_sheet(702, "npc", 5, participant, npc, compile_formula("(value - 10) // 2"), default_modifier=-1)
+
+        self.assertEqual(sheet.strength_modifier, 3) # Stored modifier on the entity is ignored
+        self.assertEqual(sheet.dexterity, 8) # Participant override wins
+        self.assertEqual(sheet.dexterity_modifier, -1)
+        self.assertEqual(sheet.initiative_modifier, -1)
+        self.assertEqual(sheet.wisdom_modifier, 4) # Modifier override used as is
+        self.assertEqual(sheet.armor_class, 13)
+        self.assertEqual(sheet.get("nested.luck_modifier"), 1)
+        self.assertEqual(sheet.charisma_modifier, -1) # Missing stat: default modifier
+        self.assertEqual(sheet.get("speed", 30), 30)
+        self.assertNotIn("current_hp", sheet)
+        with self.assertRaises(AttributeError):
+            sheet.speed
+
+    def test_player_attributes_and_default_max_hp(self):
+        player = Player(id=1, guild_id=702, discord_id=1, name="P", level=3, xp=0, unspent_xp=0, gold=0,
+                        current_status=PlayerStatus.IDLE)
+        player.attributes_json = {"strength": 18} # As spend_attribute_points stores them
+
+        sheet = build_stat_sheet(702, "player", 1, None, player, None, default_max_hp=50)
+
+        self.assertEqual(sheet.strength_modifier, 4) # Default calculation without a formula
+        self.assertEqual(sheet.max_hp, 50)
+        self.assertEqual(sheet.level, 3)
+        for column in ("id", "guild_id", "discord_id", "xp", "gold", "unspent_xp"): # Not stats
+            self.assertNotIn(column, sheet)
+            self.assertNotIn(f"{column}_modifier", sheet)
+
+    def test_failed_modifier_falls_back_only_for_that_value(self):
+        npc = _npc(strength=16, dexterity=14, wisdom=0)
+
+        sheet = build_stat_sheet(702, "npc", 5, None, npc, compile_formula("10 // value"))
+
+        self.assertEqual(sheet.strength_modifier, 0) # 10 // 16
+        self.assertEqual(sheet.dexterity_modifier, 0)
+        self.assertEqual(sheet.wisdom_modifier, -5) # Division by zero: default calculation
+
+    def test_cached_sheet_is_reused_until_invalidated(self):
+        participant = {"id": 5, "type": "npc", "current_hp": 10}
+        encounter = _encounter([participant])
+        sheet = build_stat_sheet(702, "npc", 5, participant, _npc(strength=12), None, rules_version=3)
+        store_stat_sheet(encounter, sheet)
+
+        self.assertIs(get_cached_stat_sheet(encounter, "npc", 5, participant, 3), sheet)
+        self.assertIsNone(get_cached_stat_sheet(encounter, "npc", 5, participant, 4)) # Rules changed
+        self.assertIsNone(get_cached_stat_sheet(encounter, "npc", 5, dict(participant), 3)) # Encounter reloaded
+
+        invalidate_stat_sheet(702, "generated_npc", 5) # Status effects use relationship entity types
+        self.assertIsNone(get_cached_stat_sheet(encounter, "npc", 5, participant, 3))
+
+
+class TestCombatEngineStatSheet(unittest.IsolatedAsyncioTestCase):
+
+    async def test_sheet_built_once_per_participant(self):
+        participant = {"id": 5, "type": "npc", "current_hp": 10}
+        encounter = _encounter([participant])
+        npc = _npc(strength=16)
+        snapshot = encounter.rules_config_snapshot_json
+
+        with patch("src.core.combat_engine.core_get_rule", new_callable=AsyncMock, return_value=None) as mock_get_rule, \
+             patch("src.core.stat_sheet.build_stat_sheet", wraps=build_stat_sheet) as mock_build:
+            first = await _get_stat_sheet(encounter, "npc", 5, participant, npc, AsyncMock(), 702, snapshot)
+            second = await _get_stat_sheet(encounter, "npc", 5, participant, npc, AsyncMock(), 702, snapshot)
+            self.assertIs(first, second)
+            self.assertEqual(mock_build.call_count, 1)
+            self.assertEqual(first.strength_modifier, 3)
+
+            npc.properties_json = {"stats": {"strength": 20}}
+            invalidate_stat_sheet(702, "npc", 5)
+            third = await _get_stat_sheet(encounter, "npc", 5, participant, npc, AsyncMock(), 702, snapshot)
+            self.assertEqual(third.strength_modifier, 5)
+            self.assertEqual(mock_build.call_count, 2)
+        mock_get_rule.assert_awaited() # Default modifier rule is not in the combat snapshot
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import GuildConfig, Location, RuleConfig, StoryLog, StoryLogArchive
+from src.models.enums import EventType
+from src.core import story_log_storage
+from src.core.story_log_storage import (
+    archive_expired_story_logs,
+    ensure_story_log_partitions,
+    get_story_log_retention_days,
+    month_start,
+    next_month,
+    partition_name,
+    restore_story_log_month,
+    retention_cutoff,
+    run_story_log_maintenance,
+)
+
+UTC = datetime.timezone.utc
+
+
+def _at(year: int, month: int, day: int = 1) -> datetime.datetime:
+    return datetime.datetime(year, month, day, 12, tzinfo=UTC)
+
+
+class TestStoryLogMonths(unittest.TestCase):
+
+    def test_month_bounds_and_names(self):
+        self.assertEqual(month_start("2026-03"), datetime.datetime(2026, 3, 1, tzinfo=UTC))
+        self.assertEqual(month_start(datetime.datetime(2026, 3, 31, 23, 59)), datetime.datetime(2026, 3, 1, tzinfo=UTC))
+        self.assertEqual(next_month(month_start("2026-12")), datetime.datetime(2027, 1, 1, tzinfo=UTC))
+        self.assertEqual(partition_name(month_start("2026-03")), "story_logs_y2026m03")
+        with self.assertRaises(ValueError):
+            month_start("2026")
+
+    def test_retention_cutoff(self):
+        self.assertIsNone(retention_cutoff(0, _at(2026, 10, 16)))
+        # Events older than 30 days: September ended after 2026-09-16, so only August and before are archived.
+        self.assertEqual(retention_cutoff(30, _at(2026, 10, 16)), datetime.datetime(2026, 9, 1, tzinfo=UTC))
+
+
+class TestStoryLogStorage(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    guild_id = 961
+    other_guild_id = 962
+    now = _at(2026, 10, 16)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(bind=cls.engine, class_=AsyncSession, expire_on_commit=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        self.archive_dir = tempfile.mkdtemp()
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add_all([GuildConfig(id=self.guild_id, main_language="en"), GuildConfig(id=self.other_guild_id, main_language="en")])
+            await session.flush()
+            session.add(Location(id=1, guild_id=self.guild_id, static_id="inn", name_i18n={"en": "Inn"},
+                                 descriptions_i18n={"en": "An inn"}, type="TOWN"))
+            session.add(RuleConfig(guild_id=self.guild_id, key=story_log_storage.RETENTION_RULE_KEY, value_json=40))
+            for guild_id in (self.guild_id, self.other_guild_id):
+                for month, count in ((7, 3), (8, 2), (10, 1)):
+                    for n in range(count):
+                        session.add(StoryLog(guild_id=guild_id, timestamp=_at(2026, month, n + 1), event_type=EventType.SYSTEM_EVENT,
+                                             location_id=1 if guild_id == self.guild_id else None,
+                                             details_json={"month": month, "n": n}, narrative_i18n={"en": "Событие"}))
+            await session.commit()
+
+    async def _months(self, guild_id: int) -> list:
+        async with self.SessionLocal() as session:
+            details = (await session.execute(select(StoryLog.details_json).where(StoryLog.guild_id == guild_id).order_by(StoryLog.id))).scalars()
+            return [d["month"] for d in details]
+
+    async def test_retention_days_from_rules(self):
+        async with self.SessionLocal() as session:
+            session.add(RuleConfig(guild_id=self.other_guild_id, key=story_log_storage.RETENTION_RULE_KEY, value_json="forever"))
+            await session.flush()
+            retention = await get_story_log_retention_days(session)
+        self.assertEqual(retention, {self.guild_id: 40, self.other_guild_id: story_log_storage.STORY_LOG_DEFAULT_RETENTION_DAYS})
+
+    async def test_expired_months_archived_and_restored(self):
+        archived = await archive_expired_story_logs(self.SessionLocal, now=self.now, archive_dir=self.archive_dir)
+
+        # 40 days before 2026-10-16 is in September: July and August are archived, the other guild keeps everything.
+        self.assertEqual(archived, {self.guild_id: ["2026-07", "2026-08"]})
+        self.assertEqual(await self._months(self.guild_id), [10])
+        self.assertEqual(await self._months(self.other_guild_id), [7, 7, 7, 8, 8, 10])
+
+        async with self.SessionLocal() as session:
+            archives = (await session.execute(select(StoryLogArchive).order_by(StoryLogArchive.month))).scalars().all()
+        self.assertEqual([(a.month, a.row_count) for a in archives], [("2026-07", 3), ("2026-08", 2)])
+        with gzip.open(os.path.join(self.archive_dir, archives[0].path), "rt", encoding="utf-8") as archive_file:
+            records = [json.loads(line) for line in archive_file]
+        self.assertEqual([r["details_json"] for r in records], [{"month": 7, "n": n} for n in range(3)])
+        self.assertEqual(records[0]["event_type"], "SYSTEM_EVENT")
+        self.assertEqual(records[0]["narrative_i18n"], {"en": "Событие"})
+
+        # Nothing left to archive on the next run.
+        self.assertEqual(await archive_expired_story_logs(self.SessionLocal, now=self.now, archive_dir=self.archive_dir), {})
+
+        async with self.SessionLocal() as session:
+            await session.delete(await session.get(Location, 1))
+            restored = await restore_story_log_month(session, self.guild_id, "2026-07", archive_dir=self.archive_dir)
+            await session.commit()
+            self.assertEqual(await restore_story_log_month(session, self.guild_id, "2026-07", archive_dir=self.archive_dir), 0)
+        self.assertEqual(restored, 3)
+        async with self.SessionLocal() as session:
+            rows = (await session.execute(select(StoryLog).where(StoryLog.guild_id == self.guild_id).order_by(StoryLog.id))).scalars().all()
+        self.assertEqual([row.details_json["month"] for row in rows], [7, 7, 7, 10])
+        self.assertEqual(rows[0].id, records[0]["id"]) # Original ids and timestamps
+        self.assertEqual(rows[0].timestamp.replace(tzinfo=UTC), _at(2026, 7, 1))
+        self.assertIsNone(rows[0].location_id) # Location deleted since archiving
+
+        # A restored month is held back, then archived again; the new archive supersedes the restored one.
+        self.assertEqual(await archive_expired_story_logs(self.SessionLocal, now=self.now, archive_dir=self.archive_dir), {})
+        later = self.now + datetime.timedelta(days=story_log_storage.STORY_LOG_RESTORE_HOLD_DAYS + 1)
+        archived = await archive_expired_story_logs(self.SessionLocal, now=later, archive_dir=self.archive_dir)
+        self.assertEqual(archived, {self.guild_id: ["2026-07"]})
+        async with self.SessionLocal() as session:
+            archives = (await session.execute(select(StoryLogArchive).order_by(StoryLogArchive.month))).scalars().all()
+        self.assertEqual([(a.month, a.row_count, a.restored_at) for a in archives], [("2026-07", 3, None), ("2026-08", 2, None)])
+        self.assertFalse(os.path.exists(os.path.join(self.archive_dir, archives[0].path + ".tmp")))
+        self.assertEqual(len(os.listdir(os.path.join(self.archive_dir, f"guild_{self.guild_id}"))), 2)
+
+    async def test_partitions_are_simulated_on_sqlite(self):
+        async with self.SessionLocal() as session:
+            self.assertEqual(await ensure_story_log_partitions(session, self.now), [])
+        summary = await run_story_log_maintenance(self.SessionLocal, now=self.now, archive_dir=self.archive_dir)
+        self.assertEqual(summary["partitions_created"], [])
+        self.assertEqual(summary["partitions_dropped"], [])
+        self.assertEqual(summary["archived"], {self.guild_id: ["2026-07", "2026-08"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
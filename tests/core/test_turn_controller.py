@@ -1,4 +1,5 @@
 import pytest
+import pytest_asyncio
 import asyncio
 import logging # For capturing logs in tests if needed
 
@@ -7,12 +8,15 @@ logger = logging.getLogger(__name__)
 from unittest.mock import AsyncMock, patch, MagicMock, call
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from sqlalchemy.engine import Result # For mocking query results
 
 from src.core.turn_controller import (
     process_guild_turn_if_ready,
     trigger_guild_turn_processing,
-    _guild_turn_processing_locks, # To inspect/manipulate for tests
+    claim_pending_turn_entities_for_guilds,
+    find_guilds_with_pending_turns,
+    sweep_ready_guild_turns,
 )
 from src.models import Player, Party # GuildConfig not directly used in tested functions here
 from src.models.enums import PlayerStatus, PartyTurnStatus
@@ -23,11 +27,15 @@ PLAYER_ID_2 = 11
 PARTY_ID_1 = 20
 
 
+LEASE_TOKEN = "test-host:1:lease"
+
+
 @pytest.fixture(autouse=True)
-def clear_locks_after_test():
-    """Ensures the global lock dictionary is cleared after each test."""
-    yield
-    _guild_turn_processing_locks.clear()
+def mock_turn_lease():
+    """Replaces the DB-backed guild turn lease with mocks; tests can inspect/override them."""
+    with patch("src.core.turn_controller.acquire_guild_turn_lease", new_callable=AsyncMock, return_value=LEASE_TOKEN) as mock_acquire, \
+         patch("src.core.turn_controller.release_guild_turn_lease", new_callable=AsyncMock, return_value=True) as mock_release:
+        yield {"acquire": mock_acquire, "release": mock_release}
 
 @pytest.fixture
 def mock_session() -> AsyncMock:
@@ -72,88 +80,29 @@ def mock_party_pending_1(mock_player_pending_2: Player) -> Party:
 
 
 @pytest.mark.asyncio
-@patch("src.core.turn_controller._start_action_processing_worker", new_callable=AsyncMock)
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
 async def test_process_guild_turn_no_pending_entities(
-    mock_start_worker: AsyncMock,
-    mock_session: AsyncMock
-):
-    mock_player_result = AsyncMock(spec=Result)
-    mock_player_result.scalars.return_value.all.return_value = []
-    mock_party_result = AsyncMock(spec=Result)
-    mock_party_result.scalars.return_value.all.return_value = []
-    mock_session.execute.side_effect = [mock_player_result, mock_party_result]
-
-    await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
-
-    assert DEFAULT_GUILD_ID not in _guild_turn_processing_locks
-    mock_start_worker.assert_not_called()
-    mock_session.add.assert_not_called()
-
-@pytest.mark.asyncio
-@patch("src.core.turn_controller.asyncio.create_task")
-@patch("src.core.turn_controller._start_action_processing_worker", new_callable=AsyncMock)
-async def test_process_guild_turn_one_player_pending(
-    mock_start_worker_direct_call: AsyncMock,
-    mock_create_task: MagicMock,
-    mock_session: AsyncMock,
-    mock_player_pending_1: Player
-):
-    mock_player_result = AsyncMock(spec=Result)
-    mock_player_result.scalars.return_value.all.return_value = [mock_player_pending_1]
-    mock_party_result = AsyncMock(spec=Result)
-    mock_party_result.scalars.return_value.all.return_value = []
-    mock_session.execute.side_effect = [mock_player_result, mock_party_result]
-
-    await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
-
-    assert mock_player_pending_1.current_status == PlayerStatus.PROCESSING_GUILD_TURN
-    mock_session.add.assert_called_with(mock_player_pending_1)
-
-    expected_entities = [{"id": mock_player_pending_1.id, "type": "player", "discord_id": mock_player_pending_1.discord_id}]
-    mock_start_worker_direct_call.assert_called_once_with(DEFAULT_GUILD_ID, expected_entities)
-    mock_create_task.assert_called_once()
-    assert DEFAULT_GUILD_ID not in _guild_turn_processing_locks
-
-@pytest.mark.asyncio
-@patch("src.core.turn_controller.asyncio.create_task")
-@patch("src.core.turn_controller._start_action_processing_worker", new_callable=AsyncMock)
-async def test_process_guild_turn_one_party_pending_with_member(
-    mock_start_worker_direct_call: AsyncMock,
-    mock_create_task: MagicMock,
+    mock_enqueue_job: AsyncMock,
     mock_session: AsyncMock,
-    mock_player_pending_2: Player,
-    mock_party_pending_1: Party
+    mock_turn_lease: dict
 ):
-    mock_player_pending_2.current_status = PlayerStatus.EXPLORING
-
-    mock_player_result = AsyncMock(spec=Result)
-    mock_player_result.scalars.return_value.all.return_value = []
-    mock_party_result = AsyncMock(spec=Result)
-    mock_party_result.scalars.return_value.all.return_value = [mock_party_pending_1]
-    mock_session.execute.side_effect = [mock_player_result, mock_party_result]
-    mock_session.get.return_value = mock_player_pending_2
-
-    await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
-
-    assert mock_party_pending_1.turn_status == PartyTurnStatus.PROCESSING_GUILD_TURN
-    assert mock_player_pending_2.current_status == PlayerStatus.PROCESSING_GUILD_TURN
-
-    mock_session.add.assert_any_call(mock_party_pending_1)
-    mock_session.add.assert_any_call(mock_player_pending_2)
+    with patch("src.core.turn_controller.claim_pending_turn_entities", new_callable=AsyncMock, return_value=[]) as mock_claim:
+        await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
 
-    expected_entities = [{"id": mock_party_pending_1.id, "type": "party", "name": mock_party_pending_1.name}]
-    mock_start_worker_direct_call.assert_called_once_with(DEFAULT_GUILD_ID, expected_entities)
-    mock_create_task.assert_called_once()
-    assert DEFAULT_GUILD_ID not in _guild_turn_processing_locks
+    mock_claim.assert_called_once_with(mock_session, DEFAULT_GUILD_ID)
+    mock_turn_lease["release"].assert_called_once_with(mock_session, DEFAULT_GUILD_ID, LEASE_TOKEN)
+    mock_enqueue_job.assert_not_called()
+    mock_session.add.assert_not_called()
 
 @pytest.mark.asyncio
-@patch("src.core.turn_controller._start_action_processing_worker", new_callable=AsyncMock)
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
 async def test_process_guild_turn_lock_prevents_concurrent(
-    mock_start_worker: AsyncMock,
+    mock_enqueue_job: AsyncMock,
     mock_session: AsyncMock,
-    mock_player_pending_1: Player
+    mock_player_pending_1: Player,
+    mock_turn_lease: dict
 ):
-    _guild_turn_processing_locks[DEFAULT_GUILD_ID] = True
+    mock_turn_lease["acquire"].return_value = None # Another worker holds a live lease
 
     mock_player_result = AsyncMock(spec=Result)
     mock_player_result.scalars.return_value.all.return_value = [mock_player_pending_1]
@@ -161,8 +110,10 @@ async def test_process_guild_turn_lock_prevents_concurrent(
 
     await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
 
-    mock_start_worker.assert_not_called()
-    assert _guild_turn_processing_locks[DEFAULT_GUILD_ID] is True
+    mock_enqueue_job.assert_not_called()
+    mock_session.execute.assert_not_called()
+    mock_turn_lease["release"].assert_not_called()
+    assert mock_player_pending_1.current_status == PlayerStatus.TURN_ENDED_PENDING_RESOLUTION
 
 @pytest.mark.asyncio
 @patch("src.core.turn_controller.process_guild_turn_if_ready", new_callable=AsyncMock)
@@ -179,100 +130,176 @@ async def test_trigger_guild_turn_processing_calls_process_ready(
     mock_process_ready.assert_called_once_with(mock_session_instance, DEFAULT_GUILD_ID)
 
 @pytest.mark.asyncio
-@patch("src.core.turn_controller.asyncio.create_task")
-@patch("src.core.turn_controller._start_action_processing_worker", new_callable=AsyncMock)
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
 async def test_process_guild_turn_releases_lock_on_exception(
-    mock_start_worker_direct_call: AsyncMock,
-    mock_create_task: MagicMock,
+    mock_enqueue_job: AsyncMock,
     mock_session: AsyncMock,
-    mock_player_pending_1: Player
+    mock_player_pending_1: Player,
+    mock_turn_lease: dict
 ):
-    mock_player_result = AsyncMock(spec=Result)
-    mock_player_result.scalars.return_value.all.return_value = [mock_player_pending_1]
-    mock_party_result = AsyncMock(spec=Result)
-    mock_party_result.scalars.return_value.all.return_value = []
-    mock_session.execute.side_effect = [mock_player_result, mock_party_result]
-
-    mock_start_worker_direct_call.side_effect = Exception("Worker failed intentionally")
-
-    # This list will store tasks created by our mock
-    created_test_tasks = []
-
-    def sync_simulated_create_task(coro):
-        # This function is synchronous, like the real asyncio.create_task.
-        # It needs to schedule the coroutine.
-        # The warning was about the coroutine returned by the *mock of create_task*
-        # (when simulated_create_task was async def) not being awaited.
-        # This version creates a real task and returns it.
-
-        # Wrapper to catch the expected exception from the coro, as the original test logic implied
-        async def run_coro_and_catch_exception():
-            try:
-                await coro
-            except Exception as e:
-                # Log or verify the specific exception if needed for the test
-                logger.debug(f"Simulated task caught exception: {e}")
-                pass # Exception is expected and handled by SUT or this simulation
-
-        task = asyncio.create_task(run_coro_and_catch_exception())
-        created_test_tasks.append(task) # Keep track for potential cleanup
-        return task # Return a real Task object
-
-    mock_create_task.side_effect = sync_simulated_create_task
-
-    # process_guild_turn_if_ready should catch the exception from the worker call
-    # (or more accurately, the exception during the worker's execution if it were awaited,
-    # but since it's create_task, the exception happens in the task)
-    # and log it, then proceed to the finally block to release the lock.
+    claimed = [{"id": mock_player_pending_1.id, "type": "player", "discord_id": mock_player_pending_1.discord_id}]
+    mock_enqueue_job.side_effect = Exception("Queue insert failed intentionally")
+
+    # process_guild_turn_if_ready catches the error and, since no job owns the lease, releases it.
+    with patch("src.core.turn_controller.claim_pending_turn_entities", new_callable=AsyncMock, return_value=claimed):
+        await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
+
+    mock_turn_lease["release"].assert_called_once_with(mock_session, DEFAULT_GUILD_ID, LEASE_TOKEN)
+    mock_enqueue_job.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
+async def test_process_guild_turn_releases_lease_on_error_before_handoff(
+    mock_enqueue_job: AsyncMock,
+    mock_session: AsyncMock,
+    mock_player_pending_1: Player,
+    mock_turn_lease: dict
+):
+    mock_session.execute.side_effect = RuntimeError("DB gone") # The claim UPDATE fails
+
     await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
 
-    assert DEFAULT_GUILD_ID not in _guild_turn_processing_locks
-    mock_start_worker_direct_call.assert_called_once()
+    mock_enqueue_job.assert_not_called()
+    mock_turn_lease["release"].assert_called_once_with(mock_session, DEFAULT_GUILD_ID, LEASE_TOKEN)
+
+
+# --- Set-based claim against a real (SQLite) database ---
+
+@pytest_asyncio.fixture
+async def sqlite_session():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from src.models.base import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+    await engine.dispose()
 
-    # Clean up any tasks created by the mock
-    for task_item in created_test_tasks:
-        if not task_item.done():
-            task_item.cancel()
-            try:
-                await task_item
-            except asyncio.CancelledError:
-                pass
+
+async def _player_status(session: AsyncSession, player_id: int) -> PlayerStatus:
+    return (await session.execute(select(Player.current_status).where(Player.id == player_id))).scalar_one()
+
+
+async def _party_status(session: AsyncSession, party_id: int) -> PartyTurnStatus:
+    return (await session.execute(select(Party.turn_status).where(Party.id == party_id))).scalar_one()
 
 
 @pytest.mark.asyncio
-@patch("src.core.turn_controller.asyncio.create_task")
-@patch("src.core.turn_controller._start_action_processing_worker", new_callable=AsyncMock)
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
+async def test_process_guild_turn_one_player_pending(
+    mock_enqueue_job: AsyncMock,
+    sqlite_session: AsyncSession,
+    mock_player_pending_1: Player
+):
+    sqlite_session.add(mock_player_pending_1)
+    await sqlite_session.commit()
+
+    await process_guild_turn_if_ready(sqlite_session, DEFAULT_GUILD_ID)
+
+    assert await _player_status(sqlite_session, PLAYER_ID_1) == PlayerStatus.PROCESSING_GUILD_TURN
+    expected_entities = [{"id": PLAYER_ID_1, "type": "player", "discord_id": 1001}]
+    mock_enqueue_job.assert_called_once_with(sqlite_session, DEFAULT_GUILD_ID, expected_entities, lease_owner=LEASE_TOKEN)
+
+
+@pytest.mark.asyncio
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
+async def test_process_guild_turn_one_party_pending_with_member(
+    mock_enqueue_job: AsyncMock,
+    sqlite_session: AsyncSession,
+    mock_player_pending_2: Player,
+    mock_party_pending_1: Party
+):
+    mock_player_pending_2.current_status = PlayerStatus.EXPLORING
+    sqlite_session.add_all([mock_player_pending_2, mock_party_pending_1])
+    await sqlite_session.commit()
+
+    await process_guild_turn_if_ready(sqlite_session, DEFAULT_GUILD_ID)
+
+    assert await _party_status(sqlite_session, PARTY_ID_1) == PartyTurnStatus.PROCESSING_GUILD_TURN
+    assert await _player_status(sqlite_session, PLAYER_ID_2) == PlayerStatus.PROCESSING_GUILD_TURN
+
+    expected_entities = [{"id": PARTY_ID_1, "type": "party", "name": "PartyPending1"}]
+    mock_enqueue_job.assert_called_once_with(sqlite_session, DEFAULT_GUILD_ID, expected_entities, lease_owner=LEASE_TOKEN)
+
+
+@pytest.mark.asyncio
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
 async def test_process_guild_turn_multiple_entities(
-    mock_start_worker_direct_call: AsyncMock,
-    mock_create_task: MagicMock,
-    mock_session: AsyncMock,
+    mock_enqueue_job: AsyncMock,
+    sqlite_session: AsyncSession,
     mock_player_pending_1: Player,
     mock_party_pending_1: Party,
     mock_player_pending_2: Player
 ):
-    mock_player_pending_2.current_status = PlayerStatus.TURN_ENDED_PENDING_RESOLUTION
-
-    mock_player_result = AsyncMock(spec=Result)
-    mock_player_result.scalars.return_value.all.return_value = [mock_player_pending_1]
-    mock_party_result = AsyncMock(spec=Result)
-    mock_party_result.scalars.return_value.all.return_value = [mock_party_pending_1]
-    mock_session.execute.side_effect = [mock_player_result, mock_party_result]
-    mock_session.get.return_value = mock_player_pending_2
-
-    await process_guild_turn_if_ready(mock_session, DEFAULT_GUILD_ID)
+    other_guild_player = Player(id=99, guild_id=DEFAULT_GUILD_ID + 1, discord_id=1099, name="OtherGuild",
+                                current_status=PlayerStatus.TURN_ENDED_PENDING_RESOLUTION)
+    sqlite_session.add_all([mock_player_pending_1, mock_player_pending_2, mock_party_pending_1, other_guild_player])
+    await sqlite_session.commit()
 
-    assert mock_player_pending_1.current_status == PlayerStatus.PROCESSING_GUILD_TURN
-    assert mock_party_pending_1.turn_status == PartyTurnStatus.PROCESSING_GUILD_TURN
-    assert mock_player_pending_2.current_status == PlayerStatus.PROCESSING_GUILD_TURN
+    await process_guild_turn_if_ready(sqlite_session, DEFAULT_GUILD_ID)
 
-    mock_session.add.assert_any_call(mock_player_pending_1)
-    mock_session.add.assert_any_call(mock_party_pending_1)
-    mock_session.add.assert_any_call(mock_player_pending_2)
+    assert await _player_status(sqlite_session, PLAYER_ID_1) == PlayerStatus.PROCESSING_GUILD_TURN
+    assert await _party_status(sqlite_session, PARTY_ID_1) == PartyTurnStatus.PROCESSING_GUILD_TURN
+    assert await _player_status(sqlite_session, PLAYER_ID_2) == PlayerStatus.PROCESSING_GUILD_TURN
+    assert await _player_status(sqlite_session, 99) == PlayerStatus.TURN_ENDED_PENDING_RESOLUTION # Other guild untouched
 
+    # Player 2 is covered by the party entry
     expected_entities_arg = [
-        {"id": mock_player_pending_1.id, "type": "player", "discord_id": mock_player_pending_1.discord_id},
-        {"id": mock_party_pending_1.id, "type": "party", "name": mock_party_pending_1.name}
+        {"id": PLAYER_ID_1, "type": "player", "discord_id": 1001},
+        {"id": PARTY_ID_1, "type": "party", "name": "PartyPending1"}
     ]
-    mock_start_worker_direct_call.assert_called_once_with(DEFAULT_GUILD_ID, expected_entities_arg)
-    mock_create_task.assert_called_once()
-    assert DEFAULT_GUILD_ID not in _guild_turn_processing_locks
+    mock_enqueue_job.assert_called_once_with(sqlite_session, DEFAULT_GUILD_ID, expected_entities_arg, lease_owner=LEASE_TOKEN)
+
+
+@pytest.mark.asyncio
+async def test_claim_pending_turn_entities_for_all_guilds(
+    sqlite_session: AsyncSession,
+    mock_player_pending_1: Player,
+):
+    sqlite_session.add_all([
+        mock_player_pending_1,
+        Player(id=50, guild_id=2, discord_id=2050, name="G2", current_status=PlayerStatus.TURN_ENDED_PENDING_RESOLUTION),
+        Player(id=51, guild_id=2, discord_id=2051, name="G2 idle", current_status=PlayerStatus.EXPLORING),
+    ])
+    await sqlite_session.commit()
+
+    assert await find_guilds_with_pending_turns(sqlite_session) == [DEFAULT_GUILD_ID, 2]
+
+    claimed = await claim_pending_turn_entities_for_guilds(sqlite_session)
+    assert claimed == {
+        DEFAULT_GUILD_ID: [{"id": PLAYER_ID_1, "type": "player", "discord_id": 1001}],
+        2: [{"id": 50, "type": "player", "discord_id": 2050}],
+    }
+    assert await _player_status(sqlite_session, 51) == PlayerStatus.EXPLORING
+    # A second claim finds nothing: the first one already flipped the statuses
+    assert await claim_pending_turn_entities_for_guilds(sqlite_session) == {}
+    assert await find_guilds_with_pending_turns(sqlite_session) == []
+
+
+@pytest.mark.asyncio
+@patch("src.core.turn_controller.enqueue_turn_job", new_callable=AsyncMock)
+async def test_sweep_ready_guild_turns_skips_leased_guilds(
+    mock_enqueue_job: AsyncMock,
+    sqlite_session: AsyncSession,
+    mock_player_pending_1: Player,
+    mock_turn_lease: dict
+):
+    sqlite_session.add_all([
+        mock_player_pending_1,
+        Player(id=50, guild_id=2, discord_id=2050, name="G2", current_status=PlayerStatus.TURN_ENDED_PENDING_RESOLUTION),
+    ])
+    await sqlite_session.commit()
+    mock_turn_lease["acquire"].side_effect = lambda session, guild_id: None if guild_id == 2 else LEASE_TOKEN
+    mock_enqueue_job.return_value = MagicMock(id=123)
+
+    queued = await sweep_ready_guild_turns(sqlite_session)
+
+    assert queued == {DEFAULT_GUILD_ID: 123}
+    assert await _player_status(sqlite_session, 50) == PlayerStatus.TURN_ENDED_PENDING_RESOLUTION
+    mock_enqueue_job.assert_called_once_with(
+        sqlite_session, DEFAULT_GUILD_ID, [{"id": PLAYER_ID_1, "type": "player", "discord_id": 1001}], lease_owner=LEASE_TOKEN
+    )
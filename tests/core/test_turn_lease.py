@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models.guild import GuildConfig
+from src.core.turn_lease import (
+    acquire_guild_turn_lease,
+    renew_guild_turn_lease,
+    release_guild_turn_lease,
+    get_guild_turn_lease,
+    hold_guild_turn_lease,
+)
+
+
+class TestGuildTurnLease(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    test_guild_id = 401
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add(GuildConfig(id=self.test_guild_id, main_language="en"))
+            await session.commit()
+
+    async def _acquire(self, ttl_seconds: float = 60) -> Optional[str]:
+        assert self.SessionLocal is not None
+        async with self.SessionLocal() as session:
+            token = await acquire_guild_turn_lease(session, self.test_guild_id, ttl_seconds=ttl_seconds)
+            await session.commit()
+            return token
+
+    async def test_second_acquire_fails_while_lease_is_live(self):
+        first = await self._acquire()
+        second = await self._acquire()
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+
+        async with self.SessionLocal() as session:
+            lease = await get_guild_turn_lease(session, self.test_guild_id)
+            self.assertEqual(lease.owner_id, first)
+
+    async def test_expired_lease_is_taken_over(self):
+        crashed_worker = await self._acquire(ttl_seconds=-1)
+        new_worker = await self._acquire()
+        self.assertIsNotNone(new_worker)
+        self.assertNotEqual(crashed_worker, new_worker)
+
+        async with self.SessionLocal() as session:
+            # The crashed worker can neither renew nor release someone else's lease
+            self.assertFalse(await renew_guild_turn_lease(session, self.test_guild_id, crashed_worker))
+            self.assertFalse(await release_guild_turn_lease(session, self.test_guild_id, crashed_worker))
+            self.assertTrue(await renew_guild_turn_lease(session, self.test_guild_id, new_worker))
+            await session.commit()
+
+    async def test_release_allows_reacquire(self):
+        token = await self._acquire()
+        async with self.SessionLocal() as session:
+            self.assertTrue(await release_guild_turn_lease(session, self.test_guild_id, token))
+            await session.commit()
+        self.assertIsNotNone(await self._acquire())
+
+    async def test_hold_heartbeats_and_releases(self):
+        token = await self._acquire(ttl_seconds=60)
+        async with self.SessionLocal() as session:
+            expires_before = (await get_guild_turn_lease(session, self.test_guild_id)).expires_at
+
+        async with hold_guild_turn_lease(self.test_guild_id, token, session_maker=self.SessionLocal,
+                                         ttl_seconds=120, heartbeat_seconds=0.01) as held:
+            await asyncio.sleep(0.05)
+            async with self.SessionLocal() as session:
+                lease = await get_guild_turn_lease(session, self.test_guild_id)
+                self.assertGreater(lease.expires_at, expires_before)
+        self.assertFalse(held.lost)
+
+        async with self.SessionLocal() as session:
+            self.assertIsNone(await get_guild_turn_lease(session, self.test_guild_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
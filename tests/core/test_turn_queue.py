@@ -0,0 +1,234 @@
+import asyncio
+import datetime
+import importlib.util
+import pathlib
+import unittest
+from typing import Optional
+from unittest.mock import patch
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker, AsyncEngine
+
+from src.models.base import Base
+from src.models import Player, GuildConfig, TurnJob
+from src.models.enums import PlayerStatus, TurnJobStatus
+from src.core import turn_queue
+from src.core.turn_lease import PROCESS_OWNER_PREFIX, acquire_guild_turn_lease
+from src.core.turn_queue import (
+    TurnJobWorkerPool,
+    claim_next_turn_job,
+    enqueue_turn_job,
+    get_turn_queue_metrics,
+)
+
+
+class TestTurnQueue(unittest.IsolatedAsyncioTestCase):
+    engine: Optional[AsyncEngine] = None
+    SessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+    guild_a = 501
+    guild_b = 502
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.engine:
+            asyncio.run(cls.engine.dispose())
+
+    async def asyncSetUp(self):
+        assert self.engine is not None and self.SessionLocal is not None
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        async with self.SessionLocal() as session:
+            session.add_all([GuildConfig(id=self.guild_a, main_language="en"), GuildConfig(id=self.guild_b, main_language="en")])
+            await session.commit()
+
+    async def _enqueue(self, guild_id: int, entity_id: int) -> int:
+        async with self.SessionLocal() as session:
+            job = await enqueue_turn_job(session, guild_id, [{"id": entity_id, "type": "player"}])
+            await session.commit()
+            return job.id
+
+    async def _statuses(self) -> dict:
+        async with self.SessionLocal() as session:
+            jobs = (await session.execute(select(TurnJob).order_by(TurnJob.id))).scalars().all()
+            return {job.id: job.status for job in jobs}
+
+    async def test_claim_is_fifo_per_guild(self):
+        a1 = await self._enqueue(self.guild_a, 1)
+        a2 = await self._enqueue(self.guild_a, 2)
+        b1 = await self._enqueue(self.guild_b, 3)
+
+        async with self.SessionLocal() as session:
+            first = await claim_next_turn_job(session, "w1")
+            second = await claim_next_turn_job(session, "w2")
+            third = await claim_next_turn_job(session, "w3") # a2 must wait for a1
+            await session.commit()
+
+        self.assertEqual(first.id, a1)
+        self.assertEqual(first.status, TurnJobStatus.RUNNING)
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(second.id, b1)
+        self.assertIsNone(third)
+        self.assertEqual((await self._statuses())[a2], TurnJobStatus.QUEUED)
+
+    async def test_pool_runs_jobs_in_order_and_reports_metrics(self):
+        processed = []
+
+        async def process(guild_id, entities):
+            processed.append((guild_id, entities[0]["id"]))
+
+        await self._enqueue(self.guild_a, 1)
+        await self._enqueue(self.guild_b, 2)
+        await self._enqueue(self.guild_a, 3)
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=process)
+        self.assertEqual(await pool.drain(), 3)
+
+        self.assertEqual(processed, [(self.guild_a, 1), (self.guild_b, 2), (self.guild_a, 3)])
+        self.assertTrue(all(status == TurnJobStatus.SUCCEEDED for status in (await self._statuses()).values()))
+        metrics = await pool.collect_metrics()
+        self.assertEqual(metrics["depth"]["succeeded"], 3)
+        self.assertEqual(metrics["depth"]["queued"], 0)
+        self.assertIsNone(metrics["oldest_queued_age_seconds"])
+        self.assertEqual(metrics["pool"]["jobs_succeeded"], 3)
+
+    async def test_failed_job_is_retried_then_failed_permanently(self):
+        calls = []
+
+        async def flaky(guild_id, entities):
+            calls.append(guild_id)
+            raise RuntimeError("pipeline down")
+
+        async with self.SessionLocal() as session:
+            job = await enqueue_turn_job(session, self.guild_a, [{"id": 1, "type": "player"}], max_attempts=2)
+            await session.commit()
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=flaky)
+        with patch.object(turn_queue, "TURN_JOB_RETRY_BASE_SECONDS", 0):
+            self.assertEqual(await pool.drain(), 2)
+
+        self.assertEqual(len(calls), 2)
+        async with self.SessionLocal() as session:
+            stored = await session.get(TurnJob, job.id)
+            self.assertEqual(stored.status, TurnJobStatus.FAILED)
+            self.assertEqual(stored.attempts, 2)
+            self.assertIn("pipeline down", stored.last_error)
+        self.assertEqual(pool.stats.jobs_retried, 1)
+        self.assertEqual(pool.stats.jobs_failed, 1)
+
+    async def test_job_is_deferred_while_another_worker_holds_the_lease(self):
+        processed = []
+
+        async def process(guild_id, entities):
+            processed.append(guild_id)
+
+        job_id = await self._enqueue(self.guild_a, 1)
+        async with self.SessionLocal() as session:
+            await acquire_guild_turn_lease(session, self.guild_a, owner_id="other-host:1:w0")
+            await session.commit()
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=process)
+        self.assertTrue(await pool.run_one("w1"))
+
+        self.assertEqual(processed, [])
+        async with self.SessionLocal() as session:
+            stored = await session.get(TurnJob, job_id)
+            self.assertEqual(stored.status, TurnJobStatus.QUEUED)
+            self.assertEqual(stored.attempts, 0) # A deferral does not use up an attempt
+            self.assertIsNone(stored.locked_by)
+            self.assertGreater(stored.available_at.replace(tzinfo=datetime.timezone.utc), datetime.datetime.now(datetime.timezone.utc))
+        self.assertEqual(pool.stats.jobs_deferred, 1)
+        self.assertEqual(await pool.drain(), 0) # Not claimable before the backoff ends
+
+    async def test_recovery_requeues_orphans_and_stuck_guild_turns(self):
+        orphan_id = await self._enqueue(self.guild_a, 1)
+        async with self.SessionLocal() as session:
+            await claim_next_turn_job(session, "crashed-worker") # RUNNING, but nobody holds the lease
+            session.add(Player(id=7, discord_id=707, guild_id=self.guild_b, name="Stuck",
+                               current_status=PlayerStatus.PROCESSING_GUILD_TURN))
+            await session.commit()
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=None)
+        await pool.recover()
+
+        async with self.SessionLocal() as session:
+            jobs = (await session.execute(select(TurnJob).order_by(TurnJob.id))).scalars().all()
+            metrics = await get_turn_queue_metrics(session)
+        self.assertEqual(jobs[0].id, orphan_id)
+        self.assertEqual(jobs[0].status, TurnJobStatus.QUEUED)
+        self.assertEqual(jobs[1].guild_id, self.guild_b)
+        self.assertEqual(jobs[1].entities_json, [{"id": 7, "type": "player", "discord_id": 707}])
+        self.assertIsNotNone(jobs[1].lease_owner)
+        self.assertEqual(metrics["depth"]["queued"], 2)
+
+
+    async def test_sweep_requeues_jobs_whose_lease_expired_after_startup(self):
+        job_id = await self._enqueue(self.guild_a, 1)
+        async with self.SessionLocal() as session:
+            await claim_next_turn_job(session, "other-host:1:w0")
+            await session.commit()
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=None)
+        # Just claimed: the worker is about to take the lease, so the job is not orphaned yet.
+        self.assertEqual((await pool.sweep())["requeued"], [])
+
+        async with self.SessionLocal() as session:
+            job = await session.get(TurnJob, job_id)
+            job.started_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=turn_queue.GUILD_TURN_LEASE_TTL_SECONDS + 1)
+            await session.commit()
+        self.assertEqual((await pool.sweep())["requeued"], [job_id])
+        self.assertEqual((await self._statuses())[job_id], TurnJobStatus.QUEUED)
+
+    async def test_sweep_queues_turns_of_guilds_with_pending_entities(self):
+        async with self.SessionLocal() as session:
+            session.add(Player(id=8, discord_id=808, guild_id=self.guild_b, name="Waiting",
+                               current_status=PlayerStatus.TURN_ENDED_PENDING_RESOLUTION))
+            await session.commit()
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=None)
+        queued = (await pool.sweep())["queued"]
+
+        self.assertEqual(list(queued), [self.guild_b])
+        async with self.SessionLocal() as session:
+            job = await session.get(TurnJob, queued[self.guild_b])
+            player = await session.get(Player, 8)
+        self.assertEqual(job.entities_json, [{"id": 8, "type": "player", "discord_id": 808}])
+        self.assertEqual(player.current_status, PlayerStatus.PROCESSING_GUILD_TURN)
+        self.assertEqual((await pool.sweep())["queued"], {})
+
+    async def test_recovery_requeues_own_running_jobs_despite_live_lease(self):
+        async with self.SessionLocal() as session:
+            lease_a = await acquire_guild_turn_lease(session, self.guild_a)
+            lease_b = await acquire_guild_turn_lease(session, self.guild_b)
+            own_job = await enqueue_turn_job(session, self.guild_a, [{"id": 1, "type": "player"}], lease_owner=lease_a)
+            foreign_job = await enqueue_turn_job(session, self.guild_b, [{"id": 2, "type": "player"}], lease_owner=lease_b)
+            await claim_next_turn_job(session, f"{PROCESS_OWNER_PREFIX}:w0") # Left RUNNING by a crashed run of this process
+            await claim_next_turn_job(session, "other-host:1:w0") # Still running elsewhere
+            await session.commit()
+
+        pool = TurnJobWorkerPool(session_maker=self.SessionLocal, worker_count=1, process_fn=None)
+        await pool.recover(owner_prefix=pool.worker_id_prefix) # As done by start()
+
+        statuses = await self._statuses()
+        self.assertEqual(statuses[own_job.id], TurnJobStatus.QUEUED)
+        self.assertEqual(statuses[foreign_job.id], TurnJobStatus.RUNNING)
+
+
+class TestTurnJobsMigration(unittest.TestCase):
+    def test_status_enum_labels_match_model(self):
+        path = pathlib.Path(__file__).resolve().parents[2] / "alembic" / "versions" / "0008_create_turn_jobs_table.py"
+        spec = importlib.util.spec_from_file_location("migration_0008", path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+        self.assertEqual(list(migration.turn_job_status_enum.enums), TurnJob.__table__.c.status.type.enums)
+
+if __name__ == "__main__":
+    unittest.main()